@@ -0,0 +1,80 @@
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Small timing utilities shared by the scripts in this directory."""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import timeit
+
+import numpy as onp
+
+from jax.interpreters import xla
+from jax.tree_util import tree_flatten
+
+
+def block_until_ready(x):
+  """Forces any device values in the pytree `x` to be computed."""
+  leaves, _ = tree_flatten(x)
+  for leaf in leaves:
+    if isinstance(leaf, xla.DeviceArray):
+      leaf._value  # pylint: disable=pointless-statement
+  return x
+
+
+def benchmark(f, iters=None, warmup=None, name=None, target_total_secs=1.):
+  """Benchmarks a nullary function `f`, printing and returning timings.
+
+  Args:
+    f: a function of no arguments to time. Its result is forced with
+      `block_until_ready` so that asynchronous dispatch is included.
+    iters: optional, number of timed calls. If omitted, chosen so the timed
+      calls take about `target_total_secs`.
+    warmup: optional, number of untimed calls made first, e.g. to trigger
+      compilation (default max(1, iters // 10)).
+    name: optional, name to print alongside the timings.
+    target_total_secs: used to pick `iters` when it isn't given.
+
+  Returns:
+    An array of per-call times in seconds.
+  """
+  if iters is None:
+    start = timeit.default_timer()
+    block_until_ready(f())
+    elapsed = timeit.default_timer() - start
+    iters = int(max(1, min(1000, target_total_secs / max(elapsed, 1e-6))))
+  if warmup is None:
+    warmup = max(1, iters // 10)
+
+  for _ in range(warmup):
+    block_until_ready(f())
+
+  times = []
+  for _ in range(iters):
+    start = timeit.default_timer()
+    block_until_ready(f())
+    times.append(timeit.default_timer() - start)
+  times = onp.array(times)
+
+  print("---------Benchmark results for {}---------".format(name or f.__name__))
+  print("mean={:.3e}s std={:.3e}s min={:.3e}s max={:.3e}s iters={}".format(
+      times.mean(), times.std(), times.min(), times.max(), iters))
+  return times
+
+
+def benchmark_suite(funs_and_names, **kwargs):
+  """Runs `benchmark` over (f, name) pairs, returning a dict of mean times."""
+  return {name: benchmark(f, name=name, **kwargs).mean()
+          for f, name in funs_and_names}
@@ -0,0 +1,83 @@
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Benchmarks for the top-k eigensolvers in `jax.scipy.sparse.linalg`.
+
+Run with `python -m benchmarks.eigensolver_benchmark [k]`. For matrices of
+increasing size with decaying spectra, the top `k` eigenvalues found by
+`eigsh` and the top `k` singular values found by `svds` and `randomized_svd`
+are timed against the full `lax_linalg.eigh` and `lax_linalg.svd`, and their
+largest relative error against the full decompositions is printed.
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import sys
+
+import numpy as onp
+
+from jax import jit
+from jax import lax_linalg
+from jax import random
+from jax.scipy.sparse import linalg as sp_linalg
+from benchmarks.benchmark import benchmark
+
+
+def _decaying_spectrum(rng, n):
+  """A symmetric matrix with eigenvalues decaying like 1 / i."""
+  q, _ = onp.linalg.qr(rng.randn(n, n))
+  w = 1. / onp.arange(1, n + 1)
+  return onp.dot(q * w, q.T).astype(onp.float32)
+
+
+def _max_relative_error(x, expected):
+  x, expected = onp.sort(onp.asarray(x)), onp.sort(expected)
+  return onp.max(onp.abs(x - expected) / onp.abs(expected))
+
+
+def main(k=10):
+  rng = onp.random.RandomState(0)
+  key = random.PRNGKey(0)
+  for n in [256, 1024, 4096]:
+    a = _decaying_spectrum(rng, n)
+
+    full_eigh = jit(lambda a: lax_linalg.eigh(a)[1])
+    full_svd = jit(lambda a: lax_linalg.svd(a, full_matrices=False,
+                                            compute_uv=False))
+    w = onp.asarray(full_eigh(a))
+    expected = w[-k:]
+
+    solvers = [
+        ("eigh (full)", full_eigh, lambda w: w[-k:]),
+        ("svd (full)", full_svd, lambda s: s[:k]),
+        ("eigsh", jit(lambda a: sp_linalg.eigsh(a, k, which='LA')[0]),
+         lambda w: w),
+        ("svds", jit(lambda a: sp_linalg.svds(
+            a, k, return_singular_vectors=False)), lambda s: s),
+        ("randomized_svd power_iterations=0",
+         jit(lambda a: sp_linalg.randomized_svd(
+             key, a, k, power_iterations=0)[1]), lambda s: s),
+        ("randomized_svd power_iterations=2",
+         jit(lambda a: sp_linalg.randomized_svd(key, a, k)[1]), lambda s: s),
+    ]
+    for name, f, top_k in solvers:
+      error = _max_relative_error(top_k(f(a)), expected)
+      print("{} n={} k={}: max relative error {:.2e}".format(
+          name, n, k, error))
+      benchmark(lambda: f(a), name="{} n={} k={}".format(name, n, k))
+
+
+if __name__ == "__main__":
+  main(*map(int, sys.argv[1:]))
@@ -0,0 +1,58 @@
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Benchmarks for jax.numpy.einsum.
+
+Run with `python -m benchmarks.einsum_benchmark`. Eager calls of einsum on
+small operands are dominated by the contraction path search and by tracing, both
+of which are cached after the first call with given subscripts, shapes and
+dtypes; the first call is timed against repeated ones, for a chain of matrix
+products of increasing length and for each path optimization strategy.
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import string
+
+import numpy as onp
+
+import jax.numpy as np
+from benchmarks.benchmark import benchmark
+
+
+def matrix_chain(num_operands, size=8):
+  rng = onp.random.RandomState(0)
+  letters = string.ascii_lowercase
+  subscripts = ",".join(letters[i:i + 2] for i in range(num_operands))
+  subscripts += "->" + letters[0] + letters[num_operands]
+  operands = [rng.randn(size, size).astype(onp.float32)
+              for _ in range(num_operands)]
+  return subscripts, operands
+
+
+def main():
+  for num_operands in [2, 4, 8, 12]:
+    for optimize in ["greedy", "optimal", False]:
+      if optimize == "optimal" and num_operands > 8:
+        continue
+      subscripts, operands = matrix_chain(num_operands)
+      f = lambda: np.einsum(subscripts, *operands, optimize=optimize)
+      name = "{} operands, optimize={}".format(num_operands, optimize)
+      benchmark(f, iters=1, warmup=0, name=name + ", first call")
+      benchmark(f, name=name + ", cached")
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,75 @@
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Benchmarks comparing real and complex FFTs in `jax.numpy.fft`.
+
+Run with `python -m benchmarks.fft_benchmark [batch]`. For a batch of real
+signals of increasing length, and for batches of real images of increasing
+size, the real transforms (`rfft`, `rfft2` and their inverses) are timed
+against the complex transforms (`fft`, `fft2` and their inverses) of the same
+signals.
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import sys
+
+import numpy as onp
+
+from jax import jit
+from jax import numpy as np
+from benchmarks.benchmark import benchmark
+
+
+TRANSFORMS_1D = [
+    ("rfft", jit(np.fft.rfft), False),
+    ("fft", jit(np.fft.fft), False),
+    ("irfft", jit(np.fft.irfft), True),
+    ("ifft", jit(lambda x: np.real(np.fft.ifft(x))), True),
+]
+
+TRANSFORMS_2D = [
+    ("rfft2", jit(np.fft.rfft2), False),
+    ("fft2", jit(np.fft.fft2), False),
+    ("irfft2", jit(np.fft.irfft2), True),
+    ("ifft2", jit(lambda x: np.real(np.fft.ifft2(x))), True),
+]
+
+
+def _spectrum(x, name):
+  """The input expected by the inverse transform `name` for the signal `x`."""
+  if name.startswith("ir"):
+    return onp.fft.rfftn(x, axes=tuple(range(1, x.ndim))).astype(onp.complex64)
+  return onp.fft.fftn(x, axes=tuple(range(1, x.ndim))).astype(onp.complex64)
+
+
+def main(batch=64):
+  rng = onp.random.RandomState(0)
+  for n in [256, 1024, 4096, 16384, 65536]:
+    x = rng.randn(batch, n).astype(onp.float32)
+    for name, f, inverse in TRANSFORMS_1D:
+      operand = _spectrum(x, name) if inverse else x
+      benchmark(lambda: f(operand),
+                name="{} batch={} n={}".format(name, batch, n))
+  for n in [32, 128, 512]:
+    x = rng.randn(batch, n, n).astype(onp.float32)
+    for name, f, inverse in TRANSFORMS_2D:
+      operand = _spectrum(x, name) if inverse else x
+      benchmark(lambda: f(operand),
+                name="{} batch={} shape={}x{}".format(name, batch, n, n))
+
+
+if __name__ == "__main__":
+  main(*map(int, sys.argv[1:]))
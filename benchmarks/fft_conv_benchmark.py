@@ -0,0 +1,54 @@
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Benchmarks for FFT-based convolution in `lax.conv_general_dilated`.
+
+Run with `python -m benchmarks.fft_conv_benchmark [signal_length]`. A batch of
+long single-channel 1-D signals, as in audio models, is convolved with kernels
+of increasing size using `method='direct'`, `'fft'` and `'auto'`, and the
+gradient of each method with respect to both arguments is timed as well.
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import sys
+
+import numpy as onp
+
+from jax import grad
+from jax import jit
+from jax import lax
+from jax import numpy as np
+from benchmarks.benchmark import benchmark
+
+
+def main(signal_length=65536, batch=8):
+  rng = onp.random.RandomState(0)
+  lhs = rng.randn(batch, 1, signal_length).astype(onp.float32)
+  for kernel_size in [16, 64, 256, 1024, 4096]:
+    rhs = rng.randn(1, 1, kernel_size).astype(onp.float32)
+    for method in ["direct", "fft", "auto"]:
+      conv = lambda lhs, rhs: lax.conv_general_dilated(
+          lhs, rhs, (1,), "SAME", method=method)
+      f = jit(conv)
+      g = jit(grad(lambda lhs, rhs: np.sum(conv(lhs, rhs)), (0, 1)))
+      name = "{} batch={} n={} k={}".format(method, batch, signal_length,
+                                            kernel_size)
+      benchmark(lambda: f(lhs, rhs), name=name)
+      benchmark(lambda: g(lhs, rhs), name=name + " grad")
+
+
+if __name__ == "__main__":
+  main(*map(int, sys.argv[1:]))
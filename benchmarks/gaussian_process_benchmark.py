@@ -0,0 +1,77 @@
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Benchmarks for gradients of a Gaussian process marginal likelihood.
+
+Run with `python -m benchmarks.gaussian_process_benchmark`. The gradient of the
+log marginal likelihood with respect to the kernel hyperparameters is computed
+for n training points in two ways: differentiating through the Cholesky
+factorization and a triangular solve, as in
+`examples/gaussian_process_regression.py`, and using the `solve` and `slogdet`
+primitives, whose derivatives reuse the factorization of the covariance matrix.
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import numpy as onp
+
+from jax import grad
+from jax import jit
+from jax import lax_linalg
+import jax.numpy as np
+from benchmarks.benchmark import benchmark
+
+
+def cov(params, x):
+  amplitude, length_scale = np.exp(params[0]), np.exp(params[1])
+  sqdist = np.sum((x[:, None, :] - x[None, :, :]) ** 2, axis=-1)
+  return amplitude * np.exp(-0.5 * sqdist / length_scale ** 2)
+
+
+def composed_marginal_likelihood(params, x, y):
+  n = x.shape[0]
+  k = cov(params, x) + 1e-3 * np.eye(n)
+  l = lax_linalg.cholesky(k)
+  alpha = lax_linalg.triangular_solve(l, y, left_side=True, lower=True)
+  logdet = 2 * np.sum(np.log(np.diagonal(l)))
+  return (-0.5 * np.sum(alpha ** 2) - 0.5 * logdet
+          - 0.5 * n * np.log(2 * np.pi))
+
+
+def primitive_marginal_likelihood(params, x, y):
+  n = x.shape[0]
+  k = cov(params, x) + 1e-3 * np.eye(n)
+  alpha = lax_linalg.solve(k, y, sym_pos=True)
+  _, logdet = lax_linalg.slogdet(k, sym_pos=True)
+  return (-0.5 * np.sum(y * alpha) - 0.5 * logdet
+          - 0.5 * n * np.log(2 * np.pi))
+
+
+def main():
+  rng = onp.random.RandomState(0)
+  params = onp.zeros(2, onp.float32)
+  for n in [10, 100, 500, 1000]:
+    x = rng.uniform(0., 5., size=(n, 1)).astype(onp.float32)
+    y = (onp.sin(x) + 0.1 * rng.randn(n, 1)).astype(onp.float32)
+    for name, f in [("composed", composed_marginal_likelihood),
+                    ("primitives", primitive_marginal_likelihood)]:
+      grad_fun = jit(grad(f))
+      benchmark(lambda: grad_fun(params, x, y),
+                name="GP marginal likelihood gradient, {}, n={}".format(
+                    name, n))
+
+
+if __name__ == "__main__":
+  main()
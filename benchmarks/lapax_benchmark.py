@@ -0,0 +1,75 @@
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Benchmarks for the blocked factorizations in `jax.experimental.lapax`.
+
+Run with `python -m benchmarks.lapax_benchmark`. For each matrix size the
+block size of each lapax function is first autotuned, then the lapax Cholesky,
+LU and triangular solve are timed against the `jax.lax_linalg` primitives.
+The first call of each function, which includes tracing and compilation, is
+timed separately from the calls that reuse the compiled computation.
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import time
+
+import numpy as onp
+
+from jax import jit
+from jax import lax_linalg
+from jax.experimental import lapax
+from benchmarks.benchmark import benchmark
+
+
+def _spd(rng, n):
+  x = rng.randn(n, n).astype(onp.float32)
+  return onp.matmul(x, x.T) + n * onp.eye(n, dtype=x.dtype)
+
+
+def _funs():
+  return [
+      ("cholesky", lapax.cholesky, lax_linalg.cholesky, _spd),
+      ("lu", lambda x: lapax.lu(x)[0], lambda x: lax_linalg.lu(x)[0],
+       lambda rng, n: rng.randn(n, n).astype(onp.float32)),
+      ("triangular_solve",
+       lambda x: lapax.solve_triangular(x, x, left_side=True, lower=True,
+                                        trans_a=False),
+       lambda x: lax_linalg.triangular_solve(x, x, left_side=True,
+                                             lower=True),
+       lambda rng, n: onp.linalg.cholesky(_spd(rng, n))),
+  ]
+
+
+def main():
+  rng = onp.random.RandomState(0)
+  for n in [64, 256, 1024]:
+    for fun in [lapax.cholesky, lapax.lu, lapax.solve_triangular]:
+      block_size = lapax.autotune_block_size(fun, n)
+      print("lapax.{} n={}: block size {}".format(fun.__name__, n, block_size))
+    for name, lapax_fun, lax_linalg_fun, make_operand in _funs():
+      x = make_operand(rng, n)
+      for impl, fun in [("lapax", lapax_fun), ("lax_linalg", lax_linalg_fun)]:
+        f = jit(fun)
+        start = time.time()
+        onp.asarray(f(x))
+        print("{} {} n={} first call: {:.3f} sec".format(
+            name, impl, n, time.time() - start))
+        benchmark(lambda: onp.asarray(f(x)),
+                  name="{} {} n={}".format(name, impl, n))
+
+
+if __name__ == "__main__":
+  main()
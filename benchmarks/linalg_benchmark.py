@@ -0,0 +1,90 @@
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Benchmarks for batched matrix factorizations on CPU.
+
+Run with `python -m benchmarks.linalg_benchmark [n]`. Each factorization is
+applied to a stack of `batch` random n x n matrices, for batch sizes from 1 to
+10000, both as a single batched call, which runs one LAPACK custom call that
+loops over the batch, and as a Python loop of unbatched calls for comparison.
+Then a batch of 10000 small matrices is factorized with the batch split across
+1, 2, 4, ... threads, up to the number of CPUs (see
+`jaxlib.lapack.set_num_threads`), to show how the batched kernels scale across
+cores.
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import multiprocessing
+import sys
+
+import numpy as onp
+
+from jax import jit
+from jax import lax_linalg
+from benchmarks.benchmark import benchmark
+from jaxlib import lapack
+
+
+def _spd(rng, batch, n):
+  x = rng.randn(batch, n, n).astype(onp.float32)
+  return onp.matmul(x, onp.swapaxes(x, -1, -2)) + n * onp.eye(n, dtype=x.dtype)
+
+
+FACTORIZATIONS = [
+    ("cholesky", jit(lax_linalg.cholesky), _spd),
+    ("lu", jit(lambda x: lax_linalg.lu(x)[0]),
+     lambda rng, batch, n: rng.randn(batch, n, n).astype(onp.float32)),
+    ("svd", jit(lambda x: lax_linalg.svd(x, full_matrices=False)),
+     lambda rng, batch, n: rng.randn(batch, n, n).astype(onp.float32)),
+    ("eigh", jit(lambda x: lax_linalg.eigh(x)), _spd),
+    ("triangular_solve",
+     jit(lambda x: lax_linalg.triangular_solve(x, x, left_side=True,
+                                               lower=True)),
+     lambda rng, batch, n: onp.linalg.cholesky(_spd(rng, batch, n))),
+]
+
+
+def thread_scaling(n=8, batch=10000):
+  rng = onp.random.RandomState(0)
+  default_num_threads = lapack.get_num_threads()
+  num_threads = 1
+  try:
+    while num_threads <= multiprocessing.cpu_count():
+      lapack.set_num_threads(num_threads)
+      for name, f, make_operand in FACTORIZATIONS:
+        x = make_operand(rng, batch, n)
+        benchmark(lambda: f(x), name="{} batch={} n={} threads={}".format(
+            name, batch, n, num_threads))
+      num_threads *= 2
+  finally:
+    lapack.set_num_threads(default_num_threads)
+
+
+def main(n=8):
+  rng = onp.random.RandomState(0)
+  for name, f, make_operand in FACTORIZATIONS:
+    for batch in [1, 10, 100, 1000, 10000]:
+      x = make_operand(rng, batch, n)
+      benchmark(lambda: f(x),
+                name="{} batch={} n={}".format(name, batch, n))
+      if batch <= 100:
+        benchmark(lambda: [f(x_i) for x_i in x],
+                  name="{} batch={} n={} unbatched loop".format(name, batch, n))
+  thread_scaling(n)
+
+
+if __name__ == "__main__":
+  main(*map(int, sys.argv[1:]))
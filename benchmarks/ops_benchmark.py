@@ -0,0 +1,91 @@
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Benchmarks for the indexed update operators in jax.ops.
+
+Run with `python -m benchmarks.ops_benchmark`. Accumulating rows of updates
+into a table with `index_add` and an integer array index is a single scatter;
+it is compared against the one-hot matmul formulation commonly used to express
+the same update, for a range of table sizes. The segment reductions are timed
+the same way, as a function of the number of segments.
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import numpy as onp
+
+from jax import jit
+from jax import ops
+import jax.numpy as np
+from benchmarks.benchmark import benchmark
+
+
+@jit
+def scatter_rows(table, idx, updates):
+  return ops.index_add(table, idx, updates)
+
+
+@jit
+def one_hot_rows(table, idx, updates):
+  one_hot = np.array(idx[:, None] == np.arange(table.shape[0]), table.dtype)
+  return table + np.dot(one_hot.T, updates)
+
+
+def segment_reductions(num_elements=10 ** 5, dim=16):
+  rng = onp.random.RandomState(0)
+  data = rng.randn(num_elements, dim).astype(onp.float32)
+  for log10_segments in range(1, 5):
+    num_segments = 10 ** log10_segments
+    ids = onp.sort(rng.randint(0, num_segments, num_elements)).astype(onp.int32)
+    table = onp.zeros((num_segments, dim), onp.float32)
+    for name, f in [
+        ("segment_sum", jit(lambda data, ids: ops.segment_sum(
+            data, ids, num_segments))),
+        ("segment_max", jit(lambda data, ids: ops.segment_max(
+            data, ids, num_segments))),
+        ("segment_mean", jit(lambda data, ids: ops.segment_mean(
+            data, ids, num_segments))),
+        ("segment_mean sorted", jit(lambda data, ids: ops.segment_mean(
+            data, ids, num_segments, indices_are_sorted=True))),
+        ("one-hot sum", lambda data, ids: one_hot_rows(table, ids, data))]:
+      benchmark(lambda: f(data, ids),
+                name="{} 1e{} elements into 1e{} segments".format(
+                    name, int(onp.log10(num_elements)), log10_segments))
+
+
+def main(num_updates=1000, dim=64):
+  rng = onp.random.RandomState(0)
+  updates = rng.randn(num_updates, dim).astype(onp.float32)
+  for log10_rows in range(2, 6):
+    num_rows = 10 ** log10_rows
+    table = onp.zeros((num_rows, dim), onp.float32)
+    idx = rng.randint(0, num_rows, num_updates).astype(onp.int32)
+    for f in [scatter_rows, one_hot_rows]:
+      benchmark(lambda: f(table, idx, updates),
+                name="{} {} updates into 1e{} rows".format(
+                    f.__name__, num_updates, log10_rows))
+  num_rows = 10 ** 4
+  table = onp.zeros((num_rows, dim), onp.float32)
+  idx = rng.randint(0, num_rows, num_updates).astype(onp.int32)
+  for name, op in [("index_mul", ops.index_mul), ("index_min", ops.index_min),
+                   ("index_max", ops.index_max)]:
+    f = jit(lambda table, idx, updates: op(table, idx, updates))
+    benchmark(lambda: f(table, idx, updates),
+              name="{} {} updates into 1e4 rows".format(name, num_updates))
+  segment_reductions()
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,93 @@
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Benchmarks comparing per-leaf and fused optimizer updates.
+
+Run with `python -m benchmarks.optimizers_benchmark`. Also times a training
+step on an embedding table with a dense gradient against the same step with the
+`IndexedSlices` gradient from `sparse.embedding_vjp`, as the vocabulary grows.
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import numpy.random as npr
+
+import jax.numpy as np
+from jax import grad, jit
+from jax.experimental import optimizers
+from jax.experimental import sparse
+from benchmarks.benchmark import benchmark
+
+
+def resnet_like_params(num_blocks=16, width=64):
+  # roughly the leaf count and size mix of a ResNet: conv kernels plus
+  # batchnorm scale and offset vectors
+  rng = npr.RandomState(0)
+  params = []
+  for _ in range(num_blocks):
+    for kernel_size in [1, 3, 1]:
+      kernel = rng.randn(kernel_size, kernel_size, width, width)
+      params.append((np.array(kernel, np.float32),
+                     (np.ones(width, np.float32), np.zeros(width, np.float32))))
+  return params
+
+
+def embedding_steps(batch_size=1024, dim=64):
+  ids = npr.RandomState(0).randint(0, 10 ** 4, batch_size)
+  loss = lambda rows: np.sum(rows ** 2)
+  for name, opt_maker in [("sgd", optimizers.sgd), ("adam", optimizers.adam)]:
+    opt_init, opt_update = opt_maker(1e-3)
+
+    @jit
+    def dense_step(opt_state):
+      table = optimizers.get_params(opt_state)
+      g = grad(lambda t: loss(sparse.embedding_lookup(t, ids)))(table)
+      return opt_update(0, g, opt_state)
+
+    @jit
+    def sparse_step(opt_state):
+      rows, emb_vjp = sparse.embedding_vjp(optimizers.get_params(opt_state),
+                                           ids)
+      return opt_update(0, emb_vjp(grad(loss)(rows)), opt_state)
+
+    for log10_vocab in range(4, 7):
+      opt_state = opt_init(np.zeros((10 ** log10_vocab, dim), np.float32))
+      for step_name, step in [("dense", dense_step), ("sparse", sparse_step)]:
+        benchmark(lambda: step(opt_state),
+                  name="{} {} embedding step, vocab 1e{}".format(
+                      name, step_name, log10_vocab))
+
+
+def main():
+  params = resnet_like_params()
+  grads = params
+  print("{} leaves".format(len(params) * 3))
+
+  for name, opt_maker, args in [("momentum", optimizers.momentum, (1e-3, 0.9)),
+                                ("rmsprop", optimizers.rmsprop, (1e-3,)),
+                                ("adam", optimizers.adam, (1e-3,))]:
+    for fused in [False, True]:
+      init_fun, update_fun = opt_maker(*args, fused=fused)
+      state = init_fun(params)
+      label = "{} {}".format(name, "fused" if fused else "per-leaf")
+      benchmark(lambda: update_fun(0, grads, state), name=label + " eager")
+      jit_update_fun = jit(update_fun)
+      benchmark(lambda: jit_update_fun(0, grads, state), name=label + " jit")
+
+  embedding_steps()
+
+
+if __name__ == "__main__":
+  main()
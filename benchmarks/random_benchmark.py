@@ -0,0 +1,88 @@
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Throughput benchmarks for the samplers in jax.random.
+
+Run with `python -m benchmarks.random_benchmark [max_log10_size]`. Sizes run
+from 1e6 elements up to 10**max_log10_size (default 8); sizes of 1e9 and above
+need tens of gigabytes of device memory and exercise the blocked key splitting
+in `random._random_bits`. Batched-key sampling is compared against a Python
+loop over the same keys, the raw throughput of each registered PRNG
+implementation is reported, and permutation, choice and categorical are timed
+for populations from 1e3 elements upwards.
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import sys
+
+import numpy as onp
+
+from jax import random
+from benchmarks.benchmark import benchmark
+
+
+def batched_keys(num_keys=1000, shape=(10,)):
+  keys = random.split(random.PRNGKey(0), num_keys)
+  benchmark(lambda: [random.uniform(key, shape) for key in keys],
+            name="uniform loop over {} keys".format(num_keys))
+  benchmark(lambda: random.uniform(keys, shape),
+            name="uniform batched {} keys".format(num_keys))
+  benchmark(lambda: random.split(keys),
+            name="split batched {} keys".format(num_keys))
+  benchmark(lambda: random.fold_in(keys, onp.arange(num_keys)),
+            name="fold_in batched {} keys".format(num_keys))
+
+
+def prng_impls(size=10 ** 7):
+  key = random.PRNGKey(0)
+  counts = onp.arange(size, dtype=onp.uint32)
+  for name, hash_fun in sorted(random._prng_impls.items()):
+    times = benchmark(lambda: hash_fun(key, counts), iters=10,
+                      name="{} 1e{}".format(name, int(onp.log10(size))))
+    print("{:.3e} random bits/s".format(32 * size / onp.min(times)))
+
+
+def sampling_scaling(max_log10_size):
+  key = random.PRNGKey(0)
+  for log10_size in range(3, max_log10_size + 1):
+    n = 10 ** log10_size
+    p = onp.ones(n, onp.float32)
+    benchmark(lambda: random.permutation(key, n), iters=3,
+              name="permutation 1e{}".format(log10_size))
+    benchmark(lambda: random.choice(key, n, (1000,), replace=False), iters=3,
+              name="choice 1e3 of 1e{} without replacement".format(log10_size))
+    benchmark(lambda: random.choice(key, n, (1000,), p=p), iters=3,
+              name="weighted choice 1e3 of 1e{}".format(log10_size))
+    # Gumbel-max draws cost O(n) each, so take fewer of them.
+    benchmark(lambda: random.categorical(key, p, shape=(10,)), iters=3,
+              name="categorical 10 of 1e{}".format(log10_size))
+
+
+def main(max_log10_size=8):
+  prng_impls()
+  batched_keys()
+  sampling_scaling(max_log10_size - 1)
+  key = random.PRNGKey(0)
+  for log10_size in range(6, max_log10_size + 1):
+    size = 10 ** log10_size
+    for sampler in [random.uniform, random.normal]:
+      name = "{} 1e{}".format(sampler.__name__, log10_size)
+      times = benchmark(lambda: sampler(key, (size,)), iters=3, name=name)
+      print("{:.3e} random bits/s".format(32 * size / onp.min(times)))
+
+
+if __name__ == "__main__":
+  main(*map(int, sys.argv[1:]))
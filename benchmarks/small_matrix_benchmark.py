@@ -0,0 +1,78 @@
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Benchmarks for the closed-form small-matrix paths in `jax.numpy.linalg`.
+
+Run with `python -m benchmarks.small_matrix_benchmark [max_batch]`. `det`,
+`inv` and `solve` on stacks of 2x2, 3x3 and 4x4 matrices, with up to
+`max_batch` (default 1e6) matrices per stack, are timed against the LU-based
+`lax_linalg.slogdet` and `lax_linalg.solve` that larger matrices use. The
+largest relative error of each path against NumPy is also printed.
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import sys
+
+import numpy as onp
+
+from jax import jit
+from jax import lax_linalg
+from jax import numpy as np
+from benchmarks.benchmark import benchmark
+
+
+def _lu_det(a):
+  sign, logdet = lax_linalg.slogdet(a)
+  return sign * np.exp(logdet)
+
+
+def _lu_inv(a):
+  eye = np.broadcast_to(np.eye(a.shape[-1], dtype=a.dtype), a.shape)
+  return lax_linalg.solve(a, eye)
+
+
+OPERATIONS = [
+    ("det", jit(np.linalg.det), jit(_lu_det), onp.linalg.det, False),
+    ("inv", jit(np.linalg.inv), jit(_lu_inv), onp.linalg.inv, False),
+    ("solve", jit(np.linalg.solve), jit(lax_linalg.solve), onp.linalg.solve,
+     True),
+]
+
+
+def _max_relative_error(x, expected):
+  return onp.max(onp.abs(onp.asarray(x) - expected) /
+                 (onp.abs(expected) + 1e-6))
+
+
+def main(max_batch=1000000):
+  rng = onp.random.RandomState(0)
+  batch_sizes = [b for b in [1000, 10000, 100000, 1000000] if b <= max_batch]
+  for n in [2, 3, 4]:
+    for batch in batch_sizes:
+      a = (rng.randn(batch, n, n) + n * onp.eye(n)).astype(onp.float32)
+      b = rng.randn(batch, n, 1).astype(onp.float32)
+      for name, closed_form, lu, reference, takes_rhs in OPERATIONS:
+        args = (a, b) if takes_rhs else (a,)
+        expected = reference(*(x.astype(onp.float64) for x in args))
+        for path, f in [("closed form", closed_form), ("lu", lu)]:
+          label = "{} {} batch={} n={}".format(name, path, batch, n)
+          print("{}: max relative error {:.2e}".format(
+              label, _max_relative_error(f(*args), expected)))
+          benchmark(lambda: f(*args), name=label)
+
+
+if __name__ == "__main__":
+  main(*map(int, sys.argv[1:]))
@@ -0,0 +1,76 @@
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Benchmarks for sparse-dense matrix products in jax.experimental.sparse.
+
+Run with `python -m benchmarks.sparse_benchmark [size] [num_cols]`. A random
+size x size matrix is multiplied with a dense size x num_cols operand, both
+densely and in COO and CSR format, across densities from 1e-4 to 0.3, so the
+crossover density at which the sparse product stops paying off can be read off.
+The gradients with respect to the nonzero values and the dense operand are
+timed as well.
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import sys
+
+import numpy as onp
+
+from jax import grad, jit
+from jax.experimental import sparse
+from jax.tree_util import tree_flatten, tree_unflatten
+import jax.numpy as np
+from benchmarks.benchmark import benchmark
+
+
+@jit
+def dense_matmul(x, y):
+  return np.dot(x, y)
+
+
+@jit
+def sparse_matmul(m, y):
+  return sparse.matmul(m, y)
+
+
+@jit
+def sparse_matmul_grad(m, y):
+  leaves, treedef = tree_flatten(m)
+  def loss(data, y):
+    m = tree_unflatten(treedef, [data] + leaves[1:])
+    return np.sum(sparse.matmul(m, y) ** 2)
+  return grad(loss, (0, 1))(m.data, y)
+
+
+def main(size=4096, num_cols=64):
+  rng = onp.random.RandomState(0)
+  y = rng.randn(size, num_cols).astype(onp.float32)
+  for density in [1e-4, 1e-3, 1e-2, 3e-2, 1e-1, 3e-1]:
+    x = rng.randn(size, size).astype(onp.float32)
+    x = onp.where(rng.rand(size, size) < density, x, 0).astype(onp.float32)
+    benchmark(lambda: dense_matmul(x, y),
+              name="dense {0}x{0} @ {0}x{1}".format(size, num_cols))
+    for fmt in [sparse.COO, sparse.CSR]:
+      m = fmt.fromdense(x)
+      benchmark(lambda: sparse_matmul(m, y),
+                name="{} density {:g} ({} nonzeros)".format(
+                    fmt.__name__, density, m.nnz))
+      benchmark(lambda: sparse_matmul_grad(m, y),
+                name="{} density {:g} grad".format(fmt.__name__, density))
+
+
+if __name__ == "__main__":
+  main(*map(int, sys.argv[1:]))
@@ -0,0 +1,56 @@
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Benchmarks for pytree flattening and unflattening.
+
+Run with `python -m benchmarks.tree_util_benchmark`.
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+from jax.tree_util import (tree_flatten, tree_unflatten, tree_map,
+                           tree_multimap, tree_structure)
+from jax.api_util import pytree_to_jaxtupletree
+from benchmarks.benchmark import benchmark
+
+
+def make_params(num_leaves, leaves_per_layer=4):
+  # shaped like a stax parameter list: a list of per-layer tuples and dicts
+  layers = []
+  for i in range(num_leaves // leaves_per_layer):
+    layers.append(({'w': float(i), 'b': float(i)}, (float(i), [float(i)])))
+  return layers
+
+
+def main():
+  tree = make_params(10000)
+  leaves, treedef = tree_flatten(tree)
+  _, other_treedef = tree_flatten(make_params(10000))
+  assert len(leaves) == treedef.num_leaves == 10000
+
+  benchmark(lambda: tree_flatten(tree), name="tree_flatten 10k")
+  benchmark(lambda: tree_unflatten(treedef, leaves), name="tree_unflatten 10k")
+  benchmark(lambda: tree_map(lambda x: x, tree), name="tree_map 10k")
+  benchmark(lambda: tree_multimap(lambda x, y: x, tree, tree),
+            name="tree_multimap 10k")
+  benchmark(lambda: tree_structure(tree), name="tree_structure 10k")
+  benchmark(lambda: hash(treedef), name="treedef hash 10k")
+  benchmark(lambda: treedef == other_treedef, name="treedef eq 10k")
+  benchmark(lambda: pytree_to_jaxtupletree(tree),
+            name="pytree_to_jaxtupletree 10k")
+
+
+if __name__ == "__main__":
+  main()
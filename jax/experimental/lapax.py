@@ -12,15 +12,36 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-"""A linear algebra library for use with JAX."""
+"""A linear algebra library for use with JAX.
+
+The factorizations here are blocked algorithms written with LAX operations, so
+they run on any backend. The loop over blocks, and the loop over the columns of
+each block, are `lax.fori_loop`s, so the traced and compiled computation has
+the same size whatever the matrix size and block size. To give every slice a
+static shape, matrices are padded to a multiple of the block size (with an
+identity on the padded part of the diagonal) and each step updates full-height
+panels, masking the rows that are not active. Most of the work is in matrix
+products of an n x n matrix with an n x block_size panel.
+
+`block_size=None` picks a block size for the backend, or the one found by
+`autotune_block_size` for matrices of similar size. Like `lax.fori_loop`, these
+functions are not reverse-mode differentiable; see `jax.lax_linalg` for
+differentiable factorizations.
+"""
 
 from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+import time
+
 import numpy as onp
 
+from jax import jit
 import jax.lax as lax
+from jax.lib import xla_bridge
+import jax.numpy as np
+from jax.util import partial
 
 
 # Based on work by phawkins@
@@ -34,211 +55,318 @@ import jax.lax as lax
 ### Linalg functions
 
 
-def cholesky(a, block_size=1):
-  """An unrolled left-looking Cholesky."""
-  return _cholesky(LapaxMatrix(a, block_size)).ndarray
-
-
-def _cholesky(a):
-  """An unrolled left-looking Cholesky on a (possibly blocked) LapaxMatrix."""
+def cholesky(a, block_size=None):
+  """A blocked left-looking Cholesky, returning the lower factor of `a`."""
+  a = np.asarray(a)
   n = a.shape[-1]
-  if n == 1:
-    return sqrt(a) if a.bs == 1 else _cholesky(a.bview(1))
+  block_size = _block_size(cholesky, n, a.dtype, block_size)
+  l = _cholesky_blocked(_pad_identity(a, _round_up(n, block_size)),
+                        block_size)
+  return _unpad(l, n, n)
 
-  def solve(a, b):
-    return _solve_triangular_right(a.bview(8), b.bview(8), False, True, True)
 
-  out = full_like(a, 0)
-  for i in range(0, n):
-    if i > 0:
-      a[i:, i] -= out[i:, :i] * out[i, :i].T
-    out[i, i] = _cholesky(a[i, i])
-    if i < n - 1:
-      out[i:, i] = solve(out[i, i], a[i:, i])
-  return out
+def _cholesky_blocked(a, block_size):
+  n = a.shape[-1]
+  rows = lax.broadcasted_iota(onp.int32, (n, 1), 0)
 
+  def body_fn(k, l):
+    j = k * block_size
+    # Update block column k with the columns already factored; the columns of
+    # `l` from j on are still zero.
+    l_rows = _slice(l, (j, 0), (block_size, n))
+    panel = _slice(a, (0, j), (n, block_size)) - np.matmul(l, _H(l_rows))
+    diag = _cholesky_unblocked(_slice(panel, (j, 0), (block_size, block_size)))
+    below = _H(_solve_lower_unblocked(diag, _H(panel)))
+    panel = np.where(rows >= j + block_size, below, np.zeros_like(below))
+    panel = _update(panel, diag, (j, 0))
+    return _update(l, panel, (0, j))
 
-def solve_triangular(a, b, left_side, lower, trans_a, block_size=1):
-  """An unrolled triangular solve."""
-  return _solve_triangular_right(LapaxMatrix(a, block_size),
-                                 LapaxMatrix(b, block_size),
-                                 left_side, lower, trans_a).ndarray
+  return lax.fori_loop(0, n // block_size, body_fn, np.zeros_like(a))
 
 
-def _solve_triangular_right(a, b, left_side, lower, trans_a):
-  """An unrolled right-looking triangular solve on (blocked) LapaxMatrices."""
+def _cholesky_unblocked(a):
   n = a.shape[-1]
+  rows = lax.broadcasted_iota(onp.int32, (n, 1), 0)
 
-  def solve(a, b):
-    return _solve_triangular_left(a, b, left_side, lower, trans_a)
+  def body_fn(i, l):
+    l_row = _slice(l, (i, 0), (1, n))
+    col = _slice(a, (0, i), (n, 1)) - np.matmul(l, _H(l_row))
+    col = col / np.sqrt(_slice(col, (i, 0), (1, 1)))
+    return _update(l, np.where(rows >= i, col, np.zeros_like(col)), (0, i))
 
-  if n == 1:
-    return solve(a.bview(1), b.bview(1))
+  return lax.fori_loop(0, n, body_fn, np.zeros_like(a))
 
-  out = full_like(b, 0)
-  if lower == trans_a:
-    if left_side:
-      for i in reversed(range(n)):
-        out[i, :] = solve(a[i, i], b[i, :])
-        if i > 0:
-          a_col = a[i, :i].T if lower else a[:i, i]
-          b[:i, :] -= a_col * out[i, :]
-    else:
-      for i in range(n):
-        out[:, i] = solve(a[i, i], b[:, i])
-        if i < n - 1:
-          a_row = a[i+1:, i].T if lower else a[i, i+1:]
-          b[:, i+1:] -= out[:, i] * a_row
-  else:
-    if left_side:
-      for i in range(n):
-        out[i, :] = solve(a[i, i], b[i, :])
-        if i < n - 1:
-          a_col = a[i+1:, i] if lower else a[i, i+1:].T
-          b[i+1:, :] -= a_col * out[i, :]
-    else:
-      for i in reversed(range(n)):
-        out[:, i:] = solve(a[i, i], b[:, i])
-        if i > 0:
-          a_row = a[i, :i] if lower else a[:i, i].T
-          b[:, :i] -= out[:, i] * a_row
 
-  return out
+def lu(a, block_size=None):
+  """A blocked right-looking LU decomposition with partial pivoting.
+
+  Returns `(lu, pivots)` in the same form as `jax.lax_linalg.lu`: the unit lower
+  and upper triangular factors stored in one matrix, and the row swapped with
+  row `i` at step `i`. Only square matrices are supported.
+  """
+  a = np.asarray(a)
+  m, n = a.shape[-2:]
+  if m != n:
+    msg = "lapax.lu requires square matrices, got shape {}."
+    raise ValueError(msg.format(a.shape))
+  block_size = _block_size(lu, n, a.dtype, block_size)
+  lu_, pivots = _lu_blocked(_pad_identity(a, _round_up(n, block_size)),
+                            block_size)
+  return _unpad(lu_, n, n), pivots[..., :n]
 
 
-def _solve_triangular_left(a, b, left_side, lower, trans_a):
-  """An unrolled left-looking triangular solve on *unblocked* LapaxMatrices."""
-  assert a.bs == b.bs == 1
+def _lu_blocked(a, block_size):
   n = a.shape[-1]
-  if n == 1:
-    return b / a
-
-  out = full_like(b, 0)
-  if lower == trans_a:
-    if left_side:
-      out[-1, :] = b[-1, :] / a[-1, -1]
-      for i in reversed(range(n-1)):
-        a_row = a[i+1:, i].T if lower else a[i, i+1:]
-        out[i, :] = (b[i, :] - a_row * out[i+1:, :]) / a[i, i]
+  rows = lax.broadcasted_iota(onp.int32, (n, 1), 0)
+  cols = lax.broadcasted_iota(onp.int32, (1, n), 1)
+  batch_ndims = a.ndim - 2
+
+  def body_fn(k, carry):
+    a, pivots = carry
+    j = k * block_size
+    panel, block_pivots, perm = _lu_panel(_slice(a, (0, j), (n, block_size)), j)
+    pivots = lax.dynamic_update_slice(pivots, block_pivots,
+                                      [0] * batch_ndims + [j])
+    # Apply the row interchanges of the panel to the rest of the matrix.
+    a = np.take_along_axis(a, np.broadcast_to(perm[..., None], a.shape),
+                           axis=batch_ndims)
+    a = _update(a, panel, (0, j))
+    # Solve for the block row of U to the right of the panel, then update the
+    # trailing submatrix.
+    l11 = _slice(a, (j, j), (block_size, block_size))
+    a_rows = _slice(a, (j, 0), (block_size, n))
+    u12 = _solve_lower_unblocked(l11, a_rows, unit_diagonal=True)
+    u12 = np.where(cols >= j + block_size, u12, np.zeros_like(u12))
+    a = _update(a, np.where(cols >= j + block_size, u12, a_rows), (j, 0))
+    l21 = np.where(rows >= j + block_size, panel, np.zeros_like(panel))
+    return a - np.matmul(l21, u12), pivots
+
+  pivots = np.zeros(a.shape[:-1], onp.int32)
+  return lax.fori_loop(0, n // block_size, body_fn, (a, pivots))
+
+
+def _lu_panel(panel, j):
+  """Unblocked LU with partial pivoting of the columns of `panel`.
+
+  The panel holds columns j to j + block_size of the matrix; rows above j are
+  left as they are. Returns the factored panel, the pivots of its columns, and
+  the permutation of the rows that its row interchanges make.
+  """
+  n, block_size = panel.shape[-2:]
+  batch_shape = panel.shape[:-2]
+  idx = lax.iota(onp.int32, n)
+  rows = lax.broadcasted_iota(onp.int32, (n, 1), 0)
+  cols = lax.broadcasted_iota(onp.int32, (1, block_size), 1)
+  block_idx = lax.iota(onp.int32, block_size)
+
+  def body_fn(i, carry):
+    panel, pivots, perm = carry
+    c = j + i
+    col = _slice(panel, (0, i), (n, 1))[..., 0]
+    # Like LAPACK's i?amax, measure complex entries by |re| + |im|.
+    if np.iscomplexobj(col):
+      magnitude = np.abs(np.real(col)) + np.abs(np.imag(col))
     else:
-      out[:, 0] = b[:, 0] / a[0, 0]
-      for i in range(1, n):
-        a_col = a[i, :i].T if lower else a[:i, i]
-        out[:, i] = (b[:, i] - out[:, :i] * a_col) / a[i, i]
+      magnitude = np.abs(col)
+    magnitude = np.where(idx >= c, magnitude, -np.ones_like(magnitude))
+    p = lax.convert_element_type(np.argmax(magnitude, axis=len(batch_shape)),
+                                 onp.int32)
+    swap = np.where(idx == c, p[..., None],
+                    np.where(idx == p[..., None], c, idx))
+    panel = np.take_along_axis(
+        panel, np.broadcast_to(swap[..., None], panel.shape),
+        axis=len(batch_shape))
+    perm = np.take_along_axis(perm, swap, axis=len(batch_shape))
+    pivots = np.where(block_idx == i, p[..., None], pivots)
+
+    pivot_row = _slice(panel, (c, 0), (1, block_size))
+    pivot = _slice(panel, (c, i), (1, 1))
+    # Like LAPACK, leave the column unscaled if the pivot is zero.
+    pivot = np.where(pivot == 0, np.ones_like(pivot), pivot)
+    col = _slice(panel, (0, i), (n, 1))
+    col = np.where(rows > c, col / pivot, col)
+    panel = _update(panel, col, (0, i))
+    update = np.matmul(np.where(rows > c, col, np.zeros_like(col)),
+                       np.where(cols > i, pivot_row, np.zeros_like(pivot_row)))
+    return panel - update, pivots, perm
+
+  pivots = np.zeros(batch_shape + (block_size,), onp.int32)
+  perm = np.broadcast_to(idx, batch_shape + (n,))
+  return lax.fori_loop(0, block_size, body_fn, (panel, pivots, perm))
+
+
+def solve_triangular(a, b, left_side, lower, trans_a, block_size=None):
+  """A blocked triangular solve."""
+  a, b = np.asarray(a), np.asarray(b)
+  dtype = xla_bridge.canonicalize_dtype(onp.result_type(a.dtype, b.dtype))
+  a = lax.convert_element_type(a, dtype)
+  b = lax.convert_element_type(b, dtype)
+  # Reduce to solving `l x = b` with a lower triangular `l`.
+  if trans_a:
+    a, lower = _T(a), not lower
+  if not left_side:
+    a, b, lower = _T(a), _T(b), not lower
+  if not lower:
+    a, b = _rev(a, (-2, -1)), _rev(b, (-2,))
+
+  n, m = b.shape[-2:]
+  block_size = _block_size(solve_triangular, n, a.dtype, block_size)
+  padded_n = _round_up(n, block_size)
+  x = _solve_lower_blocked(_pad_identity(a, padded_n),
+                           _pad_rows(b, padded_n), block_size)
+  x = _unpad(x, n, m)
+
+  if not lower:
+    x = _rev(x, (-2,))
+  return x if left_side else _T(x)
+
+
+def _solve_lower_blocked(l, b, block_size):
+  n, m = b.shape[-2:]
+
+  def body_fn(k, x):
+    j = k * block_size
+    # The rows of `x` from j on are still zero.
+    rhs = _slice(b, (j, 0), (block_size, m))
+    rhs = rhs - np.matmul(_slice(l, (j, 0), (block_size, n)), x)
+    diag = _slice(l, (j, j), (block_size, block_size))
+    return _update(x, _solve_lower_unblocked(diag, rhs), (j, 0))
+
+  return lax.fori_loop(0, n // block_size, body_fn, np.zeros_like(b))
+
+
+def _solve_lower_unblocked(l, b, unit_diagonal=False):
+  n, m = b.shape[-2:]
+
+  def body_fn(i, x):
+    row = _slice(b, (i, 0), (1, m)) - np.matmul(_slice(l, (i, 0), (1, n)), x)
+    if not unit_diagonal:
+      row = row / _slice(l, (i, i), (1, 1))
+    return _update(x, row, (i, 0))
+
+  return lax.fori_loop(0, n, body_fn, np.zeros_like(b))
+
+
+### Block size selection
+
+
+# Used when a function has not been autotuned for a matrix size.
+_DEFAULT_BLOCK_SIZES = {"cpu": 32, "gpu": 128, "tpu": 128}
+
+# Maps (platform, function name, size class, dtype) to a block size.
+_tuned_block_sizes = {}
+
+
+def _block_size_key(fun, n, dtype):
+  platform = xla_bridge.get_backend().platform
+  # Matrix sizes within a factor of two share a block size.
+  return (platform, fun.__name__, int(n).bit_length(), onp.dtype(dtype).name)
+
+
+def _block_size(fun, n, dtype, block_size):
+  if block_size is None:
+    block_size = _tuned_block_sizes.get(_block_size_key(fun, n, dtype))
+  if block_size is None:
+    platform = xla_bridge.get_backend().platform
+    block_size = _DEFAULT_BLOCK_SIZES.get(platform, 32)
+  return max(1, min(block_size, n))
+
+
+def autotune_block_size(fun, n, dtype=onp.float32,
+                        candidates=(8, 16, 32, 64, 128, 256), iters=3):
+  """Finds the fastest block size for `fun` on n x n matrices.
+
+  Each candidate block size is compiled and timed on the current backend, and
+  the fastest is used by later calls of `fun` with `block_size=None` on
+  matrices of the same dtype and of size within a factor of two of `n`.
+
+  Args:
+    fun: one of `cholesky`, `lu` or `solve_triangular`.
+    n: the matrix size to tune for.
+    dtype: the matrix dtype.
+    candidates: the block sizes to try. Those larger than `n` are clipped.
+    iters: the number of timed calls of each candidate.
+
+  Returns:
+    The chosen block size.
+  """
+  rng = onp.random.RandomState(0)
+  x = rng.randn(n, n).astype(dtype)
+  eye = n * onp.eye(n, dtype=dtype)
+  if fun is cholesky:
+    args, kwargs = (onp.matmul(x, x.T) + eye,), {}
+  elif fun is lu:
+    args, kwargs = (x,), {}
+  elif fun is solve_triangular:
+    args = (onp.tril(x) + eye, x)
+    kwargs = dict(left_side=True, lower=True, trans_a=False)
   else:
-    if left_side:
-      out[0, :] = b[0, :] / a[0, 0]
-      for i in range(1, n):
-        a_row = a[i, :i] if lower else a[:i, i].T
-        out[i, :] = (b[i, :] - a_row * out[:i, :]) / a[i, i]
-    else:
-      out[:, -1] = b[:, -1] / a[-1, -1]
-      for i in reversed(range(n-1)):
-        a_col = a[i+1:, i] if lower else a[i, i+1:].T
-        out[:, i] = (b[:, i] - out[:, i+1:] * a_col) / a[i, i]
-
-  return out
+    raise ValueError("Can't autotune the block size of {}.".format(fun))
 
+  timings = []
+  for block_size in sorted(set(max(1, min(c, n)) for c in candidates)):
+    f = jit(partial(fun, block_size=block_size, **kwargs))
+    run = lambda: onp.asarray(f(*args)[0] if fun is lu else f(*args))
+    run()  # compile
+    start = time.time()
+    for _ in range(iters):
+      run()
+    timings.append(((time.time() - start) / iters, block_size))
+  _, best = min(timings)
+  _tuned_block_sizes[_block_size_key(fun, n, dtype)] = best
+  return best
 
-### Convenient internally-used matrix model
 
+### Utilities
 
-def full_like(x, val):
-  return LapaxMatrix(lax.full_like(x.ndarray, val), x.bs)
 
+def _T(x):
+  return np.swapaxes(x, -1, -2)
 
-def sqrt(x):
-  return LapaxMatrix(lax.pow(x.ndarray, lax.full_like(x.ndarray, 0.5)), x.bs)
 
+def _H(x):
+  return np.conj(_T(x))
 
-def _matrix_transpose(ndarray):
-  dims = tuple(range(ndarray.ndim))
-  dims = dims[:-2] + (dims[-1], dims[-2])
-  return lax.transpose(ndarray, dims)
 
+def _rev(x, dims):
+  return lax.rev(x, tuple(d % x.ndim for d in dims))
 
-def _make_infix_op(fun):
-  return lambda *args: LapaxMatrix(fun(*(a.ndarray for a in args)), args[0].bs)
 
+def _round_up(n, block_size):
+  return -(-n // block_size) * block_size
 
-class LapaxMatrix(object):
-  """A matrix model using LAX functions and tweaked index rules from Numpy."""
-  __slots__ = ["ndarray", "bs", "shape"]
 
-  def __init__(self, ndarray, block_size=1):
-    self.ndarray = ndarray
-    self.bs = block_size
-    self.shape = tuple(onp.floor_divide(ndarray.shape, block_size)
-                       + (onp.mod(ndarray.shape, block_size) > 0))
-
-  def __getitem__(self, idx):
-    return LapaxMatrix(_matrix_take(self.ndarray, idx, self.bs), block_size=1)
-
-  def __setitem__(self, idx, val):
-    self.ndarray = _matrix_put(self.ndarray, idx, val.ndarray, self.bs)
-
-  def bview(self, block_size):
-    return LapaxMatrix(self.ndarray, block_size=block_size)
-
-  __add__ = _make_infix_op(lax.add)
-  __sub__ = _make_infix_op(lax.sub)
-  __mul__ = _make_infix_op(lax.batch_matmul)
-  __div__ = _make_infix_op(lax.div)
-  __truediv__ = _make_infix_op(lax.div)
-  T = property(_make_infix_op(_matrix_transpose))
-
-
-# Utility functions for block access of ndarrays
-
-
-def _canonical_idx(shape, idx_elt, axis, block_size=1):
-  """Canonicalize the indexer `idx_elt` to a slice."""
-  k = block_size
-  block_dim = shape[axis] // k + bool(shape[axis] % k)
-  if isinstance(idx_elt, int):
-    idx_elt = idx_elt % block_dim
-    idx_elt = slice(idx_elt, idx_elt + 1, 1)
-  indices = tuple(onp.arange(block_dim)[idx_elt])
-  if not indices:
-    return slice(0, 0, 1), False  # sliced to size zero
-  start, stop_inclusive = indices[0], indices[-1]
-  step = 1 if idx_elt.step is None else idx_elt.step
-  if k != 1 and step != 1:
-    raise TypeError("Non-unit step supported only with block_size=1")
-  if step > 0:
-    end = min(k * (stop_inclusive + step), shape[axis])
-    return slice(k * start, end, step), False
-  else:
-    end = min(k * (start - step), shape[axis])
-    return slice(k * stop_inclusive, end, -step), True
+def _slice(x, start, sizes):
+  """Dynamic slice of the last two dimensions of `x`."""
+  batch_ndims = x.ndim - 2
+  return lax.dynamic_slice(x, [0] * batch_ndims + list(start),
+                           x.shape[:-2] + tuple(sizes))
 
 
-def _matrix_put(ndarray, idx, val, block_size=1):
-  """Similar to numpy.put using LAX operations."""
-  idx_i, idx_j = idx
-  sli, row_rev = _canonical_idx(ndarray.shape, idx_i, -2, block_size)
-  slj, col_rev = _canonical_idx(ndarray.shape, idx_j, -1, block_size)
-  if not sli.step == slj.step == 1:
-    raise TypeError("Non-unit step not supported in assigment.")
+def _update(x, update, start):
+  """Dynamic update of a slice of the last two dimensions of `x`."""
+  return lax.dynamic_update_slice(x, update, [0] * (x.ndim - 2) + list(start))
 
-  if row_rev or col_rev:
-    val = lax.rev(val, *onp.where([row_rev, col_rev]))
 
-  start_indices = [0] * (ndarray.ndim - 2) + [sli.start, slj.start]
-  return lax.dynamic_update_slice(ndarray, val, start_indices)
+def _pad_identity(a, n):
+  """Pads the square `a` to n x n, with ones on the padded diagonal."""
+  m = a.shape[-1]
+  if m == n:
+    return a
+  config = [(0, 0, 0)] * (a.ndim - 2) + [(0, n - m, 0)] * 2
+  a = lax.pad(a, onp.array(0, a.dtype), config)
+  return a + onp.diag(onp.arange(n) >= m).astype(a.dtype)
 
 
-def _matrix_take(ndarray, idx, block_size=1):
-  """Similar to numpy.take using LAX operations."""
-  idx_i, idx_j = idx
-  sli, row_rev = _canonical_idx(ndarray.shape, idx_i, -2, block_size)
-  slj, col_rev = _canonical_idx(ndarray.shape, idx_j, -1, block_size)
+def _pad_rows(b, n):
+  m = b.shape[-2]
+  if m == n:
+    return b
+  config = [(0, 0, 0)] * (b.ndim - 2) + [(0, n - m, 0), (0, 0, 0)]
+  return lax.pad(b, onp.array(0, b.dtype), config)
 
-  start_indices = [0] * (ndarray.ndim - 2) + [sli.start, slj.start]
-  limit_indices = list(ndarray.shape[:-2]) + [sli.stop, slj.stop]
-  strides = [1] * (ndarray.ndim - 2) + [sli.step, slj.step]
-  out = lax.slice(ndarray, start_indices, limit_indices, strides)
 
-  if row_rev or col_rev:
-    out = lax.rev(out, *onp.where([row_rev, col_rev]))
-  return out
+def _unpad(x, m, n):
+  if x.shape[-2:] == (m, n):
+    return x
+  return lax.slice(x, (0,) * x.ndim, x.shape[:-2] + (m, n))
@@ -26,35 +26,138 @@ import collections
 import functools
 import operator
 
+import numpy as onp
+
+from jax import lax
+from jax import jit
+from jax import ops
 import jax.numpy as np
 from jax.core import pack
+from jax.experimental import sparse
+from jax.flatten_util import PackedTree, pack_tree
 from jax.util import partial, safe_zip, safe_map, unzip2
-from jax.tree_util import (tree_map, tree_mimomap, tree_structure,
-                           register_pytree_node)
+from jax.tree_util import (tree_map, tree_multimap, tree_mimomap, tree_flatten,
+                           tree_unflatten, tree_structure, register_pytree_node,
+                           _flatten_up_to)
 
 map = safe_map
 zip = safe_zip
 
 def optimizer(opt_maker):
-  """Decorator to make an optimizer map over tuple/list/dict containers."""
+  """Decorator to make an optimizer map over tuple/list/dict containers.
+
+  The decorated optimizer constructor accepts an extra keyword argument `fused`
+  (default False). When it is True, the init function ravels all the leaves of
+  like dtype into one contiguous flat buffer and the update rule is applied once
+  per buffer rather than once per leaf, which cuts the number of dispatched
+  computations when not under `jit`. The optimizer state is then a
+  `FusedOptimizerState`, and `get_params` unravels it back into a pytree.
+
+  Alternatively, the unfused optimizer can be initialized directly with a
+  `jax.flatten_util.PackedTree` of parameters, in which case all of the state
+  stays packed and `get_params` returns a `PackedTree` too.
+
+  Unfused update functions also accept `jax.experimental.sparse.IndexedSlices`
+  gradients for individual parameters (see `sparse_update`); fused ones don't.
+  """
   @functools.wraps(opt_maker)
   def tree_opt_maker(*args, **kwargs):
+    fused = kwargs.pop("fused", False)
     init_fun, update_fun = opt_maker(*args, **kwargs)
+    tree_init_fun, tree_update_fun = tree_init_update(init_fun, update_fun)
+    if fused:
+      return fused_init_update(tree_init_fun, tree_update_fun)
+    else:
+      return tree_init_fun, tree_update_fun
+  return tree_opt_maker
 
-    @functools.wraps(init_fun)
-    def tree_init_fun(x0_tree):
-      return tree_mimomap(init_fun, x0_tree)
+def tree_init_update(init_fun, update_fun):
+  """Lifts leaf-wise init/update functions to map over pytrees.
 
-    @functools.wraps(update_fun)
-    def tree_update_fun(i, grad_tree, state_trees):
-      return tree_mimomap(partial(update_fun, i), grad_tree, *state_trees)
+  A gradient in `grad_tree` may be a `jax.experimental.sparse.IndexedSlices`
+  in place of a dense array, e.g. as produced by `sparse.embedding_vjp`; see
+  `sparse_update`.
+  """
+  @functools.wraps(init_fun)
+  def tree_init_fun(x0_tree):
+    return tree_mimomap(init_fun, x0_tree)
 
-    return tree_init_fun, tree_update_fun
-  return tree_opt_maker
+  leaf_update_fun = sparse_update(update_fun)
+
+  @functools.wraps(update_fun)
+  def tree_update_fun(i, grad_tree, state_trees):
+    treedef = tree_structure(state_trees[0])
+    grads = _flatten_up_to(treedef, grad_tree)
+    states = [_flatten_up_to(treedef, tree) for tree in state_trees]
+    new_states = zip(*map(partial(leaf_update_fun, i), grads, *states))
+    return tuple(tree_unflatten(treedef, leaves) for leaves in new_states)
+
+  return tree_init_fun, tree_update_fun
+
+def sparse_update(update_fun):
+  """Extends a leaf-wise update function to accept `IndexedSlices` gradients.
+
+  Given an `IndexedSlices` gradient, the wrapped function gathers the rows of
+  the parameters and of each state component named by its indices, applies
+  `update_fun` to just those rows and scatters the results back with
+  `jax.ops.index_update`. Its cost is proportional to the number of rows in the
+  gradient rather than to the size of the parameters. Rows without a gradient
+  are left untouched, so for optimizers with decaying state, such as momentum
+  and Adam, this is the "lazy" variant of the update. Duplicate indices are
+  summed first. The state components must all have the shape of the
+  parameters. Dense gradients are passed through to `update_fun` unchanged.
+  """
+  @functools.wraps(update_fun)
+  def sparse_update_fun(i, g, *state):
+    if type(g) is not sparse.IndexedSlices:
+      return update_fun(i, g, *state)
+    g = sparse._sum_duplicates(g)
+    rows = [np.take(s, g.indices, axis=0) for s in state]
+    new_rows = update_fun(i, g.values, *rows)
+    return tuple(ops.index_update(s, g.indices, row)
+                 for s, row in zip(state, new_rows))
+  return sparse_update_fun
+
+def fused_init_update(tree_init_fun, tree_update_fun):
+  """Wraps pytree init/update functions to act on per-dtype flat buffers."""
+  @functools.wraps(tree_init_fun)
+  def fused_init_fun(x0_tree):
+    return FusedOptimizerState(tree_init_fun(pack_tree(x0_tree)))
+
+  @functools.wraps(tree_update_fun)
+  def fused_update_fun(i, grad_tree, state):
+    packed_trees = state.packed_trees
+    if type(grad_tree) is not PackedTree:
+      grad_tree = packed_trees[0].layout.pack(grad_tree)
+    return FusedOptimizerState(tree_update_fun(i, grad_tree, packed_trees))
+
+  return fused_init_fun, fused_update_fun
+
+class FusedOptimizerState(object):
+  """Optimizer state with each component stored as a `PackedTree`.
+
+  Attributes:
+    packed_trees: a tuple with one `PackedTree` per optimizer state component
+      (e.g. the parameters and the first and second moment estimates for Adam),
+      all sharing the same layout.
+  """
+  __slots__ = ["packed_trees"]
+
+  def __init__(self, packed_trees):
+    self.packed_trees = tuple(packed_trees)
+
+register_pytree_node(FusedOptimizerState,
+                     lambda state: (state.packed_trees, None),
+                     lambda _, packed_trees: FusedOptimizerState(packed_trees))
 
 def iterate(state_trees):
   """Extract the current iterate from an optimizer state."""
-  return state_trees[0]
+  if type(state_trees) is FusedOptimizerState:
+    return state_trees.packed_trees[0].unpack()
+  elif type(state_trees) is LossScaleState:
+    return iterate(state_trees.opt_state)
+  else:
+    return state_trees[0]
 get_params = iterate
 
 # optimizers
@@ -150,6 +253,131 @@ def adam(step_size, b1=0.9, b2=0.999, eps=1e-8):
     return x, m, v
   return init_fun, update_fun
 
+# gradient clipping
+
+def global_norm(tree):
+  """Returns the l2 norm of all the leaves of `tree` taken together.
+
+  All of the squared sums and the final square root are computed in a single
+  compiled computation, with reductions done in at least float32.
+  """
+  leaves, _ = tree_flatten(tree)
+  return _global_norm(*leaves)
+
+def clip_grads(grad_tree, max_norm):
+  """Rescales `grad_tree` so that its `global_norm` is at most `max_norm`."""
+  leaves, treedef = tree_flatten(grad_tree)
+  return tree_unflatten(treedef, _clip_leaves(max_norm, *leaves))
+
+def clip_update(update_fun, max_norm):
+  """Wraps an optimizer update function to first apply `clip_grads`.
+
+  Args:
+    update_fun: an update function, e.g. as returned by `adam`.
+    max_norm: positive scalar, the maximum global norm of the gradients.
+
+  Returns:
+    An update function with the same signature as `update_fun`.
+  """
+  @functools.wraps(update_fun)
+  def clipped_update_fun(i, grad_tree, state):
+    return update_fun(i, clip_grads(grad_tree, max_norm), state)
+  return clipped_update_fun
+
+def _is_inexact(x):
+  # Integer leaves, like the indices of an IndexedSlices gradient, aren't
+  # gradient values and are left out of norms and rescaling.
+  return onp.issubdtype(onp.result_type(x), onp.inexact)
+
+def _sum_of_squares(x):
+  dtype = onp.promote_types(onp.result_type(x), onp.float32)
+  x = lax.convert_element_type(x, dtype)
+  return np.sum(np.real(x * np.conj(x)))
+
+@jit
+def _global_norm(*leaves):
+  return np.sqrt(sum(_sum_of_squares(leaf) for leaf in leaves
+                     if _is_inexact(leaf)))
+
+@jit
+def _clip_leaves(max_norm, *leaves):
+  norm = _global_norm(*leaves)
+  scale = np.where(norm <= max_norm, 1., max_norm / norm)
+  return [leaf * lax.convert_element_type(scale, onp.result_type(leaf))
+          if _is_inexact(leaf) else leaf for leaf in leaves]
+
+# dynamic loss scaling
+
+LossScaleState = collections.namedtuple(
+    "LossScaleState", ["opt_state", "loss_scale", "good_steps"])
+register_pytree_node(LossScaleState, lambda state: (tuple(state), None),
+                     lambda _, xs: LossScaleState(*xs))
+
+def all_finite(tree):
+  """Returns a boolean scalar, True iff every leaf of `tree` is finite."""
+  leaves, _ = tree_flatten(tree)
+  if not leaves:
+    return np.array(True)
+  return functools.reduce(np.logical_and,
+                          [np.all(np.isfinite(leaf)) for leaf in leaves])
+
+def dynamic_loss_scaling(init_fun, update_fun, init_scale=2.**15,
+                         growth_interval=2000, growth_factor=2.,
+                         backoff_factor=0.5):
+  """Wraps optimizer init and update functions with dynamic loss scaling.
+
+  For mixed-precision training, the loss is multiplied by a scale factor before
+  differentiation so that small gradients don't underflow in float16. The
+  wrapped update function takes the resulting scaled gradients, unscales them in
+  float32 and checks them for overflow. If any gradient is non-finite the update
+  is skipped and the scale is multiplied by `backoff_factor`; after
+  `growth_interval` consecutive finite steps the scale is multiplied by
+  `growth_factor`. Everything is computed with array ops, so the update function
+  can be used under `jit`.
+
+  Args:
+    init_fun: an optimizer init function, e.g. as returned by `adam`.
+    update_fun: the corresponding optimizer update function.
+    init_scale: optional, the initial loss scale (default 2**15).
+    growth_interval: optional, number of consecutive finite steps after which
+      the loss scale is increased (default 2000).
+    growth_factor: optional, factor by which to increase the loss scale
+      (default 2.).
+    backoff_factor: optional, factor by which to decrease the loss scale on
+      overflow (default 0.5).
+
+  Returns:
+    An (init_fun, update_fun) pair whose state is a `LossScaleState`. Use
+    `get_loss_scale` to read the current scale to multiply the loss by, and
+    `get_params` to read the parameters as usual.
+  """
+  def scaled_init_fun(x0_tree):
+    return LossScaleState(init_fun(x0_tree), np.array(init_scale, np.float32),
+                          np.array(0, np.int32))
+
+  def scaled_update_fun(i, scaled_grad_tree, state):
+    opt_state, loss_scale, good_steps = state
+    grad_tree = tree_map(
+        lambda g: lax.convert_element_type(g, np.float32) / loss_scale
+        if _is_inexact(g) else g, scaled_grad_tree)
+    finite = all_finite(grad_tree)
+    new_opt_state = update_fun(i, grad_tree, opt_state)
+    opt_state = tree_multimap(partial(np.where, finite), new_opt_state,
+                              opt_state)
+    grow = np.logical_and(finite, good_steps + 1 >= growth_interval)
+    loss_scale = np.where(
+        finite, np.where(grow, loss_scale * growth_factor, loss_scale),
+        loss_scale * backoff_factor)
+    good_steps = np.where(np.logical_and(finite, np.logical_not(grow)),
+                          good_steps + 1, np.zeros_like(good_steps))
+    return LossScaleState(opt_state, loss_scale, good_steps)
+
+  return scaled_init_fun, scaled_update_fun
+
+def get_loss_scale(state):
+  """Extract the current loss scale from a `LossScaleState`."""
+  return state.loss_scale
+
 # learning rate schedules
 
 def constant(step_size):
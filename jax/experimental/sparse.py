@@ -0,0 +1,341 @@
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Sparse matrix containers and sparse-dense matrix products.
+
+`COO` and `CSR` hold the nonzeros of a 2-D matrix. Both are pytrees whose leaves
+are their arrays, with the dense shape as static auxiliary data, so they can be
+passed to and returned from `jit`, `grad` and `vmap` functions like any other
+container.
+
+The product of a sparse matrix with a dense operand gathers the rows of the
+dense operand named by the column indices, scales them by the nonzero values,
+and scatter-adds them into the output rows (see `jax.ops.segment_sum`). Its cost
+is proportional to the number of nonzeros rather than to the dense size, and
+since it is built from `lax.gather` and `lax.scatter_add` it can be
+differentiated with respect to both the dense operand and the nonzero values
+and batched with `vmap`. For example::
+
+  A = sparse.COO.fromdense(adjacency)
+  y = sparse.matmul(A, x)   # or A @ x
+
+`IndexedSlices` represents an array that is zero outside of a few of its rows,
+such as the gradient of an embedding lookup with respect to the embedding
+table. `embedding_vjp` computes such a gradient without materializing the full
+table, and the update functions in `jax.experimental.optimizers` apply it to
+only the rows it touches::
+
+  rows, emb_vjp = sparse.embedding_vjp(table, ids)
+  g_rows, g_other = grad(loss, (0, 1))(rows, other_params)
+  g_table = emb_vjp(g_rows)   # an IndexedSlices
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import numpy as onp
+
+from jax import lax
+from jax import ops
+from jax.tree_util import register_pytree_node
+import jax.numpy as np
+
+
+class COO(object):
+  """A 2-D sparse matrix in coordinate format.
+
+  Attributes:
+    data: an array of shape (nnz,) with the stored values.
+    row: an integer array of shape (nnz,) with the row index of each value.
+    col: an integer array of shape (nnz,) with the column index of each value.
+    shape: the static shape of the dense matrix, a pair of ints.
+
+  Duplicate (row, col) entries are summed.
+  """
+  __slots__ = ["data", "row", "col", "shape"]
+  # Higher than ndarray's, so that `ndarray @ sparse` defers to __rmatmul__.
+  __array_priority__ = 2000
+
+  def __init__(self, data, row, col, shape):
+    self.data = data
+    self.row = row
+    self.col = col
+    self.shape = tuple(shape)
+
+  @classmethod
+  def fromdense(cls, x):
+    """Builds a `COO` with the nonzeros of `x`, which must be concrete."""
+    x = onp.asarray(x)
+    _check_matrix_shape(x.shape)
+    row, col = onp.nonzero(x)
+    return cls(x[row, col], row.astype(onp.int32), col.astype(onp.int32),
+               x.shape)
+
+  @property
+  def dtype(self):
+    return np.result_type(self.data)
+
+  @property
+  def nnz(self):
+    return np.shape(self.data)[0]
+
+  @property
+  def T(self):
+    return COO(self.data, self.col, self.row, self.shape[::-1])
+
+  def todense(self):
+    out = np.zeros(self.shape, self.dtype)
+    return ops.index_add(out, (self.row, self.col), self.data)
+
+  def __matmul__(self, other):
+    return matmul(self, other)
+
+  def __rmatmul__(self, other):
+    return matmul(other, self)
+
+  def __repr__(self):
+    return "COO(shape={}, nnz={}, dtype={})".format(
+        self.shape, self.nnz, onp.dtype(self.dtype).name)
+
+register_pytree_node(COO, lambda x: ((x.data, x.row, x.col), x.shape),
+                     lambda shape, xs: COO(xs[0], xs[1], xs[2], shape))
+
+
+class CSR(object):
+  """A 2-D sparse matrix in compressed sparse row format.
+
+  Attributes:
+    data: an array of shape (nnz,) with the stored values, ordered by row.
+    indices: an integer array of shape (nnz,) with the column index of each
+      value.
+    indptr: an integer array of shape (shape[0] + 1,); the values of row `i`
+      are `data[indptr[i]:indptr[i + 1]]`.
+    shape: the static shape of the dense matrix, a pair of ints.
+  """
+  __slots__ = ["data", "indices", "indptr", "shape"]
+  __array_priority__ = 2000
+
+  def __init__(self, data, indices, indptr, shape):
+    self.data = data
+    self.indices = indices
+    self.indptr = indptr
+    self.shape = tuple(shape)
+
+  @classmethod
+  def fromdense(cls, x):
+    """Builds a `CSR` with the nonzeros of `x`, which must be concrete."""
+    x = onp.asarray(x)
+    _check_matrix_shape(x.shape)
+    row, col = onp.nonzero(x)
+    indptr = onp.concatenate([[0], onp.cumsum(onp.bincount(
+        row, minlength=x.shape[0]))])
+    return cls(x[row, col], col.astype(onp.int32), indptr.astype(onp.int32),
+               x.shape)
+
+  @property
+  def dtype(self):
+    return np.result_type(self.data)
+
+  @property
+  def nnz(self):
+    return np.shape(self.data)[0]
+
+  @property
+  def T(self):
+    return self.tocoo().T
+
+  def tocoo(self):
+    """Returns the `COO` equivalent of this matrix, with rows in order."""
+    return COO(self.data, _csr_rows(self.indptr, self.nnz), self.indices,
+               self.shape)
+
+  def todense(self):
+    return self.tocoo().todense()
+
+  def __matmul__(self, other):
+    return matmul(self, other)
+
+  def __rmatmul__(self, other):
+    return matmul(other, self)
+
+  def __repr__(self):
+    return "CSR(shape={}, nnz={}, dtype={})".format(
+        self.shape, self.nnz, onp.dtype(self.dtype).name)
+
+register_pytree_node(CSR, lambda x: ((x.data, x.indices, x.indptr), x.shape),
+                     lambda shape, xs: CSR(xs[0], xs[1], xs[2], shape))
+
+
+def _check_matrix_shape(shape):
+  if len(shape) != 2:
+    msg = "Sparse matrices must be 2-D, got shape {}."
+    raise ValueError(msg.format(shape))
+
+
+def _csr_rows(indptr, nnz):
+  """Returns the row index of each of the `nnz` values of a CSR matrix."""
+  indptr = lax.convert_element_type(indptr, onp.int32)
+  positions = lax.iota(onp.int32, nnz)
+  return lax.sub(np._searchsorted(indptr, positions), onp.int32(1))
+
+
+class IndexedSlices(object):
+  """An array that is zero except for a set of slices along its first axis.
+
+  Attributes:
+    indices: an integer array of shape (n,) with the indices of the slices.
+    values: an array of shape `(n,) + shape[1:]` with the slice values.
+    shape: the static shape of the dense array.
+
+  Duplicate indices are summed.
+  """
+  __slots__ = ["indices", "values", "shape"]
+
+  def __init__(self, indices, values, shape):
+    self.indices = indices
+    self.values = values
+    self.shape = tuple(shape)
+
+  @property
+  def dtype(self):
+    return np.result_type(self.values)
+
+  def todense(self):
+    out = np.zeros(self.shape, self.dtype)
+    return ops.index_add(out, self.indices, self.values)
+
+  def __repr__(self):
+    return "IndexedSlices(shape={}, num_slices={}, dtype={})".format(
+        self.shape, np.shape(self.indices)[0], onp.dtype(self.dtype).name)
+
+register_pytree_node(
+    IndexedSlices, lambda x: ((x.indices, x.values), x.shape),
+    lambda shape, xs: IndexedSlices(xs[0], xs[1], shape))
+
+
+def _sum_duplicates(x):
+  """Sorts the slices of `x`, giving each the total over its duplicates.
+
+  Every one of a group of duplicate indices ends up with the same value, the
+  sum of the group, so that `index_update(dense, indices, f(values))` is well
+  defined for any elementwise `f`. Takes O(n log n) time in the number of
+  slices, independent of `x.shape[0]`.
+  """
+  indices = lax.convert_element_type(x.indices, onp.int32)
+  n = np.shape(indices)[0]
+  indices, perm = lax.sort_key_val(indices, lax.iota(onp.int32, n))
+  values = np.take(x.values, perm, axis=0)
+  # The position of the first of each run of equal indices, found by binary
+  # search, serves as a segment id for the run.
+  starts = np._searchsorted(indices, lax.sub(indices, onp.int32(1)))
+  totals = ops.segment_sum(values, starts, n, indices_are_sorted=True)
+  return IndexedSlices(indices, np.take(totals, starts, axis=0), x.shape)
+
+
+def embedding_lookup(table, ids):
+  """Returns the rows `table[ids]`, with shape `ids.shape + table.shape[1:]`.
+
+  Differentiating through this function with `grad` gives a dense gradient for
+  `table`; use `embedding_vjp` to get an `IndexedSlices` gradient instead.
+  """
+  return np.take(table, ids, axis=0)
+
+
+def embedding_vjp(table, ids):
+  """Looks up rows of an embedding table, returning a sparse VJP function.
+
+  Analogous to `jax.vjp(embedding_lookup, table)`, except that the VJP function
+  returns the gradient with respect to `table` as an `IndexedSlices` holding
+  one slice per looked-up id. Its cost is proportional to the number of ids
+  rather than to the number of rows in `table`.
+
+  Args:
+    table: an array of shape `(vocab_size,) + embedding_shape`.
+    ids: an integer array of any shape with values in [0, vocab_size).
+
+  Returns:
+    A pair `(rows, vjp_fun)` where `rows` is `table[ids]` and `vjp_fun` maps a
+    cotangent with the shape of `rows` to an `IndexedSlices` with the shape of
+    `table`.
+  """
+  rows = embedding_lookup(table, ids)
+  table_shape = np.shape(table)
+  def vjp_fun(ct):
+    values = np.reshape(ct, (-1,) + table_shape[1:])
+    return IndexedSlices(np.ravel(ids), values, table_shape)
+  return rows, vjp_fun
+
+
+def issparse(x):
+  """Returns True if `x` is a `COO` or `CSR` sparse matrix."""
+  return isinstance(x, (COO, CSR))
+
+
+def _sparse_dense_matmul(a, b):
+  """Product of a sparse matrix `a` with a dense vector or matrix `b`."""
+  if np.ndim(b) not in (1, 2):
+    msg = "Sparse matmul requires a 1-D or 2-D dense operand, got shape {}."
+    raise ValueError(msg.format(np.shape(b)))
+  if np.shape(b)[0] != a.shape[1]:
+    msg = "matmul shapes {} and {} are not aligned."
+    raise ValueError(msg.format(a.shape, np.shape(b)))
+  if isinstance(a, CSR):
+    a, indices_are_sorted = a.tocoo(), True
+  else:
+    indices_are_sorted = False
+  data, b = np._promote_dtypes(a.data, b)
+  rows = np.take(b, a.col, axis=0)
+  data = lax.reshape(data, np.shape(data) + (1,) * (np.ndim(b) - 1))
+  return ops.segment_sum(data * rows, a.row, a.shape[0],
+                         indices_are_sorted=indices_are_sorted)
+
+
+def matmul(a, b):
+  """Matrix product where either operand may be a `COO` or `CSR` matrix.
+
+  If neither operand is sparse this is `jax.numpy.matmul`. Otherwise the sparse
+  operand must be 2-D and the dense one 1-D or 2-D, and the result is dense.
+  The cost is linear in the number of nonzeros and in the number of columns of
+  the dense operand. Products of two sparse matrices are not supported.
+
+  Args:
+    a: a dense array or sparse matrix.
+    b: a dense array or sparse matrix.
+
+  Returns:
+    A dense array equal to :code:`a.todense() @ b` or :code:`a @ b.todense()`.
+  """
+  if issparse(a) and issparse(b):
+    raise TypeError("matmul of two sparse matrices is not supported.")
+  elif issparse(a):
+    return _sparse_dense_matmul(a, b)
+  elif issparse(b):
+    # a @ b == (b.T @ a.T).T, and transposing a COO matrix is free.
+    if np.ndim(a) == 1:
+      return _sparse_dense_matmul(b.T, a)
+    return np.transpose(_sparse_dense_matmul(b.T, np.transpose(a)))
+  else:
+    return np.matmul(a, b)
+
+
+def dot(a, b):
+  """Dot product where either operand may be a `COO` or `CSR` matrix.
+
+  For the 1-D and 2-D operands allowed with sparse matrices this is the same as
+  `matmul`; if neither operand is sparse this is `jax.numpy.dot`.
+  """
+  if issparse(a) or issparse(b):
+    return matmul(a, b)
+  return np.dot(a, b)
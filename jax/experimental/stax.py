@@ -31,6 +31,7 @@ from six.moves import reduce
 
 from jax import lax
 from jax import random
+from jax.flatten_util import pack_tree, unpack_tree
 from jax.scipy.special import logsumexp
 import jax.numpy as np
 
@@ -78,6 +79,20 @@ zeros = functools.partial(np.zeros, dtype='float32')
 ones = functools.partial(np.ones, dtype='float32')
 
 
+# Mixed precision
+
+# Layers with parameters take an optional `compute_dtype` argument. When it is
+# set (e.g. to float16), parameters are still initialized and stored in float32,
+# acting as master weights for the optimizer, but each application casts the
+# parameters and inputs to `compute_dtype`, accumulates matrix multiplications
+# and convolutions in float32 and returns activations in `compute_dtype`.
+
+_accumulation_dtype = onp.float32
+
+def _cast(dtype, *xs):
+  return [lax.convert_element_type(x, dtype) for x in xs]
+
+
 # Layers
 
 # Each layer constructor function returns an (init_fun, apply_fun) pair, where
@@ -85,7 +100,7 @@ ones = functools.partial(np.ones, dtype='float32')
 #   apply_fun: takes params, inputs, and an rng key and applies the layer.
 
 
-def Dense(out_dim, W_init=glorot(), b_init=randn()):
+def Dense(out_dim, W_init=glorot(), b_init=randn(), compute_dtype=None):
   """Layer constructor function for a dense (fully-connected) layer."""
   def init_fun(input_shape):
     output_shape = input_shape[:-1] + (out_dim,)
@@ -93,12 +108,19 @@ def Dense(out_dim, W_init=glorot(), b_init=randn()):
     return output_shape, (W, b)
   def apply_fun(params, inputs, **kwargs):
     W, b = params
-    return np.dot(inputs, W) + b
+    if compute_dtype is None:
+      return np.dot(inputs, W) + b
+    inputs, W, b = _cast(compute_dtype, inputs, W, b)
+    dimension_numbers = (((np.ndim(inputs) - 1,), (0,)), ((), ()))
+    out = lax.dot_general(inputs, W, dimension_numbers,
+                          preferred_element_type=_accumulation_dtype)
+    return lax.convert_element_type(out, compute_dtype) + b
   return init_fun, apply_fun
 
 
 def GeneralConv(dimension_numbers, out_chan, filter_shape,
-                strides=None, padding='VALID', W_init=None, b_init=randn(1e-6)):
+                strides=None, padding='VALID', W_init=None, b_init=randn(1e-6),
+                compute_dtype=None):
   """Layer construction function for a general convolution layer."""
   lhs_spec, rhs_spec, out_spec = dimension_numbers
   one = (1,) * len(filter_shape)
@@ -117,14 +139,20 @@ def GeneralConv(dimension_numbers, out_chan, filter_shape,
     return output_shape, (W, b)
   def apply_fun(params, inputs, **kwargs):
     W, b = params
-    return lax.conv_general_dilated(inputs, W, strides, padding, one, one,
-                                    dimension_numbers) + b
+    if compute_dtype is None:
+      return lax.conv_general_dilated(inputs, W, strides, padding, one, one,
+                                      dimension_numbers) + b
+    inputs, W, b = _cast(compute_dtype, inputs, W, b)
+    out = lax.conv_general_dilated(inputs, W, strides, padding, one, one,
+                                   dimension_numbers,
+                                   preferred_element_type=_accumulation_dtype)
+    return lax.convert_element_type(out, compute_dtype) + b
   return init_fun, apply_fun
 Conv = functools.partial(GeneralConv, ('NHWC', 'HWIO', 'NHWC'))
 
 
 def BatchNorm(axis=(0, 1, 2), epsilon=1e-5, center=True, scale=True,
-              beta_init=zeros, gamma_init=ones):
+              beta_init=zeros, gamma_init=ones, compute_dtype=None):
   """Layer construction function for a batch normalization layer."""
   _beta_init = lambda shape: beta_init(shape) if center else ()
   _gamma_init = lambda shape: gamma_init(shape) if scale else ()
@@ -140,8 +168,15 @@ def BatchNorm(axis=(0, 1, 2), epsilon=1e-5, center=True, scale=True,
     ed = tuple(None if i in axis else slice(None) for i in range(np.ndim(x)))
     beta = beta[ed]
     gamma = gamma[ed]
+    if compute_dtype is not None:
+      # batch statistics are reductions, so we compute them at full precision
+      x, = _cast(_accumulation_dtype, x)
     mean, var = np.mean(x, axis, keepdims=True), fastvar(x, axis, keepdims=True)
     z = (x - mean) / np.sqrt(var + epsilon)
+    if compute_dtype is not None:
+      z, = _cast(compute_dtype, z)
+      if center: beta, = _cast(compute_dtype, beta)
+      if scale: gamma, = _cast(compute_dtype, gamma)
     if center and scale: return gamma * z + beta
     if center: return z + beta
     if scale: return gamma * z
@@ -311,6 +346,27 @@ def parallel(*layers):
   return init_fun, apply_fun
 
 
+def packed(layer):
+  """Combinator to store a layer's parameters in per-dtype flat buffers.
+
+  Args:
+    layer: an (init_fun, apply_fun) pair.
+
+  Returns:
+    A new layer, meaning an (init_fun, apply_fun) pair, representing the same
+    layer but with parameters held in a `jax.flatten_util.PackedTree`. Gradients
+    with respect to those parameters are then also packed, so optimizer updates,
+    all-reduces and norms act on a few contiguous buffers instead of every leaf.
+  """
+  init_fun, apply_fun = layer
+  def packed_init_fun(input_shape):
+    output_shape, params = init_fun(input_shape)
+    return output_shape, pack_tree(params)
+  def packed_apply_fun(params, inputs, **kwargs):
+    return apply_fun(unpack_tree(params), inputs, **kwargs)
+  return packed_init_fun, packed_apply_fun
+
+
 def shape_dependent(make_layer):
   """Combinator to delay layer constructor pair until input shapes are known.
 
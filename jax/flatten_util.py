@@ -16,12 +16,16 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
-from .tree_util import tree_flatten, tree_unflatten
+import numpy as onp
+
+from .tree_util import tree_flatten, tree_unflatten, register_pytree_node
 from .linear_util import transformation_with_aux
-from .util import safe_zip
+from .lib.xla_bridge import canonicalize_dtype
+from .util import safe_zip, partial, prod
 
+from jax import lax
 import jax.numpy as np
-from jax.api import vjp
+from jax.api import vjp, jit
 
 zip = safe_zip
 
@@ -41,3 +45,132 @@ def ravel_fun(unravel_inputs, flat_in, **kwargs):
   pytree_args = unravel_inputs(flat_in)
   ans = yield pytree_args
   yield ravel_pytree(ans)
+
+
+class DtypeRavelLayout(object):
+  """Describes how the leaves of a pytree pack into one flat buffer per dtype.
+
+  Unlike `ravel_pytree`, which concatenates every leaf into a single vector and
+  so promotes all leaves to a common dtype, a `DtypeRavelLayout` keeps one
+  contiguous buffer for each distinct leaf dtype, ordered by first appearance.
+  Layouts are hashable, so they can be used as static arguments to `jit` and as
+  pytree node data.
+  """
+  def __init__(self, treedef, shapes, dtypes):
+    self.treedef = treedef
+    self.shapes = shapes
+    self.dtypes = dtypes
+    # Tuple of (dtype, leaf_indices, offsets) triples, one per buffer.
+    self.groups = _dtype_groups(shapes, dtypes)
+    self._hash = hash((treedef, shapes, dtypes))
+
+  def ravel(self, pytree):
+    """Packs `pytree`, which must have this layout's structure, into buffers."""
+    leaves, treedef = tree_flatten(pytree)
+    if treedef != self.treedef:
+      raise TypeError("Mismatch: {} != {}".format(treedef, self.treedef))
+    return _ravel_leaves(self, *leaves)
+
+  def unravel(self, buffers):
+    """Inverse of `ravel`, mapping a tuple of flat buffers back to a pytree."""
+    return tree_unflatten(self.treedef, _unravel_leaves(self, *buffers))
+
+  def pack(self, pytree):
+    """Like `ravel`, but returns a `PackedTree` carrying this layout."""
+    return PackedTree(self, self.ravel(pytree))
+
+  def __repr__(self):
+    return "DtypeRavelLayout({}, dtypes={})".format(
+        self.treedef, tuple(dtype for dtype, _, _ in self.groups))
+
+  def __hash__(self):
+    return self._hash
+
+  def __eq__(self, other):
+    return self is other or (type(other) is DtypeRavelLayout and
+                             self._hash == other._hash and
+                             self.treedef == other.treedef and
+                             self.shapes == other.shapes and
+                             self.dtypes == other.dtypes)
+
+  def __ne__(self, other):
+    return not self == other
+
+def dtype_ravel_layout(pytree):
+  leaves, treedef = tree_flatten(pytree)
+  shapes = tuple(np.shape(leaf) for leaf in leaves)
+  dtypes = tuple(canonicalize_dtype(np.result_type(leaf)) for leaf in leaves)
+  return DtypeRavelLayout(treedef, shapes, dtypes)
+
+def ravel_pytree_by_dtype(pytree):
+  layout = dtype_ravel_layout(pytree)
+  return layout.ravel(pytree), layout.unravel
+
+
+class PackedTree(object):
+  """A pytree stored as one contiguous flat buffer per leaf dtype.
+
+  A `PackedTree` is itself a pytree whose leaves are the flat buffers, so
+  anything that maps over pytrees (optimizer updates, `grad`, `lax.psum` via
+  `tree_map`, checkpointing) does one operation per buffer rather than one per
+  original leaf. In particular, the gradient of a function with respect to a
+  `PackedTree` is a `PackedTree` with the same layout. Use `unpack` to get the
+  original pytree view back; under `jit`, the slices it produces fuse into
+  their consumers rather than being materialized.
+
+  Attributes:
+    layout: a `DtypeRavelLayout` describing the original pytree.
+    buffers: a tuple of rank-1 arrays, one per dtype in `layout`.
+  """
+  __slots__ = ["layout", "buffers"]
+
+  def __init__(self, layout, buffers):
+    self.layout = layout
+    self.buffers = tuple(buffers)
+
+  def unpack(self):
+    return self.layout.unravel(self.buffers)
+
+  def __repr__(self):
+    return "PackedTree({}, {})".format(self.layout, self.buffers)
+
+register_pytree_node(PackedTree, lambda tree: (tree.buffers, tree.layout),
+                     PackedTree)
+
+def pack_tree(pytree):
+  """Packs `pytree` into a `PackedTree` with one flat buffer per leaf dtype."""
+  return dtype_ravel_layout(pytree).pack(pytree)
+
+def unpack_tree(tree):
+  """Inverse of `pack_tree`, passing through anything that isn't packed."""
+  return tree.unpack() if type(tree) is PackedTree else tree
+
+def _dtype_groups(shapes, dtypes):
+  order = []
+  indices = {}
+  for i, dtype in enumerate(dtypes):
+    if dtype not in indices:
+      order.append(dtype)
+      indices[dtype] = []
+    indices[dtype].append(i)
+  groups = []
+  for dtype in order:
+    idxs = tuple(indices[dtype])
+    sizes = [prod(shapes[i]) for i in idxs]
+    offsets = tuple(int(offset) for offset in onp.cumsum([0] + sizes))
+    groups.append((dtype, idxs, offsets))
+  return tuple(groups)
+
+@partial(jit, static_argnums=(0,))
+def _ravel_leaves(layout, *leaves):
+  ravel = lambda x, dtype: lax.convert_element_type(np.ravel(x), dtype)
+  return tuple(np.concatenate([ravel(leaves[i], dtype) for i in idxs])
+               for dtype, idxs, _ in layout.groups)
+
+@partial(jit, static_argnums=(0,))
+def _unravel_leaves(layout, *buffers):
+  leaves = [None] * len(layout.shapes)
+  for buf, (_, idxs, offsets) in zip(buffers, layout.groups):
+    for i, start, end in zip(idxs, offsets[:-1], offsets[1:]):
+      leaves[i] = np.reshape(lax.slice(buf, (start,), (end,)), layout.shapes[i])
+  return leaves
@@ -382,7 +382,8 @@ def concatenate(operands, dimension):
                             operand_shapes=tuple(o.shape for o in operands))
 
 def conv_general_dilated(lhs, rhs, window_strides, padding, lhs_dilation=None,
-                         rhs_dilation=None, dimension_numbers=None):
+                         rhs_dilation=None, dimension_numbers=None,
+                         preferred_element_type=None, method='direct'):
   """General n-dimensional convolution operator, with optional dilation.
 
   Wraps XLA's `Conv
@@ -406,6 +407,15 @@ def conv_general_dilated(lhs, rhs, window_strides, padding, lhs_dilation=None,
     dimension_numbers: either `None`, a `ConvDimensionNumbers` object, or
       a 3-tuple `(lhs_spec, rhs_spec, out_spec)`, where each element is a string
       of length `n+2`.
+    preferred_element_type: optional, a dtype in which to accumulate and return
+      the result, e.g. `float32` for `float16` inputs. If `None` (the default),
+      the result has the dtype of the inputs.
+    method: one of `'direct'` (the default), which lowers to XLA's convolution,
+      `'fft'`, which computes the convolution with FFTs over the spatial
+      dimensions in O(N log N) rather than O(N K) time for windows of size K,
+      or `'auto'`, which picks `'fft'` when it is estimated to be faster. The
+      FFT path computes in single precision and supports at most three
+      spatial dimensions.
 
   Returns:
     An array containing the convolution result.
@@ -446,13 +456,33 @@ def conv_general_dilated(lhs, rhs, window_strides, padding, lhs_dilation=None,
     lhs_dilation = (1,) * (lhs.ndim - 2)
   if rhs_dilation is None:
     rhs_dilation = (1,) * (rhs.ndim - 2)
+  if method not in ('direct', 'fft', 'auto'):
+    msg = ("conv_general_dilated method must be 'direct', 'fft' or 'auto', "
+           "got {}.")
+    raise ValueError(msg.format(method))
+  if method != 'direct':
+    from . import lax_fft  # lax_fft is built on top of this module.
+    if method == 'fft' or lax_fft.fft_conv_is_faster(
+        lhs.shape, rhs.shape, _dtype(lhs), window_strides, padding,
+        lhs_dilation, rhs_dilation, dimension_numbers):
+      return lax_fft.fft_conv_general_dilated(
+          lhs, rhs, tuple(window_strides), tuple(padding), tuple(lhs_dilation),
+          tuple(rhs_dilation), dimension_numbers,
+          _canonicalize_preferred(preferred_element_type))
   return conv_general_dilated_p.bind(
       lhs, rhs, window_strides=tuple(window_strides), padding=tuple(padding),
       lhs_dilation=tuple(lhs_dilation), rhs_dilation=tuple(rhs_dilation),
       dimension_numbers=dimension_numbers, lhs_shape=lhs.shape,
-      rhs_shape=rhs.shape)
+      rhs_shape=rhs.shape,
+      preferred_element_type=_canonicalize_preferred(preferred_element_type))
 
-def dot(lhs, rhs):
+def _canonicalize_preferred(preferred_element_type):
+  if preferred_element_type is None:
+    return None
+  else:
+    return xla_bridge.canonicalize_dtype(preferred_element_type)
+
+def dot(lhs, rhs, preferred_element_type=None):
   """Vector/vector, matrix/vector, and matrix/matrix multiplication.
 
   Wraps XLA's `Dot
@@ -464,13 +494,19 @@ def dot(lhs, rhs):
   Args:
     lhs: an array of rank 1 or 2.
     rhs: an array of rank 1 or 2.
+    preferred_element_type: optional, a dtype in which to accumulate and return
+      the result (see `dot_general`).
 
   Returns:
     An array containing the product.
   """
-  return dot_p.bind(lhs, rhs)
+  if preferred_element_type is None:
+    return dot_p.bind(lhs, rhs)
+  else:
+    dimension_numbers = (((onp.ndim(lhs) - 1,), (0,)), ((), ()))
+    return dot_general(lhs, rhs, dimension_numbers, preferred_element_type)
 
-def dot_general(lhs, rhs, dimension_numbers):
+def dot_general(lhs, rhs, dimension_numbers, preferred_element_type=None):
   """More general contraction operator.
 
   Wraps XLA's `DotGeneral
@@ -483,13 +519,19 @@ def dot_general(lhs, rhs, dimension_numbers):
     dimension_numbers: a tuple of tuples of the form
       `((lhs_contracting_dims, rhs_contracting_dims),
       (lhs_batch_dims, rhs_batch_dims))`
+    preferred_element_type: optional, a dtype in which to accumulate and return
+      the result, e.g. `float32` for `float16` inputs so that the reduction over
+      contracting dimensions doesn't lose precision. If `None` (the default),
+      the result has the dtype of the inputs.
 
   Returns:
     An array containing the result.
   """
   lhs_dims, rhs_dims = dimension_numbers
   dimension_numbers = (tuple(map(tuple, lhs_dims)), tuple(map(tuple, rhs_dims)))
-  return dot_general_p.bind(lhs, rhs, dimension_numbers=dimension_numbers)
+  return dot_general_p.bind(
+      lhs, rhs, dimension_numbers=dimension_numbers,
+      preferred_element_type=_canonicalize_preferred(preferred_element_type))
 
 def broadcast(operand, sizes):
   """Broadcasts an array, adding new major dimensions.
@@ -669,6 +711,89 @@ def scatter(operand, scatter_indices, updates, dimension_numbers):
       update_consts=consts, dimension_numbers=dimension_numbers,
       updates_shape=updates.shape)
 
+def scatter_mul(operand, scatter_indices, updates, dimension_numbers):
+  """Scatter-multiply operator.
+
+  Wraps `XLA's Scatter operator
+  <https://www.tensorflow.org/xla/operation_semantics#scatter>`_, where
+  multiplication is used to combine updates and values from `operand`.
+
+  The semantics of scatter are complicated and its API is subject to change.
+
+  Args:
+    operand: an array to which the scatter should be applied
+    scatter_indices: an array that gives the indices in `operand` to which each
+      update in `updates` should be applied.
+    updates: the updates that should be scattered onto `operand`.
+    dimension_numbers: a `lax.ScatterDimensionNumbers` object that describes
+      how dimensions of `operand`, `start_indices`, `updates` and the output
+      relate.
+
+  Returns:
+    An array containing the product of `operand` and the scattered updates.
+  """
+  jaxpr, consts = _reduction_jaxpr(mul, _const(operand, 1))
+  return scatter_mul_p.bind(
+      operand, scatter_indices, updates, update_jaxpr=jaxpr,
+      update_consts=consts, dimension_numbers=dimension_numbers,
+      updates_shape=updates.shape)
+
+def scatter_min(operand, scatter_indices, updates, dimension_numbers):
+  """Scatter-min operator.
+
+  Wraps `XLA's Scatter operator
+  <https://www.tensorflow.org/xla/operation_semantics#scatter>`_, where
+  the `min` function is used to combine updates and values from `operand`.
+
+  The semantics of scatter are complicated and its API is subject to change.
+
+  Args:
+    operand: an array to which the scatter should be applied
+    scatter_indices: an array that gives the indices in `operand` to which each
+      update in `updates` should be applied.
+    updates: the updates that should be scattered onto `operand`.
+    dimension_numbers: a `lax.ScatterDimensionNumbers` object that describes
+      how dimensions of `operand`, `start_indices`, `updates` and the output
+      relate.
+
+  Returns:
+    An array containing the elementwise minimum of `operand` and the scattered
+    updates.
+  """
+  jaxpr, consts = _reduction_jaxpr(min, _const(operand, 0))
+  return scatter_min_p.bind(
+      operand, scatter_indices, updates, update_jaxpr=jaxpr,
+      update_consts=consts, dimension_numbers=dimension_numbers,
+      updates_shape=updates.shape)
+
+def scatter_max(operand, scatter_indices, updates, dimension_numbers):
+  """Scatter-max operator.
+
+  Wraps `XLA's Scatter operator
+  <https://www.tensorflow.org/xla/operation_semantics#scatter>`_, where
+  the `max` function is used to combine updates and values from `operand`.
+
+  The semantics of scatter are complicated and its API is subject to change.
+
+  Args:
+    operand: an array to which the scatter should be applied
+    scatter_indices: an array that gives the indices in `operand` to which each
+      update in `updates` should be applied.
+    updates: the updates that should be scattered onto `operand`.
+    dimension_numbers: a `lax.ScatterDimensionNumbers` object that describes
+      how dimensions of `operand`, `start_indices`, `updates` and the output
+      relate.
+
+  Returns:
+    An array containing the elementwise maximum of `operand` and the scattered
+    updates.
+  """
+  jaxpr, consts = _reduction_jaxpr(max, _const(operand, 0))
+  return scatter_max_p.bind(
+      operand, scatter_indices, updates, update_jaxpr=jaxpr,
+      update_consts=consts, dimension_numbers=dimension_numbers,
+      updates_shape=updates.shape)
+
 def index_take(src, idxs, axes):
   indices = concatenate([reshape(i, [i.shape[0], 1]) for i in idxs], 1)
   slice_sizes = list(src.shape)
@@ -1875,16 +2000,17 @@ def _conv_general_dilated_shape_rule(
 
 def _conv_general_dilated_dtype_rule(
     lhs, rhs, window_strides, padding, lhs_dilation, rhs_dilation,
-    dimension_numbers, **unused_kwargs):
-  return binop_dtype_rule(_input_dtype, [_f32, _f32], 'conv_general_dilated',
-                          lhs, rhs)
+    dimension_numbers, preferred_element_type, **unused_kwargs):
+  input_dtype = binop_dtype_rule(_input_dtype, [_f32, _f32],
+                                 'conv_general_dilated', lhs, rhs)
+  return preferred_element_type or input_dtype
 
 _conv_transpose = lambda spec: (spec[1], spec[0]) + spec[2:]
 _conv_sdims = lambda spec: spec[2:]
 
 def _conv_general_dilated_transpose_lhs(
     g, rhs, window_strides, padding, lhs_dilation, rhs_dilation,
-    dimension_numbers, lhs_shape, rhs_shape):
+    dimension_numbers, lhs_shape, rhs_shape, preferred_element_type):
   assert type(dimension_numbers) is ConvDimensionNumbers
   lhs_sdims, rhs_sdims, out_sdims = map(_conv_sdims, dimension_numbers)
   lhs_spec, rhs_spec, out_spec = dimension_numbers
@@ -1895,14 +2021,19 @@ def _conv_general_dilated_transpose_lhs(
       window_strides, onp.take(g.shape, out_sdims), padding, lhs_dilation,
       rhs_dilation)
   revd_weights = rev(rhs, rhs_sdims)
-  return conv_general_dilated(
-      g, revd_weights, window_strides=lhs_dilation, padding=padding,
+  # with a preferred_element_type the cotangent may be wider than the inputs,
+  # so compute in the input dtype (accumulating as preferred) and cast back
+  out = conv_general_dilated(
+      convert_element_type(g, _dtype(rhs)), revd_weights,
+      window_strides=lhs_dilation, padding=padding,
       lhs_dilation=window_strides, rhs_dilation=rhs_dilation,
-      dimension_numbers=trans_dimension_numbers)
+      dimension_numbers=trans_dimension_numbers,
+      preferred_element_type=preferred_element_type)
+  return convert_element_type(out, _dtype(rhs))
 
 def _conv_general_dilated_transpose_rhs(
     g, lhs, window_strides, padding, lhs_dilation, rhs_dilation,
-    dimension_numbers, lhs_shape, rhs_shape):
+    dimension_numbers, lhs_shape, rhs_shape, preferred_element_type):
   assert type(dimension_numbers) is ConvDimensionNumbers
   lhs_sdims, rhs_sdims, out_sdims = map(_conv_sdims, dimension_numbers)
   lhs_trans, rhs_trans, out_trans = map(_conv_transpose, dimension_numbers)
@@ -1911,22 +2042,36 @@ def _conv_general_dilated_transpose_rhs(
       onp.take(lhs_shape, lhs_sdims), onp.take(rhs_shape, rhs_sdims),
       window_strides, onp.take(g.shape, out_sdims), padding, lhs_dilation,
       rhs_dilation)
-  return conv_general_dilated(
-      lhs, g, window_strides=rhs_dilation, padding=padding,
-      lhs_dilation=lhs_dilation, rhs_dilation=window_strides,
-      dimension_numbers=trans_dimension_numbers)
+  out = conv_general_dilated(
+      lhs, convert_element_type(g, _dtype(lhs)), window_strides=rhs_dilation,
+      padding=padding, lhs_dilation=lhs_dilation, rhs_dilation=window_strides,
+      dimension_numbers=trans_dimension_numbers,
+      preferred_element_type=preferred_element_type)
+  return convert_element_type(out, _dtype(lhs))
 
 def _conv_general_dilated_translation_rule(
     c, lhs, rhs, window_strides, padding, lhs_dilation, rhs_dilation,
-    dimension_numbers, **unused_kwargs):
+    dimension_numbers, preferred_element_type, **unused_kwargs):
   assert type(dimension_numbers) is ConvDimensionNumbers
   dimension_numbers = _conv_general_proto(dimension_numbers)
+  lhs, rhs = _convert_to_preferred(c, preferred_element_type, lhs, rhs)
   return c.ConvGeneralDilated(lhs, rhs, window_strides, padding, lhs_dilation,
                               rhs_dilation, dimension_numbers)
 
+def _convert_to_preferred(c, preferred_element_type, *operands):
+  # The XLA client doesn't let us set the result type of a Dot or Conv
+  # directly, so we widen the operands inside the computation instead. XLA
+  # fuses these conversions into the operand reads of the Dot/Conv, so the
+  # narrow inputs are all that get materialized in memory.
+  if preferred_element_type is None:
+    return operands
+  etype = xla_bridge.dtype_to_etype_exact(preferred_element_type)
+  return [c.ConvertElementType(x, new_element_type=etype) for x in operands]
+
 def _conv_general_dilated_batch_rule(
     batched_args, batch_dims, window_strides, padding,
-    lhs_dilation, rhs_dilation, dimension_numbers, **unused_kwargs):
+    lhs_dilation, rhs_dilation, dimension_numbers, preferred_element_type,
+    **unused_kwargs):
   lhs, rhs = batched_args
   lhs_bdim, rhs_bdim = batch_dims
   lhs_dim, rhs_dim, out_dim = dimension_numbers
@@ -1937,7 +2082,8 @@ def _conv_general_dilated_batch_rule(
     rhs = batching.move_dim_to_front(rhs, rhs_bdim)
     outputs = [
         conv_general_dilated(l, r, window_strides, padding,
-                             lhs_dilation, rhs_dilation, dimension_numbers)
+                             lhs_dilation, rhs_dilation, dimension_numbers,
+                             preferred_element_type)
         for l, r in zip(lhs, rhs)]
     outputs = [reshape(out, (1,) + out.shape) for out in outputs]
     outputs = concatenate(outputs, 0)
@@ -1961,7 +2107,8 @@ def _conv_general_dilated_batch_rule(
         lhs, rhs, window_strides, padding,
         lhs_dilation, rhs_dilation,
         ConvDimensionNumbers(new_lhs_dim, dimension_numbers.rhs_spec,
-                             new_out_dim))
+                             new_out_dim),
+        preferred_element_type)
     outputs = reshape(outputs, (batched_size, n_size,) + outputs.shape[1:])
 
     if out_dim[0] != 0:
@@ -1975,7 +2122,8 @@ def _conv_general_dilated_batch_rule(
     rhs = batching.move_dim_to_front(rhs, rhs_bdim)
     outputs = [
         conv_general_dilated(lhs, x, window_strides, padding,
-                                 lhs_dilation, rhs_dilation, dimension_numbers)
+                                 lhs_dilation, rhs_dilation, dimension_numbers,
+                                 preferred_element_type)
         for x in rhs]
     outputs = [reshape(out, (1,) + out.shape) for out in outputs]
     outputs = concatenate(outputs, 0)
@@ -2113,7 +2261,8 @@ batching.primitive_batchers[dot_p] = _dot_batch_rule
 parallel.papply_primitive_rules[dot_p] = _dot_papply_rule
 
 
-def _dot_general_shape_rule(lhs, rhs, dimension_numbers):
+def _dot_general_shape_rule(lhs, rhs, dimension_numbers,
+                            preferred_element_type):
   (lhs_contracting, rhs_contracting), (lhs_batch, rhs_batch) = dimension_numbers
   if len(lhs_batch) != len(rhs_batch):
     msg = ("dot_general requires equal numbers of lhs_batch and rhs_batch "
@@ -2152,11 +2301,15 @@ def _dot_general_shape_rule(lhs, rhs, dimension_numbers):
   return batch_shape + lhs_tensored_shape + rhs_tensored_shape
 
 
-def _dot_general_dtype_rule(lhs, rhs, dimension_numbers):
-  return binop_dtype_rule(_input_dtype, [_num, _num], 'dot_general', lhs, rhs)
+def _dot_general_dtype_rule(lhs, rhs, dimension_numbers,
+                            preferred_element_type):
+  input_dtype = binop_dtype_rule(_input_dtype, [_num, _num], 'dot_general',
+                                 lhs, rhs)
+  return preferred_element_type or input_dtype
 
 
-def _dot_general_transpose_lhs(g, y, dimension_numbers, swap_ans=False):
+def _dot_general_transpose_lhs(g, y, dimension_numbers, preferred_element_type,
+                               swap_ans=False):
   (x_contract, y_contract), (x_batch, y_batch) = dimension_numbers
   x_ndim = g.ndim - y.ndim + len(x_batch) + 2 * len(x_contract)
   x_kept = remaining(range(x_ndim), x_contract, x_batch)
@@ -2168,15 +2321,21 @@ def _dot_general_transpose_lhs(g, y, dimension_numbers, swap_ans=False):
   dims = ((ans_y, y_kept), (ans_batch, y_batch))
   x_contract_sorted_by_y = list(onp.take(x_contract, onp.argsort(y_contract)))
   out_axes = onp.argsort(list(x_batch) + x_kept + x_contract_sorted_by_y)
-  return transpose(dot_general(g, y, dims), tuple(out_axes))
+  # with a preferred_element_type the cotangent may be wider than the inputs,
+  # so compute in the input dtype (accumulating as preferred) and cast back
+  out = dot_general(convert_element_type(g, _dtype(y)), y, dims,
+                    preferred_element_type)
+  return convert_element_type(transpose(out, tuple(out_axes)), _dtype(y))
 
-def _dot_general_transpose_rhs(g, x, dimension_numbers):
+def _dot_general_transpose_rhs(g, x, dimension_numbers, preferred_element_type):
   (x_contract, y_contract), (x_batch, y_batch) = dimension_numbers
   swapped_dimension_numbers = ((y_contract, x_contract), (y_batch, x_batch))
-  return _dot_general_transpose_lhs(g, x, swapped_dimension_numbers, True)
+  return _dot_general_transpose_lhs(g, x, swapped_dimension_numbers,
+                                    preferred_element_type, True)
 
 
-def _dot_general_batch_rule(batched_args, batch_dims, dimension_numbers):
+def _dot_general_batch_rule(batched_args, batch_dims, dimension_numbers,
+                            preferred_element_type):
   (lhs_contract, rhs_contract), (lhs_batch, rhs_batch) = dimension_numbers
   lhs, rhs = batched_args
   lbd, rbd = batch_dims
@@ -2203,11 +2362,13 @@ def _dot_general_batch_rule(batched_args, batch_dims, dimension_numbers):
   rhs_batch = (0,) + tuple(onp.add(1, rhs_batch))
 
   new_dimension_numbers = [(lhs_contract, rhs_contract), (lhs_batch, rhs_batch)]
-  batched_out = dot_general(lhs, rhs, new_dimension_numbers)
+  batched_out = dot_general(lhs, rhs, new_dimension_numbers,
+                            preferred_element_type)
   return batched_out, 0
 
 
-def _dot_general_papply_rule(name, vals, dims, dimension_numbers):
+def _dot_general_papply_rule(name, vals, dims, dimension_numbers,
+                             preferred_element_type):
   x, y = vals
   xdim, ydim = dims
 
@@ -2229,28 +2390,34 @@ def _dot_general_papply_rule(name, vals, dims, dimension_numbers):
       (sub_lhs_contract, sub_rhs_contract), (lhs_batch, rhs_batch))
 
   if xdim in lhs_contract and ydim in rhs_contract:
-    z = dot_general(x, y, sub_dimension_numbers)
+    z = dot_general(x, y, sub_dimension_numbers, preferred_element_type)
     return psum(z, name), None
   elif xdim in lhs_contract:
     if ydim is not None:        # Cannot hide two dimensions, so collect one
       y = pcollect(y, name)
-    return dot_general(x, y, sub_dimension_numbers), xdim
+    return dot_general(x, y, sub_dimension_numbers, preferred_element_type), xdim
   elif ydim in rhs_contract:
     if xdim is not None:        # Cannot hide two dimensions, so collect one
       x = pcollect(x, name)
-    return dot_general(x, y, sub_dimension_numbers), ydim
+    return dot_general(x, y, sub_dimension_numbers, preferred_element_type), ydim
   elif xdim is not None:
     if ydim is not None:        # Cannot hide two dimensions, so collect one
       y = pcollect(y, name)
-    return dot_general(x, y, sub_dimension_numbers), xdim
+    return dot_general(x, y, sub_dimension_numbers, preferred_element_type), xdim
   elif ydim is not None:
-    return dot_general(x, y, sub_dimension_numbers), ydim
+    return dot_general(x, y, sub_dimension_numbers, preferred_element_type), ydim
   else:
-    return dot_general(x, y, sub_dimension_numbers), None
+    return dot_general(x, y, sub_dimension_numbers, preferred_element_type), None
+
 
+def _dot_general_translation_rule(c, lhs, rhs, dimension_numbers,
+                                 preferred_element_type):
+  lhs, rhs = _convert_to_preferred(c, preferred_element_type, lhs, rhs)
+  return c.DotGeneral(lhs, rhs, dimension_numbers)
 
 dot_general_p = standard_primitive(_dot_general_shape_rule,
-                                   _dot_general_dtype_rule, 'dot_general')
+                                   _dot_general_dtype_rule, 'dot_general',
+                                   _dot_general_translation_rule)
 ad.defbilinear(dot_general_p,
                _dot_general_transpose_lhs, _dot_general_transpose_rhs)
 batching.primitive_batchers[dot_general_p] = _dot_general_batch_rule
@@ -3062,6 +3229,25 @@ def _scatter_translation_rule(c, operand, scatter_indices, updates,
   return c.Scatter(operand, scatter_indices, updates, update_computation,
                   _scatter_dimensions_proto(indices_shape, dimension_numbers))
 
+def _scatter_inverse_gather(x, scatter_indices, dimension_numbers,
+                            updates_shape):
+  """Gathers from `x` the elements a scatter would have updated, in the layout
+  of the scatter's `updates`."""
+  gather_dnums = GatherDimensionNumbers(
+    offset_dims=dimension_numbers.update_window_dims,
+    collapsed_slice_dims=dimension_numbers.inserted_window_dims,
+    start_index_map=dimension_numbers.scatter_dims_to_operand_dims)
+  slice_sizes = []
+  pos = 0
+  for i in xrange(len(x.shape)):
+    if i in dimension_numbers.inserted_window_dims:
+      slice_sizes.append(1)
+    else:
+      slice_sizes.append(updates_shape[dimension_numbers.update_window_dims[pos]])
+      pos += 1
+  return gather(x, scatter_indices, dimension_numbers=gather_dnums,
+                slice_sizes=slice_sizes)
+
 def _scatter_add_jvp(primals, tangents, update_jaxpr, update_consts,
                      dimension_numbers, updates_shape):
   operand, scatter_indices, updates = primals
@@ -3091,20 +3277,8 @@ def _scatter_add_transpose_rule(t, operand, scatter_indices, updates,
     operand_t = t
 
   if updates is None:
-    gather_dnums = GatherDimensionNumbers(
-      offset_dims=dimension_numbers.update_window_dims,
-      collapsed_slice_dims=dimension_numbers.inserted_window_dims,
-      start_index_map=dimension_numbers.scatter_dims_to_operand_dims)
-    slice_sizes = []
-    pos = 0
-    for i in xrange(len(t.shape)):
-      if i in dimension_numbers.inserted_window_dims:
-        slice_sizes.append(1)
-      else:
-        slice_sizes.append(updates_shape[dimension_numbers.update_window_dims[pos]])
-        pos += 1
-    update_t = gather(t, scatter_indices, dimension_numbers=gather_dnums,
-                      slice_sizes=slice_sizes)
+    update_t = _scatter_inverse_gather(t, scatter_indices, dimension_numbers,
+                                       updates_shape)
   return [operand_t, None, update_t]
 
 def _scatter_batching_rule(
@@ -3123,8 +3297,12 @@ def _scatter_batching_rule(
   operand_bdim = 0
 
   if scatter_indices_bdim is not None and updates_bdim is None:
-    raise NotImplementedError  # TODO(mattjj,phawkins)
-  elif scatter_indices_bdim is None and updates_bdim is not None:
+    # give the updates a batch dim too, and scatter them as in the third case
+    updates = batching.bdim_at_front(updates, updates_bdim,
+                                     broadcast_size=size, force_broadcast=True)
+    updates_bdim = 0
+
+  if scatter_indices_bdim is None and updates_bdim is not None:
     updates = batching.move_dim_to_front(updates, updates_bdim)
     inserted_window_dims = tuple(onp.add(1, dimension_numbers.inserted_window_dims))
     update_window_dims = (0,) + tuple(onp.add(1, dimension_numbers.update_window_dims))
@@ -3229,21 +3407,8 @@ def _scatter_jvp(primals, tangents, update_jaxpr, update_consts,
   scattered_ids = index_in_dim(outputs, 1, keepdims=False)
 
   # b) compute the inverse gather that "undoes" the scatter on the id values.
-  gather_dnums = GatherDimensionNumbers(
-    offset_dims=dnums.update_window_dims,
-    collapsed_slice_dims=dnums.inserted_window_dims,
-    start_index_map=dnums.scatter_dims_to_operand_dims)
-  slice_sizes = []
-  pos = 0
-  for i in xrange(len(scattered_ids.shape)):
-    if i in dnums.inserted_window_dims:
-      slice_sizes.append(1)
-    else:
-      slice_sizes.append(updates_shape[dnums.update_window_dims[pos]])
-      pos += 1
-  gathered_update_ids = gather(scattered_ids, scatter_indices,
-                         dimension_numbers=gather_dnums,
-                         slice_sizes=slice_sizes)
+  gathered_update_ids = _scatter_inverse_gather(scattered_ids, scatter_indices,
+                                                dnums, updates_shape)
 
   # c) mask off input JVP elements that do not correspond to a primal output.
   g_operand = ad.instantiate_zeros(operand, g_operand)
@@ -3267,6 +3432,109 @@ batching.primitive_batchers[scatter_p] = (
   partial(_scatter_batching_rule, scatter))
 
 
+def _scatter_mul_jvp(primals, tangents, update_jaxpr, update_consts,
+                     dimension_numbers, updates_shape):
+  operand, scatter_indices, updates = primals
+  g_operand, g_scatter_indices, g_updates = tangents
+  assert g_scatter_indices is ad_util.zero
+  val_out = scatter_mul_p.bind(
+      operand, scatter_indices, updates, update_jaxpr=update_jaxpr,
+      update_consts=update_consts, dimension_numbers=dimension_numbers,
+      updates_shape=updates_shape)
+  if g_operand is ad_util.zero:
+    tangent_out = ad_util.zero
+  else:
+    tangent_out = scatter_mul_p.bind(
+        g_operand, scatter_indices, updates, update_jaxpr=update_jaxpr,
+        update_consts=update_consts, dimension_numbers=dimension_numbers,
+        updates_shape=updates_shape)
+  if g_updates is not ad_util.zero:
+    # d(x * prod(u)) = x * sum(du_k * prod_{j != k} u_j). The exclusive
+    # products are formed from the product of the nonzero updates and the
+    # number of zero updates scattered to each element, rather than as
+    # prod(u) / u_k, so that zero updates don't produce NaNs.
+    dnums = dimension_numbers
+    is_zero = eq(updates, _zeros(updates))
+    nonzero_updates = select(is_zero, _ones(updates), updates)
+    nonzero_prod = _scatter_inverse_gather(
+        scatter_mul(_ones(operand), scatter_indices, nonzero_updates, dnums),
+        scatter_indices, dnums, updates_shape)
+    num_zeros = _scatter_inverse_gather(
+        scatter_add(_zeros(operand), scatter_indices,
+                    convert_element_type(is_zero, _dtype(updates)), dnums),
+        scatter_indices, dnums, updates_shape)
+    exclusive_prod = select(
+        is_zero,
+        select(eq(num_zeros, _ones(num_zeros)), nonzero_prod,
+               _zeros(nonzero_prod)),
+        select(eq(num_zeros, _zeros(num_zeros)),
+               div(nonzero_prod, nonzero_updates), _zeros(nonzero_prod)))
+    g_updates = scatter_add(_zeros(operand), scatter_indices,
+                            mul(g_updates, exclusive_prod), dnums)
+    tangent_out = ad.add_tangents(tangent_out, mul(operand, g_updates))
+  return val_out, tangent_out
+
+def _scatter_mul_transpose_rule(t, operand, scatter_indices, updates,
+                                update_jaxpr, update_consts, dimension_numbers,
+                                updates_shape):
+  assert scatter_indices is not None and updates is not None
+  operand_t = None
+  if operand is None:
+    operand_t = scatter_mul(t, scatter_indices, updates, dimension_numbers)
+  return [operand_t, None, None]
+
+scatter_mul_p = standard_primitive(
+    _scatter_shape_rule, _scatter_dtype_rule, 'scatter-mul',
+    _scatter_translation_rule)
+ad.primitive_jvps[scatter_mul_p] = _scatter_mul_jvp
+ad.primitive_transposes[scatter_mul_p] = _scatter_mul_transpose_rule
+batching.primitive_batchers[scatter_mul_p] = (
+  partial(_scatter_batching_rule, scatter_mul))
+
+
+def _scatter_extremal_jvp(scatter_op_p, primals, tangents, update_jaxpr,
+                          update_consts, dimension_numbers, updates_shape):
+  operand, scatter_indices, updates = primals
+  g_operand, g_scatter_indices, g_updates = tangents
+  dnums = dimension_numbers
+  assert g_scatter_indices is ad_util.zero
+
+  val_out = scatter_op_p.bind(
+      operand, scatter_indices, updates, update_jaxpr=update_jaxpr,
+      update_consts=update_consts, dimension_numbers=dnums,
+      updates_shape=updates_shape)
+  if g_operand is ad_util.zero and g_updates is ad_util.zero:
+    return val_out, ad_util.zero
+
+  # The tangent of each output element is the mean of the tangents of all the
+  # operand and update elements equal to it, as for reduce_max/reduce_min.
+  g_operand = ad.instantiate_zeros(operand, g_operand)
+  g_updates = ad.instantiate_zeros(updates, g_updates)
+  dtype = _dtype(operand)
+  gathered_out = _scatter_inverse_gather(val_out, scatter_indices, dnums,
+                                         updates_shape)
+  operand_mask = convert_element_type(eq(operand, val_out), dtype)
+  updates_mask = convert_element_type(eq(updates, gathered_out), dtype)
+  counts = scatter_add(operand_mask, scatter_indices, updates_mask, dnums)
+  tangent_out = scatter_add(mul(operand_mask, g_operand), scatter_indices,
+                            mul(updates_mask, g_updates), dnums)
+  return val_out, div(tangent_out, counts)
+
+scatter_min_p = standard_primitive(
+    _scatter_shape_rule, _scatter_dtype_rule, 'scatter-min',
+    _scatter_translation_rule)
+ad.primitive_jvps[scatter_min_p] = partial(_scatter_extremal_jvp, scatter_min_p)
+batching.primitive_batchers[scatter_min_p] = (
+  partial(_scatter_batching_rule, scatter_min))
+
+scatter_max_p = standard_primitive(
+    _scatter_shape_rule, _scatter_dtype_rule, 'scatter-max',
+    _scatter_translation_rule)
+ad.primitive_jvps[scatter_max_p] = partial(_scatter_extremal_jvp, scatter_max_p)
+batching.primitive_batchers[scatter_max_p] = (
+  partial(_scatter_batching_rule, scatter_max))
+
+
 def _reduce_shape_rule(operand, init_value, computation, jaxpr, consts, dimensions):
   return tuple(onp.delete(operand.shape, dimensions))
 
@@ -0,0 +1,266 @@
+# Copyright 2018 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import numpy as onp
+
+from jax import lax
+from jax.abstract_arrays import ShapedArray
+from jax.core import Primitive
+from jax.interpreters import ad
+from jax.interpreters import batching
+from jax.interpreters import xla
+from jax.lib.xla_bridge import xla_client
+
+FftType = xla_client.FftType
+
+
+# traceables
+
+def fft(x, fft_type, fft_lengths):
+  """Applies an `fft_type` transform over the trailing `len(fft_lengths)` axes.
+
+  For `FftType.FFT`, `IFFT` and `RFFT` the trailing axes of `x` must equal
+  `fft_lengths`; for `IRFFT` the last of them must instead be
+  `fft_lengths[-1] // 2 + 1`.
+  `RFFT` maps a real input to the non-negative frequency half of its spectrum,
+  and `IRFFT` maps such a half-spectrum back to a real signal. The inverse
+  transforms are normalized by `1 / prod(fft_lengths)`, as in NumPy.
+  """
+  fft_lengths = tuple(fft_lengths)
+  if fft_type == FftType.RFFT:
+    if onp.issubdtype(lax._dtype(x), onp.complexfloating):
+      raise ValueError("only real valued inputs supported for rfft")
+    x = _promote_to_real(x)
+  else:
+    x = _promote_to_complex(x)
+  if len(fft_lengths) == 0:
+    return x
+  return fft_p.bind(x, fft_type=fft_type, fft_lengths=fft_lengths)
+
+
+# primitive
+
+# XLA's FFT op only supports C64, so inputs are promoted to (or truncated to)
+# single precision.
+def _promote_to_complex(x):
+  return lax.convert_element_type(x, onp.complex64)
+
+def _promote_to_real(x):
+  return lax.convert_element_type(x, onp.float32)
+
+def fft_impl(x, fft_type, fft_lengths):
+  return xla.apply_primitive(fft_p, x, fft_type=fft_type,
+                             fft_lengths=fft_lengths)
+
+def fft_abstract_eval(x, fft_type, fft_lengths):
+  num_axes = len(fft_lengths)
+  if not 1 <= num_axes <= 3:
+    raise ValueError("fft supports 1 to 3 transformed axes, got fft_lengths "
+                     "{}".format(fft_lengths))
+  if x.ndim < num_axes:
+    raise ValueError("fft with fft_lengths {} requires an operand with at "
+                     "least {} dimensions, got shape {}"
+                     .format(fft_lengths, num_axes, x.shape))
+  batch_shape = x.shape[:-num_axes]
+  if fft_type == FftType.RFFT:
+    expected = fft_lengths
+    shape = batch_shape + fft_lengths[:-1] + (fft_lengths[-1] // 2 + 1,)
+    dtype = onp.complex64
+  elif fft_type == FftType.IRFFT:
+    expected = fft_lengths[:-1] + (fft_lengths[-1] // 2 + 1,)
+    shape = batch_shape + fft_lengths
+    dtype = onp.float32
+  else:
+    expected = fft_lengths
+    shape = x.shape
+    dtype = x.dtype
+  if x.shape[-num_axes:] != expected:
+    raise ValueError("fft with fft_lengths {} requires trailing dimensions {}, "
+                     "got shape {}".format(fft_lengths, expected, x.shape))
+  return ShapedArray(shape, dtype)
+
+def fft_translation_rule(c, x, fft_type, fft_lengths):
+  return c.Fft(x, fft_type, fft_lengths)
+
+def _rfft_transpose(t, fft_lengths):
+  # RFFT is the real part of a full FFT truncated to the non-negative
+  # frequencies, and the (unconjugated) DFT matrix is symmetric, so the
+  # transpose zero-pads the cotangent back to full length, applies a full FFT
+  # and keeps the real part.
+  n = fft_lengths[-1]
+  t_shape = onp.shape(t)
+  padding = [(0, 0, 0)] * (len(t_shape) - 1) + [(0, n - t_shape[-1], 0)]
+  t = lax.pad(t, lax._const(t, 0), padding)
+  return lax.real(fft(t, FftType.FFT, fft_lengths))
+
+def _irfft_transpose(t, fft_lengths):
+  # IRFFT implicitly doubles every half-spectrum entry except the zero and (for
+  # even lengths) Nyquist frequencies, whose conjugate partners are the entries
+  # themselves. IRFFT takes the real part of a sum of `y * exp(+2 pi i jk / n)`
+  # terms, whose (unconjugated) transpose is the conjugate of an RFFT.
+  x = fft(t, FftType.RFFT, fft_lengths)
+  n = onp.shape(x)[-1]
+  is_odd = fft_lengths[-1] % 2
+  mask = onp.concatenate([onp.ones(1), 2 * onp.ones(n - 2 + is_odd),
+                          onp.ones(1 - is_odd)])
+  scale = 1. / onp.prod(fft_lengths)
+  return lax.conj(x * lax._const(x, scale * mask))
+
+def fft_transpose_rule(t, fft_type, fft_lengths):
+  if fft_type == FftType.RFFT:
+    result = _rfft_transpose(t, fft_lengths)
+  elif fft_type == FftType.IRFFT:
+    result = _irfft_transpose(t, fft_lengths)
+  else:
+    result = fft(t, fft_type, fft_lengths)
+  return [result]
+
+def fft_batching_rule(batched_args, batch_dims, fft_type, fft_lengths):
+  x, = batched_args
+  bd, = batch_dims
+  x = batching.bdim_at_front(x, bd)
+  return fft(x, fft_type, fft_lengths), 0
+
+fft_p = Primitive('fft')
+fft_p.def_impl(fft_impl)
+fft_p.def_abstract_eval(fft_abstract_eval)
+xla.translations[fft_p] = fft_translation_rule
+ad.deflinear(fft_p, fft_transpose_rule)
+batching.primitive_batchers[fft_p] = fft_batching_rule
+
+
+# FFT-based convolution
+
+# Rough ratio between the cost of an FFT-path flop and a direct-convolution
+# flop, used by the `method='auto'` heuristic of `lax.conv_general_dilated`.
+_FFT_CONV_COST_RATIO = 4.
+
+def _fast_fft_size(n):
+  """Smallest integer >= n whose prime factors are all 2, 3 or 5."""
+  while True:
+    m = n
+    for p in (2, 3, 5):
+      while m % p == 0:
+        m //= p
+    if m == 1:
+      return n
+    n += 1
+
+def _conv_fft_sizes(lhs_shape, rhs_shape, padding, lhs_dilation, rhs_dilation,
+                    dimension_numbers):
+  """Padded input sizes and dilated window sizes of a convolution."""
+  lhs_spec, rhs_spec, _ = dimension_numbers
+  in_sizes = [(lhs_shape[d] - 1) * ld + 1 + lo + hi for d, ld, (lo, hi)
+              in zip(lhs_spec[2:], lhs_dilation, padding)]
+  window = [(rhs_shape[d] - 1) * rd + 1
+            for d, rd in zip(rhs_spec[2:], rhs_dilation)]
+  return in_sizes, window
+
+def fft_conv_is_faster(lhs_shape, rhs_shape, dtype, window_strides, padding,
+                       lhs_dilation, rhs_dilation, dimension_numbers):
+  """Whether `fft_conv_general_dilated` is expected to beat a direct conv.
+
+  Compares a flop count of the direct convolution against that of the FFT
+  path. Since XLA's FFT is single precision, only float32 and complex64
+  convolutions are ever routed to FFTs.
+  """
+  if onp.dtype(dtype) not in (onp.float32, onp.complex64):
+    return False
+  if not 1 <= len(window_strides) <= 3:
+    return False
+  lhs_spec, rhs_spec, _ = dimension_numbers
+  in_sizes, window = _conv_fft_sizes(lhs_shape, rhs_shape, padding,
+                                     lhs_dilation, rhs_dilation,
+                                     dimension_numbers)
+  out_sizes = [(i - w) // s + 1
+               for i, w, s in zip(in_sizes, window, window_strides)]
+  if min(out_sizes) <= 0:
+    return False
+  n, c = lhs_shape[lhs_spec[0]], lhs_shape[lhs_spec[1]]
+  o = rhs_shape[rhs_spec[0]]
+  taps = onp.prod([rhs_shape[d] for d in rhs_spec[2:]])
+  direct_flops = float(n * c * o) * onp.prod(out_sizes) * taps
+  fft_size = float(onp.prod([_fast_fft_size(i) for i in in_sizes]))
+  fft_flops = (fft_size * onp.log2(max(fft_size, 2.)) * (n * c + o * c + n * o)
+               + n * c * o * fft_size)
+  return _FFT_CONV_COST_RATIO * fft_flops < direct_flops
+
+def fft_conv_general_dilated(lhs, rhs, window_strides, padding, lhs_dilation,
+                             rhs_dilation, dimension_numbers,
+                             preferred_element_type=None):
+  """`lax.conv_general_dilated` computed with FFTs over the spatial dimensions.
+
+  Takes the canonicalized arguments of `lax.conv_general_dilated`: `padding`
+  as `(low, high)` pairs, explicit dilations and a `ConvDimensionNumbers`.
+  Inputs are dilated and padded explicitly, correlated with the kernel by a
+  pointwise product of their spectra contracted over input features, and the
+  output is cropped and strided from the inverse transform. Real inputs use
+  real transforms. The result is differentiable, and its gradients are
+  themselves computed with FFTs.
+  """
+  lhs_spec, rhs_spec, out_spec = dimension_numbers
+  out_dtype = preferred_element_type or lax._dtype(lhs)
+  is_complex = any(onp.issubdtype(lax._dtype(x), onp.complexfloating)
+                   for x in (lhs, rhs))
+  forward, inverse = ((FftType.FFT, FftType.IFFT) if is_complex
+                      else (FftType.RFFT, FftType.IRFFT))
+
+  num_spatial = len(window_strides)
+  spatial = tuple(range(2, num_spatial + 2))
+  lhs = lax.transpose(lhs, lhs_spec)
+  rhs = lax.transpose(rhs, rhs_spec)
+  lhs = lax.pad(lhs, lax._const(lhs, 0),
+                [(0, 0, 0)] * 2 + [(lo, hi, d - 1) for (lo, hi), d
+                                   in zip(padding, lhs_dilation)])
+  # Correlating with the kernel is convolving with the reversed kernel.
+  rhs = lax.rev(lax.pad(rhs, lax._const(rhs, 0),
+                        [(0, 0, 0)] * 2 + [(0, 0, d - 1)
+                                           for d in rhs_dilation]),
+                spatial)
+  n, c = onp.shape(lhs)[:2]
+  o = onp.shape(rhs)[0]
+  in_sizes = onp.shape(lhs)[2:]
+  window = onp.shape(rhs)[2:]
+  if any(i < w for i, w in zip(in_sizes, window)):
+    raise ValueError("fft convolution requires the padded input {} to be at "
+                     "least as large as the dilated window {}."
+                     .format(in_sizes, window))
+
+  # The valid outputs of a circular convolution of length >= in_sizes do not
+  # wrap around, so no padding beyond the input size is needed.
+  fft_lengths = tuple(_fast_fft_size(i) for i in in_sizes)
+  pad_to = lambda x: lax.pad(
+      x, lax._const(x, 0),
+      [(0, 0, 0)] * 2 + [(0, f - s, 0)
+                         for f, s in zip(fft_lengths, onp.shape(x)[2:])])
+  lhs_hat = fft(pad_to(lhs), forward, fft_lengths)
+  rhs_hat = fft(pad_to(rhs), forward, fft_lengths)
+
+  # Contract over input features independently at every frequency.
+  freq_shape = onp.shape(lhs_hat)[2:]
+  f = int(onp.prod(freq_shape))
+  lhs_hat = lax.transpose(lax.reshape(lhs_hat, (n, c, f)), (2, 0, 1))
+  rhs_hat = lax.transpose(lax.reshape(rhs_hat, (o, c, f)), (2, 1, 0))
+  out_hat = lax.dot_general(lhs_hat, rhs_hat, (((2,), (1,)), ((0,), (0,))))
+  out_hat = lax.reshape(lax.transpose(out_hat, (1, 2, 0)), (n, o) + freq_shape)
+
+  out = fft(out_hat, inverse, fft_lengths)
+  out = lax.slice(out, (0, 0) + tuple(w - 1 for w in window),
+                  (n, o) + tuple(in_sizes), (1, 1) + tuple(window_strides))
+  out = lax.transpose(out, tuple(onp.argsort(out_spec)))
+  return lax.convert_element_type(out, out_dtype)
@@ -16,12 +16,15 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+import re
+
 import numpy as onp
 
 from jax.numpy import lax_numpy as np
 from jax import core
 from jax import lax
 from jax import ad_util
+from jax import api
 from jax.interpreters import xla
 from jax.interpreters import ad
 from jax.interpreters import batching
@@ -29,8 +32,9 @@ from jax.util import partial
 from jax.abstract_arrays import ShapedArray
 from jax.core import Primitive
 from jax.lax import (standard_primitive, standard_unop, binop_dtype_rule,
-                     _float, _complex, _input_dtype)
+                     unop_dtype_rule, _float, _complex, _num, _input_dtype)
 from jaxlib import lapack
+from jaxlib import version as jaxlib_version
 
 # traceables
 
@@ -63,6 +67,46 @@ def triangular_solve(a, b, left_side=False, lower=False, transpose_a=False,
       a, b, left_side=left_side, lower=lower, transpose_a=transpose_a,
       conjugate_a=conjugate_a)
 
+def cho_solve(c, b):
+  """Solves `a x = b` given the lower Cholesky factor `c` of `a`."""
+  return cho_solve_p.bind(c, b)
+
+def solve(a, b, sym_pos=False):
+  """Solves `a x = b`, via Cholesky if `sym_pos` and otherwise LU."""
+  return solve_p.bind(a, b, sym_pos=sym_pos)
+
+def slogdet(a, sym_pos=False):
+  """Sign and log-magnitude of det(a), via Cholesky if `sym_pos` else LU."""
+  sign, logdet = slogdet_p.bind(a, sym_pos=sym_pos)
+  return sign, logdet
+
+def expm(x):
+  """Matrix exponential, by scaling and squaring with a Pade approximant."""
+  return expm_p.bind(x)
+
+def sqrtm(x):
+  """Principal matrix square root, by the Denman-Beavers iteration."""
+  return sqrtm_p.bind(x)
+
+def logm(x):
+  """Principal matrix logarithm, by inverse scaling and squaring."""
+  return logm_p.bind(x)
+
+def matrix_power(x, n):
+  """Raises `x` to the integer power `n` by repeated squaring."""
+  if n == 0:
+    return _eye_like(x)
+  return matrix_power_p.bind(x, n=n)
+
+def matrix_function_frechet(a, e, function, params=()):
+  """Frechet derivative of the matrix function primitive `function` at `a`.
+
+  Computes `L(a, e)`, the derivative of `function.bind(a, **dict(params))` in
+  the direction `e`. It is linear in `e`.
+  """
+  return matrix_function_frechet_p.bind(a, e, function=function,
+                                        params=tuple(sorted(params)))
+
 
 # utilities
 
@@ -75,6 +119,28 @@ def symmetrize(x): return (x + _H(x)) / 2
 
 _cpu_lapack_types = {np.float32, np.float64, np.complex64, np.complex128}
 
+def _version_tuple(version):
+  """Parses e.g. "0.1.13rc1" as (0, 1, 13), ignoring any non-numeric suffix."""
+  parts = []
+  for part in version.split('.'):
+    match = re.match(r'\d+', part)
+    if not match:
+      break
+    parts.append(int(match.group()))
+  return tuple(parts)
+
+# jaxlib 0.1.13 added batched LAPACK kernels. With older versions, batched
+# operands fall back to HLO implementations where they exist. The check can go
+# once the minimum jaxlib version reaches 0.1.13.
+_cpu_lapack_batched = (
+    _version_tuple(jaxlib_version.__version__) >= (0, 1, 13))
+
+def _cpu_lapack_supports(shape):
+  """Whether the CPU LAPACK kernels can handle an operand of `shape`."""
+  ndims = len(shape.dimensions())
+  return (shape.element_type().type in _cpu_lapack_types and
+          (ndims == 2 or ndims > 2 and _cpu_lapack_batched))
+
 # Cholesky decomposition
 
 def cholesky_jvp_rule(primals, tangents):
@@ -103,13 +169,11 @@ batching.primitive_batchers[cholesky_p] = cholesky_batching_rule
 
 def cholesky_cpu_translation_rule(c, operand):
   shape = c.GetShape(operand)
-  dtype = shape.element_type().type
-  if len(shape.dimensions()) == 2 and dtype in _cpu_lapack_types:
+  if _cpu_lapack_supports(shape):
     return c.GetTupleElement(lapack.jax_potrf(c, operand, lower=True), 0)
   else:
-    # Fall back to the HLO implementation for batched Cholesky decomposition or
-    # unsupported types.
-    # TODO(phawkins): support LAPACK primitives in batched mode.
+    # Fall back to the HLO implementation for unsupported types, or for batched
+    # Cholesky decomposition with an older jaxlib.
     return c.Cholesky(operand)
 
 xla.backend_specific_translations['cpu'][cholesky_p] = cholesky_cpu_translation_rule
@@ -141,13 +205,13 @@ def eigh_abstract_eval(operand, lower):
 
 def eigh_cpu_translation_rule(c, operand, lower):
   shape = c.GetShape(operand)
-  dtype = shape.element_type().type
-  if len(shape.dimensions()) == 2 and dtype in _cpu_lapack_types:
+  if _cpu_lapack_supports(shape):
     out = lapack.jax_syevd(c, operand, lower=lower)
     return c.Tuple(c.GetTupleElement(out, 0), c.GetTupleElement(out, 1))
   else:
     raise NotImplementedError(
-        "Only unbatched eigendecomposition is implemented on CPU")
+        "Only unbatched eigendecomposition is implemented on CPU with this "
+        "jaxlib version")
 
 def eigh_jvp_rule(primals, tangents, lower):
   # Derivative for eigh in the simplest case of distinct eigenvalues.
@@ -166,18 +230,24 @@ def eigh_jvp_rule(primals, tangents, lower):
   eye_n = np.eye(a.shape[-1], dtype=a.dtype)
   # carefully build reciprocal delta-eigenvalue matrix, avoiding NaNs.
   Fmat = np.reciprocal(eye_n + w - w[..., np.newaxis]) - eye_n
-  # eigh impl doesn't support batch dims, but future-proof the grad.
   dot = lax.dot if a.ndim == 2 else lax.batch_matmul
   vdag_adot_v = dot(dot(_H(v), a_dot), v)
   dv = dot(v, np.multiply(Fmat, vdag_adot_v))
   dw = np.diagonal(vdag_adot_v)
   return core.pack((v, w)), core.pack((dv, dw))
 
+def eigh_batching_rule(batched_args, batch_dims, lower):
+  x, = batched_args
+  bd, = batch_dims
+  x = batching.bdim_at_front(x, bd)
+  return eigh_p.bind(x, lower=lower), 0
+
 eigh_p = Primitive('eigh')
 eigh_p.def_impl(eigh_impl)
 eigh_p.def_abstract_eval(eigh_abstract_eval)
 xla.translations[eigh_p] = eigh_translation_rule
 ad.primitive_jvps[eigh_p] = eigh_jvp_rule
+batching.primitive_batchers[eigh_p] = eigh_batching_rule
 xla.backend_specific_translations['cpu'][eigh_p] = eigh_cpu_translation_rule
 
 
@@ -251,14 +321,13 @@ def triangular_solve_cpu_translation_rule(
     c, a, b, left_side, lower, transpose_a, conjugate_a):
   shape = c.GetShape(a)
   dtype = shape.element_type().type
-  if len(shape.dimensions()) == 2 and dtype in _cpu_lapack_types:
+  if _cpu_lapack_supports(shape):
     return lapack.jax_trsm(
       c, c.Constant(onp.array(1, dtype=dtype)), a, b, left_side, lower,
                     transpose_a, conjugate_a)
   else:
-    # Fall back to the HLO implementation for batched triangular_solve or
-    # unsupported types.
-    # TODO(phawkins): support BLAS primitives in batched mode.
+    # Fall back to the HLO implementation for unsupported types, or for batched
+    # triangular_solve with an older jaxlib.
     return c.TriangularSolve(a, b, left_side, lower, transpose_a, conjugate_a)
 
 xla.backend_specific_translations['cpu'][triangular_solve_p] = triangular_solve_cpu_translation_rule
@@ -302,8 +371,13 @@ def lu_jvp_rule(primals, tangents):
   dtype = lax._dtype(a)
   k = min(m, n)
 
+  ndims = len(a_shape)
   permutation = lu_pivots_to_permutation(pivots, m)
-  x = a_dot[..., permutation, :]
+  if ndims > 2:
+    indices = np.broadcast_to(permutation[..., None], a_shape)
+    x = np.take_along_axis(a_dot, indices, axis=ndims - 2)
+  else:
+    x = a_dot[..., permutation, :]
 
   # Differentiation of Matrix Functionals Using Triangular Factorization
   # F. R. De Hoog, R. S. Anderssen, and M. A. Lukas
@@ -314,7 +388,6 @@ def lu_jvp_rule(primals, tangents):
   # ==> L' = L . tril(inv(L) . A' . inv(U), -1)
   #     U' = triu(inv(L) . A' . inv(U)) . U
 
-  ndims = len(a_shape)
   l_padding = [(0, 0, 0)] * ndims
   l_padding[-1] = (0, m - k, 0)
   zero = np._constant_like(lu, 0)
@@ -337,17 +410,23 @@ def lu_jvp_rule(primals, tangents):
   lu_dot = l_dot + u_dot
   return core.pack((lu, pivots)), ad.TangentTuple((lu_dot, ad_util.zero))
 
+def lu_batching_rule(batched_args, batch_dims):
+  x, = batched_args
+  bd, = batch_dims
+  x = batching.bdim_at_front(x, bd)
+  return lu_p.bind(x), 0
+
 
 lu_p = Primitive('lu')
 lu_p.def_impl(lu_impl)
 lu_p.def_abstract_eval(lu_abstract_eval)
 xla.translations[lu_p] = lu_translation_rule
 ad.primitive_jvps[lu_p] = lu_jvp_rule
+batching.primitive_batchers[lu_p] = lu_batching_rule
 
 def lu_cpu_translation_rule(c, operand):
   shape = c.GetShape(operand)
-  dtype = shape.element_type().type
-  if len(shape.dimensions()) == 2 and dtype in _cpu_lapack_types:
+  if _cpu_lapack_supports(shape):
     out = lapack.jax_getrf(c, operand)
     lu = c.GetTupleElement(out, 0)
     # Subtract 1 from the pivot to get 0-based indices.
@@ -355,7 +434,9 @@ def lu_cpu_translation_rule(c, operand):
     # Throw away the `info` value, because we have no way to report errors.
     return c.Tuple(lu, pivot)
   else:
-    raise NotImplementedError("Only unbatched LU decomposition is implemented")
+    raise NotImplementedError(
+        "Only unbatched LU decomposition is implemented with this jaxlib "
+        "version")
 
 # TODO(phawkins): The hasattr() test here is to avoid incompatibilities between
 # jax and an older jaxlib. Remove after a jaxlib release includes jax_getrf.
@@ -364,7 +445,12 @@ if hasattr(lapack, "jax_getrf"):
 
 
 def lu_pivots_to_permutation(swaps, k):
-  """Converts the pivots (row swaps) returned by LU to a permutation."""
+  """Converts the pivots (row swaps) returned by LU to a permutation.
+
+  `swaps` may have leading batch dimensions, as returned by a batched LU.
+  """
+  if np.ndim(swaps) > 1:
+    return api.vmap(partial(lu_pivots_to_permutation, k=k))(swaps)
 
   def body_fn(i, loop_carry):
     swaps, permutation = loop_carry
@@ -381,6 +467,446 @@ def lu_pivots_to_permutation(swaps, k):
   return permutation
 
 
+# Linear solves and log-determinants
+#
+# These are composed from the factorizations above, but are primitives so that
+# their JVPs can factorize the matrix once and reuse the factors for both the
+# primal output and the tangent, instead of differentiating through the
+# factorization.
+
+def _linear_solve_shape_rule(a, b, **unused_kwargs):
+  if a.ndim < 2 or a.shape[-1] != a.shape[-2]:
+    msg = "linear solve requires a to have shape [..., n, n], got {}."
+    raise TypeError(msg.format(a.shape))
+  if a.shape[:-2] != b.shape[:-2] or a.ndim != b.ndim:
+    msg = ("linear solve requires both arguments to have the same number of "
+           "dimensions and equal batch dimensions, got {} and {}.")
+    raise TypeError(msg.format(a.shape, b.shape))
+  if a.shape[-1] != b.shape[-2]:
+    msg = "Incompatible shapes for arguments to linear solve: {} and {}."
+    raise TypeError(msg.format(a.shape, b.shape))
+  return b.shape
+
+def _linear_solve_batching_rule(prim, batched_args, batch_dims, **params):
+  a, b = batched_args
+  ba, bb = batch_dims
+  size = next(t.shape[i] for t, i in zip(batched_args, batch_dims)
+              if i is not None)
+  a = batching.bdim_at_front(a, ba, size, force_broadcast=True)
+  b = batching.bdim_at_front(b, bb, size, force_broadcast=True)
+  return prim.bind(a, b, **params), 0
+
+def _lu_solve(lu, permutation, b):
+  """Solves `a x = b` given the LU decomposition of `a` as computed by `lu`."""
+  m = np.shape(lu)[-1]
+  ndims = np.ndim(b)
+  if ndims > 2:
+    indices = np.broadcast_to(permutation[..., None], np.shape(b))
+    x = np.take_along_axis(b, indices, axis=ndims - 2)
+  else:
+    x = b[permutation, :]
+  # TODO(phawkins): add unit_diagonal support to triangular_solve, use it here
+  # instead of explicit masking of l.
+  l = np.tril(lu, -1) + np.eye(m, dtype=lax._dtype(lu))
+  x = triangular_solve(l, x, left_side=True, lower=True)
+  return triangular_solve(lu, x, left_side=True, lower=False)
+
+def _linear_solver(a, sym_pos):
+  """Factorizes `a`, returning a function that solves `a x = b` for any `b`."""
+  if sym_pos:
+    return partial(cho_solve, cholesky(a))
+  lu_factors, pivots = lu(a)
+  permutation = lu_pivots_to_permutation(pivots, np.shape(a)[-1])
+  return partial(_lu_solve, lu_factors, permutation)
+
+
+def _cho_solve_translation_impl(c, b):
+  b = triangular_solve(c, b, left_side=True, lower=True)
+  return triangular_solve(c, b, left_side=True, lower=True, transpose_a=True,
+                          conjugate_a=True)
+
+def _cho_solve_jvp_rule_c(g_c, ans, c, b):
+  # With a = c c^H, a' = c' c^H + c c'^H and x' = -inv(a) a' x.
+  c, g_c = np.tril(c), np.tril(g_c)
+  dot = lax.dot if c.ndim == 2 else lax.batch_matmul
+  g_a_ans = dot(g_c, dot(_H(c), ans)) + dot(c, dot(_H(g_c), ans))
+  return lax.neg(cho_solve(c, g_a_ans))
+
+def _cho_solve_transpose_rule(cotangent, c, b):
+  # cho_solve is linear in b. Since a is Hermitian, transpose(inv(a)) is
+  # inv(conj(a)).
+  assert c is not None and b is None
+  return [None, np.conj(cho_solve(c, np.conj(cotangent)))]
+
+cho_solve_dtype_rule = partial(
+    binop_dtype_rule, _input_dtype, (_float | _complex, _float | _complex),
+    'cho_solve')
+
+cho_solve_p = standard_primitive(
+    _linear_solve_shape_rule, cho_solve_dtype_rule, 'cho_solve',
+    translation_rule=partial(xla.lower_fun, _cho_solve_translation_impl))
+ad.defjvp2(cho_solve_p, _cho_solve_jvp_rule_c,
+           lambda g_b, _, c, b: cho_solve(c, g_b))
+ad.primitive_transposes[cho_solve_p] = _cho_solve_transpose_rule
+batching.primitive_batchers[cho_solve_p] = partial(
+    _linear_solve_batching_rule, cho_solve_p)
+
+
+def _solve_translation_impl(a, b, sym_pos):
+  return _linear_solver(a, sym_pos)(b)
+
+def _solve_jvp_rule(primals, tangents, sym_pos):
+  a, b = primals
+  g_a, g_b = tangents
+  solve = _linear_solver(a, sym_pos)
+  x = solve(b)
+  # x' = inv(a) (b' - a' x), reusing the factorization of a.
+  rhs = g_b
+  if g_a is not ad_util.zero:
+    g_a = symmetrize(g_a) if sym_pos else g_a
+    dot = lax.dot if g_a.ndim == 2 else lax.batch_matmul
+    rhs = ad.add_tangents(rhs, lax.neg(dot(g_a, x)))
+  return x, ad_util.zero if rhs is ad_util.zero else solve(rhs)
+
+solve_dtype_rule = partial(
+    binop_dtype_rule, _input_dtype, (_float | _complex, _float | _complex),
+    'solve')
+
+solve_p = standard_primitive(
+    _linear_solve_shape_rule, solve_dtype_rule, 'solve',
+    translation_rule=partial(xla.lower_fun, _solve_translation_impl))
+ad.primitive_jvps[solve_p] = _solve_jvp_rule
+batching.primitive_batchers[solve_p] = partial(
+    _linear_solve_batching_rule, solve_p)
+
+
+def _lu_slogdet(lu, pivots):
+  dtype = lax._dtype(lu)
+  n = np.shape(lu)[-1]
+  diag = np.diagonal(lu, axis1=-2, axis2=-1)
+  is_zero = np.any(diag == np.array(0, dtype=dtype), axis=-1)
+  parity = np.count_nonzero(pivots != np.arange(n), axis=-1)
+  if np.iscomplexobj(lu):
+    sign = np.prod(diag / np.abs(diag), axis=-1)
+  else:
+    sign = np.array(1, dtype=dtype)
+    parity = parity + np.count_nonzero(diag < 0, axis=-1)
+  sign = np.where(is_zero,
+                  np.array(0, dtype=dtype),
+                  sign * np.array(-2 * (parity % 2) + 1, dtype=dtype))
+  logdet = np.where(
+      is_zero, np.array(-np.inf, dtype=dtype),
+      np.sum(np.log(np.abs(diag)), axis=-1))
+  return sign, np.real(logdet)
+
+def _cholesky_slogdet(c):
+  diag = np.real(np.diagonal(c, axis1=-2, axis2=-1))
+  logdet = 2 * np.sum(np.log(diag), axis=-1)
+  return np.ones_like(logdet, dtype=lax._dtype(c)), logdet
+
+def _slogdet_impl(a, sym_pos):
+  sign, logdet = xla.apply_primitive(slogdet_p, a, sym_pos=sym_pos)
+  return core.pack((sign, logdet))
+
+def _slogdet_translation_impl(a, sym_pos):
+  if sym_pos:
+    sign, logdet = _cholesky_slogdet(cholesky(a))
+  else:
+    sign, logdet = _lu_slogdet(*lu(a))
+  return core.pack((sign, logdet))
+
+def _slogdet_abstract_eval(a, sym_pos):
+  if isinstance(a, ShapedArray):
+    if a.ndim < 2 or a.shape[-1] != a.shape[-2]:
+      raise ValueError("Argument to slogdet must have shape [..., n, n]")
+    batch_dims = a.shape[:-2]
+    sign = ShapedArray(batch_dims, a.dtype)
+    logdet = ShapedArray(batch_dims, onp.finfo(a.dtype).dtype)
+  else:
+    sign, logdet = a, a
+  return core.AbstractTuple((sign, logdet))
+
+def _slogdet_jvp_rule(primals, tangents, sym_pos):
+  a, = primals
+  g_a, = tangents
+  eye = np.broadcast_to(np.eye(a.shape[-1], dtype=a.dtype), a.shape)
+  if sym_pos:
+    c = cholesky(a)
+    sign, logdet = _cholesky_slogdet(c)
+    a_inv = cho_solve(c, eye)
+    g_a = symmetrize(g_a)
+  else:
+    lu_factors, pivots = lu(a)
+    sign, logdet = _lu_slogdet(lu_factors, pivots)
+    permutation = lu_pivots_to_permutation(pivots, a.shape[-1])
+    a_inv = _lu_solve(lu_factors, permutation, eye)
+  # d log(det(a)) = trace(inv(a) a'), whose real part is the derivative of the
+  # log-magnitude and whose imaginary part rotates the sign.
+  trace = np.sum(_T(a_inv) * g_a, axis=(-2, -1))
+  g_logdet = np.real(trace)
+  if np.iscomplexobj(a) and not sym_pos:
+    g_sign = sign * (trace - g_logdet)
+  else:
+    g_sign = ad_util.zero
+  return core.pack((sign, logdet)), ad.TangentTuple((g_sign, g_logdet))
+
+def _slogdet_batching_rule(batched_args, batch_dims, sym_pos):
+  a, = batched_args
+  bd, = batch_dims
+  a = batching.bdim_at_front(a, bd)
+  return slogdet_p.bind(a, sym_pos=sym_pos), 0
+
+slogdet_p = Primitive('slogdet')
+slogdet_p.def_impl(_slogdet_impl)
+slogdet_p.def_abstract_eval(_slogdet_abstract_eval)
+xla.translations[slogdet_p] = partial(xla.lower_fun, _slogdet_translation_impl)
+ad.primitive_jvps[slogdet_p] = _slogdet_jvp_rule
+batching.primitive_batchers[slogdet_p] = _slogdet_batching_rule
+
+
+
+# Matrix functions
+#
+# expm, sqrtm, logm and matrix_power are lowered with loops, so that their
+# computations have a size independent of the number of iterations taken.
+# Each is a primary matrix function f, for which
+#
+#   f([[a, e], [0, a]]) = [[f(a), L(a, e)], [0, f(a)]],
+#
+# where L(a, e) is the Frechet derivative of f at a in the direction e. Their
+# JVPs are matrix_function_frechet_p, which evaluates f on that block matrix.
+# It is linear in e, with transpose L(a^T, .), and its own JVP is again the
+# Frechet derivative of f at a larger block matrix, so derivatives of any
+# order are available.
+
+def _eye_like(a):
+  return np.broadcast_to(np.eye(a.shape[-1], dtype=lax._dtype(a)), a.shape)
+
+def _norm1(a):
+  return np.max(np.sum(np.abs(a), axis=-2), axis=-1)
+
+def _block_triangular(a, e, d):
+  """Returns the block matrix [[a, e], [0, d]]."""
+  return np.concatenate([np.concatenate([a, e], axis=-1),
+                         np.concatenate([np.zeros_like(d), d], axis=-1)],
+                        axis=-2)
+
+def _matrix_function_shape_rule(a, **unused_kwargs):
+  if a.ndim < 2 or a.shape[-1] != a.shape[-2]:
+    msg = "matrix functions require a to have shape [..., n, n], got {}."
+    raise TypeError(msg.format(a.shape))
+  return a.shape
+
+def _matrix_function_jvp_rule(prim, primals, tangents, **params):
+  a, = primals
+  g_a, = tangents
+  out = prim.bind(a, **params)
+  if g_a is ad_util.zero:
+    return out, ad_util.zero
+  return out, matrix_function_frechet(a, g_a, prim, params.items())
+
+def _matrix_function_batching_rule(prim, batched_args, batch_dims, **params):
+  a, = batched_args
+  bd, = batch_dims
+  return prim.bind(batching.bdim_at_front(a, bd), **params), 0
+
+def _matrix_function_primitive(name, impl, accepted_dtypes=_float | _complex):
+  prim = standard_primitive(
+      _matrix_function_shape_rule,
+      partial(unop_dtype_rule, _input_dtype, accepted_dtypes, name), name,
+      translation_rule=partial(xla.lower_fun, impl))
+  ad.primitive_jvps[prim] = partial(_matrix_function_jvp_rule, prim)
+  batching.primitive_batchers[prim] = partial(
+      _matrix_function_batching_rule, prim)
+  return prim
+
+
+# The [13/13] Pade approximant of Higham, "The scaling and squaring method for
+# the matrix exponential revisited", 2005. theta_13 is the largest 1-norm for
+# which it is accurate to double precision.
+_EXPM_PADE_13 = (64764752532480000., 32382376266240000., 7771770303897600.,
+                 1187353796428800., 129060195264000., 10559470521600.,
+                 670442572800., 33522128640., 1323241920., 40840800., 960960.,
+                 16380., 182., 1.)
+_EXPM_THETA_13 = 5.371920351148152
+
+def _expm_impl(a):
+  b = _EXPM_PADE_13
+  dtype = lax._dtype(a)
+  s = np.maximum(0., np.ceil(np.log2(_norm1(a) / _EXPM_THETA_13)))
+  a = a / lax.convert_element_type(np.exp2(s), dtype)[..., None, None]
+  eye = _eye_like(a)
+  a2 = np.matmul(a, a)
+  a4 = np.matmul(a2, a2)
+  a6 = np.matmul(a4, a2)
+  u = np.matmul(a, np.matmul(a6, b[13] * a6 + b[11] * a4 + b[9] * a2)
+                + b[7] * a6 + b[5] * a4 + b[3] * a2 + b[1] * eye)
+  v = (np.matmul(a6, b[12] * a6 + b[10] * a4 + b[8] * a2)
+       + b[6] * a6 + b[4] * a4 + b[2] * a2 + b[0] * eye)
+  r = solve(v - u, v + u)
+
+  # Square each matrix in the batch s times.
+  s = lax.convert_element_type(s, onp.int32)
+  def square(i, r):
+    return np.where((i < s)[..., None, None], np.matmul(r, r), r)
+  return lax.fori_loop(onp.array(0, onp.int32), np.max(s), square, r)
+
+expm_p = _matrix_function_primitive('expm', _expm_impl)
+
+
+_SQRTM_MAX_ITERATIONS = 64
+
+def _sqrtm_impl(a):
+  # The product form of the Denman-Beavers iteration with determinantal
+  # scaling, from Higham, "Functions of Matrices", 2008, eq. (6.29). y
+  # converges to sqrt(a) as m converges to the identity.
+  n = a.shape[-1]
+  eye = _eye_like(a)
+  tol = onp.sqrt(onp.finfo(lax._dtype(a)).eps)
+
+  def cond_fun(value):
+    i, _, _, err = value
+    return np.logical_and(i < _SQRTM_MAX_ITERATIONS, np.any(err > tol))
+
+  def body_fun(value):
+    # Convergence is quadratic, so after m is within sqrt(eps) of the
+    # identity, one more step is taken.
+    i, m, y, _ = value
+    err = _norm1(m - eye)
+    lu_factors, pivots = lu(m)
+    _, logdet = _lu_slogdet(lu_factors, pivots)
+    permutation = lu_pivots_to_permutation(pivots, n)
+    mu = lax.convert_element_type(np.exp(-logdet / (2 * n)), lax._dtype(a))
+    mu = mu[..., None, None]
+    m_inv = _lu_solve(lu_factors, permutation, eye) / (mu * mu)
+    m = m * (mu * mu)
+    y = np.matmul(y * mu, eye + m_inv) / 2
+    m = (eye + (m + m_inv) / 2) / 2
+    return i + 1, m, y, err
+
+  err = np.full(a.shape[:-2], np.inf, dtype=onp.finfo(lax._dtype(a)).dtype)
+  _, _, y, _ = lax.while_loop(cond_fun, body_fun, (0, a, a, err))
+  return y
+
+sqrtm_p = _matrix_function_primitive('sqrtm', _sqrtm_impl)
+
+
+_LOGM_MAX_SQUARE_ROOTS = 64
+_LOGM_QUADRATURE_NODES = 8
+
+def _logm_impl(a):
+  # Takes k square roots until |a - I| <= 1/4, then log(a) = 2^k log(I + x)
+  # with log(I + x) = int_0^1 x (I + t x)^-1 dt, which Gauss-Legendre
+  # quadrature evaluates as the diagonal Pade approximant.
+  dtype = lax._dtype(a)
+  eye = _eye_like(a)
+  needs_root = lambda a: _norm1(a - eye) > 0.25
+
+  def cond_fun(value):
+    i, _, a = value
+    return np.logical_and(i < _LOGM_MAX_SQUARE_ROOTS, np.any(needs_root(a)))
+
+  def body_fun(value):
+    i, k, a = value
+    take_root = needs_root(a)
+    a = np.where(take_root[..., None, None], _sqrtm_impl(a), a)
+    return i + 1, k + take_root, a
+
+  k = np.zeros(a.shape[:-2], dtype=onp.int32)
+  _, k, a = lax.while_loop(cond_fun, body_fun, (0, k, a))
+
+  nodes, weights = onp.polynomial.legendre.leggauss(_LOGM_QUADRATURE_NODES)
+  nodes = ((nodes + 1) / 2).astype(dtype)[(Ellipsis,) + (None,) * a.ndim]
+  weights = (weights / 2).astype(dtype)[(Ellipsis,) + (None,) * a.ndim]
+  x = a - eye
+  log = np.sum(weights * solve(np.broadcast_to(eye + nodes * x,
+                                               nodes.shape[:1] + x.shape),
+                               np.broadcast_to(x, nodes.shape[:1] + x.shape)),
+               axis=0)
+  scale = lax.convert_element_type(np.exp2(k), dtype)
+  return log * scale[..., None, None]
+
+logm_p = _matrix_function_primitive('logm', _logm_impl)
+
+
+def _matrix_power_impl(a, n):
+  eye = _eye_like(a)
+  if n < 0:
+    a, n = solve(a, eye), -n
+  bits = onp.array([(n >> i) & 1 for i in range(n.bit_length())], onp.bool_)
+
+  def body_fun(i, value):
+    result, power = value
+    bit = lax.dynamic_index_in_dim(bits, i, keepdims=False)
+    result = np.where(bit, np.matmul(result, power), result)
+    return result, np.matmul(power, power)
+
+  result, _ = lax.fori_loop(0, len(bits), body_fun, (eye, a))
+  return result
+
+matrix_power_p = _matrix_function_primitive('matrix_power', _matrix_power_impl,
+                                            accepted_dtypes=_num)
+
+
+def _matrix_function_frechet_shape_rule(a, e, **unused_kwargs):
+  if a.shape != e.shape:
+    msg = ("matrix_function_frechet requires arguments of equal shape, got {} "
+           "and {}.")
+    raise TypeError(msg.format(a.shape, e.shape))
+  return _matrix_function_shape_rule(a)
+
+def _matrix_function_frechet_impl(a, e, function, params):
+  n = a.shape[-1]
+  f_block = function.bind(_block_triangular(a, e, a), **dict(params))
+  return f_block[..., :n, n:]
+
+def _matrix_function_frechet_jvp_rule(primals, tangents, function, params):
+  a, e = primals
+  g_a, g_e = tangents
+  out = matrix_function_frechet(a, e, function, params)
+  if g_a is ad_util.zero:
+    if g_e is ad_util.zero:
+      return out, ad_util.zero
+    return out, matrix_function_frechet(a, g_e, function, params)
+  # L(a, e) is the top right block of f([[a, e], [0, a]]), whose derivative in
+  # the direction [[g_a, g_e], [0, g_a]] is again a Frechet derivative of f.
+  n = a.shape[-1]
+  g_e = ad.instantiate_zeros(e, g_e)
+  g_block = matrix_function_frechet(
+      _block_triangular(a, e, a), _block_triangular(g_a, g_e, g_a), function,
+      params)
+  return out, g_block[..., :n, n:]
+
+def _matrix_function_frechet_transpose_rule(cotangent, a, e, function,
+                                            params):
+  assert a is not None and e is None
+  if cotangent is ad_util.zero:
+    return [None, ad_util.zero]
+  return [None, matrix_function_frechet(_T(a), cotangent, function, params)]
+
+def _matrix_function_frechet_batching_rule(batched_args, batch_dims,
+                                           function, params):
+  a, e = batched_args
+  ba, be = batch_dims
+  size = next(t.shape[i] for t, i in zip(batched_args, batch_dims)
+              if i is not None)
+  a = batching.bdim_at_front(a, ba, size, force_broadcast=True)
+  e = batching.bdim_at_front(e, be, size, force_broadcast=True)
+  return matrix_function_frechet(a, e, function, params), 0
+
+matrix_function_frechet_p = standard_primitive(
+    _matrix_function_frechet_shape_rule,
+    partial(binop_dtype_rule, _input_dtype,
+            (_float | _complex, _float | _complex), 'matrix_function_frechet'),
+    'matrix_function_frechet',
+    translation_rule=partial(xla.lower_fun, _matrix_function_frechet_impl))
+ad.primitive_jvps[matrix_function_frechet_p] = (
+    _matrix_function_frechet_jvp_rule)
+ad.primitive_transposes[matrix_function_frechet_p] = (
+    _matrix_function_frechet_transpose_rule)
+batching.primitive_batchers[matrix_function_frechet_p] = (
+    _matrix_function_frechet_batching_rule)
+
 
 # QR decomposition
 
@@ -457,18 +983,25 @@ def svd_abstract_eval(operand, full_matrices, compute_uv):
 
 def svd_cpu_translation_rule(c, operand, full_matrices, compute_uv):
   shape = c.GetShape(operand)
-  dtype = shape.element_type().type
-  if len(shape.dimensions()) == 2 and dtype in _cpu_lapack_types:
+  if _cpu_lapack_supports(shape):
     out = lapack.jax_gesdd(c, operand, full_matrices=full_matrices, compute_uv=compute_uv)
     return c.Tuple(c.GetTupleElement(out, 0),
                    c.GetTupleElement(out, 1),
                    c.GetTupleElement(out, 2))
   else:
     raise NotImplementedError(
-        "Only unbatched singular value decomposition is implemented on CPU")
+        "Only unbatched singular value decomposition is implemented on CPU "
+        "with this jaxlib version")
+
+def svd_batching_rule(batched_args, batch_dims, full_matrices, compute_uv):
+  x, = batched_args
+  bd, = batch_dims
+  x = batching.bdim_at_front(x, bd)
+  return svd_p.bind(x, full_matrices=full_matrices, compute_uv=compute_uv), 0
 
 svd_p = Primitive('svd')
 svd_p.def_impl(svd_impl)
 svd_p.def_abstract_eval(svd_abstract_eval)
 xla.translations[svd_p] = svd_translation_rule
 xla.backend_specific_translations['cpu'][svd_p] = svd_cpu_translation_rule
+batching.primitive_batchers[svd_p] = svd_batching_rule
@@ -16,10 +16,168 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+import operator
+
 import numpy as onp
 
+from .. import lax
+from .. import lax_fft
+from ..lax_fft import FftType
 from ..util import get_module_functions
 from .lax_numpy import _not_implemented
+from .lax_numpy import _wraps
+from . import lax_numpy as np
+
+
+def _resize_trailing(x, shape):
+  """Zero-pads or crops the trailing `len(shape)` axes of `x` to `shape`."""
+  x_shape = np.shape(x)
+  batch_ndims = len(x_shape) - len(shape)
+  limits = x_shape[:batch_ndims] + tuple(min(d, n) for d, n in
+                                         zip(x_shape[batch_ndims:], shape))
+  if limits != x_shape:
+    x = lax.slice(x, (0,) * len(x_shape), limits)
+  padding = ([(0, 0, 0)] * batch_ndims +
+             [(0, n - d, 0) for d, n in zip(limits[batch_ndims:], shape)])
+  if any(hi for _, hi, _ in padding):
+    x = lax.pad(x, lax._const(x, 0), padding)
+  return x
+
+
+def _fft_core(func_name, fft_type, a, s, axes, norm):
+  """Applies `fft_type` over `axes` of `a`, zero-padded or cropped to `s`."""
+  full_name = "jax.numpy.fft." + func_name
+  if norm is not None and norm != "ortho":
+    raise ValueError("Invalid norm value {}; should be None or \"ortho\"."
+                     .format(norm))
+  a = np.asarray(a)
+  if fft_type == FftType.RFFT:
+    # Like NumPy, the real transforms discard the imaginary part of the input.
+    a = np.real(a)
+  ndim = np.ndim(a)
+
+  if s is not None:
+    s = tuple(map(operator.index, s))
+    if any(n < 1 for n in s):
+      raise ValueError("Invalid number of FFT data points {} specified in {}."
+                       .format(s, full_name))
+  if s is not None and axes is not None and len(s) != len(axes):
+    raise ValueError("Shape and axes have different lengths.")
+  if axes is None:
+    axes = range(ndim) if s is None else range(ndim - len(s), ndim)
+  axes = tuple(np._canonicalize_axis(axis, ndim) for axis in axes)
+  if len(axes) != len(set(axes)):
+    raise ValueError("{} does not support repeated axes. Got axes {}."
+                     .format(full_name, axes))
+  if len(axes) > 3:
+    # XLA only supports FFTs over up to 3 innermost dimensions.
+    raise ValueError("{} only supports 1D, 2D, and 3D FFTs. Got axes {}."
+                     .format(full_name, axes))
+  if not axes:
+    return lax_fft.fft(a, fft_type, ())
+
+  a_shape = np.shape(a)
+  if s is None:
+    s = tuple(a_shape[axis] for axis in axes)
+    if fft_type == FftType.IRFFT:
+      s = s[:-1] + (2 * (s[-1] - 1),)
+  in_shape = s
+  if fft_type == FftType.IRFFT:
+    in_shape = s[:-1] + (s[-1] // 2 + 1,)
+
+  trailing = tuple(range(ndim - len(axes), ndim))
+  x = np.moveaxis(a, axes, trailing)
+  x = _resize_trailing(x, in_shape)
+  x = lax_fft.fft(x, fft_type, s)
+  if norm == "ortho":
+    scale = onp.sqrt(onp.prod(s))
+    if fft_type in (FftType.FFT, FftType.RFFT):
+      scale = 1. / scale
+    x = x * lax._const(x, scale)
+  return np.moveaxis(x, trailing, axes)
+
+
+def _axis_args(n, axis):
+  return (None if n is None else [n]), [axis]
+
+
+@_wraps(onp.fft.fft)
+def fft(a, n=None, axis=-1, norm=None):
+  s, axes = _axis_args(n, axis)
+  return _fft_core("fft", FftType.FFT, a, s, axes, norm)
+
+
+@_wraps(onp.fft.ifft)
+def ifft(a, n=None, axis=-1, norm=None):
+  s, axes = _axis_args(n, axis)
+  return _fft_core("ifft", FftType.IFFT, a, s, axes, norm)
+
+
+@_wraps(onp.fft.rfft)
+def rfft(a, n=None, axis=-1, norm=None):
+  s, axes = _axis_args(n, axis)
+  return _fft_core("rfft", FftType.RFFT, a, s, axes, norm)
+
+
+@_wraps(onp.fft.irfft)
+def irfft(a, n=None, axis=-1, norm=None):
+  s, axes = _axis_args(n, axis)
+  return _fft_core("irfft", FftType.IRFFT, a, s, axes, norm)
+
+
+@_wraps(onp.fft.fftn)
+def fftn(a, s=None, axes=None, norm=None):
+  return _fft_core("fftn", FftType.FFT, a, s, axes, norm)
+
+
+@_wraps(onp.fft.ifftn)
+def ifftn(a, s=None, axes=None, norm=None):
+  return _fft_core("ifftn", FftType.IFFT, a, s, axes, norm)
+
+
+@_wraps(onp.fft.rfftn)
+def rfftn(a, s=None, axes=None, norm=None):
+  return _fft_core("rfftn", FftType.RFFT, a, s, axes, norm)
+
+
+@_wraps(onp.fft.irfftn)
+def irfftn(a, s=None, axes=None, norm=None):
+  return _fft_core("irfftn", FftType.IRFFT, a, s, axes, norm)
+
+
+@_wraps(onp.fft.fft2)
+def fft2(a, s=None, axes=(-2, -1), norm=None):
+  return _fft_core("fft2", FftType.FFT, a, s, axes, norm)
+
+
+@_wraps(onp.fft.ifft2)
+def ifft2(a, s=None, axes=(-2, -1), norm=None):
+  return _fft_core("ifft2", FftType.IFFT, a, s, axes, norm)
+
+
+@_wraps(onp.fft.rfft2)
+def rfft2(a, s=None, axes=(-2, -1), norm=None):
+  return _fft_core("rfft2", FftType.RFFT, a, s, axes, norm)
+
+
+@_wraps(onp.fft.irfft2)
+def irfft2(a, s=None, axes=(-2, -1), norm=None):
+  return _fft_core("irfft2", FftType.IRFFT, a, s, axes, norm)
+
+
+@_wraps(onp.fft.fftfreq)
+def fftfreq(n, d=1.0):
+  n = operator.index(n)
+  k = onp.concatenate([onp.arange(0, (n - 1) // 2 + 1),
+                       onp.arange(-(n // 2), 0)])
+  return np.asarray(k) / (d * n)
+
+
+@_wraps(onp.fft.rfftfreq)
+def rfftfreq(n, d=1.0):
+  n = operator.index(n)
+  return np.asarray(onp.arange(0, n // 2 + 1)) / (d * n)
+
 
 for func in get_module_functions(onp.fft):
   if func.__name__ not in globals():
@@ -1496,12 +1496,54 @@ def tensordot(a, b, axes=2):
 
 
 @_wraps(onp.einsum)
-def einsum(*operands):
+def einsum(*operands, **kwargs):
+  optimize = kwargs.pop('optimize', 'auto')
+  if kwargs:
+    msg = "invalid keyword arguments for einsum: {}"
+    raise TypeError(msg.format(", ".join(kwargs)))
+  if isinstance(optimize, (list, tuple)):
+    # an explicit contraction path, optionally in onp.einsum_path's format
+    optimize = tuple(tuple(step) for step in optimize if step != 'einsum_path')
+
+  # Operands are either (subscripts, *arrays) or interleaved as (array,
+  # sublist, array, sublist, ..., [output sublist]).
+  if operands and isinstance(operands[0], six.string_types):
+    array_positions = range(1, len(operands))
+  else:
+    array_positions = range(0, len(operands) - len(operands) % 2, 2)
+  arrays = [asarray(operands[i]) for i in array_positions]
+  if optimize is False or optimize is None:
+    # contract left to right, since _einsum only contracts pairs of operands
+    optimize = ((0, 1),) * (len(arrays) - 1) or ((0,),)
+  spec = [tuple(x) if isinstance(x, list) else x for x in operands]
+  for i, x in zip(array_positions, arrays):
+    spec[i] = _EinsumOperand(shape(x), _dtype(x))
+  contractions = _einsum_contract_path(tuple(spec), optimize)
+  return _einsum(arrays, contractions)
+
+
+_EinsumOperand = collections.namedtuple("_EinsumOperand", ["shape", "dtype"])
+
+@memoize
+def _einsum_contract_path(spec, optimize):
+  """Returns the contractions to evaluate an einsum, given operand avals.
+
+  Path search in opt_einsum can cost far more than the contraction itself for
+  small or many-operand expressions, so paths are cached by subscripts, shapes,
+  dtypes and strategy. Returning the same contractions object each time also
+  lets `_einsum`, which takes them as a static argument, hit its compilation
+  cache.
+  """
+  # opt_einsum only looks at shapes, so zero-strided stand-ins will do.
+  operands = [onp.broadcast_to(onp.zeros((), x.dtype), x.shape)
+              if type(x) is _EinsumOperand else
+              list(x) if isinstance(x, tuple) else x for x in spec]
+  if isinstance(optimize, tuple):
+    optimize = list(optimize)
   # using einsum_call=True here is an internal api for opt_einsum
-  operands, contractions = opt_einsum.contract_path(
-      *operands, einsum_call=True, use_blas=True)
-  contractions = tuple(data[:3] for data in contractions)
-  return _einsum(operands, contractions)
+  _, contractions = opt_einsum.contract_path(
+      *operands, einsum_call=True, use_blas=True, optimize=optimize)
+  return tuple(data[:3] for data in contractions)
 
 
 @partial(jit, static_argnums=(1,))
@@ -1549,6 +1591,9 @@ def _einsum(operands, contractions):
 
     elif len(operand_indices) == 2:
       lhs, rhs = map(operands.pop, operand_indices)
+      if _einsum_swap_operands(input_names, result_names):
+        lhs, rhs = rhs, lhs
+        input_names = input_names[::-1]
       lhs_counts, rhs_counts = map(collections.Counter, input_names)
       lhs_names, rhs_names = input_names
 
@@ -1569,8 +1614,6 @@ def _einsum(operands, contractions):
 
       contracted_names = contracted_names & (set(lhs_names) | set(rhs_names))
       batch_names = (set(lhs_names) & set(rhs_names)) - contracted_names
-      lhs_batch, rhs_batch = unzip2((lhs_names.find(n), rhs_names.find(n))
-                                    for n in batch_names)
 
       # NOTE(mattjj): this can fail non-deterministically in python3, maybe
       # due to opt_einsum
@@ -1578,7 +1621,11 @@ def _einsum(operands, contractions):
                   lhs.shape[lhs_names.index(name)] == rhs.shape[rhs_names.index(name)]
                   for name in contracted_names)
 
-      # move batch dims to the front (required by lax.dot_general, and easier)
+      # move batch dims to the front (required by lax.dot_general, and easier),
+      # in the order they appear in the result
+      batch_names = sorted(batch_names, key=result_names.index)
+      lhs_batch, rhs_batch = unzip2((lhs_names.find(n), rhs_names.find(n))
+                                    for n in batch_names)
       batch_dims = tuple(range(len(batch_names)))
       if lhs_batch != rhs_batch or set(lhs_batch) != set(batch_dims):
         lhs = moveaxis(lhs, lhs_batch, batch_dims)
@@ -1667,6 +1714,21 @@ def _dot_general(lhs, rhs, lhs_cont, rhs_cont, nbatch):
     return lax.reshape(result, result_shape)
 
 
+def _einsum_swap_operands(input_names, result_names):
+  """Whether to swap the operands of a two-operand contraction.
+
+  lax.dot_general puts the lhs free dimensions before the rhs ones, so order the
+  operands to match the result where that saves a transpose.
+  """
+  lhs_names, rhs_names = input_names
+  free = lambda names, other: sorted(
+      set(names) & set(result_names) - set(other), key=names.index)
+  lhs_free, rhs_free = free(lhs_names, rhs_names), free(rhs_names, lhs_names)
+  result_free = [n for n in result_names if n in lhs_free or n in rhs_free]
+  return (lhs_free + rhs_free != result_free and
+          rhs_free + lhs_free == result_free)
+
+
 def _movechars(s, src, dst):
   """Helper for einsum string munging, like moveaxis on identifier strings."""
   chars = [c for i, c in enumerate(s) if i not in src]
@@ -2114,6 +2176,19 @@ def _canonicalize_tuple_index(arr, idx):
   return idx
 
 
+def _searchsorted(a, v):
+  """Returns, for each of `v`, the number of entries of sorted 1-D `a` <= it."""
+  n = a.shape[0]
+  lo = lax.tie_in(v, lax.full(v.shape, 0, onp.int32))
+  hi = lax.tie_in(v, lax.full(v.shape, n, onp.int32))
+  for _ in range(int(onp.ceil(onp.log2(n + 1)))):
+    mid = lax.shift_right_logical(lax.add(lo, hi), onp.int32(1))
+    go_right = lax.bitwise_and(lax.lt(lo, hi), lax.le(take(a, mid), v))
+    lo = lax.select(go_right, lax.add(mid, onp.int32(1)), lo)
+    hi = lax.select(go_right, hi, mid)
+  return lo
+
+
 def _static_idx(idx, size):
   """Helper function to compute the static slice start/limit/stride values."""
   indices = onp.arange(size)[idx]  # get shape statically
@@ -18,6 +18,7 @@ from __future__ import print_function
 
 
 import numpy as onp
+import operator
 import warnings
 
 from .. import lax
@@ -46,6 +47,84 @@ def _promote_arg_dtypes(*args):
     return args
 
 
+# Matrices up to this size use closed-form determinants and adjugates, which
+# lower to a handful of fused elementwise ops over the whole batch instead of
+# a per-matrix LU factorization.
+_SMALL_MATRIX_SIZE = 4
+
+
+def _is_small_matrix(a):
+  return 0 < np.shape(a)[-1] <= _SMALL_MATRIX_SIZE
+
+
+def _stack_matrix(rows):
+  return np.stack([np.stack(row, axis=-1) for row in rows], axis=-2)
+
+
+def _small_adjugate_and_det(a, compute_adjugate=True):
+  """Closed-form adjugate and determinant of a stack of small matrices.
+
+  Returns `(adj, det)` such that `a @ adj == det * I` for `a` of shape
+  `[..., n, n]` with `n <= 4`; `adj` is None if `compute_adjugate` is False.
+  Unlike LU with partial pivoting the result is not backward stable, so very
+  ill-conditioned matrices lose more accuracy than on the general path.
+  """
+  n = np.shape(a)[-1]
+  m = [[a[..., i, j] for j in range(n)] for i in range(n)]
+  adj = None
+  if n == 1:
+    det = m[0][0]
+    if compute_adjugate:
+      adj = [[np.ones_like(det)]]
+  elif n == 2:
+    (a00, a01), (a10, a11) = m
+    det = a00 * a11 - a01 * a10
+    if compute_adjugate:
+      adj = [[a11, -a01], [-a10, a00]]
+  elif n == 3:
+    (a00, a01, a02), (a10, a11, a12), (a20, a21, a22) = m
+    b00 = a11 * a22 - a12 * a21
+    b10 = a12 * a20 - a10 * a22
+    b20 = a10 * a21 - a11 * a20
+    det = a00 * b00 + a01 * b10 + a02 * b20
+    if compute_adjugate:
+      adj = [[b00, a02 * a21 - a01 * a22, a01 * a12 - a02 * a11],
+             [b10, a00 * a22 - a02 * a20, a02 * a10 - a00 * a12],
+             [b20, a01 * a20 - a00 * a21, a00 * a11 - a01 * a10]]
+  elif n == 4:
+    # Laplace expansion along the first two rows: `s` holds the 2x2 minors of
+    # rows 0 and 1, `c` the complementary minors of rows 2 and 3.
+    ((a00, a01, a02, a03), (a10, a11, a12, a13),
+     (a20, a21, a22, a23), (a30, a31, a32, a33)) = m
+    s0 = a00 * a11 - a10 * a01
+    s1 = a00 * a12 - a10 * a02
+    s2 = a00 * a13 - a10 * a03
+    s3 = a01 * a12 - a11 * a02
+    s4 = a01 * a13 - a11 * a03
+    s5 = a02 * a13 - a12 * a03
+    c0 = a20 * a31 - a30 * a21
+    c1 = a20 * a32 - a30 * a22
+    c2 = a20 * a33 - a30 * a23
+    c3 = a21 * a32 - a31 * a22
+    c4 = a21 * a33 - a31 * a23
+    c5 = a22 * a33 - a32 * a23
+    det = s0 * c5 - s1 * c4 + s2 * c3 + s3 * c2 - s4 * c1 + s5 * c0
+    if compute_adjugate:
+      adj = [
+          [a11 * c5 - a12 * c4 + a13 * c3, -a01 * c5 + a02 * c4 - a03 * c3,
+           a31 * s5 - a32 * s4 + a33 * s3, -a21 * s5 + a22 * s4 - a23 * s3],
+          [-a10 * c5 + a12 * c2 - a13 * c1, a00 * c5 - a02 * c2 + a03 * c1,
+           -a30 * s5 + a32 * s2 - a33 * s1, a20 * s5 - a22 * s2 + a23 * s1],
+          [a10 * c4 - a11 * c2 + a13 * c0, -a00 * c4 + a01 * c2 - a03 * c0,
+           a30 * s4 - a31 * s2 + a33 * s0, -a20 * s4 + a21 * s2 - a23 * s0],
+          [-a10 * c3 + a11 * c1 - a12 * c0, a00 * c3 - a01 * c1 + a02 * c0,
+           -a30 * s3 + a31 * s1 - a32 * s0, a20 * s3 - a21 * s1 + a22 * s0]]
+  else:
+    raise ValueError("Closed-form adjugate requires n <= {}, got n={}"
+                     .format(_SMALL_MATRIX_SIZE, n))
+  return (None if adj is None else _stack_matrix(adj)), det
+
+
 @_wraps(onp.linalg.cholesky)
 def cholesky(a):
   warnings.warn(_EXPERIMENTAL_WARNING)
@@ -63,31 +142,19 @@ def svd(a, full_matrices=True, compute_uv=True):
 @_wraps(onp.linalg.slogdet)
 def slogdet(a):
   a = _promote_arg_dtypes(np.asarray(a))
-  dtype = lax._dtype(a)
   a_shape = np.shape(a)
   if len(a_shape) < 2 or a_shape[-1] != a_shape[-2]:
     msg = "Argument to slogdet() must have shape [..., n, n], got {}"
     raise ValueError(msg.format(a_shape))
-  lu, pivot = lax_linalg.lu(a)
-  diag = np.diagonal(lu, axis1=-2, axis2=-1)
-  is_zero = np.any(diag == np.array(0, dtype=dtype), axis=-1)
-  parity = np.count_nonzero(pivot != np.arange(a_shape[-1]), axis=-1)
-  if np.iscomplexobj(a):
-    sign = np.prod(diag / np.abs(diag))
-  else:
-    sign = np.array(1, dtype=dtype)
-    parity = parity + np.count_nonzero(diag < 0)
-  sign = np.where(is_zero,
-                  np.array(0, dtype=dtype),
-                  sign * np.array(-2 * (parity % 2) + 1, dtype=dtype))
-  logdet = np.where(
-      is_zero, np.array(-np.inf, dtype=dtype),
-      np.sum(np.log(np.abs(diag)), axis=-1))
-  return sign, np.real(logdet)
+  return lax_linalg.slogdet(a)
 
 
 @_wraps(onp.linalg.det)
 def det(a):
+  a = _promote_arg_dtypes(np.asarray(a))
+  a_shape = np.shape(a)
+  if len(a_shape) >= 2 and a_shape[-1] == a_shape[-2] and _is_small_matrix(a):
+    return _small_adjugate_and_det(a, compute_adjugate=False)[1]
   sign, logdet = slogdet(a)
   return sign * np.exp(logdet)
 
@@ -113,10 +180,25 @@ def inv(a):
   if np.ndim(a) < 2 or a.shape[-1] != a.shape[-2]:
     raise ValueError("Argument to inv must have shape [..., n, n], got {}."
       .format(np.shape(a)))
+  if _is_small_matrix(a):
+    adj, det = _small_adjugate_and_det(_promote_arg_dtypes(np.asarray(a)))
+    return adj / det[..., None, None]
   q, r = qr(a)
   return lax_linalg.triangular_solve(r, _T(q), lower=False, left_side=True)
 
 
+@_wraps(onp.linalg.matrix_power)
+def matrix_power(a, n):
+  a = np.asarray(a)
+  if np.ndim(a) < 2 or a.shape[-1] != a.shape[-2]:
+    raise ValueError("Argument to matrix_power must have shape [..., n, n], "
+                     "got {}.".format(np.shape(a)))
+  n = operator.index(n)
+  if n < 0:
+    a = _promote_arg_dtypes(a)
+  return lax_linalg.matrix_power(a, n)
+
+
 @_wraps(onp.linalg.norm)
 def norm(x, ord=None, axis=None, keepdims=False):
   x = _promote_arg_dtypes(np.asarray(x))
@@ -215,8 +297,12 @@ def qr(a, mode="reduced"):
   return q, r
 
 
-@_wraps(onp.linalg.solve)
-def solve(a, b):
+def _solve(a, b, sym_pos=False):
+  """Solves `a x = b` for matrix or vector `b` with `lax_linalg.solve`.
+
+  Matrices of size at most `_SMALL_MATRIX_SIZE` are solved with their
+  closed-form adjugate instead.
+  """
   a, b = _promote_arg_dtypes(np.asarray(a), np.asarray(b))
   a_shape = np.shape(a)
   b_shape = np.shape(b)
@@ -227,25 +313,21 @@ def solve(a, b):
     msg = ("The arguments to solve must have shapes a=[..., m, m] and "
            "b=[..., m, k] or b=[..., m]; got a={} and b={}")
     raise ValueError(msg.format(a_shape, b_shape))
-  lu, pivots = lax_linalg.lu(a)
-  dtype = lax._dtype(a)
-
-  # TODO(phawkins): add unit_diagonal support to solve_triangular, use it here
-  # instead of explicit masking of l.
-  m = a_shape[-1]
-  l = np.tril(lu, -1)[:, :m] + np.eye(m, m, dtype=dtype)
 
   # TODO(phawkins): triangular_solve only supports matrices on the RHS, so we
   # add a dummy dimension. Extend it to support vectors and simplify this.
   x = b if a_ndims == b_ndims else b[..., None]
+  if _is_small_matrix(a):
+    adj, det = _small_adjugate_and_det(a)
+    x = np.matmul(adj, x) / det[..., None, None]
+  else:
+    x = lax_linalg.solve(a, x, sym_pos=sym_pos)
+  return x[..., 0] if a_ndims != b_ndims else x
 
-  permutation = lax_linalg.lu_pivots_to_permutation(pivots, m)
-  x = x[..., permutation, :]
-
-  x = lax_linalg.triangular_solve(l, x, left_side=True, lower=True)
-  x = lax_linalg.triangular_solve(lu, x, left_side=True, lower=False)
 
-  return x[..., 0] if a_ndims != b_ndims else x
+@_wraps(onp.linalg.solve)
+def solve(a, b):
+  return _solve(a, b)
 
 
 for func in get_module_functions(onp.linalg):
@@ -14,4 +14,6 @@
 
 from __future__ import absolute_import
 
-from .scatter import index, index_add, index_update
\ No newline at end of file
+from .scatter import (index, index_add, index_max, index_min, index_mul,
+                      index_update, segment_max, segment_mean, segment_min,
+                      segment_prod, segment_sum)
\ No newline at end of file
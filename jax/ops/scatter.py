@@ -33,10 +33,9 @@ def _scatter_update(x, idx, y, scatter_op):
     x[idx] op= y
   except in a pure functional way, with no in-place updating.
 
-  Support NumPy-style basic indexing only, i.e., `idx` must be
-  `None`, an integer, a `slice` object, or ellipses, or a tuple of the above.
-
-  TODO(phawkins): support advanced indexing.
+  Supports NumPy-style basic indexing, i.e., `None`, integers, `slice` objects
+  and ellipses, and advanced indexing by integer arrays and static boolean
+  masks, or a tuple mixing the two. The whole update lowers to a single scatter.
   """
 
   x = np.asarray(x)
@@ -45,19 +44,28 @@ def _scatter_update(x, idx, y, scatter_op):
   y_shape = np.shape(y)
   y = lax.convert_element_type(y, lax._dtype(x))
 
-  if not isinstance(idx, tuple):
-    idx = (idx,)
-
-  # Test for unsupported advanced indexing and report an error.
-  if any(onp.ndim(elt) != 0 for elt in idx):
-    raise NotImplementedError("Unimplemented case for indexed update. Advanced "
-                              "indexing is not yet implemented.")
+  idx = _canonicalize_advanced_index(idx)
 
   # Remove ellipses and add trailing slice(None)s.
   idx = np._canonicalize_tuple_index(x, idx)
 
   _int = lambda aval: not aval.shape and onp.issubdtype(aval.dtype, onp.integer)
 
+  # Integer arrays, and any integers alongside them, are advanced indices. They
+  # broadcast together to `advanced_shape`, which takes the place of the first
+  # of them in the update if they are adjacent, and otherwise leads it.
+  advanced_positions = [k for k, elt in enumerate(idx) if _is_advanced(elt)]
+  if any(onp.ndim(idx[k]) for k in advanced_positions):
+    advanced_shape = lax.broadcast_shapes(
+        *(tuple(np.shape(idx[k])) for k in advanced_positions))
+    contiguous = onp.all(onp.diff(advanced_positions) == 1)
+  else:
+    advanced_positions = []
+    advanced_shape = ()
+    contiguous = True
+  advanced_x_axes = [sum(elt is not None for elt in idx[:k])
+                     for k in advanced_positions]
+
   x_axis = 0
   y_axis = 0  # Current axis in y, before collapsing. See below.
   collapsed_y_axis = 0  # Current axis in y, after collapsing.
@@ -79,13 +87,39 @@ def _scatter_update(x, idx, y, scatter_op):
   # Finally, we reverse reversed_y_dims to handle slices with negative strides.
   reversed_y_dims = []
 
-  for i in idx:
+  def add_advanced_indices(scatter_indices):
+    columns = []
+    for k, axis in zip(advanced_positions, advanced_x_axes):
+      i = np.mod(idx[k], np._constant_like(idx[k], x_shape[axis]))
+      i = lax.convert_element_type(i, np.int32)
+      i = np.broadcast_to(i, advanced_shape)
+      columns.append(lax.reshape(i, advanced_shape + (1,)))
+      inserted_window_dims.append(axis)
+      scatter_dims_to_operand_dims.append(axis)
+    columns = lax.concatenate(columns, len(advanced_shape))
+    return _append_index_columns(scatter_indices, columns)
+
+  if advanced_positions and not contiguous:
+    scatter_indices = add_advanced_indices(scatter_indices)
+    slice_shape.extend(advanced_shape)
+    collapsed_slice_shape.extend(advanced_shape)
+    y_axis = collapsed_y_axis = len(advanced_shape)
+
+  for position, i in enumerate(idx):
     try:
       abstract_i = core.get_aval(i)
     except TypeError:
       abstract_i = None
-    if (isinstance(abstract_i, ConcreteArray) or
-        isinstance(abstract_i, ShapedArray)) and _int(abstract_i):
+    if position in advanced_positions:
+      if contiguous and position == advanced_positions[0]:
+        scatter_indices = add_advanced_indices(scatter_indices)
+        slice_shape.extend(advanced_shape)
+        collapsed_slice_shape.extend(advanced_shape)
+        y_axis += len(advanced_shape)
+        collapsed_y_axis += len(advanced_shape)
+      x_axis += 1
+    elif (isinstance(abstract_i, ConcreteArray) or
+          isinstance(abstract_i, ShapedArray)) and _int(abstract_i):
       i = np.mod(i, np._constant_like(i, x.shape[x_axis]))
       i = lax.convert_element_type(i, np.int32)
       i = np.broadcast_to(i, tuple(scatter_indices.shape[:-1]) + (1,))
@@ -120,18 +154,7 @@ def _scatter_update(x, idx, y, scatter_op):
         size = i.shape[0]
         slice_shape.append(size)
         collapsed_slice_shape.append(size)
-        scatter_indices_shape = tuple(scatter_indices.shape[:-1]) + (size,)
-        i = lax.broadcast_in_dim(
-            i, shape=scatter_indices_shape + (1,),
-            broadcast_dimensions=(len(scatter_indices_shape) - 1,))
-        scatter_indices = lax.broadcast_in_dim(
-            scatter_indices,
-            shape=scatter_indices_shape + (len(scatter_dims_to_operand_dims),),
-            broadcast_dimensions=(
-              tuple(range(len(scatter_indices_shape) - 1)) +
-              (len(scatter_indices_shape),)))
-        scatter_indices = np.concatenate(
-          (scatter_indices, i), len(scatter_indices_shape))
+        scatter_indices = _append_index_columns(scatter_indices, i[:, None])
         scatter_dims_to_operand_dims.append(x_axis)
         inserted_window_dims.append(x_axis)
 
@@ -148,12 +171,69 @@ def _scatter_update(x, idx, y, scatter_op):
 
   dnums = lax.ScatterDimensionNumbers(
     update_window_dims = tuple(update_window_dims),
-    inserted_window_dims = tuple(inserted_window_dims),
+    inserted_window_dims = tuple(sorted(inserted_window_dims)),
     scatter_dims_to_operand_dims = tuple(scatter_dims_to_operand_dims)
   )
   return scatter_op(x, scatter_indices, y, dnums)
 
 
+def _is_advanced(elt):
+  """Returns True if `elt` is an integer array (or scalar) index element."""
+  if elt is None or elt is Ellipsis or isinstance(elt, slice):
+    return False
+  return onp.issubdtype(lax._dtype(elt), onp.integer)
+
+
+def _canonicalize_advanced_index(idx):
+  """Normalizes `idx` to a tuple, expanding static boolean masks to integers.
+
+  Following NumPy (and `x[idx]` in jax.numpy), a list of integers is an array
+  index, while a list containing sequences is treated as a tuple.
+  """
+  if isinstance(idx, list):
+    if any(onp.ndim(elt) or elt is None or elt is Ellipsis
+           or isinstance(elt, slice) for elt in idx):
+      idx = tuple(idx)
+    else:
+      idx = onp.asarray(idx)
+  if not isinstance(idx, tuple):
+    idx = (idx,)
+
+  expanded = []
+  for elt in idx:
+    if isinstance(elt, (list, tuple)):
+      elt = onp.asarray(elt)
+    if (elt is not None and elt is not Ellipsis and not isinstance(elt, slice)
+        and onp.ndim(elt) and onp.issubdtype(lax._dtype(elt), onp.bool_)):
+      if not isinstance(core.get_aval(elt), ConcreteArray):
+        msg = ("Array boolean indices must be static (e.g. no dependence on an "
+               "argument to a jit or vmap function).")
+        raise IndexError(msg)
+      expanded.extend(onp.nonzero(onp.asarray(elt)))
+    else:
+      expanded.append(elt)
+  return tuple(expanded)
+
+
+def _append_index_columns(scatter_indices, columns):
+  """Appends index `columns`, with shape batch + (k,), to `scatter_indices`.
+
+  The batch dimensions of `columns` are added after those of `scatter_indices`,
+  and both are broadcast to the combined batch shape.
+  """
+  old_batch = tuple(scatter_indices.shape[:-1])
+  new_batch = tuple(columns.shape[:-1])
+  batch = old_batch + new_batch
+  num_old, num_new = scatter_indices.shape[-1], columns.shape[-1]
+  scatter_indices = lax.broadcast_in_dim(
+      scatter_indices, batch + (num_old,),
+      tuple(range(len(old_batch))) + (len(batch),))
+  columns = lax.broadcast_in_dim(
+      columns, batch + (num_new,),
+      tuple(range(len(old_batch), len(batch))) + (len(batch),))
+  return lax.concatenate((scatter_indices, columns), len(batch))
+
+
 class _Indexable(object):
   """Helper object for building indexes for indexed update functions.
 
@@ -190,9 +270,10 @@ def index_add(x, idx, y):
 
   Args:
     x: an array.
-    idx: a Numpy-style basic index, consisting of `None`, integers, `slice`
-      objects, ellipses, or a tuple of the above. A convenient syntactic sugar
-      for forming indices is via the :data:`jax.ops.index` object.
+    idx: a Numpy-style index, consisting of `None`, integers, `slice`
+      objects, ellipses, integer arrays, static boolean masks, or a tuple of
+      the above. A convenient syntactic sugar for forming indices is via the
+      :data:`jax.ops.index` object.
     y: the array of updates. `y` must be broadcastable to the shape of the
       array that would be returned by `x[idx]`.
 
@@ -206,9 +287,123 @@ def index_add(x, idx, y):
          [1., 1., 1., 7., 7., 7.],
          [1., 1., 1., 7., 7., 7.],
          [1., 1., 1., 1., 1., 1.]], dtype=float32)
+
+  Integer array indices may repeat, which makes `index_add` a convenient way
+  to accumulate sparse updates:
+
+  >>> jax.ops.index_add(jax.numpy.zeros(4), jax.numpy.array([0, 2, 0]), 1.)
+  array([2., 0., 1., 0.], dtype=float32)
   """
   return _scatter_update(x, idx, y, lax.scatter_add)
 
+def index_mul(x, idx, y):
+  """Pure equivalent of :code:`x[idx] *= y`.
+
+  Returns the value of `x` that would result from the
+  NumPy-style :mod:`indexed assignment <numpy.doc.indexing>`::
+    x[idx] *= y
+
+  Note the `index_mul` operator is pure; `x` itself is
+  not modified, instead the new value that `x` would have taken is returned.
+
+  Unlike the NumPy code :code:`x[idx] *= y`, if multiple indices refer to the
+  same location the updates will be multiplied. (NumPy would only apply the
+  last update, rather than multiplying the updates.) The order in which
+  conflicting updates are applied is implementation-defined and may be
+  nondeterministic (e.g., due to concurrency on some hardware platforms).
+
+  Args:
+    x: an array.
+    idx: a Numpy-style index, consisting of `None`, integers, `slice`
+      objects, ellipses, integer arrays, static boolean masks, or a tuple of
+      the above. A convenient syntactic sugar for forming indices is via the
+      :data:`jax.ops.index` object.
+    y: the array of updates. `y` must be broadcastable to the shape of the
+      array that would be returned by `x[idx]`.
+
+  Returns:
+    An array.
+
+  >>> x = jax.numpy.ones((5, 6))
+  >>> jax.ops.index_mul(x, jax.ops.index[2:4, 3:], 6.)
+  array([[1., 1., 1., 1., 1., 1.],
+         [1., 1., 1., 1., 1., 1.],
+         [1., 1., 1., 6., 6., 6.],
+         [1., 1., 1., 6., 6., 6.],
+         [1., 1., 1., 1., 1., 1.]], dtype=float32)
+  """
+  return _scatter_update(x, idx, y, lax.scatter_mul)
+
+def index_min(x, idx, y):
+  """Pure equivalent of :code:`x[idx] = minimum(x[idx], y)`.
+
+  Returns the value of `x` that would result from the
+  NumPy-style :mod:`indexed assignment <numpy.doc.indexing>`::
+    x[idx] = minimum(x[idx], y)
+
+  Note the `index_min` operator is pure; `x` itself is
+  not modified, instead the new value that `x` would have taken is returned.
+
+  If multiple indices refer to the same location the result is the minimum
+  over all of the updates, as with :code:`numpy.minimum.at`.
+
+  Args:
+    x: an array.
+    idx: a Numpy-style index, consisting of `None`, integers, `slice`
+      objects, ellipses, integer arrays, static boolean masks, or a tuple of
+      the above. A convenient syntactic sugar for forming indices is via the
+      :data:`jax.ops.index` object.
+    y: the array of updates. `y` must be broadcastable to the shape of the
+      array that would be returned by `x[idx]`.
+
+  Returns:
+    An array.
+
+  >>> x = jax.numpy.ones((5, 6))
+  >>> jax.ops.index_min(x, jax.ops.index[2:4, 3:], 0.)
+  array([[1., 1., 1., 1., 1., 1.],
+         [1., 1., 1., 1., 1., 1.],
+         [1., 1., 1., 0., 0., 0.],
+         [1., 1., 1., 0., 0., 0.],
+         [1., 1., 1., 1., 1., 1.]], dtype=float32)
+  """
+  return _scatter_update(x, idx, y, lax.scatter_min)
+
+def index_max(x, idx, y):
+  """Pure equivalent of :code:`x[idx] = maximum(x[idx], y)`.
+
+  Returns the value of `x` that would result from the
+  NumPy-style :mod:`indexed assignment <numpy.doc.indexing>`::
+    x[idx] = maximum(x[idx], y)
+
+  Note the `index_max` operator is pure; `x` itself is
+  not modified, instead the new value that `x` would have taken is returned.
+
+  If multiple indices refer to the same location the result is the maximum
+  over all of the updates, as with :code:`numpy.maximum.at`.
+
+  Args:
+    x: an array.
+    idx: a Numpy-style index, consisting of `None`, integers, `slice`
+      objects, ellipses, integer arrays, static boolean masks, or a tuple of
+      the above. A convenient syntactic sugar for forming indices is via the
+      :data:`jax.ops.index` object.
+    y: the array of updates. `y` must be broadcastable to the shape of the
+      array that would be returned by `x[idx]`.
+
+  Returns:
+    An array.
+
+  >>> x = jax.numpy.ones((5, 6))
+  >>> jax.ops.index_max(x, jax.ops.index[2:4, 3:], 6.)
+  array([[1., 1., 1., 1., 1., 1.],
+         [1., 1., 1., 1., 1., 1.],
+         [1., 1., 1., 6., 6., 6.],
+         [1., 1., 1., 6., 6., 6.],
+         [1., 1., 1., 1., 1., 1.]], dtype=float32)
+  """
+  return _scatter_update(x, idx, y, lax.scatter_max)
+
 def index_update(x, idx, y):
   """Pure equivalent of :code:`x[idx] = y`.
 
@@ -226,9 +421,10 @@ def index_update(x, idx, y):
 
   Args:
     x: an array.
-    idx: a Numpy-style basic index, consisting of `None`, integers, `slice`
-      objects, ellipses, or a tuple of the above. A convenient syntactic sugar
-      for forming indices is via the :data:`jax.ops.index` object.
+    idx: a Numpy-style index, consisting of `None`, integers, `slice`
+      objects, ellipses, integer arrays, static boolean masks, or a tuple of
+      the above. A convenient syntactic sugar for forming indices is via the
+      :data:`jax.ops.index` object.
     y: the array of updates. `y` must be broadcastable to the shape of the
       array that would be returned by `x[idx]`.
 
@@ -244,3 +440,235 @@ def index_update(x, idx, y):
          [1., 1., 1., 6., 6., 6.]], dtype=float32)
   """
   return _scatter_update(x, idx, y, lax.scatter)
+
+
+def _segment_update(name, data, segment_ids, scatter_op, num_segments,
+                    indices_are_sorted, identity):
+  """Helper for segment reductions.
+
+  Scatters each element of `data` into the output row given by its segment id,
+  combining elements with `scatter_op`. Rows start out as `identity`.
+  """
+  data = np.asarray(data)
+  segment_ids = np.asarray(segment_ids)
+  if not onp.issubdtype(lax._dtype(segment_ids), onp.integer):
+    msg = "{} segment_ids must be integers, got dtype {}."
+    raise TypeError(msg.format(name, lax._dtype(segment_ids)))
+  if np.shape(segment_ids) != np.shape(data)[:np.ndim(segment_ids)]:
+    msg = ("{} segment_ids shape must be a prefix of the data shape, got "
+           "segment_ids shape {} and data shape {}.")
+    raise ValueError(msg.format(name, np.shape(segment_ids), np.shape(data)))
+  num_segments = _num_segments(name, segment_ids, num_segments,
+                               indices_are_sorted)
+
+  out = np.full((num_segments,) + np.shape(data)[np.ndim(segment_ids):],
+                identity, dtype=lax._dtype(data))
+  segment_ids = lax.convert_element_type(segment_ids, np.int32)
+  scatter_indices = lax.reshape(segment_ids, np.shape(segment_ids) + (1,))
+  dnums = lax.ScatterDimensionNumbers(
+    update_window_dims=tuple(range(np.ndim(segment_ids), np.ndim(data))),
+    inserted_window_dims=(0,),
+    scatter_dims_to_operand_dims=(0,))
+  return scatter_op(out, scatter_indices, data, dnums)
+
+
+def _num_segments(name, segment_ids, num_segments, indices_are_sorted):
+  """Returns the static number of segments, inferring it from concrete ids."""
+  if num_segments is not None:
+    return int(num_segments)
+  if not isinstance(core.get_aval(segment_ids), ConcreteArray):
+    msg = ("{} requires a static num_segments when segment_ids is traced "
+           "(e.g. under jit or vmap).")
+    raise ValueError(msg.format(name))
+  segment_ids = onp.asarray(segment_ids)
+  if not segment_ids.size:
+    return 0
+  last = segment_ids.ravel()[-1] if indices_are_sorted else segment_ids.max()
+  return int(last) + 1
+
+
+def _segment_counts(segment_ids, num_segments, indices_are_sorted):
+  """Returns the number of elements in each of the segments."""
+  segment_ids = lax.convert_element_type(np.ravel(segment_ids), np.int32)
+  if indices_are_sorted:
+    # Each segment is a contiguous run of the ids, whose ends we find with a
+    # binary search in O(num_segments * log(n)) rather than scattering n ones.
+    last_ids = lax.sub(lax.iota(np.int32, num_segments + 1), np.int32(1))
+    ends = np._searchsorted(segment_ids, last_ids)
+    return lax.sub(ends[1:], ends[:-1])
+  ones = lax.full_like(segment_ids, 1)
+  return segment_sum(ones, segment_ids, num_segments)
+
+
+def segment_sum(data, segment_ids, num_segments=None,
+                indices_are_sorted=False):
+  """Computes the sum within segments of an array.
+
+  Similar to TensorFlow's `segment_sum
+  <https://www.tensorflow.org/api_docs/python/tf/math/segment_sum>`_, lowered
+  to a single `lax.scatter_add`, so it costs O(n) rather than the O(n *
+  num_segments) of a one-hot matrix product.
+
+  Args:
+    data: an array with the values to be summed.
+    segment_ids: an array of integers indicating the segments of `data` (along
+      its leading axes) to be summed. Its shape must be a prefix of the shape
+      of `data`. Values outside of the range [0, num_segments) are dropped and
+      do not contribute to the sum.
+    num_segments: optional, a static int with the number of segments. If it
+      is not given, it is computed as ``max(segment_ids) + 1``, which requires
+      `segment_ids` to be concrete, i.e. not traced by `jit` or `vmap`.
+    indices_are_sorted: whether `segment_ids` is known to be sorted.
+
+  Returns:
+    An array with shape :code:`(num_segments,) + data.shape[segment_ids.ndim:]`
+    representing the segment sums.
+
+  >>> jax.ops.segment_sum(jax.numpy.arange(5), jax.numpy.array([0, 0, 1, 1, 2]))
+  array([1, 5, 4], dtype=int32)
+  """
+  return _segment_update("segment_sum", data, segment_ids, lax.scatter_add,
+                         num_segments, indices_are_sorted, 0)
+
+
+def segment_prod(data, segment_ids, num_segments=None,
+                 indices_are_sorted=False):
+  """Computes the product within segments of an array.
+
+  Similar to TensorFlow's `segment_prod
+  <https://www.tensorflow.org/api_docs/python/tf/math/segment_prod>`_, lowered
+  to a single `lax.scatter_mul`. Empty segments have product 1. Gradients are
+  finite for segments containing zeros: the gradient with respect to an element
+  is the product of the other elements of its segment.
+
+  Args:
+    data: an array with the values to be multiplied.
+    segment_ids: an array of integers indicating the segments of `data` (along
+      its leading axes) to be multiplied. Its shape must be a prefix of the
+      shape of `data`. Values outside of the range [0, num_segments) are
+      dropped.
+    num_segments: optional, a static int with the number of segments. If it
+      is not given, it is computed as ``max(segment_ids) + 1``, which requires
+      `segment_ids` to be concrete.
+    indices_are_sorted: whether `segment_ids` is known to be sorted.
+
+  Returns:
+    An array with shape :code:`(num_segments,) + data.shape[segment_ids.ndim:]`
+    representing the segment products.
+  """
+  return _segment_update("segment_prod", data, segment_ids, lax.scatter_mul,
+                         num_segments, indices_are_sorted, 1)
+
+
+def segment_max(data, segment_ids, num_segments=None,
+                indices_are_sorted=False):
+  """Computes the maximum within segments of an array.
+
+  Similar to TensorFlow's `segment_max
+  <https://www.tensorflow.org/api_docs/python/tf/math/segment_max>`_, lowered
+  to a single `lax.scatter_max`. Empty segments hold the lowest value of the
+  dtype (`-inf` for floating point types). Gradients are split evenly between
+  tied maximal elements.
+
+  Args:
+    data: an array with the values to be reduced.
+    segment_ids: an array of integers indicating the segments of `data` (along
+      its leading axes) to be reduced. Its shape must be a prefix of the shape
+      of `data`. Values outside of the range [0, num_segments) are dropped.
+    num_segments: optional, a static int with the number of segments. If it
+      is not given, it is computed as ``max(segment_ids) + 1``, which requires
+      `segment_ids` to be concrete.
+    indices_are_sorted: whether `segment_ids` is known to be sorted.
+
+  Returns:
+    An array with shape :code:`(num_segments,) + data.shape[segment_ids.ndim:]`
+    representing the segment maxima.
+  """
+  identity = _lowest(lax._dtype(np.asarray(data)))
+  return _segment_update("segment_max", data, segment_ids, lax.scatter_max,
+                         num_segments, indices_are_sorted, identity)
+
+
+def segment_min(data, segment_ids, num_segments=None,
+                indices_are_sorted=False):
+  """Computes the minimum within segments of an array.
+
+  Similar to TensorFlow's `segment_min
+  <https://www.tensorflow.org/api_docs/python/tf/math/segment_min>`_, lowered
+  to a single `lax.scatter_min`. Empty segments hold the highest value of the
+  dtype (`inf` for floating point types). Gradients are split evenly between
+  tied minimal elements.
+
+  Args:
+    data: an array with the values to be reduced.
+    segment_ids: an array of integers indicating the segments of `data` (along
+      its leading axes) to be reduced. Its shape must be a prefix of the shape
+      of `data`. Values outside of the range [0, num_segments) are dropped.
+    num_segments: optional, a static int with the number of segments. If it
+      is not given, it is computed as ``max(segment_ids) + 1``, which requires
+      `segment_ids` to be concrete.
+    indices_are_sorted: whether `segment_ids` is known to be sorted.
+
+  Returns:
+    An array with shape :code:`(num_segments,) + data.shape[segment_ids.ndim:]`
+    representing the segment minima.
+  """
+  identity = _highest(lax._dtype(np.asarray(data)))
+  return _segment_update("segment_min", data, segment_ids, lax.scatter_min,
+                         num_segments, indices_are_sorted, identity)
+
+
+def segment_mean(data, segment_ids, num_segments=None,
+                 indices_are_sorted=False):
+  """Computes the mean within segments of an array.
+
+  Similar to TensorFlow's `segment_mean
+  <https://www.tensorflow.org/api_docs/python/tf/math/segment_mean>`_. Empty
+  segments have mean 0. When `indices_are_sorted` is set, the segment sizes are
+  found by binary search over the ids rather than by a second scatter.
+
+  Args:
+    data: an array with the values to be averaged.
+    segment_ids: an array of integers indicating the segments of `data` (along
+      its leading axes) to be averaged. Its shape must be a prefix of the shape
+      of `data`. Values outside of the range [0, num_segments) are dropped.
+    num_segments: optional, a static int with the number of segments. If it
+      is not given, it is computed as ``max(segment_ids) + 1``, which requires
+      `segment_ids` to be concrete.
+    indices_are_sorted: whether `segment_ids` is known to be sorted. If set,
+      the ids must be sorted in increasing order, otherwise results are
+      undefined.
+
+  Returns:
+    An array with shape :code:`(num_segments,) + data.shape[segment_ids.ndim:]`
+    representing the segment means.
+  """
+  data = np.asarray(data)
+  segment_ids = np.asarray(segment_ids)
+  num_segments = _num_segments("segment_mean", segment_ids, num_segments,
+                               indices_are_sorted)
+  sums = segment_sum(data, segment_ids, num_segments, indices_are_sorted)
+  counts = _segment_counts(segment_ids, num_segments, indices_are_sorted)
+  counts = lax.reshape(counts, (num_segments,) + (1,) * (np.ndim(sums) - 1))
+  counts = np.maximum(counts, 1)
+  if onp.issubdtype(lax._dtype(sums), onp.inexact):
+    counts = lax.convert_element_type(counts, lax._dtype(sums))
+  return np.true_divide(sums, counts)
+
+
+def _lowest(dtype):
+  if onp.issubdtype(dtype, onp.floating):
+    return -onp.inf
+  elif onp.issubdtype(dtype, onp.integer):
+    return onp.iinfo(dtype).min
+  else:
+    return False
+
+
+def _highest(dtype):
+  if onp.issubdtype(dtype, onp.floating):
+    return onp.inf
+  elif onp.issubdtype(dtype, onp.integer):
+    return onp.iinfo(dtype).max
+  else:
+    return True
@@ -24,19 +24,31 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
-from functools import partial
+import os
+from functools import partial, wraps
 
 import numpy as onp
 
 from . import lax
+from . import lax_linalg
 from . import numpy as np
 from . import tree_util
-from .api import jit
+from .api import custom_transforms, jit, vmap
+from .interpreters import ad
+from .interpreters import batching
 from .numpy.lax_numpy import _constant_like
+from .config import flags
 from jax.lib import xla_bridge
 from jax import core
 
 
+FLAGS = flags.FLAGS
+flags.DEFINE_string(
+    'jax_prng_impl', os.getenv('JAX_PRNG_IMPL', 'threefry2x32'),
+    'Name of the counter-based PRNG used by jax.random, either "threefry2x32" '
+    'or the cheaper reduced-round "threefry2x32_13".')
+
+
 def PRNGKey(seed):
   """Create a pseudo-random number generator (PRNG) key given an integer seed.
 
@@ -82,6 +94,21 @@ def _make_rotate_left(dtype):
   return _rotate_left
 
 
+def _batch_keys(fun):
+  """Lets `fun(key, ...)` also accept an array of keys with shape (N, 2).
+
+  Given a batch of keys, `fun` is vmapped over them, so that its results for
+  each key are stacked along a new leading axis of size N. Because `fun` is
+  jitted, this compiles to one computation over all N keys rather than N.
+  """
+  @wraps(fun)
+  def batched_fun(key, *args, **kwargs):
+    if onp.ndim(key) == 2:
+      return vmap(lambda key: fun(key, *args, **kwargs))(key)
+    return fun(key, *args, **kwargs)
+  return batched_fun
+
+
 def _bit_stats(bits):
   """This is a debugging function to compute the statistics of bit fields."""
   return onp.array([list(map(int, onp.binary_repr(x, 64))) for x in bits]).mean(0)
@@ -101,6 +128,28 @@ def threefry_2x32(keypair, count):
   Returns:
     An array of dtype uint32 with the same shape as `count`.
   """
+  return _threefry_2x32(keypair, count, 20)
+
+
+@jit
+def threefry_2x32_13(keypair, count):
+  """Apply the Threefry 2x32 hash reduced to 13 rounds.
+
+  This is the cheapest variant that Salmon et al. (2011) found to pass the
+  BigCrush statistical test suite, and costs about two thirds as much as the
+  20-round `threefry_2x32`.
+
+  Args:
+    keypair: a pair of 32bit unsigned integers used for the key.
+    count: an array of dtype uint32 used for the counts.
+
+  Returns:
+    An array of dtype uint32 with the same shape as `count`.
+  """
+  return _threefry_2x32(keypair, count, 13)
+
+
+def _threefry_2x32(keypair, count, num_rounds):
   # Based on ThreeFry2x32 by phawkins@ in //.../xla/client/lib/prng.cc
   key1, key2 = keypair
   if not lax._dtype(key1) == lax._dtype(key2) == lax._dtype(count) == onp.uint32:
@@ -128,66 +177,111 @@ def threefry_2x32(keypair, count):
   x[0] = x[0] + ks[0]
   x[1] = x[1] + ks[1]
 
-  for r in rotations[:4]:
-    x = apply_round(x, r)
-  x[0] = x[0] + ks[1]
-  x[1] = x[1] + ks[2] + onp.uint32(1)
+  # The key is injected after every four rounds, cycling through the schedule.
+  for i in range(num_rounds):
+    x = apply_round(x, rotations[i % 8])
+    if i % 4 == 3:
+      j = i // 4 + 1
+      x[0] = x[0] + ks[j % 3]
+      x[1] = x[1] + ks[(j + 1) % 3] + onp.uint32(j)
 
-  for r in rotations[4:]:
-    x = apply_round(x, r)
-  x[0] = x[0] + ks[2]
-  x[1] = x[1] + ks[0] + onp.uint32(2)
+  out = np.concatenate(x)
+  assert out.dtype == onp.uint32
+  return lax.reshape(out[:-1] if odd_size else out, count.shape)
 
-  for r in rotations[:4]:
-    x = apply_round(x, r)
-  x[0] = x[0] + ks[0]
-  x[1] = x[1] + ks[1] + onp.uint32(3)
 
-  for r in rotations[4:]:
-    x = apply_round(x, r)
-  x[0] = x[0] + ks[1]
-  x[1] = x[1] + ks[2] + onp.uint32(4)
+_prng_impls = {}
 
-  for r in rotations[:4]:
-    x = apply_round(x, r)
-  x[0] = x[0] + ks[2]
-  x[1] = x[1] + ks[0] + onp.uint32(5)
+def register_prng_impl(name, hash_fun):
+  """Registers a counter-based PRNG for use by the functions in this module.
 
-  out = np.concatenate(x)
-  assert out.dtype == onp.uint32
-  return lax.reshape(out[:-1] if odd_size else out, count.shape)
+  The implementation used by `split`, `fold_in` and all samplers is chosen by
+  name with the `jax_prng_impl` config option (or the JAX_PRNG_IMPL environment
+  variable), which must be set before any of them are traced. Keys are plain
+  uint32 arrays and carry no record of the implementation that made them.
+
+  Args:
+    name: a string used to select the implementation.
+    hash_fun: a function `hash_fun(keypair, count)` that takes a PRNG key (an
+      array with shape (2,) and dtype uint32) and an array of uint32 counts and
+      returns uint32 random bits with the same shape as the counts.
+  """
+  _prng_impls[name] = hash_fun
 
+register_prng_impl("threefry2x32", threefry_2x32)
+register_prng_impl("threefry2x32_13", threefry_2x32_13)
 
+
+def _hash(keypair, count):
+  """Hashes `count` under `keypair` with the configured PRNG implementation."""
+  try:
+    hash_fun = _prng_impls[FLAGS.jax_prng_impl]
+  except KeyError:
+    msg = "Unknown PRNG implementation {}, expected one of {}."
+    raise ValueError(msg.format(FLAGS.jax_prng_impl, sorted(_prng_impls)))
+  return hash_fun(keypair, count)
+
+
+@_batch_keys
 @partial(jit, static_argnums=(1,))
 def split(key, num=2):
   """Splits a PRNG key into `num` new keys by adding a leading axis.
 
   Args:
-    key: a PRNGKey (an array with shape (2,) and dtype uint32).
+    key: a PRNGKey (an array with shape (2,) and dtype uint32), or an array of
+      N keys with shape (N, 2).
     num: optional, a positive integer indicating the number of keys to produce
       (default 2).
 
   Returns:
-    An array with shape (num, 2) and dtype uint32 representing `num` new keys.
+    An array with shape (num, 2) and dtype uint32 representing `num` new keys,
+    or with shape (N, num, 2) when splitting N keys.
   """
   counts = lax.tie_in(key, lax.iota(onp.uint32, num * 2))
-  return lax.reshape(threefry_2x32(key, counts), (num, 2))
+  return lax.reshape(_hash(key, counts), (num, 2))
 
 
-@partial(jit, static_argnums=(1,))
 def fold_in(key, data):
   """Folds in data to a PRNG key to form a new PRNG key.
 
   Args:
-    key: a PRNGKey (an array with shape (2,) and dtype uint32).
-    data: an integer representing data to be folded in to the key.
+    key: a PRNGKey (an array with shape (2,) and dtype uint32), or an array of
+      N keys with shape (N, 2).
+    data: an integer representing data to be folded in to the key, or an array
+      of N integers to fold in to the key (or to the corresponding keys).
 
   Returns:
     A new PRNGKey that is a deterministic function of the inputs and is
-    statistically safe for producing a stream of new pseudo-random values.
+    statistically safe for producing a stream of new pseudo-random values. If
+    either input is batched, an array of N such keys with shape (N, 2).
   """
+  if onp.ndim(key) == 1 and isinstance(data, (int, onp.integer)):
+    return _fold_in(key, data)
+  return _fold_in_batched(key, data)
+
+
+@partial(jit, static_argnums=(1,))
+def _fold_in(key, data):
   key2 = lax.tie_in(key, PRNGKey(data))
-  return threefry_2x32(key, key2)
+  return _hash(key, key2)
+
+
+@jit
+def _fold_in_batched(key, data):
+  if onp.ndim(key) not in (1, 2) or onp.ndim(data) not in (0, 1):
+    msg = "fold_in got key and data with shapes {} and {}."
+    raise TypeError(msg.format(onp.shape(key), onp.shape(data)))
+  if onp.ndim(key) == 1 and onp.ndim(data) == 0:
+    return _hash(key, PRNGKey(data))
+  in_axes = (0 if onp.ndim(key) == 2 else None,
+             0 if onp.ndim(data) == 1 else None)
+  return vmap(lambda k, d: _hash(k, PRNGKey(d)), in_axes)(key, data)
+
+
+# The number of 32-bit counters hashed under a single key. Requests for more
+# bits than this are served from a sequence of subkeys split off the original
+# key, each of which hashes (at most) one block of counters.
+_MAX_BLOCK_COUNT = int(onp.iinfo(onp.uint32).max)
 
 
 def _random_bits(key, bit_width, shape):
@@ -196,13 +290,24 @@ def _random_bits(key, bit_width, shape):
     raise TypeError("_random_bits got invalid prng key.")
   if bit_width not in (32, 64):
     raise TypeError("requires 32- or 64-bit field width.")
-  max_count = (bit_width // 32) * onp.prod(shape)
-  if max_count >= onp.iinfo(onp.uint32).max:
-    # TODO(mattjj): just split the key here
-    raise TypeError("requesting more random bits than a single call provides.")
+  max_count = (bit_width // 32) * int(onp.prod(shape))
+
+  nblocks, rem = divmod(max_count, _MAX_BLOCK_COUNT)
+  if not nblocks:
+    counts = lax.tie_in(key, lax.iota(onp.uint32, rem))
+    bits = _hash(key, counts)
+  else:
+    # All full blocks share one counter array and are hashed in a single
+    # batched computation; only the trailing partial block gets its own.
+    keys = split(key, nblocks + 1)
+    subkeys, last_key = keys[:-1], keys[-1]
+    counts = lax.tie_in(key, lax.iota(onp.uint32, _MAX_BLOCK_COUNT))
+    blocks = vmap(_hash, in_axes=(0, None))(subkeys, counts)
+    bits = lax.reshape(blocks, (nblocks * _MAX_BLOCK_COUNT,))
+    if rem:
+      counts = lax.tie_in(key, lax.iota(onp.uint32, rem))
+      bits = lax.concatenate([bits, _hash(last_key, counts)], 0)
 
-  counts = lax.tie_in(key, lax.iota(onp.uint32, max_count))
-  bits = threefry_2x32(key, counts)
   if bit_width == 64:
     bits = [lax.convert_element_type(x, onp.uint64) for x in np.split(bits, 2)]
     bits = (bits[0] << onp.uint64(32)) | bits[1]
@@ -212,12 +317,14 @@ def _random_bits(key, bit_width, shape):
 ### random samplers
 
 
+@_batch_keys
 @partial(jit, static_argnums=(1, 2))
 def uniform(key, shape, dtype=onp.float32, minval=0., maxval=1.):
   """Sample uniform random values in [minval, maxval) with given shape/dtype.
 
   Args:
-    key: a PRNGKey used as the random key.
+    key: a PRNGKey used as the random key, or an array of N keys with shape
+      (N, 2) to draw N independent results stacked along a new leading axis.
     shape: a tuple of nonnegative integers representing the shape.
     dtype: optional, a float dtype for the returned values (default float32).
     minval: optional, a minimum (inclusive) value for the range (default 0).
@@ -253,12 +360,14 @@ def uniform(key, shape, dtype=onp.float32, minval=0., maxval=1.):
       lax.reshape(floats * (maxval - minval) + minval, shape))
 
 
+@_batch_keys
 @partial(jit, static_argnums=(1, 4))
 def randint(key, shape, minval, maxval, dtype=onp.int32):
   """Sample uniform random values in [minval, maxval) with given shape/dtype.
 
   Args:
-    key: a PRNGKey used as the random key.
+    key: a PRNGKey used as the random key, or an array of N keys with shape
+      (N, 2) to draw N independent results stacked along a new leading axis.
     shape: a tuple of nonnegative integers representing the shape.
     minval: optional, a minimum (inclusive) value for the range (default 0).
     maxval: optional, a maximum (exclusive) value for the range (default 1).
@@ -306,12 +415,14 @@ def randint(key, shape, minval, maxval, dtype=onp.int32):
   return lax.add(minval, lax.convert_element_type(random_offset, dtype))
 
 
+@_batch_keys
 @partial(jit, static_argnums=(2,))
 def shuffle(key, x, axis=0):
   """Shuffle the elements of an array uniformly at random along an axis.
 
   Args:
-    key: a PRNGKey used as the random key.
+    key: a PRNGKey used as the random key, or an array of N keys with shape
+      (N, 2) to draw N independent results stacked along a new leading axis.
     x: the array to be shuffled.
     axis: optional, an int axis along which to shuffle (default 0).
 
@@ -344,12 +455,132 @@ def shuffle(key, x, axis=0):
   return x
 
 
+@_batch_keys
+def permutation(key, x):
+  """Returns a randomly permuted array or range.
+
+  Args:
+    key: a PRNGKey used as the random key, or an array of N keys with shape
+      (N, 2) to draw N independent results stacked along a new leading axis.
+    x: an int n, to permute `arange(n)`, or an array to permute along its
+      leading axis.
+
+  Returns:
+    A permuted copy of `arange(x)` or of `x`.
+  """
+  if not onp.ndim(x):
+    return _permutation_indices(key, n=int(x))
+  return _permute(key, x)
+
+
+# The static arguments of the jitted helpers below are passed by keyword, so
+# that calls with equal (rather than identical) ints share a compilation.
+@jit
+def _permutation_indices(key, n):
+  # Shuffling the indices, rather than the array itself, means the sorts move
+  # only int32 values and the rows of `x` are gathered once at the end.
+  return shuffle(key, lax.tie_in(key, lax.iota(onp.int32, n)))
+
+
+@jit
+def _permute(key, x):
+  return np.take(x, _permutation_indices(key, n=x.shape[0]), axis=0)
+
+
+@_batch_keys
+def choice(key, a, shape=(), replace=True, p=None):
+  """Generates a random sample from a given 1-D array or range.
+
+  Args:
+    key: a PRNGKey used as the random key, or an array of N keys with shape
+      (N, 2) to draw N independent results stacked along a new leading axis.
+    a: a 1-D array to sample from, or an int n to sample from `arange(n)`.
+    shape: optional, a tuple of nonnegative integers representing the shape of
+      the sample (default scalar).
+    replace: optional, a boolean indicating whether to sample with replacement
+      (default True).
+    p: optional, an array of the probabilities associated with each entry of
+      `a`, which need not be normalized (default uniform).
+
+  Returns:
+    An array of the given shape of samples drawn from `a`.
+  """
+  if not onp.ndim(a):
+    n, a = int(a), None
+  elif onp.ndim(a) == 1:
+    n = onp.shape(a)[0]
+  else:
+    raise ValueError("choice requires a 1-D array or an int, got shape {}."
+                     .format(onp.shape(a)))
+  shape = tuple(shape) if onp.ndim(shape) else (shape,) if shape else ()
+  if p is not None and onp.shape(p) != (n,):
+    msg = "choice requires p to have shape {}, got {}."
+    raise ValueError(msg.format((n,), onp.shape(p)))
+  if not replace and int(onp.prod(shape)) > n:
+    msg = "choice cannot draw {} samples without replacement from {} entries."
+    raise ValueError(msg.format(int(onp.prod(shape)), n))
+  return _choice(key, a, p, n=n, shape=shape, replace=replace)
+
+
+@jit
+def _choice(key, a, p, n, shape, replace):
+  num = int(onp.prod(shape))
+  if replace and p is None:
+    idx = randint(key, (num,), 0, n)
+  elif replace:
+    # Inverse transform sampling by binary search on the (unnormalized) CDF.
+    cdf = np.cumsum(p)
+    u = uniform(key, (num,), lax._dtype(cdf)) * cdf[-1]
+    idx = lax.min(np._searchsorted(cdf, u), lax.tie_in(u, onp.int32(n - 1)))
+  elif p is None:
+    idx = _permutation_indices(key, n=n)[:num]
+  else:
+    # The Gumbel-top-k trick: the indices of the k largest perturbed logits
+    # are distributed as k successive draws without replacement.
+    perturbed = np.log(p) + gumbel(key, (n,), lax._dtype(p))
+    iota = lax.tie_in(perturbed, lax.iota(onp.int32, n))
+    _, idx = lax.sort_key_val(lax.neg(perturbed), iota)
+    idx = idx[:num]
+  idx = lax.reshape(idx, shape)
+  return idx if a is None else np.take(a, idx, axis=0)
+
+
+@_batch_keys
+@partial(jit, static_argnums=(2, 3))
+def categorical(key, logits, axis=-1, shape=None):
+  """Sample random values from categorical distributions.
+
+  Args:
+    key: a PRNGKey used as the random key, or an array of N keys with shape
+      (N, 2) to draw N independent results stacked along a new leading axis.
+    logits: an array of unnormalized log probabilities of the categories.
+    axis: optional, the axis of `logits` indexing the categories (default -1).
+    shape: optional, a tuple of nonnegative integers representing the result
+      shape, which must be broadcast-compatible with the shape of `logits`
+      without `axis` (default that shape).
+
+  Returns:
+    A random array of int32 category indices with the given shape.
+  """
+  logits = np.moveaxis(logits, axis, -1)
+  shape = logits.shape[:-1] if shape is None else tuple(shape)
+  dtype = lax._dtype(logits)
+  if not onp.issubdtype(dtype, onp.floating):
+    dtype = xla_bridge.canonicalize_dtype(onp.float32)
+    logits = lax.convert_element_type(logits, dtype)
+  noise = gumbel(key, shape + logits.shape[-1:], dtype)
+  return lax.convert_element_type(np.argmax(logits + noise, axis=-1),
+                                  onp.int32)
+
+
+@_batch_keys
 @partial(jit, static_argnums=(1, 2))
 def normal(key, shape, dtype=onp.float32):
   """Sample standard normal random values with given shape and float dtype.
 
   Args:
-    key: a PRNGKey used as the random key.
+    key: a PRNGKey used as the random key, or an array of N keys with shape
+      (N, 2) to draw N independent results stacked along a new leading axis.
     shape: a tuple of nonnegative integers representing the shape.
     dtype: optional, a float dtype for the returned values (default float32).
 
@@ -362,12 +593,14 @@ def normal(key, shape, dtype=onp.float32):
   return onp.array(onp.sqrt(2), dtype) * lax.erf_inv(u)
 
 
+@_batch_keys
 @partial(jit, static_argnums=(2,))
 def bernoulli(key, mean=onp.float32(0.5), shape=()):
   """Sample Bernoulli random values with given shape and mean.
 
   Args:
-    key: a PRNGKey used as the random key.
+    key: a PRNGKey used as the random key, or an array of N keys with shape
+      (N, 2) to draw N independent results stacked along a new leading axis.
     mean: optional, an array-like broadcastable to `shape` for the mean of the
       random variables (default 0.5).
     shape: optional, a tuple of nonnegative integers representing the shape
@@ -384,12 +617,14 @@ def bernoulli(key, mean=onp.float32(0.5), shape=()):
   return lax.lt(uniform(key, shape), mean)
 
 
+@_batch_keys
 @partial(jit, static_argnums=(1, 2))
 def cauchy(key, shape=(), dtype=onp.float32):
   """Sample Cauchy random values with given shape and float dtype.
 
   Args:
-    key: a PRNGKey used as the random key.
+    key: a PRNGKey used as the random key, or an array of N keys with shape
+      (N, 2) to draw N independent results stacked along a new leading axis.
     shape: optional, a tuple of nonnegative integers representing the shape
       (default scalar).
     dtype: optional, a float dtype for the returned values (default float32).
@@ -402,12 +637,14 @@ def cauchy(key, shape=(), dtype=onp.float32):
   return lax.tan(lax.mul(pi, lax.sub(u, _constant_like(u, 0.5))))
 
 
+@_batch_keys
 @partial(jit, static_argnums=(1, 2))
 def exponential(key, shape=(), dtype=onp.float32):
   """Sample Exponential random values with given shape and float dtype.
 
   Args:
-    key: a PRNGKey used as the random key.
+    key: a PRNGKey used as the random key, or an array of N keys with shape
+      (N, 2) to draw N independent results stacked along a new leading axis.
     shape: optional, a tuple of nonnegative integers representing the shape
       (default scalar).
     dtype: optional, a float dtype for the returned values (default float32).
@@ -420,12 +657,14 @@ def exponential(key, shape=(), dtype=onp.float32):
   return lax.neg(lax.log(lax.sub(_constant_like(u, 1), u)))
 
 
+@_batch_keys
 @partial(jit, static_argnums=(1, 2))
 def laplace(key, shape=(), dtype=onp.float32):
   """Sample Laplace random values with given shape and float dtype.
 
   Args:
-    key: a PRNGKey used as the random key.
+    key: a PRNGKey used as the random key, or an array of N keys with shape
+      (N, 2) to draw N independent results stacked along a new leading axis.
     shape: optional, a tuple of nonnegative integers representing the shape
       (default scalar).
     dtype: optional, a float dtype for the returned values (default float32).
@@ -437,12 +676,14 @@ def laplace(key, shape=(), dtype=onp.float32):
   return lax.mul(lax.sign(u), lax.log1p(lax.neg(lax.abs(u))))
 
 
+@_batch_keys
 @partial(jit, static_argnums=(2, 3))
 def pareto(key, b, shape=(), dtype=onp.float32):
   """Sample Pareto random values with given shape and float dtype.
 
   Args:
-    key: a PRNGKey used as the random key.
+    key: a PRNGKey used as the random key, or an array of N keys with shape
+      (N, 2) to draw N independent results stacked along a new leading axis.
     b: an array-like broadcastable to `shape` and used as the shape parameter
       of the random variables.
     shape: optional, a tuple of nonnegative integers representing the shape
@@ -460,12 +701,14 @@ def pareto(key, b, shape=(), dtype=onp.float32):
   return lax.exp(lax.div(e, b))
 
 
+@_batch_keys
 @partial(jit, static_argnums=(1, 2))
 def gumbel(key, shape=(), dtype=onp.float32):
   """Sample Gumbel random values with given shape and float dtype.
 
   Args:
-    key: a PRNGKey used as the random key.
+    key: a PRNGKey used as the random key, or an array of N keys with shape
+      (N, 2) to draw N independent results stacked along a new leading axis.
     shape: optional, a tuple of nonnegative integers representing the shape
       (default scalar).
     dtype: optional, a float dtype for the returned values (default float32).
@@ -474,3 +717,261 @@ def gumbel(key, shape=(), dtype=onp.float32):
     A random array with the specified shape and dtype.
   """
   return -np.log(-np.log(uniform(key, shape, dtype)))
+
+
+@_batch_keys
+@partial(jit, static_argnums=(2, 3))
+def gamma(key, a, shape=(), dtype=onp.float32):
+  """Sample Gamma random values with given shape and float dtype.
+
+  Samples are differentiable with respect to `a` by implicit
+  reparameterization (Figurnov et al. 2018).
+
+  Args:
+    key: a PRNGKey used as the random key, or an array of N keys with shape
+      (N, 2) to draw N independent results stacked along a new leading axis.
+    a: an array-like broadcastable to `shape` and used as the shape parameter
+      of the random variables.
+    shape: optional, a tuple of nonnegative integers representing the shape
+      (default scalar).
+    dtype: optional, a float dtype for the returned values (default float32).
+
+  Returns:
+    A random array with the specified shape and dtype.
+  """
+  a = lax.convert_element_type(a, dtype)
+  shape = shape or onp.shape(a)
+  if onp.shape(a) != shape:
+    a = np.broadcast_to(a, shape)
+  samples = _gamma_impl(key, lax.stop_gradient(a))
+  return _gamma_reparameterized(a, samples)
+
+
+def _gamma_impl(key, a):
+  keys = split(key, a.size)
+  samples = vmap(_gamma_one)(keys, lax.reshape(a, (a.size,)))
+  return lax.reshape(samples, a.shape)
+
+
+def _gamma_one(key, alpha):
+  # Marsaglia and Tsang, "A simple method for generating gamma variables"
+  # (2000). Shape parameters below one are boosted by sampling Gamma(alpha + 1)
+  # and multiplying by U ** (1 / alpha).
+  zero = _constant_like(alpha, 0)
+  one = _constant_like(alpha, 1)
+  dtype = lax._dtype(alpha)
+
+  key, subkey = split(key)
+  boost = lax.select(lax.ge(alpha, one), one,
+                     lax.pow(uniform(subkey, (), dtype), lax.div(one, alpha)))
+  alpha = lax.select(lax.ge(alpha, one), alpha, lax.add(alpha, one))
+
+  d = lax.sub(alpha, _constant_like(alpha, 1. / 3))
+  c = lax.div(one, lax.sqrt(lax.mul(_constant_like(alpha, 9.), d)))
+
+  def _rejected(kXVU):
+    _, X, V, U = kXVU
+    squeeze = lax.sub(one, lax.mul(_constant_like(X, 0.0331), lax.mul(X, X)))
+    log_accept = lax.add(
+        lax.mul(_constant_like(X, 0.5), X),
+        lax.mul(d, lax.add(lax.sub(one, V), lax.log(V))))
+    return lax.bitwise_and(lax.ge(U, squeeze), lax.ge(lax.log(U), log_accept))
+
+  def _propose(kXVU):
+    key = kXVU[0]
+    key, x_key, U_key = split(key, 3)
+
+    def _next_xv(kxv):
+      key = kxv[0]
+      key, subkey = split(key)
+      x = normal(subkey, (), dtype)
+      v = lax.add(one, lax.mul(c, x))
+      return key, x, v
+
+    _, x, v = lax.while_loop(lambda kxv: lax.le(kxv[2], zero), _next_xv,
+                             (x_key, zero, lax.neg(one)))
+    X = lax.mul(x, x)
+    V = lax.mul(lax.mul(v, v), v)
+    U = uniform(U_key, (), dtype)
+    return key, X, V, U
+
+  # U = 2 is never accepted, so the loop always draws at least one proposal.
+  _, _, V, _ = lax.while_loop(_rejected, _propose,
+                              (key, zero, one, _constant_like(alpha, 2)))
+  z = lax.mul(lax.mul(d, V), boost)
+  return lax.max(z, _constant_like(z, onp.finfo(dtype).tiny))
+
+
+def _gamma_grad(alpha, sample):
+  """Derivative of a Gamma(alpha) sample with respect to alpha.
+
+  Holding the CDF P(alpha, x) fixed, dx/dalpha = -(dP/dalpha) / p(x; alpha).
+  Both P, the regularized lower incomplete gamma function, and its derivative
+  come from the power series P = x**alpha e**-x / Gamma(alpha + 1) * S with
+  S = sum_n x**n / ((alpha + 1) ... (alpha + n)).
+  """
+  one = _constant_like(alpha, 1)
+  eps = _constant_like(alpha, onp.finfo(lax._dtype(alpha)).eps)
+  x = sample
+
+  def _not_converged(carry):
+    n, term, _, total, _ = carry
+    big_terms = lax.gt(lax.abs(term), lax.mul(eps, total))
+    max_terms = _constant_like(n, 2000)
+    return lax.bitwise_and(lax.lt(n, max_terms), np.any(big_terms))
+
+  def _next_term(carry):
+    n, term, dterm, total, dtotal = carry
+    n = lax.add(n, one)
+    denom = lax.add(alpha, n)
+    new_term = lax.div(lax.mul(term, x), denom)
+    dterm = lax.div(lax.sub(lax.mul(dterm, x), new_term), denom)
+    return n, new_term, dterm, lax.add(total, new_term), lax.add(dtotal, dterm)
+
+  zeros, ones = lax.full_like(x, 0), lax.full_like(x, 1)
+  _, _, _, S, dS = lax.while_loop(_not_converged, _next_term,
+                                  (lax.tie_in(x, _constant_like(x, 0)), ones,
+                                   zeros, ones, zeros))
+  log_x = lax.log(x)
+  dlog_prefactor = lax.sub(log_x, lax.digamma(lax.add(alpha, one)))
+  # The ratio of the series prefactor to the density is x / alpha.
+  dP_over_pdf = lax.mul(lax.div(x, alpha),
+                        lax.add(lax.mul(S, dlog_prefactor), dS))
+  return lax.neg(dP_over_pdf)
+
+
+@custom_transforms
+def _gamma_reparameterized(a, sample):
+  return sample
+ad.defjvp2(_gamma_reparameterized.primitive,
+           lambda g, ans, a, sample: lax.mul(g, _gamma_grad(a, ans)), None)
+
+def _gamma_reparameterized_batching_rule(batched_args, batch_dims):
+  # With a batch of keys, the samples are batched while `a` may not be, so `a`
+  # is broadcast along the batch to keep `_gamma_grad` elementwise.
+  size = next(x.shape[bd] for x, bd in zip(batched_args, batch_dims)
+              if bd is not None)
+  a, sample = [batching.bdim_at_front(x, bd, size, force_broadcast=True)
+               for x, bd in zip(batched_args, batch_dims)]
+  return _gamma_reparameterized(a, sample), 0
+batching.primitive_batchers[_gamma_reparameterized.primitive] = (
+    _gamma_reparameterized_batching_rule)
+
+
+@_batch_keys
+@partial(jit, static_argnums=(3, 4))
+def beta(key, a, b, shape=(), dtype=onp.float32):
+  """Sample Beta random values with given shape and float dtype.
+
+  Args:
+    key: a PRNGKey used as the random key, or an array of N keys with shape
+      (N, 2) to draw N independent results stacked along a new leading axis.
+    a: an array-like broadcastable to `shape` and used as the first shape
+      parameter of the random variables.
+    b: an array-like broadcastable to `shape` and used as the second shape
+      parameter of the random variables.
+    shape: optional, a tuple of nonnegative integers representing the shape
+      (default the broadcast shape of `a` and `b`).
+    dtype: optional, a float dtype for the returned values (default float32).
+
+  Returns:
+    A random array with the specified shape and dtype.
+  """
+  shape = shape or lax.broadcast_shapes(onp.shape(a), onp.shape(b))
+  key_a, key_b = split(key)
+  gamma_a = gamma(key_a, a, shape, dtype)
+  gamma_b = gamma(key_b, b, shape, dtype)
+  return lax.div(gamma_a, lax.add(gamma_a, gamma_b))
+
+
+@_batch_keys
+@partial(jit, static_argnums=(2, 3))
+def dirichlet(key, alpha, shape=(), dtype=onp.float32):
+  """Sample Dirichlet random values with given shape and float dtype.
+
+  Args:
+    key: a PRNGKey used as the random key, or an array of N keys with shape
+      (N, 2) to draw N independent results stacked along a new leading axis.
+    alpha: an array of shape (..., K) of concentration parameters, whose
+      leading dimensions are broadcastable to `shape`.
+    shape: optional, a tuple of nonnegative integers representing the batch
+      shape of the result (default `alpha.shape[:-1]`).
+    dtype: optional, a float dtype for the returned values (default float32).
+
+  Returns:
+    A random array with shape `shape + alpha.shape[-1:]` and the given dtype,
+    whose entries along the last axis sum to one.
+  """
+  if onp.ndim(alpha) < 1:
+    raise ValueError("dirichlet requires alpha.ndim >= 1, got alpha.ndim == 0")
+  shape = shape or onp.shape(alpha)[:-1]
+  samples = gamma(key, alpha, tuple(shape) + onp.shape(alpha)[-1:], dtype)
+  return samples / np.sum(samples, axis=-1, keepdims=True)
+
+
+@_batch_keys
+@partial(jit, static_argnums=(3, 4))
+def multivariate_normal(key, mean, cov, shape=None, dtype=onp.float32):
+  """Sample multivariate normal random values with given shape and float dtype.
+
+  Args:
+    key: a PRNGKey used as the random key, or an array of N keys with shape
+      (N, 2) to draw N independent results stacked along a new leading axis.
+    mean: an array of shape (..., n) for the mean of the distribution, whose
+      leading dimensions are broadcastable to `shape`.
+    cov: a positive definite array of shape (n, n) for the covariance of the
+      distribution.
+    shape: optional, a tuple of nonnegative integers representing the batch
+      shape of the result (default `mean.shape[:-1]`).
+    dtype: optional, a float dtype for the returned values (default float32).
+
+  Returns:
+    A random array with shape `shape + mean.shape[-1:]` and the given dtype.
+  """
+  mean = lax.convert_element_type(mean, dtype)
+  cov = lax.convert_element_type(cov, dtype)
+  n = onp.shape(mean)[-1] if onp.ndim(mean) else None
+  if n is None or onp.shape(cov) != (n, n):
+    msg = ("multivariate_normal requires mean.shape == (..., n) and "
+           "cov.shape == (n, n), got {} and {}.")
+    raise ValueError(msg.format(onp.shape(mean), onp.shape(cov)))
+  shape = onp.shape(mean)[:-1] if shape is None else tuple(shape)
+  chol_factor = lax_linalg.cholesky(cov)
+  normal_samples = normal(key, shape + (n,), dtype)
+  return mean + np.matmul(normal_samples, np.transpose(chol_factor))
+
+
+@_batch_keys
+@partial(jit, static_argnums=(3, 4))
+def truncated_normal(key, lower, upper, shape=(), dtype=onp.float32):
+  """Sample truncated standard normal random values with given shape and dtype.
+
+  Samples are differentiable with respect to `lower` and `upper`.
+
+  Args:
+    key: a PRNGKey used as the random key, or an array of N keys with shape
+      (N, 2) to draw N independent results stacked along a new leading axis.
+    lower: an array-like broadcastable to `shape` giving the lower bound for
+      truncation.
+    upper: an array-like broadcastable to `shape` giving the upper bound for
+      truncation.
+    shape: optional, a tuple of nonnegative integers representing the shape
+      (default the broadcast shape of `lower` and `upper`).
+    dtype: optional, a float dtype for the returned values (default float32).
+
+  Returns:
+    A random array with the specified shape and dtype, with values in the
+    closed interval [lower, upper].
+  """
+  shape = shape or lax.broadcast_shapes(onp.shape(lower), onp.shape(upper))
+  lower = np.broadcast_to(lax.convert_element_type(lower, dtype), shape)
+  upper = np.broadcast_to(lax.convert_element_type(upper, dtype), shape)
+  # Inverse transform sampling, in terms of erf rather than the normal CDF.
+  sqrt2 = onp.array(onp.sqrt(2), dtype)
+  a = lax.erf(lax.div(lower, sqrt2))
+  b = lax.erf(lax.div(upper, sqrt2))
+  # `a` and `b` may be tracers, so scale a unit uniform rather than passing them
+  # to `uniform` as (static) keyword arguments.
+  u = lax.add(a, lax.mul(uniform(key, shape, dtype), lax.sub(b, a)))
+  out = lax.mul(sqrt2, lax.erf_inv(u))
+  return lax.clamp(lower, out, upper)
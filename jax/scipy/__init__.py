@@ -15,5 +15,7 @@
 from __future__ import absolute_import
 from . import linalg
 from . import misc
+from . import signal
+from . import sparse
 from . import special
 from . import stats
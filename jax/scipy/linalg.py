@@ -64,10 +64,7 @@ def cho_solve(c_and_lower, b, overwrite_b=False, check_finite=True):
   # TODO(phawkins): triangular_solve only supports matrices on the RHS, so we
   # add a dummy dimension. Extend it to support vectors and simplify this.
   b = b if c_ndims == b_ndims else b[..., None]
-  b = lax_linalg.triangular_solve(c, b, left_side=True, lower=lower,
-                                  transpose_a=not lower, conjugate_a=not lower)
-  b = lax_linalg.triangular_solve(c, b, left_side=True, lower=lower,
-                                  transpose_a=lower, conjugate_a=lower)
+  b = lax_linalg.cho_solve(c if lower else np.conj(_T(c)), b)
   return b[..., 0] if c_ndims != b_ndims else b
 
 
@@ -110,6 +107,29 @@ def eigh(a, b=None, lower=True, eigvals_only=False, overwrite_a=False,
 
 
 
+@_wraps(scipy.linalg.expm)
+def expm(A):
+  A = np_linalg._promote_arg_dtypes(np.asarray(A))
+  return lax_linalg.expm(A)
+
+
+@_wraps(scipy.linalg.sqrtm)
+def sqrtm(A, disp=True, blocksize=64):
+  del blocksize
+  if not disp:
+    raise NotImplementedError("Only the disp=True case of sqrtm is implemented.")
+  A = np_linalg._promote_arg_dtypes(np.asarray(A))
+  return lax_linalg.sqrtm(A)
+
+
+@_wraps(scipy.linalg.logm)
+def logm(A, disp=True):
+  if not disp:
+    raise NotImplementedError("Only the disp=True case of logm is implemented.")
+  A = np_linalg._promote_arg_dtypes(np.asarray(A))
+  return lax_linalg.logm(A)
+
+
 @_wraps(scipy.linalg.inv)
 def inv(a, overwrite_a=False, check_finite=True):
   warnings.warn(_EXPERIMENTAL_WARNING)
@@ -169,8 +189,13 @@ def solve(a, b, sym_pos=False, lower=False, overwrite_a=False, overwrite_b=False
   if not sym_pos:
     return np_linalg.solve(a, b)
 
-  a, b = np_linalg._promote_arg_dtypes(np.asarray(a), np.asarray(b))
-  return cho_solve(cho_factor(a, lower=lower), b)
+  # Only the `lower` triangle of `a` is referenced, as in scipy.
+  a = np.asarray(a)
+  if lower:
+    a = np.tril(a) + np.conj(_T(np.tril(a, -1)))
+  else:
+    a = np.triu(a) + np.conj(_T(np.triu(a, 1)))
+  return np_linalg._solve(a, b, sym_pos=True)
 
 
 @_wraps(scipy.linalg.solve_triangular)
@@ -0,0 +1,124 @@
+# Copyright 2018 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import scipy.signal as osp_signal
+
+from .. import lax
+from .. import lax_fft
+from ..numpy.lax_numpy import _wraps
+from ..numpy import fft as np_fft
+from ..numpy import lax_numpy as np
+from ..numpy import linalg as np_linalg
+
+
+def _check_mode(mode):
+  if mode not in ("full", "same", "valid"):
+    raise ValueError("acceptable mode flags are 'valid', 'same', or 'full'.")
+
+
+def _valid_mode_swap_needed(shape1, shape2):
+  """Whether 'valid' mode must swap its inputs to put the larger one first."""
+  if all(s1 >= s2 for s1, s2 in zip(shape1, shape2)):
+    return False
+  if all(s1 <= s2 for s1, s2 in zip(shape1, shape2)):
+    return True
+  raise ValueError("For 'valid' mode, one must be at least as large as the "
+                   "other in every dimension")
+
+
+def _centered_slice(x, axes, full_shape, out_shape):
+  """Crops `axes` of `x` from `full_shape` to the centered `out_shape`."""
+  start = [0] * np.ndim(x)
+  limit = list(np.shape(x))
+  for axis, full, out in zip(axes, full_shape, out_shape):
+    start[axis] = (full - out) // 2
+    limit[axis] = start[axis] + out
+  return lax.slice(x, start, limit)
+
+
+@_wraps(osp_signal.fftconvolve)
+def fftconvolve(in1, in2, mode="full", axes=None):
+  _check_mode(mode)
+  in1, in2 = np_linalg._promote_arg_dtypes(np.asarray(in1), np.asarray(in2))
+  if np.ndim(in1) != np.ndim(in2):
+    raise ValueError("in1 and in2 should have the same dimensionality")
+  ndim = np.ndim(in1)
+  if axes is None:
+    axes = tuple(range(ndim))
+  else:
+    axes = tuple(np._canonicalize_axis(axis, ndim) for axis in
+                 (axes if isinstance(axes, (list, tuple)) else [axes]))
+  shape1, shape2 = np.shape(in1), np.shape(in2)
+  for axis in range(ndim):
+    if (axis not in axes and shape1[axis] != shape2[axis] and
+        1 not in (shape1[axis], shape2[axis])):
+      raise ValueError("incompatible shapes for in1 and in2: {} and {}"
+                       .format(shape1, shape2))
+  if not axes:
+    return in1 * in2
+  if mode == "valid" and _valid_mode_swap_needed(
+      [shape1[axis] for axis in axes], [shape2[axis] for axis in axes]):
+    in1, in2 = in2, in1
+    shape1, shape2 = shape2, shape1
+
+  full_shape = [shape1[a] + shape2[a] - 1 for a in axes]
+  fft_shape = [lax_fft._fast_fft_size(n) for n in full_shape]
+  if np.iscomplexobj(in1):
+    forward, inverse = np_fft.fftn, np_fft.ifftn
+  else:
+    forward, inverse = np_fft.rfftn, np_fft.irfftn
+  spectrum = forward(in1, fft_shape, axes) * forward(in2, fft_shape, axes)
+  out = inverse(spectrum, fft_shape, axes)
+
+  if mode == "full":
+    out_shape = full_shape
+  elif mode == "same":
+    out_shape = [shape1[a] for a in axes]
+  else:
+    out_shape = [shape1[a] - shape2[a] + 1 for a in axes]
+  out = _centered_slice(out, axes, full_shape, out_shape)
+  return lax.convert_element_type(out, np._dtype(in1))
+
+
+@_wraps(osp_signal.convolve)
+def convolve(in1, in2, mode="full", method="auto"):
+  _check_mode(mode)
+  if method not in ("auto", "direct", "fft"):
+    raise ValueError("acceptable method flags are 'auto', 'direct', or 'fft'.")
+  if method == "fft":
+    return fftconvolve(in1, in2, mode=mode)
+  in1, in2 = np._promote_dtypes(np.asarray(in1), np.asarray(in2))
+  if np.ndim(in1) != np.ndim(in2):
+    raise ValueError("in1 and in2 should have the same dimensionality")
+  if np.ndim(in1) == 0:
+    return in1 * in2
+  if mode == "valid" and _valid_mode_swap_needed(np.shape(in1), np.shape(in2)):
+    in1, in2 = in2, in1
+  window = np.shape(in2)
+  if mode == "full":
+    padding = [(k - 1, k - 1) for k in window]
+  elif mode == "same":
+    padding = [(k // 2, (k - 1) // 2) for k in window]
+  else:
+    padding = [(0, 0)] * len(window)
+  # Convolution is correlation with the reversed kernel, over a batch of one
+  # single-feature input.
+  out = lax.conv_general_dilated(
+      in1[None, None], lax.rev(in2, tuple(range(np.ndim(in2))))[None, None],
+      (1,) * len(window), padding, method=method)
+  return out[0, 0]
@@ -0,0 +1,673 @@
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Iterative solvers for linear systems and eigenproblems.
+
+The operator `A` (and the preconditioner `M`) may be a dense matrix or a
+function computing `A x`, for example one built from `jax.jvp` or `jax.vjp`,
+so the matrix never needs to be materialized. Each solver runs as a single
+`lax.while_loop`.
+
+The solvers are differentiated implicitly: differentiating `A x = b` gives
+`A x' = b' - A' x`, which is solved with the same solver instead of
+differentiating through the iterations. Gradients with respect to `b` and to
+any values `A` closes over are supported; the initial guess and the
+preconditioner only affect convergence and get no gradient.
+
+Under `vmap`, a batch of systems is solved as one block-diagonal system, so
+`tol` and `atol` bound the residual of the whole batch rather than of each
+system separately.
+
+The eigensolvers `eigsh`, `svds` and `randomized_svd` find a few extreme
+eigenpairs or singular triples without the O(n^3) cost of a full
+decomposition. They accept operators in the same forms, but like
+`lax.while_loop` they are not differentiable.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import numpy as onp
+
+from ... import ad_util
+from ... import api
+from ... import core
+from ... import lax
+from ... import lax_linalg
+from ... import linear_util as lu
+from ... import random
+from ...abstract_arrays import ShapedArray
+from ...interpreters import ad
+from ...interpreters import batching
+from ...interpreters import partial_eval as pe
+from ...interpreters import xla
+from ...lib import xla_bridge
+from ...numpy import lax_numpy as np
+from ...numpy import linalg as np_linalg
+from ...util import partial
+
+
+def cg(A, b, x0=None, tol=1e-5, atol=0.0, maxiter=None, M=None):
+  """Solves `A x = b` by the preconditioned conjugate gradient method.
+
+  Args:
+    A: a Hermitian positive definite matrix, or a function computing `A x`
+      for an array `x` with the shape of `b`.
+    b: right-hand side, an array of any shape.
+    x0: optional initial guess, with the shape of `b`. Defaults to zeros.
+    tol, atol: the iteration stops once
+      `norm(b - A x) <= max(tol * norm(b), atol)`.
+    maxiter: maximum number of iterations. Defaults to `10 * b.size`.
+    M: optional preconditioner approximating `inv(A)`, given like `A`. It
+      must be Hermitian positive definite.
+
+  Returns:
+    A pair `(x, info)`. Unlike `scipy.sparse.linalg.cg`, `info` is always
+    None since convergence is not known until the computation runs.
+  """
+  matvec, b, x0, M = _normalize_args(A, b, x0, M)
+  maxiter = 10 * np.size(b) if maxiter is None else maxiter
+  solve = partial(_cg_solve, tol=tol, atol=atol, maxiter=maxiter)
+  return _linear_solve(matvec, b, x0, M, solve, symmetric=True), None
+
+
+def gmres(A, b, x0=None, tol=1e-5, atol=0.0, restart=20, maxiter=None,
+          M=None):
+  """Solves `A x = b` by the restarted generalized minimal residual method.
+
+  Args:
+    A: a square matrix, or a function computing `A x` for an array `x` with
+      the shape of `b`.
+    b: right-hand side, an array of any shape.
+    x0: optional initial guess, with the shape of `b`. Defaults to zeros.
+    tol, atol: the iteration stops once
+      `norm(b - A x) <= max(tol * norm(b), atol)`.
+    restart: size of the Krylov subspace built between restarts. It fixes the
+      memory used, `restart + 1` vectors the size of `b`.
+    maxiter: maximum number of restart cycles. Defaults to
+      `10 * b.size // restart`, at least one.
+    M: optional preconditioner approximating `inv(A)`, given like `A`. It is
+      applied on the right, so the residual tested is that of `A x = b`.
+
+  Returns:
+    A pair `(x, info)`. Unlike `scipy.sparse.linalg.gmres`, `info` is always
+    None since convergence is not known until the computation runs.
+  """
+  matvec, b, x0, M = _normalize_args(A, b, x0, M)
+  restart = min(restart, np.size(b))
+  if maxiter is None:
+    maxiter = max(1, 10 * np.size(b) // restart)
+  solve = partial(_gmres_solve, tol=tol, atol=atol, restart=restart,
+                  maxiter=maxiter)
+  return _linear_solve(matvec, b, x0, M, solve, symmetric=False), None
+
+
+def bicgstab(A, b, x0=None, tol=1e-5, atol=0.0, maxiter=None, M=None):
+  """Solves `A x = b` by the preconditioned stabilized biconjugate gradient method.
+
+  Args:
+    A: a square matrix, or a function computing `A x` for an array `x` with
+      the shape of `b`.
+    b: right-hand side, an array of any shape.
+    x0: optional initial guess, with the shape of `b`. Defaults to zeros.
+    tol, atol: the iteration stops once
+      `norm(b - A x) <= max(tol * norm(b), atol)`.
+    maxiter: maximum number of iterations. Defaults to `10 * b.size`.
+    M: optional preconditioner approximating `inv(A)`, given like `A`.
+
+  Returns:
+    A pair `(x, info)`. Unlike `scipy.sparse.linalg.bicgstab`, `info` is
+    always None since convergence is not known until the computation runs.
+  """
+  matvec, b, x0, M = _normalize_args(A, b, x0, M)
+  maxiter = 10 * np.size(b) if maxiter is None else maxiter
+  solve = partial(_bicgstab_solve, tol=tol, atol=atol, maxiter=maxiter)
+  return _linear_solve(matvec, b, x0, M, solve, symmetric=False), None
+
+
+def eigsh(A, k=6, which='LM', v0=None, ncv=None, maxiter=None, tol=0):
+  """Finds `k` eigenvalues and eigenvectors of a Hermitian operator.
+
+  Uses the Lanczos method with full reorthogonalization and thick restarts:
+  each cycle extends the `k` wanted Ritz vectors of the previous cycle to a
+  Krylov basis of `ncv` vectors, so memory is `O(ncv * n)` and each cycle
+  costs `ncv - k` products with `A`.
+
+  Args:
+    A: a Hermitian `n x n` matrix, or a function computing `A x` for vectors
+      `x` with the shape of `v0`.
+    k: the number of eigenpairs wanted, with `0 < k < n`.
+    which: which eigenvalues to find: 'LM' (largest magnitude), 'LA' (largest
+      algebraic) or 'SA' (smallest algebraic).
+    v0: starting vector, of shape `(n,)`. Required when `A` is a function.
+      Defaults to a random normal vector drawn with a fixed key.
+    ncv: the number of Lanczos vectors, with `k < ncv <= n`. Defaults to
+      `min(n, max(2 * k + 1, 20))`.
+    maxiter: maximum number of restart cycles. Defaults to `10 * n`.
+    tol: the iteration stops once the residual norm of every wanted Ritz
+      pair is below `tol` times the largest Ritz value magnitude. Defaults to
+      machine precision.
+
+  Returns:
+    A pair `(w, v)` of the eigenvalues in ascending order, of shape `(k,)`,
+    and the corresponding eigenvectors as the columns of `v`, of shape
+    `(n, k)`.
+  """
+  matvec, v0 = _normalize_eig_args(A, v0)
+  n = np.shape(v0)[0]
+  if not 0 < k < n:
+    raise ValueError("eigsh requires 0 < k < n, got k={} and n={}.".format(
+        k, n))
+  if which not in ('LM', 'LA', 'SA'):
+    raise ValueError("which must be one of 'LM', 'LA' or 'SA', got {}.".format(
+        which))
+  ncv = min(n, max(2 * k + 1, 20)) if ncv is None else ncv
+  if not k < ncv <= n:
+    raise ValueError("eigsh requires k < ncv <= n, got k={}, ncv={} and "
+                     "n={}.".format(k, ncv, n))
+  maxiter = 10 * n if maxiter is None else maxiter
+  tol = max(tol, onp.finfo(lax._dtype(v0)).eps)
+  return _lanczos_eigsh(matvec, v0, k, which, ncv, maxiter, tol)
+
+
+def svds(A, k=6, ncv=None, tol=0, which='LM', v0=None, maxiter=None,
+         return_singular_vectors=True):
+  """Finds `k` singular values and vectors of a linear operator.
+
+  Runs `eigsh` on `A^H A`, so only products with `A` and its adjoint are
+  needed. When `A` is a function, its adjoint is obtained with `vjp`.
+  Squaring the operator squares its condition number, so the smallest
+  singular values are found less accurately than the largest.
+
+  Args:
+    A: an `m x n` matrix, or a linear function computing `A x` for vectors
+      `x` with the shape of `v0`.
+    k: the number of singular triples wanted, with `0 < k < n`.
+    ncv, tol, maxiter: as for `eigsh` on `A^H A`.
+    which: 'LM' for the largest singular values, 'SM' for the smallest.
+    v0: starting vector, of shape `(n,)`. Required when `A` is a function.
+    return_singular_vectors: whether to return `u` and `vh`.
+
+  Returns:
+    `(u, s, vh)`, or just `s` if `return_singular_vectors` is False, with the
+    singular values `s` in ascending order, `u` of shape `(m, k)` and `vh` of
+    shape `(k, n)`.
+  """
+  matvec, v0 = _normalize_eig_args(A, v0)
+  if which not in ('LM', 'SM'):
+    raise ValueError("which must be 'LM' or 'SM', got {}.".format(which))
+  adjoint = _adjoint_operator(matvec, v0)
+  gram = lambda x: adjoint(matvec(x))
+  w, v = eigsh(gram, k, 'LA' if which == 'LM' else 'SA', v0, ncv, maxiter,
+               tol)
+  s = np.sqrt(np.maximum(w, 0))
+  if not return_singular_vectors:
+    return s
+  u = _safe_div(_apply_to_columns(matvec, v), s)
+  return u, s, np.conj(v.T)
+
+
+def randomized_svd(key, A, k, oversamples=10, power_iterations=2,
+                   shape=None):
+  """Approximates the top `k` singular triples of an operator.
+
+  This is the randomized range finder of Halko, Martinsson and Tropp (2011)
+  and has no scipy counterpart. `A` is applied to a random block of
+  `k + oversamples` vectors, the result is orthonormalized with a QR
+  decomposition and refined by `power_iterations` rounds of multiplication by
+  `A^H` and `A`, and the small projected matrix is decomposed exactly. Each
+  power iteration improves the accuracy when the singular values decay
+  slowly, at the cost of two more block products.
+
+  Args:
+    key: a PRNGKey for the random test vectors.
+    A: an `m x n` matrix, or a linear function computing `A x` for vectors
+      `x` of shape `(n,)`.
+    k: the number of singular triples wanted.
+    oversamples: the number of test vectors beyond `k`.
+    power_iterations: the number of power iterations.
+    shape: the shape `(m, n)` of `A`. Required when `A` is a function.
+
+  Returns:
+    `(u, s, vh)` with the singular values `s` in descending order, `u` of
+    shape `(m, k)` and `vh` of shape `(k, n)`.
+  """
+  if callable(A):
+    if shape is None:
+      raise ValueError("randomized_svd requires shape when A is a function.")
+    dtype = xla_bridge.canonicalize_dtype(onp.float64)
+  else:
+    A = np_linalg._promote_arg_dtypes(np.asarray(A))
+    shape, dtype = np.shape(A), lax._dtype(A)
+  m, n = shape
+  l = min(k + oversamples, m, n)
+  matvec = _normalize_operator(A)
+  example = np.zeros((n,), dtype=dtype)
+  adjoint = _adjoint_operator(matvec, example)
+
+  def orthonormalize(x):
+    return lax_linalg.qr(x, full_matrices=False)[0]
+
+  def power_iteration(_, q):
+    q = orthonormalize(_apply_to_columns(adjoint, q))
+    return orthonormalize(_apply_to_columns(matvec, q))
+
+  omega = _random_normal(key, (n, l), dtype)
+  q = orthonormalize(_apply_to_columns(matvec, omega))
+  q = lax.fori_loop(0, power_iterations, power_iteration, q)
+  b = np.conj(_apply_to_columns(adjoint, q).T)
+  u, s, vh = lax_linalg.svd(b, full_matrices=False)
+  return np.dot(q, u[:, :k]), s[:k], vh[:k]
+
+
+# utilities
+
+def _normalize_operator(A):
+  if A is None:
+    return lambda x: x
+  elif callable(A):
+    return A
+  else:
+    A = np.asarray(A)
+    return lambda x: np.dot(A, x)
+
+def _normalize_args(A, b, x0, M):
+  b = np_linalg._promote_arg_dtypes(np.asarray(b))
+  if x0 is None:
+    x0 = np.zeros_like(b)
+  else:
+    x0 = lax.convert_element_type(np.asarray(x0), lax._dtype(b))
+    if np.shape(x0) != np.shape(b):
+      msg = "x0 and b must have the same shape, got {} and {}."
+      raise ValueError(msg.format(np.shape(x0), np.shape(b)))
+  return _normalize_operator(A), b, x0, _normalize_operator(M)
+
+def _normalize_eig_args(A, v0):
+  if v0 is None:
+    if callable(A):
+      raise ValueError("v0 is required when A is a function.")
+    A = np_linalg._promote_arg_dtypes(np.asarray(A))
+    v0 = _random_normal(random.PRNGKey(0), np.shape(A)[-1:], lax._dtype(A))
+  else:
+    v0 = np_linalg._promote_arg_dtypes(np.asarray(v0))
+  if np.ndim(v0) != 1:
+    raise ValueError("v0 must be a vector, got shape {}.".format(np.shape(v0)))
+  return _normalize_operator(A), v0
+
+def _random_normal(key, shape, dtype):
+  if onp.issubdtype(dtype, onp.complexfloating):
+    real_dtype = onp.finfo(dtype).dtype
+    key_real, key_imag = random.split(key)
+    return lax.convert_element_type(
+        lax.complex(random.normal(key_real, shape, real_dtype),
+                    random.normal(key_imag, shape, real_dtype)), dtype)
+  return random.normal(key, shape, dtype)
+
+def _apply_to_columns(matvec, x):
+  return api.vmap(matvec, 1, 1)(x)
+
+def _vdot(x, y):
+  return np.vdot(x, y)
+
+def _norm_squared(x):
+  return np.real(_vdot(x, x))
+
+def _index(x, i):
+  return lax.dynamic_index_in_dim(x, i, 0, keepdims=False)
+
+def _safe_div(x, y):
+  return x / np.where(y == 0, np.ones_like(y), y)
+
+
+# solvers
+#
+# Each takes the operator and preconditioner as functions, and runs entirely
+# inside one while_loop.
+
+def _cg_solve(matvec, b, x0, M, tol, atol, maxiter):
+  atol2 = np.maximum(tol ** 2 * _norm_squared(b), atol ** 2)
+
+  def cond_fun(value):
+    _, r, _, _, k = value
+    return np.logical_and(_norm_squared(r) > atol2, k < maxiter)
+
+  def body_fun(value):
+    x, r, gamma, p, k = value
+    ap = matvec(p)
+    alpha = gamma / _vdot(p, ap)
+    x = x + alpha * p
+    r = r - alpha * ap
+    z = M(r)
+    gamma_new = _vdot(r, z)
+    p = z + (gamma_new / gamma) * p
+    return x, r, gamma_new, p, k + 1
+
+  r0 = b - matvec(x0)
+  p0 = M(r0)
+  x, _, _, _, _ = lax.while_loop(
+      cond_fun, body_fun, (x0, r0, _vdot(r0, p0), p0, 0))
+  return x
+
+
+def _bicgstab_solve(matvec, b, x0, M, tol, atol, maxiter):
+  atol2 = np.maximum(tol ** 2 * _norm_squared(b), atol ** 2)
+
+  def cond_fun(value):
+    _, r, _, _, _, _, _, _, k = value
+    return np.logical_and(_norm_squared(r) > atol2, k < maxiter)
+
+  def body_fun(value):
+    x, r, rhat, alpha, omega, rho, p, v, k = value
+    rho_new = _vdot(rhat, r)
+    beta = (rho_new / rho) * (alpha / omega)
+    p = r + beta * (p - omega * v)
+    phat = M(p)
+    v = matvec(phat)
+    alpha = rho_new / _vdot(rhat, v)
+    s = r - alpha * v
+    shat = M(s)
+    t = matvec(shat)
+    # t is zero only if s is, in which case x has converged.
+    omega = _safe_div(_vdot(t, s), _vdot(t, t))
+    x = x + alpha * phat + omega * shat
+    r = s - omega * t
+    return x, r, rhat, alpha, omega, rho_new, p, v, k + 1
+
+  r0 = b - matvec(x0)
+  one = np.ones((), dtype=lax._dtype(b))
+  zeros = np.zeros_like(b)
+  init_val = (x0, r0, r0, one, one, one, zeros, zeros, 0)
+  x = lax.while_loop(cond_fun, body_fun, init_val)[0]
+  return x
+
+
+def _givens_rotation(a, b):
+  """Returns `(c, s)` with `c` real such that the rotation zeroes `b`."""
+  abs_a = np.abs(a)
+  r = np.sqrt(abs_a ** 2 + np.abs(b) ** 2)
+  phase = np.where(abs_a == 0, np.ones_like(a), _safe_div(a, abs_a))
+  c = np.where(r == 0, np.ones_like(r), _safe_div(abs_a, r))
+  s = np.where(r == 0, np.zeros_like(a), phase * np.conj(b) / np.where(
+      r == 0, np.ones_like(r), r))
+  return lax.convert_element_type(c, lax._dtype(a)), s
+
+def _apply_givens_rotation(v, i, c, s):
+  """Rotates elements `i` and `i + 1` of the vector `v`."""
+  pair = lax.dynamic_slice_in_dim(v, i, 2)
+  a, b = pair[0], pair[1]
+  pair = np.stack([c * a + s * b, c * b - np.conj(s) * a])
+  return lax.dynamic_update_slice_in_dim(v, pair, i, 0)
+
+def _gmres_solve(matvec, b, x0, M, tol, atol, restart, maxiter):
+  shape, dtype, n = np.shape(b), lax._dtype(b), np.size(b)
+  threshold = np.maximum(tol * np.sqrt(_norm_squared(b)), atol)
+
+  def preconditioned_matvec(v):
+    return np.ravel(matvec(M(np.reshape(v, shape))))
+
+  def arnoldi_step(value):
+    # Extends the orthonormal Krylov basis V by one vector, and the upper
+    # triangular R and rotated residual g of the least squares problem
+    # min |g - R y| by one column, using Givens rotations.
+    k, V, R, cs, sn, g = value
+    w = preconditioned_matvec(_index(V, k))
+    # Classical Gram-Schmidt, repeated once for stability. Rows of V past k
+    # are zero, so they do not contribute.
+    h = np.dot(np.conj(V), w)
+    w = w - np.dot(h, V)
+    h2 = np.dot(np.conj(V), w)
+    w = w - np.dot(h2, V)
+    h = h + h2
+    w_norm = np.sqrt(_norm_squared(w))
+    V = lax.dynamic_update_index_in_dim(V, _safe_div(w, w_norm), k + 1, 0)
+    h = lax.dynamic_update_index_in_dim(
+        h, lax.convert_element_type(w_norm, dtype), k + 1, 0)
+
+    def rotate(i, h):
+      c, s = _index(cs, i), _index(sn, i)
+      return _apply_givens_rotation(h, i, c, s)
+    h = lax.fori_loop(0, k, rotate, h)
+    pair = lax.dynamic_slice_in_dim(h, k, 2)
+    c, s = _givens_rotation(pair[0], pair[1])
+    h = _apply_givens_rotation(h, k, c, s)
+    g = _apply_givens_rotation(g, k, c, s)
+    R = lax.dynamic_update_index_in_dim(R, h[:restart], k, 1)
+    cs = lax.dynamic_update_index_in_dim(cs, c, k, 0)
+    sn = lax.dynamic_update_index_in_dim(sn, s, k, 0)
+    return k + 1, V, R, cs, sn, g
+
+  def arnoldi_cond(value):
+    k, _, _, _, _, g = value
+    return np.logical_and(k < restart, np.abs(_index(g, k)) > threshold)
+
+  def cycle(r):
+    r = np.ravel(r)
+    r_norm = np.sqrt(_norm_squared(r))
+    V = np.zeros((restart + 1, n), dtype=dtype)
+    V = lax.dynamic_update_index_in_dim(V, _safe_div(r, r_norm), 0, 0)
+    g = np.zeros((restart + 1,), dtype=dtype)
+    g = lax.dynamic_update_index_in_dim(
+        g, lax.convert_element_type(r_norm, dtype), 0, 0)
+    R = np.zeros((restart, restart), dtype=dtype)
+    cs = np.zeros((restart,), dtype=dtype)
+    k, V, R, _, _, g = lax.while_loop(
+        arnoldi_cond, arnoldi_step, (0, V, R, cs, cs, g))
+    # Columns past k were not computed; give them a unit diagonal and a zero
+    # right-hand side so that the triangular solve leaves them at zero.
+    unused = np.arange(restart) >= k
+    R = R + np.diag(lax.convert_element_type(unused, dtype))
+    g = np.where(unused, np.zeros_like(g[:restart]), g[:restart])
+    y = lax_linalg.triangular_solve(R, g[:, None], left_side=True,
+                                    lower=False)[:, 0]
+    return M(np.reshape(np.dot(y, V[:restart]), shape))
+
+  def cond_fun(value):
+    _, r, j = value
+    return np.logical_and(np.sqrt(_norm_squared(r)) > threshold, j < maxiter)
+
+  def body_fun(value):
+    x, r, j = value
+    x = x + cycle(r)
+    return x, b - matvec(x), j + 1
+
+  x, _, _ = lax.while_loop(cond_fun, body_fun, (x0, b - matvec(x0), 0))
+  return x
+
+
+def _lanczos_eigsh(matvec, v0, k, which, ncv, maxiter, tol):
+  n, dtype, m = np.shape(v0)[0], lax._dtype(v0), ncv
+
+  def lanczos_step(j, value):
+    # Extends the orthonormal basis V by one vector and the projected matrix
+    # H = V^H A V by one column. Rows of V past j + 1 are zero.
+    V, H = value
+    w = matvec(_index(V, j))
+    h = np.dot(np.conj(V), w)
+    w = w - np.dot(h, V)
+    h2 = np.dot(np.conj(V), w)
+    w = w - np.dot(h2, V)
+    h = h + h2
+    w_norm = np.sqrt(_norm_squared(w))
+    V = lax.dynamic_update_index_in_dim(V, _safe_div(w, w_norm), j + 1, 0)
+    h = lax.dynamic_update_index_in_dim(
+        h, lax.convert_element_type(w_norm, dtype), j + 1, 0)
+    H = lax.dynamic_update_index_in_dim(H, h, j, 1)
+    return V, H
+
+  def ritz(V, H):
+    # Returns the wanted Ritz values, their coordinates in V, and whether
+    # they have converged.
+    U, theta = lax_linalg.eigh(H[:m], lower=True)
+    if which == 'LA':
+      order = np.argsort(-theta)
+    elif which == 'SA':
+      order = np.argsort(theta)
+    else:
+      order = np.argsort(-np.abs(theta))
+    wanted = order[:k]
+    U_wanted = np.take(U, wanted, axis=1)
+    residuals = np.abs(H[m, m - 1] * U_wanted[m - 1])
+    converged = np.all(residuals <= tol * np.max(np.abs(theta)))
+    return np.take(theta, wanted), U_wanted, converged
+
+  def restart(V, H):
+    # Keeps the wanted Ritz vectors Y and the last basis vector v, for which
+    # A Y = Y diag(theta) + v b^T.
+    theta, U, _ = ritz(V, H)
+    Y = np.dot(U.T, V[:m])
+    V = np.concatenate([Y, V[m:], np.zeros((m - k, n), dtype=dtype)])
+    b = H[m, m - 1] * U[m - 1]
+    block = np.concatenate([np.diag(lax.convert_element_type(theta, dtype)),
+                            b[None]])
+    H = lax.dynamic_update_slice(np.zeros_like(H), block, (0, 0))
+    return V, H
+
+  def cond_fun(value):
+    i, V, H = value
+    return np.logical_and(i < maxiter, np.logical_not(ritz(V, H)[2]))
+
+  def body_fun(value):
+    i, V, H = value
+    V, H = lax.fori_loop(k, m, lanczos_step, restart(V, H))
+    return i + 1, V, H
+
+  V = np.zeros((m + 1, n), dtype=dtype)
+  V = lax.dynamic_update_index_in_dim(
+      V, _safe_div(v0, np.sqrt(_norm_squared(v0))), 0, 0)
+  H = np.zeros((m + 1, m), dtype=dtype)
+  V, H = lax.fori_loop(0, m, lanczos_step, (V, H))
+  _, V, H = lax.while_loop(cond_fun, body_fun, (0, V, H))
+
+  theta, U, _ = ritz(V, H)
+  order = np.argsort(theta)
+  return np.take(theta, order), np.dot(V[:m].T, np.take(U, order, axis=1))
+
+
+# The linear_solve primitive
+#
+# The operator and preconditioner are traced to jaxprs, whose constants are
+# passed as operands so that values they close over can be differentiated and
+# batched. `solve` is one of the solvers above with its options bound.
+
+def _trace_operator(fun, x):
+  """Traces `fun` at the shape and dtype of `x` to a jaxpr and constants."""
+  jaxpr, (aval_out, _), consts = pe.trace_to_jaxpr(
+      lu.wrap_init(fun), (lax._abstractify(x),))
+  if (not isinstance(aval_out, ShapedArray) or aval_out.shape != np.shape(x)
+      or aval_out.dtype != lax._dtype(x)):
+    msg = ("linear operators must map arrays of shape {} and dtype {} to "
+           "arrays of the same shape and dtype, got {}.")
+    raise TypeError(msg.format(np.shape(x), lax._dtype(x), aval_out))
+  return jaxpr, consts
+
+def _apply_operator(jaxpr, consts, x):
+  return core.eval_jaxpr(jaxpr, tuple(consts), (), x)
+
+def _transpose_operator(fun, x):
+  # fun is linear, so its VJP is the same at every point.
+  _, vjp_fun = api.vjp(fun, np.zeros_like(x))
+  return lambda y: vjp_fun(y)[0]
+
+def _adjoint_operator(fun, x):
+  transpose = _transpose_operator(fun, x)
+  return lambda y: np.conj(transpose(np.conj(y)))
+
+def _linear_solve(matvec, b, x0, M, solve, symmetric):
+  matvec_jaxpr, matvec_consts = _trace_operator(matvec, b)
+  precond_jaxpr, precond_consts = _trace_operator(M, b)
+  return linear_solve_p.bind(
+      b, x0, core.pack(matvec_consts), core.pack(precond_consts),
+      matvec_jaxpr=matvec_jaxpr, precond_jaxpr=precond_jaxpr, solve=solve,
+      symmetric=symmetric)
+
+def _linear_solve_impl(b, x0, matvec_consts, precond_consts, matvec_jaxpr,
+                       precond_jaxpr, solve, symmetric):
+  matvec = partial(_apply_operator, matvec_jaxpr, matvec_consts)
+  M = partial(_apply_operator, precond_jaxpr, precond_consts)
+  return solve(matvec, b, x0, M)
+
+def _linear_solve_abstract_eval(b, x0, matvec_consts, precond_consts,
+                                **unused_kwargs):
+  return ShapedArray(b.shape, b.dtype)
+
+def _linear_solve_jvp_rule(primals, tangents, **params):
+  b, x0, matvec_consts, precond_consts = primals
+  g_b, _, g_matvec_consts, _ = tangents
+  x = linear_solve_p.bind(b, x0, matvec_consts, precond_consts, **params)
+  # Differentiating A x = b gives A x' = b' - A' x, another solve with the same
+  # operator. The initial guess and the preconditioner don't change x.
+  rhs = g_b
+  if g_matvec_consts is not ad_util.zero:
+    g_matvec_consts = ad.instantiate_zeros(matvec_consts, g_matvec_consts)
+    matvec_at_x = lambda consts: _apply_operator(
+        params['matvec_jaxpr'], consts, x)
+    _, g_ax = ad.jvp(lu.wrap_init(matvec_at_x)).call_wrapped(
+        (matvec_consts,), (g_matvec_consts,))
+    rhs = ad.add_tangents(rhs, lax.neg(g_ax))
+  if rhs is ad_util.zero:
+    return x, ad_util.zero
+  rhs = ad.instantiate_zeros(b, rhs)
+  g_x = linear_solve_p.bind(rhs, np.zeros_like(x), matvec_consts,
+                            precond_consts, **params)
+  return x, g_x
+
+def _linear_solve_transpose_rule(cotangent, b, x0, matvec_consts,
+                                 precond_consts, matvec_jaxpr, precond_jaxpr,
+                                 solve, symmetric):
+  # The solve is linear in b only.
+  assert b is None and matvec_consts is not None
+  if cotangent is ad_util.zero:
+    return [ad_util.zero, None, None, None]
+  x0 = np.zeros_like(cotangent)
+  if symmetric:
+    # A is Hermitian, so transpose(A) is conj(A).
+    ct_b = np.conj(linear_solve_p.bind(
+        np.conj(cotangent), x0, matvec_consts, precond_consts,
+        matvec_jaxpr=matvec_jaxpr, precond_jaxpr=precond_jaxpr, solve=solve,
+        symmetric=symmetric))
+  else:
+    matvec = partial(_apply_operator, matvec_jaxpr, matvec_consts)
+    M = partial(_apply_operator, precond_jaxpr, precond_consts)
+    ct_b = _linear_solve(
+        _transpose_operator(matvec, cotangent), cotangent, x0,
+        _transpose_operator(M, cotangent), solve, symmetric)
+  return [ct_b, None, None, None]
+
+def _batch_operator(jaxpr, consts, consts_bd):
+  def batched(x):
+    fun = lu.wrap_init(partial(_apply_operator, jaxpr))
+    return batching.batch(fun, (consts, x), (consts_bd, 0), 0)
+  return batched
+
+def _linear_solve_batching_rule(batched_args, batch_dims, matvec_jaxpr,
+                                precond_jaxpr, solve, symmetric):
+  # The batch is solved as one block-diagonal system, which keeps the
+  # solution a linear_solve that can be differentiated implicitly.
+  b, x0, matvec_consts, precond_consts = batched_args
+  b_bd, x0_bd, matvec_bd, precond_bd = batch_dims
+  size, = set.union(*map(batching.dimsize, batch_dims, batched_args))
+  b = batching.bdim_at_front(b, b_bd, size, force_broadcast=True)
+  x0 = batching.bdim_at_front(x0, x0_bd, size, force_broadcast=True)
+  matvec = _batch_operator(matvec_jaxpr, matvec_consts, matvec_bd)
+  M = _batch_operator(precond_jaxpr, precond_consts, precond_bd)
+  return _linear_solve(matvec, b, x0, M, solve, symmetric), 0
+
+linear_solve_p = core.Primitive('linear_solve')
+linear_solve_p.def_impl(partial(xla.apply_primitive, linear_solve_p))
+linear_solve_p.def_abstract_eval(_linear_solve_abstract_eval)
+xla.translations[linear_solve_p] = partial(xla.lower_fun, _linear_solve_impl)
+ad.primitive_jvps[linear_solve_p] = _linear_solve_jvp_rule
+ad.primitive_transposes[linear_solve_p] = _linear_solve_transpose_rule
+batching.primitive_batchers[linear_solve_p] = _linear_solve_batching_rule
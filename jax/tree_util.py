@@ -37,13 +37,8 @@ def tree_map(f, tree):
     leaf given by `f(x)` where `x` is the value at the corresponding leaf in
     `tree`.
   """
-  node_type = node_types.get(type(tree))
-  if node_type:
-    children, node_spec = node_type.to_iterable(tree)
-    new_children = [tree_map(f, child) for child in children]
-    return node_type.from_iterable(node_spec, new_children)
-  else:
-    return f(tree)
+  leaves, treedef = tree_flatten(tree)
+  return tree_unflatten(treedef, map(f, leaves))
 
 def tree_multimap(f, tree, *rest):
   """Map a multi-input function over pytree args to produce a new pytree.
@@ -61,24 +56,9 @@ def tree_multimap(f, tree, *rest):
     in `tree` and `xs` is the tuple of values at corresponding leaves in `rest`.
   """
   # equivalent to prefix_multimap(f, tree_structure(tree), tree, *rest)
-  node_type = node_types.get(type(tree))
-  if node_type:
-    children, node_spec = node_type.to_iterable(tree)
-    all_children = [children]
-    for other_tree in rest:
-      other_node_type = node_types.get(type(other_tree))
-      # TODO(mattjj): enable this check
-      # if node_type != other_node_type:
-      #   raise TypeError('Mismatch: {} != {}'.format(other_node_type, node_type))
-      other_children, other_node_data = node_type.to_iterable(other_tree)
-      if other_node_data != node_spec:
-        raise TypeError('Mismatch: {} != {}'.format(other_node_data, node_spec))
-      all_children.append(other_children)
-
-    new_children = [tree_multimap(f, *xs) for xs in zip(*all_children)]
-    return node_type.from_iterable(node_spec, new_children)
-  else:
-    return f(tree, *rest)
+  leaves, treedef = tree_flatten(tree)
+  all_leaves = [leaves] + [_flatten_up_to(treedef, other) for other in rest]
+  return tree_unflatten(treedef, map(f, *all_leaves))
 
 def prefix_multimap(f, treedef, tree, *rest):
   """Like tree_multimap but only maps down through a tree prefix."""
@@ -140,38 +120,144 @@ def process_pytree(process_node, tree):
   return walk_pytree(process_node, lambda x: x, tree)
 
 
-def walk_pytree(f_node, f_leaf, tree):
-  node_type = node_types.get(type(tree))
-  if node_type:
-    children, node_spec = node_type.to_iterable(tree)
-    proc_children, child_specs = unzip2([walk_pytree(f_node, f_leaf, child)
-                                         for child in children])
-    tree_def = PyTreeDef(node_type, node_spec, child_specs)
-    return f_node(proc_children), tree_def
+# The traversals below use explicit stacks rather than Python recursion, both to
+# avoid per-node function call overhead on large trees and so that deeply nested
+# trees don't hit the interpreter's recursion limit. A tree is first expanded
+# into a pre-order list of nodes, with None marking a leaf and a
+# (node_type, node_data, num_children) triple marking an internal node, and then
+# reassembled bottom-up by walking that list in reverse.
+
+def _preorder(tree, f_leaf):
+  nodes = []
+  stack = [tree]
+  while stack:
+    x = stack.pop()
+    node_type = node_types.get(type(x))
+    if node_type:
+      children, node_data = node_type.to_iterable(x)
+      children = tuple(children)
+      nodes.append((node_type, node_data, len(children)))
+      stack.extend(children[::-1])
+    else:
+      nodes.append(None)
+      f_leaf(x)
+  return nodes
+
+def _pop_children(stack, num_children):
+  # when walking a pre-order list in reverse, children are pushed last-first, so
+  # the top of the stack holds the first child
+  if num_children:
+    children = tuple(stack[:-num_children-1:-1])
+    del stack[-num_children:]
+    return children
   else:
-    return f_leaf(tree), leaf
+    return ()
+
+
+def walk_pytree(f_node, f_leaf, tree):
+  leaf_vals = []
+  nodes = _preorder(tree, lambda x: leaf_vals.append(f_leaf(x)))
+  vals, treedefs = [], []
+  for node in reversed(nodes):
+    if node is None:
+      vals.append(leaf_vals.pop())
+      treedefs.append(leaf)
+    else:
+      node_type, node_data, num_children = node
+      vals.append(f_node(_pop_children(vals, num_children)))
+      treedefs.append(PyTreeDef(node_type, node_data,
+                                _pop_children(treedefs, num_children)))
+  return vals[0], treedefs[0]
 
 
 def build_tree(treedef, xs):
   if treedef is leaf:
     return xs
-  else:
-    # We use 'iter' for clearer error messages
-    children = map(build_tree, iter(treedef.children), iter(xs))
-    return treedef.node_type.from_iterable(treedef.node_data, children)
+  vals = []
+  stack = [(treedef, xs, False)]
+  while stack:
+    td, x, expanded = stack.pop()
+    if td is leaf:
+      vals.append(x)
+    elif expanded:
+      num_children = len(td.children)
+      children = vals[len(vals) - num_children:]
+      del vals[len(vals) - num_children:]
+      vals.append(td.node_type.from_iterable(td.node_data, children))
+    else:
+      child_xs = list(x)
+      if len(child_xs) != len(td.children):
+        raise TypeError("Expected {} children for {}, got {}."
+                        .format(len(td.children), td, len(child_xs)))
+      stack.append((td, None, True))
+      stack.extend((child_td, child_x, False) for child_td, child_x
+                   in reversed(list(zip(td.children, child_xs))))
+  return vals[0]
 
 
-tree_flatten = partial(walk_pytree, concatenate, lambda x: [x])
+def tree_flatten(tree):
+  """Flatten a pytree into a list of leaves and a treedef.
+
+  Args:
+    tree: a pytree to flatten.
+
+  Returns:
+    A pair where the first element is a list of leaf values, in the order they
+    are visited by a left-to-right depth-first traversal, and the second element
+    is a `PyTreeDef` representing the structure of `tree`.
+  """
+  leaves = []
+  nodes = _preorder(tree, leaves.append)
+  treedefs = []
+  for node in reversed(nodes):
+    if node is None:
+      treedefs.append(leaf)
+    else:
+      node_type, node_data, num_children = node
+      treedefs.append(PyTreeDef(node_type, node_data,
+                                _pop_children(treedefs, num_children)))
+  return leaves, treedefs[0]
 
 def tree_unflatten(treedef, xs):
-  return _tree_unflatten(iter(xs), treedef)
+  """Reconstruct a pytree from a treedef and a sequence of leaves.
+
+  Args:
+    treedef: a `PyTreeDef`, typically as returned by `tree_flatten`.
+    xs: an iterable of leaf values, with length `treedef.num_leaves`.
 
-def _tree_unflatten(xs, treedef):
+  Returns:
+    A pytree with structure `treedef` and leaves taken in order from `xs`.
+  """
   if treedef is leaf:
-    return next(xs)
-  else:
-    children = map(partial(_tree_unflatten, xs), treedef.children)
-    return treedef.node_type.from_iterable(treedef.node_data, children)
+    return next(iter(xs))
+  xs = iter(xs)
+  vals = []
+  for node in treedef.postorder:
+    if node is None:
+      vals.append(next(xs))
+    else:
+      node_type, node_data, num_children = node
+      children = vals[len(vals) - num_children:]
+      del vals[len(vals) - num_children:]
+      vals.append(node_type.from_iterable(node_data, children))
+  return vals[0]
+
+def _flatten_up_to(treedef, tree):
+  # Flattens `tree` only down to the leaves of `treedef`, so that subtrees of
+  # `tree` sitting at leaf positions of `treedef` are kept whole.
+  leaves = []
+  stack = [(treedef, tree)]
+  while stack:
+    td, x = stack.pop()
+    if td is leaf:
+      leaves.append(x)
+    else:
+      children, node_data = td.node_type.to_iterable(x)
+      children = tuple(children)
+      if node_data != td.node_data or len(children) != len(td.children):
+        raise TypeError('Mismatch: {} != {}'.format(node_data, td.node_data))
+      stack.extend(zip(td.children[::-1], children[::-1]))
+  return leaves
 
 
 def tree_transpose(outer_treedef, inner_treedef, pytree_to_transpose):
@@ -189,7 +275,7 @@ def tree_transpose(outer_treedef, inner_treedef, pytree_to_transpose):
   return tree_unflatten(inner_treedef, subtrees)
 
 def _num_leaves(treedef):
-  return 1 if treedef is leaf else sum(map(_num_leaves, treedef.children))
+  return treedef.num_leaves
 
 def _nested_treedef(inner, outer):
   # just used in tree_transpose error checking
@@ -201,7 +287,7 @@ def _nested_treedef(inner, outer):
 
 
 def tree_structure(tree):
-  _, spec = process_pytree(lambda _: None, tree)
+  _, spec = tree_flatten(tree)
   return spec
 
 
@@ -209,7 +295,33 @@ class PyTreeDef(object):
   def __init__(self, node_type, node_data, children):
     self.node_type = node_type
     self.node_data = node_data
-    self.children = children
+    self.children = children = tuple(children)
+    # Treedefs are immutable and are used heavily as cache keys, so we compute
+    # the hash and leaf count once, from the already-cached values of the
+    # children, rather than with a recursive walk on every use.
+    self.num_leaves = sum(child.num_leaves for child in children)
+    try:
+      self._hash = hash((node_type, node_data, children))
+    except TypeError:
+      self._hash = None  # unhashable node_data, only an error if hashed
+    self._postorder = None
+
+  @property
+  def postorder(self):
+    """List of nodes in post-order, with None for leaves, for unflattening."""
+    if self._postorder is None:
+      postorder = []
+      stack = [self]
+      while stack:
+        td = stack.pop()
+        if td is leaf:
+          postorder.append(None)
+        else:
+          postorder.append((td.node_type, td.node_data, len(td.children)))
+          stack.extend(td.children)
+      postorder.reverse()
+      self._postorder = postorder
+    return self._postorder
 
   def __repr__(self):
     if self.node_data is None:
@@ -221,10 +333,18 @@ class PyTreeDef(object):
                                      ','.join(map(repr, self.children)))
 
   def __hash__(self):
-    return hash((self.node_type, self.node_data, tuple(self.children)))
+    if self._hash is None:
+      raise TypeError("unhashable node data in {}".format(self))
+    return self._hash
 
   def __eq__(self, other):
-    if other is leaf:
+    if self is other:
+      return True
+    elif type(other) is not PyTreeDef:
+      return False
+    elif (self.num_leaves != other.num_leaves or
+          (self._hash is not None and other._hash is not None and
+           self._hash != other._hash)):
       return False
     else:
       return (self.node_type == other.node_type and
@@ -236,6 +356,8 @@ class PyTreeDef(object):
 
 
 class PyLeaf(object):
+  num_leaves = 1
+
   def __repr__(self):
     return '*'
 
@@ -19,9 +19,10 @@
 
 from __future__ import print_function
 
-from libc.stdlib cimport malloc, free
+cimport cython
+from libc.stdlib cimport malloc, free, abs
 from libc.stdint cimport int32_t
-from libc.string cimport memcpy
+from libc.string cimport memcpy, memset
 from libcpp.string cimport string
 from cpython.pycapsule cimport PyCapsule_New
 
@@ -31,6 +32,8 @@ from scipy.linalg.cython_lapack cimport spotrf, dpotrf, cpotrf, zpotrf
 from scipy.linalg.cython_lapack cimport sgesdd, dgesdd, cgesdd, zgesdd
 from scipy.linalg.cython_lapack cimport ssyevd, dsyevd, cheevd, zheevd
 
+import multiprocessing
+
 import numpy as np
 from jaxlib import xla_client
 
@@ -42,25 +45,310 @@ cdef register_cpu_custom_call_target(fn_name, void* fn):
   xla_client.register_cpu_custom_call_target(
     fn_name, PyCapsule_New(fn, name, NULL))
 
+
+# Every kernel takes a leading batch size and loops over that many matrices.
+# Arrays of shape batch_dims + (m, n) are laid out so that each matrix is
+# contiguous and column-major, with the batch dimensions major-most.
+
+def _prod(xs):
+  out = 1
+  for x in xs:
+    out *= x
+  return out
+
+def _batched_layout(num_bd, ndim):
+  """Returns the minor-to-major layout of an array with `num_bd` leading batch
+  dimensions followed by `ndim` column-major matrix or vector dimensions."""
+  return tuple(range(num_bd, num_bd + ndim)) + tuple(range(num_bd - 1, -1, -1))
+
+
+# LAPACK only parallelizes work within a matrix, which doesn't pay off for small
+# matrices, so batches of those are instead split into chunks that run on a
+# persistent pool of worker threads, started lazily on first use. A kernel
+# called with a negative batch size -b runs b matrices on the calling thread;
+# this is how each chunk is run.
+
+ctypedef void* (*_thread_start_t)(void*) nogil
+ctypedef void (*_kernel_t)(void*, void**) nogil
+
+cdef extern from "<pthread.h>" nogil:
+  ctypedef struct pthread_t:
+    pass
+  ctypedef struct pthread_mutex_t:
+    pass
+  ctypedef struct pthread_cond_t:
+    pass
+  int pthread_create(pthread_t*, void*, _thread_start_t, void*)
+  int pthread_detach(pthread_t)
+  int pthread_mutex_init(pthread_mutex_t*, void*)
+  int pthread_mutex_lock(pthread_mutex_t*)
+  int pthread_mutex_unlock(pthread_mutex_t*)
+  int pthread_cond_init(pthread_cond_t*, void*)
+  int pthread_cond_destroy(pthread_cond_t*)
+  int pthread_cond_wait(pthread_cond_t*, pthread_mutex_t*)
+  int pthread_cond_broadcast(pthread_cond_t*)
+
+cdef enum:
+  _MAX_BUFFERS = 16
+
+# The chunks of one batch still running, and a condition signalled when the
+# last of them finishes.
+cdef struct _Job:
+  int remaining
+  pthread_cond_t done
+
+# How to run a kernel on the part [start, start + size) of its batch.
+cdef struct _BatchChunk:
+  _kernel_t kernel
+  void* out
+  void** data
+  # The number of operands, and of results if `out` is a tuple of buffers (0
+  # if it is a single buffer).
+  int num_operands
+  int num_results
+  # The bytes per matrix of each operand and result, or 0 for operands shared by
+  # the whole batch, such as the batch size and options.
+  size_t operand_strides[_MAX_BUFFERS]
+  size_t result_strides[_MAX_BUFFERS]
+  # The bytes of each workspace result, of which every chunk gets its own copy.
+  size_t scratch_sizes[_MAX_BUFFERS]
+  # The largest matrix dimension, and approximate flops per matrix.
+  int max_dim
+  double flops
+  int32_t start
+  int32_t size
+  # This chunk's copy of each workspace result, allocated before it is queued.
+  void* scratch[_MAX_BUFFERS]
+  _Job* job
+  # The next chunk in the pool's queue.
+  _BatchChunk* next
+
+# Fills in the strides, scratch sizes and cost of a _BatchChunk given the
+# kernel's operands and the sizes of its element type and of the corresponding
+# real type.
+ctypedef void (*_layout_t)(_BatchChunk*, void**, size_t, size_t) nogil
+
+cdef int _num_threads = 1
+# Larger matrices are left to LAPACK's own threading.
+cdef int _max_parallel_dim = 128
+# Roughly the fewest flops worth starting a thread for.
+cdef double _min_flops_per_thread = 1e5
+
+
+def set_num_threads(int num_threads):
+  """Sets the number of threads batches of small matrices may be split over.
+
+  Defaults to the number of CPUs; 1 runs every batch on the calling thread.
+  """
+  global _num_threads
+  if num_threads < 1:
+    raise ValueError("num_threads must be positive, got {}".format(num_threads))
+  _num_threads = num_threads
+
+def get_num_threads():
+  """Returns the number of threads set by `set_num_threads`."""
+  return _num_threads
+
+set_num_threads(multiprocessing.cpu_count())
+
+
+cdef void* _run_chunk(void* arg) nogil:
+  cdef _BatchChunk* chunk = <_BatchChunk*>(arg)
+  cdef void* data[_MAX_BUFFERS]
+  cdef void* results[_MAX_BUFFERS]
+  cdef int32_t batch = -chunk.size
+  cdef int i
+  data[0] = &batch
+  for i in range(1, chunk.num_operands):
+    data[i] = <char*>(chunk.data[i]) + chunk.start * chunk.operand_strides[i]
+  if chunk.num_results == 0:
+    chunk.kernel(<char*>(chunk.out) + chunk.start * chunk.result_strides[0],
+                 data)
+    return NULL
+
+  for i in range(chunk.num_results):
+    if chunk.scratch_sizes[i]:
+      results[i] = chunk.scratch[i]
+    else:
+      results[i] = (<char*>((<void**>(chunk.out))[i]) +
+                    chunk.start * chunk.result_strides[i])
+  chunk.kernel(results, data)
+  return NULL
+
+
+# The pool's queue of chunks waiting for a thread, guarded by _pool_mutex.
+# Workers wait on _pool_work for chunks to be queued.
+cdef pthread_mutex_t _pool_mutex
+cdef pthread_cond_t _pool_work
+cdef _BatchChunk* _pool_queue = NULL
+cdef int _pool_size = 0
+pthread_mutex_init(&_pool_mutex, NULL)
+pthread_cond_init(&_pool_work, NULL)
+
+cdef _BatchChunk* _pop_chunk() nogil:
+  """Dequeues a chunk, or returns NULL. Requires _pool_mutex."""
+  global _pool_queue
+  cdef _BatchChunk* chunk = _pool_queue
+  if chunk != NULL:
+    _pool_queue = chunk.next
+  return chunk
+
+cdef void _finish_chunk(_BatchChunk* chunk) nogil:
+  """Marks a chunk as done. Requires _pool_mutex."""
+  chunk.job.remaining -= 1
+  if chunk.job.remaining == 0:
+    pthread_cond_broadcast(&chunk.job.done)
+
+cdef void* _pool_worker(void* arg) nogil:
+  cdef _BatchChunk* chunk
+  pthread_mutex_lock(&_pool_mutex)
+  while True:
+    chunk = _pop_chunk()
+    if chunk == NULL:
+      pthread_cond_wait(&_pool_work, &_pool_mutex)
+      continue
+    pthread_mutex_unlock(&_pool_mutex)
+    _run_chunk(chunk)
+    pthread_mutex_lock(&_pool_mutex)
+    _finish_chunk(chunk)
+  return NULL
+
+cdef void _grow_pool(int size) nogil:
+  """Starts workers until there are `size`, or one fails to start. Requires
+  _pool_mutex; callers still finish their chunks if the pool is empty."""
+  global _pool_size
+  cdef pthread_t thread
+  while _pool_size < size:
+    if pthread_create(&thread, NULL, _pool_worker, NULL) != 0:
+      return
+    pthread_detach(thread)
+    _pool_size += 1
+
+cdef void _free_chunks(_BatchChunk* chunks, int num_chunks) nogil:
+  cdef int t, i
+  for t in range(num_chunks):
+    for i in range(chunks[t].num_results):
+      free(chunks[t].scratch[i])
+  free(chunks)
+
+@cython.cdivision(True)
+cdef bint _run_batch_in_parallel(_kernel_t kernel, void* out, void** data,
+                                 _layout_t layout, size_t elem_size,
+                                 size_t real_size) nogil:
+  """Runs a kernel's batch split across the thread pool, if that is worthwhile.
+
+  Returns False, having done nothing, if the caller should run the batch itself,
+  including when memory for the chunks can't be allocated.
+  """
+  global _pool_queue
+  cdef int batch = (<int32_t*>(data[0]))[0]
+  if batch <= 1 or _num_threads <= 1:
+    return False
+
+  cdef _BatchChunk spec
+  memset(&spec, 0, sizeof(_BatchChunk))
+  spec.kernel = kernel
+  spec.out = out
+  spec.data = data
+  layout(&spec, data, elem_size, real_size)
+  if spec.max_dim > _max_parallel_dim:
+    return False
+  cdef double max_threads = batch * spec.flops / _min_flops_per_thread
+  cdef int num_threads = min(_num_threads, batch)
+  if max_threads < num_threads:
+    num_threads = <int>max_threads
+  if num_threads <= 1:
+    return False
+
+  cdef _BatchChunk* chunks = <_BatchChunk*>malloc(
+      num_threads * sizeof(_BatchChunk))
+  if chunks == NULL:
+    return False
+  cdef _Job job
+  cdef int t, i
+  for t in range(num_threads):
+    chunks[t] = spec
+    chunks[t].start = <int32_t>((<long long>batch) * t / num_threads)
+    chunks[t].size = (<int32_t>((<long long>batch) * (t + 1) / num_threads) -
+                      chunks[t].start)
+    chunks[t].job = &job
+  for t in range(num_threads):
+    for i in range(spec.num_results):
+      if spec.scratch_sizes[i]:
+        chunks[t].scratch[i] = malloc(spec.scratch_sizes[i])
+        if chunks[t].scratch[i] == NULL:
+          _free_chunks(chunks, num_threads)
+          return False
+
+  job.remaining = num_threads
+  pthread_cond_init(&job.done, NULL)
+  pthread_mutex_lock(&_pool_mutex)
+  _grow_pool(_num_threads - 1)
+  for t in range(1, num_threads):
+    chunks[t].next = _pool_queue
+    _pool_queue = &chunks[t]
+  pthread_cond_broadcast(&_pool_work)
+  pthread_mutex_unlock(&_pool_mutex)
+
+  # The first chunk runs on this thread, which then helps drain the queue
+  # until every chunk of this batch is done.
+  cdef _BatchChunk* chunk = &chunks[0]
+  while True:
+    _run_chunk(chunk)
+    pthread_mutex_lock(&_pool_mutex)
+    _finish_chunk(chunk)
+    chunk = NULL
+    while job.remaining > 0:
+      chunk = _pop_chunk()
+      if chunk != NULL:
+        break
+      pthread_cond_wait(&job.done, &_pool_mutex)
+    pthread_mutex_unlock(&_pool_mutex)
+    if chunk == NULL:
+      break
+
+  pthread_cond_destroy(&job.done)
+  _free_chunks(chunks, num_threads)
+  return True
+
 # TODO(phawkins): it would be nice to avoid duplicating code for each type.
 
 # ?trsm(left_side, lower, trans_a, diag, m, n, alpha, a, b):
 # triangular solve
 
+cdef void _trsm_layout(_BatchChunk* chunk, void** data, size_t elem_size,
+                       size_t real_size) nogil:
+  cdef int32_t left_side = (<int32_t*>(data[1]))[0]
+  cdef size_t m = (<int32_t*>(data[5]))[0]
+  cdef size_t n = (<int32_t*>(data[6]))[0]
+  cdef size_t k = m if left_side else n
+  chunk.num_operands = 10
+  chunk.num_results = 0
+  chunk.operand_strides[8] = k * k * elem_size
+  chunk.operand_strides[9] = m * n * elem_size
+  chunk.result_strides[0] = m * n * elem_size
+  chunk.max_dim = max(m, n)
+  chunk.flops = <double>(m) * n * k
+
 cdef void blas_strsm(void* out, void** data) nogil:
-  cdef int32_t left_side = (<int32_t*>(data[0]))[0]
-  cdef int32_t lower = (<int32_t*>(data[1]))[0]
-  cdef int32_t trans_a = (<int32_t*>(data[2]))[0]
-  cdef int32_t diag = (<int32_t*>(data[3]))[0]
-  cdef int m = (<int32_t*>(data[4]))[0]
-  cdef int n = (<int32_t*>(data[5]))[0]
-  cdef float* alpha = <float*>(data[6])
-  cdef float* a = <float*>(data[7])
-  cdef float* b = <float*>(data[8])
+  cdef int batch = (<int32_t*>(data[0]))[0]
+  if _run_batch_in_parallel(blas_strsm, out, data, _trsm_layout,
+                            sizeof(float), sizeof(float)):
+    return
+  batch = abs(batch)
+  cdef int32_t left_side = (<int32_t*>(data[1]))[0]
+  cdef int32_t lower = (<int32_t*>(data[2]))[0]
+  cdef int32_t trans_a = (<int32_t*>(data[3]))[0]
+  cdef int32_t diag = (<int32_t*>(data[4]))[0]
+  cdef int m = (<int32_t*>(data[5]))[0]
+  cdef int n = (<int32_t*>(data[6]))[0]
+  cdef float* alpha = <float*>(data[7])
+  cdef float* a = <float*>(data[8])
+  cdef float* b = <float*>(data[9])
 
   cdef float* x = <float*>(out)
   if x != b:
-    memcpy(x, b, m * n * sizeof(float))
+    memcpy(x, b, <size_t>(batch) * m * n * sizeof(float))
 
   cdef char cside = 'L' if left_side else 'R'
   cdef char cuplo = 'L' if lower else 'U'
@@ -72,24 +360,33 @@ cdef void blas_strsm(void* out, void** data) nogil:
   cdef char cdiag = 'U' if diag else 'N'
   cdef int lda = m if left_side else n
   cdef int ldb = m
-  strsm(&cside, &cuplo, &ctransa, &cdiag, &m, &n, alpha, a, &lda, x, &ldb)
+  cdef int i
+  for i in range(batch):
+    strsm(&cside, &cuplo, &ctransa, &cdiag, &m, &n, alpha, a, &lda, x, &ldb)
+    a += lda * lda
+    x += m * n
 
 register_cpu_custom_call_target(b"blas_strsm", <void*>(blas_strsm))
 
 cdef void blas_dtrsm(void* out, void** data) nogil:
-  cdef int32_t left_side = (<int32_t*>(data[0]))[0]
-  cdef int32_t lower = (<int32_t*>(data[1]))[0]
-  cdef int32_t trans_a = (<int32_t*>(data[2]))[0]
-  cdef int32_t diag = (<int32_t*>(data[3]))[0]
-  cdef int m = (<int32_t*>(data[4]))[0]
-  cdef int n = (<int32_t*>(data[5]))[0]
-  cdef double* alpha = <double*>(data[6])
-  cdef double* a = <double*>(data[7])
-  cdef double* b = <double*>(data[8])
+  cdef int batch = (<int32_t*>(data[0]))[0]
+  if _run_batch_in_parallel(blas_dtrsm, out, data, _trsm_layout,
+                            sizeof(double), sizeof(double)):
+    return
+  batch = abs(batch)
+  cdef int32_t left_side = (<int32_t*>(data[1]))[0]
+  cdef int32_t lower = (<int32_t*>(data[2]))[0]
+  cdef int32_t trans_a = (<int32_t*>(data[3]))[0]
+  cdef int32_t diag = (<int32_t*>(data[4]))[0]
+  cdef int m = (<int32_t*>(data[5]))[0]
+  cdef int n = (<int32_t*>(data[6]))[0]
+  cdef double* alpha = <double*>(data[7])
+  cdef double* a = <double*>(data[8])
+  cdef double* b = <double*>(data[9])
 
   cdef double* x = <double*>(out)
   if x != b:
-    memcpy(x, b, m * n * sizeof(double))
+    memcpy(x, b, <size_t>(batch) * m * n * sizeof(double))
 
   cdef char cside = 'L' if left_side else 'R'
   cdef char cuplo = 'L' if lower else 'U'
@@ -101,25 +398,34 @@ cdef void blas_dtrsm(void* out, void** data) nogil:
   cdef char cdiag = 'U' if diag else 'N'
   cdef int lda = m if left_side else n
   cdef int ldb = m
-  dtrsm(&cside, &cuplo, &ctransa, &cdiag, &m, &n, alpha, a, &lda, x, &ldb)
+  cdef int i
+  for i in range(batch):
+    dtrsm(&cside, &cuplo, &ctransa, &cdiag, &m, &n, alpha, a, &lda, x, &ldb)
+    a += lda * lda
+    x += m * n
 
 register_cpu_custom_call_target(b"blas_dtrsm", <void*>(blas_dtrsm))
 
 
 cdef void blas_ctrsm(void* out, void** data) nogil:
-  cdef int32_t left_side = (<int32_t*>(data[0]))[0]
-  cdef int32_t lower = (<int32_t*>(data[1]))[0]
-  cdef int32_t trans_a = (<int32_t*>(data[2]))[0]
-  cdef int32_t diag = (<int32_t*>(data[3]))[0]
-  cdef int m = (<int32_t*>(data[4]))[0]
-  cdef int n = (<int32_t*>(data[5]))[0]
-  cdef float complex* alpha = <float complex*>(data[6])
-  cdef float complex* a = <float complex*>(data[7])
-  cdef float complex* b = <float complex*>(data[8])
+  cdef int batch = (<int32_t*>(data[0]))[0]
+  if _run_batch_in_parallel(blas_ctrsm, out, data, _trsm_layout,
+                            sizeof(float complex), sizeof(float)):
+    return
+  batch = abs(batch)
+  cdef int32_t left_side = (<int32_t*>(data[1]))[0]
+  cdef int32_t lower = (<int32_t*>(data[2]))[0]
+  cdef int32_t trans_a = (<int32_t*>(data[3]))[0]
+  cdef int32_t diag = (<int32_t*>(data[4]))[0]
+  cdef int m = (<int32_t*>(data[5]))[0]
+  cdef int n = (<int32_t*>(data[6]))[0]
+  cdef float complex* alpha = <float complex*>(data[7])
+  cdef float complex* a = <float complex*>(data[8])
+  cdef float complex* b = <float complex*>(data[9])
 
   cdef float complex* x = <float complex*>(out)
   if x != b:
-    memcpy(x, b, m * n * sizeof(float complex))
+    memcpy(x, b, <size_t>(batch) * m * n * sizeof(float complex))
 
   cdef char cside = 'L' if left_side else 'R'
   cdef char cuplo = 'L' if lower else 'U'
@@ -131,24 +437,33 @@ cdef void blas_ctrsm(void* out, void** data) nogil:
   cdef char cdiag = 'U' if diag else 'N'
   cdef int lda = m if left_side else n
   cdef int ldb = m
-  ctrsm(&cside, &cuplo, &ctransa, &cdiag, &m, &n, alpha, a, &lda, x, &ldb)
+  cdef int i
+  for i in range(batch):
+    ctrsm(&cside, &cuplo, &ctransa, &cdiag, &m, &n, alpha, a, &lda, x, &ldb)
+    a += lda * lda
+    x += m * n
 
 register_cpu_custom_call_target(b"blas_ctrsm", <void*>(blas_ctrsm))
 
 cdef void blas_ztrsm(void* out, void** data) nogil:
-  cdef int32_t left_side = (<int32_t*>(data[0]))[0]
-  cdef int32_t lower = (<int32_t*>(data[1]))[0]
-  cdef int32_t trans_a = (<int32_t*>(data[2]))[0]
-  cdef int32_t diag = (<int32_t*>(data[3]))[0]
-  cdef int m = (<int32_t*>(data[4]))[0]
-  cdef int n = (<int32_t*>(data[5]))[0]
-  cdef double complex* alpha = <double complex*>(data[6])
-  cdef double complex* a = <double complex*>(data[7])
-  cdef double complex* b = <double complex*>(data[8])
+  cdef int batch = (<int32_t*>(data[0]))[0]
+  if _run_batch_in_parallel(blas_ztrsm, out, data, _trsm_layout,
+                            sizeof(double complex), sizeof(double)):
+    return
+  batch = abs(batch)
+  cdef int32_t left_side = (<int32_t*>(data[1]))[0]
+  cdef int32_t lower = (<int32_t*>(data[2]))[0]
+  cdef int32_t trans_a = (<int32_t*>(data[3]))[0]
+  cdef int32_t diag = (<int32_t*>(data[4]))[0]
+  cdef int m = (<int32_t*>(data[5]))[0]
+  cdef int n = (<int32_t*>(data[6]))[0]
+  cdef double complex* alpha = <double complex*>(data[7])
+  cdef double complex* a = <double complex*>(data[8])
+  cdef double complex* b = <double complex*>(data[9])
 
   cdef double complex* x = <double complex*>(out)
   if x != b:
-    memcpy(x, b, m * n * sizeof(double complex))
+    memcpy(x, b, <size_t>(batch) * m * n * sizeof(double complex))
 
   cdef char cside = 'L' if left_side else 'R'
   cdef char cuplo = 'L' if lower else 'U'
@@ -160,7 +475,11 @@ cdef void blas_ztrsm(void* out, void** data) nogil:
   cdef char cdiag = 'U' if diag else 'N'
   cdef int lda = m if left_side else n
   cdef int ldb = m
-  ztrsm(&cside, &cuplo, &ctransa, &cdiag, &m, &n, alpha, a, &lda, x, &ldb)
+  cdef int i
+  for i in range(batch):
+    ztrsm(&cside, &cuplo, &ctransa, &cdiag, &m, &n, alpha, a, &lda, x, &ldb)
+    a += lda * lda
+    x += m * n
 
 register_cpu_custom_call_target(b"blas_ztrsm", <void*>(blas_ztrsm))
 
@@ -169,11 +488,15 @@ def jax_trsm(c, alpha, a, b, left_side=False, lower=False, trans_a=False,
              conj_a=False, diag=False):
   b_shape = c.GetShape(b)
   dtype = b_shape.element_type()
-  m, n = b_shape.dimensions()
+  dims = b_shape.dimensions()
+  batch_dims = tuple(dims[:-2])
+  num_bd = len(batch_dims)
+  m, n = dims[-2:]
   k = m if left_side else n
 
   a_shape = c.GetShape(a)
-  if (k, k) != a_shape.dimensions() or a_shape.element_type() != dtype:
+  if (batch_dims + (k, k) != a_shape.dimensions() or
+      a_shape.element_type() != dtype):
     raise ValueError("Argument mismatch for trsm, got {} and {}".format(
       a_shape, b_shape))
 
@@ -194,6 +517,7 @@ def jax_trsm(c, alpha, a, b, left_side=False, lower=False, trans_a=False,
   return c.CustomCall(
       fn,
       operands=(
+        c.ConstantS32Scalar(_prod(batch_dims)),
         c.ConstantS32Scalar(int(left_side)),
         c.ConstantS32Scalar(int(lower)),
         c.ConstantS32Scalar((2 if conj_a else 1) if trans_a else 0),
@@ -201,7 +525,8 @@ def jax_trsm(c, alpha, a, b, left_side=False, lower=False, trans_a=False,
         c.ConstantS32Scalar(m),
         c.ConstantS32Scalar(n),
         alpha, a, b),
-      shape_with_layout=Shape.array_shape(dtype, b_shape.dimensions(), (0, 1)),
+      shape_with_layout=Shape.array_shape(
+          dtype, dims, _batched_layout(num_bd, 2)),
       operand_shapes_with_layout=(
           Shape.array_shape(np.int32, (), ()),
           Shape.array_shape(np.int32, (), ()),
@@ -209,78 +534,133 @@ def jax_trsm(c, alpha, a, b, left_side=False, lower=False, trans_a=False,
           Shape.array_shape(np.int32, (), ()),
           Shape.array_shape(np.int32, (), ()),
           Shape.array_shape(np.int32, (), ()),
+          Shape.array_shape(np.int32, (), ()),
           Shape.array_shape(dtype, (), ()),
-          Shape.array_shape(dtype, a_shape.dimensions(), (0, 1)),
-          Shape.array_shape(dtype, b_shape.dimensions(), (0, 1)),
+          Shape.array_shape(
+              dtype, a_shape.dimensions(), _batched_layout(num_bd, 2)),
+          Shape.array_shape(dtype, dims, _batched_layout(num_bd, 2)),
       ))
 
 
 # ?getrf: LU decomposition
 
+cdef void _getrf_layout(_BatchChunk* chunk, void** data, size_t elem_size,
+                        size_t real_size) nogil:
+  cdef size_t m = (<int32_t*>(data[1]))[0]
+  cdef size_t n = (<int32_t*>(data[2]))[0]
+  chunk.num_operands = 4
+  chunk.num_results = 3
+  chunk.operand_strides[3] = m * n * elem_size
+  chunk.result_strides[0] = m * n * elem_size
+  chunk.result_strides[1] = min(m, n) * sizeof(int)
+  chunk.result_strides[2] = sizeof(int)
+  chunk.max_dim = max(m, n)
+  chunk.flops = <double>(m) * n * min(m, n)
+
 cdef void lapack_sgetrf(void* out_tuple, void** data) nogil:
-  cdef int m = (<int32_t*>(data[0]))[0]
-  cdef int n = (<int32_t*>(data[1]))[0]
-  cdef const float* a_in = <float*>(data[2])
+  cdef int batch = (<int32_t*>(data[0]))[0]
+  if _run_batch_in_parallel(lapack_sgetrf, out_tuple, data, _getrf_layout,
+                            sizeof(float), sizeof(float)):
+    return
+  batch = abs(batch)
+  cdef int m = (<int32_t*>(data[1]))[0]
+  cdef int n = (<int32_t*>(data[2]))[0]
+  cdef const float* a_in = <float*>(data[3])
 
   cdef void** out = <void**>(out_tuple)
   cdef float* a_out = <float*>(out[0])
   cdef int* ipiv = <int*>(out[1])
   cdef int* info = <int*>(out[2])
   if a_out != a_in:
-    memcpy(a_out, a_in, m * n * sizeof(float))
+    memcpy(a_out, a_in, <size_t>(batch) * m * n * sizeof(float))
 
-  sgetrf(&m, &n, a_out, &m, ipiv, info)
+  cdef int i
+  for i in range(batch):
+    sgetrf(&m, &n, a_out, &m, ipiv, info)
+    a_out += m * n
+    ipiv += min(m, n)
+    info += 1
 
 register_cpu_custom_call_target(b"lapack_sgetrf", <void*>(lapack_sgetrf))
 
 
 cdef void lapack_dgetrf(void* out_tuple, void** data) nogil:
-  cdef int m = (<int32_t*>(data[0]))[0]
-  cdef int n = (<int32_t*>(data[1]))[0]
-  cdef const double* a_in = <double*>(data[2])
+  cdef int batch = (<int32_t*>(data[0]))[0]
+  if _run_batch_in_parallel(lapack_dgetrf, out_tuple, data, _getrf_layout,
+                            sizeof(double), sizeof(double)):
+    return
+  batch = abs(batch)
+  cdef int m = (<int32_t*>(data[1]))[0]
+  cdef int n = (<int32_t*>(data[2]))[0]
+  cdef const double* a_in = <double*>(data[3])
 
   cdef void** out = <void**>(out_tuple)
   cdef double* a_out = <double*>(out[0])
   cdef int* ipiv = <int*>(out[1])
   cdef int* info = <int*>(out[2])
   if a_out != a_in:
-    memcpy(a_out, a_in, m * n * sizeof(double))
+    memcpy(a_out, a_in, <size_t>(batch) * m * n * sizeof(double))
 
-  dgetrf(&m, &n, a_out, &m, ipiv, info)
+  cdef int i
+  for i in range(batch):
+    dgetrf(&m, &n, a_out, &m, ipiv, info)
+    a_out += m * n
+    ipiv += min(m, n)
+    info += 1
 
 register_cpu_custom_call_target(b"lapack_dgetrf", <void*>(lapack_dgetrf))
 
 
 cdef void lapack_cgetrf(void* out_tuple, void** data) nogil:
-  cdef int m = (<int32_t*>(data[0]))[0]
-  cdef int n = (<int32_t*>(data[1]))[0]
-  cdef const float complex* a_in = <float complex*>(data[2])
+  cdef int batch = (<int32_t*>(data[0]))[0]
+  if _run_batch_in_parallel(lapack_cgetrf, out_tuple, data, _getrf_layout,
+                            sizeof(float complex), sizeof(float)):
+    return
+  batch = abs(batch)
+  cdef int m = (<int32_t*>(data[1]))[0]
+  cdef int n = (<int32_t*>(data[2]))[0]
+  cdef const float complex* a_in = <float complex*>(data[3])
 
   cdef void** out = <void**>(out_tuple)
   cdef float complex* a_out = <float complex*>(out[0])
   cdef int* ipiv = <int*>(out[1])
   cdef int* info = <int*>(out[2])
   if a_out != a_in:
-    memcpy(a_out, a_in, m * n * sizeof(float complex))
+    memcpy(a_out, a_in, <size_t>(batch) * m * n * sizeof(float complex))
 
-  cgetrf(&m, &n, a_out, &m, ipiv, info)
+  cdef int i
+  for i in range(batch):
+    cgetrf(&m, &n, a_out, &m, ipiv, info)
+    a_out += m * n
+    ipiv += min(m, n)
+    info += 1
 
 register_cpu_custom_call_target(b"lapack_cgetrf", <void*>(lapack_cgetrf))
 
 
 cdef void lapack_zgetrf(void* out_tuple, void** data) nogil:
-  cdef int m = (<int32_t*>(data[0]))[0]
-  cdef int n = (<int32_t*>(data[1]))[0]
-  cdef const double complex* a_in = <double complex*>(data[2])
+  cdef int batch = (<int32_t*>(data[0]))[0]
+  if _run_batch_in_parallel(lapack_zgetrf, out_tuple, data, _getrf_layout,
+                            sizeof(double complex), sizeof(double)):
+    return
+  batch = abs(batch)
+  cdef int m = (<int32_t*>(data[1]))[0]
+  cdef int n = (<int32_t*>(data[2]))[0]
+  cdef const double complex* a_in = <double complex*>(data[3])
 
   cdef void** out = <void**>(out_tuple)
   cdef double complex* a_out = <double complex*>(out[0])
   cdef int* ipiv = <int*>(out[1])
   cdef int* info = <int*>(out[2])
   if a_out != a_in:
-    memcpy(a_out, a_in, m * n * sizeof(double complex))
+    memcpy(a_out, a_in, <size_t>(batch) * m * n * sizeof(double complex))
 
-  zgetrf(&m, &n, a_out, &m, ipiv, info)
+  cdef int i
+  for i in range(batch):
+    zgetrf(&m, &n, a_out, &m, ipiv, info)
+    a_out += m * n
+    ipiv += min(m, n)
+    info += 1
 
 register_cpu_custom_call_target(b"lapack_zgetrf", <void*>(lapack_zgetrf))
 
@@ -289,7 +669,10 @@ def jax_getrf(c, a):
 
   a_shape = c.GetShape(a)
   dtype = a_shape.element_type()
-  m, n = a_shape.dimensions()
+  dims = a_shape.dimensions()
+  batch_dims = tuple(dims[:-2])
+  num_bd = len(batch_dims)
+  m, n = dims[-2:]
   if dtype == np.float32:
     fn = b"lapack_sgetrf"
   elif dtype == np.float64:
@@ -303,85 +686,135 @@ def jax_getrf(c, a):
 
   return c.CustomCall(
       fn,
-      operands=(c.ConstantS32Scalar(m), c.ConstantS32Scalar(n), a),
+      operands=(c.ConstantS32Scalar(_prod(batch_dims)),
+                c.ConstantS32Scalar(m), c.ConstantS32Scalar(n), a),
       shape_with_layout=Shape.tuple_shape((
-          Shape.array_shape(dtype, (m, n), (0, 1)),
-          Shape.array_shape(np.int32, (min(m, n),), (0,)),
-          Shape.array_shape(np.int32, (), ()),
+          Shape.array_shape(dtype, dims, _batched_layout(num_bd, 2)),
+          Shape.array_shape(np.int32, batch_dims + (min(m, n),),
+                            _batched_layout(num_bd, 1)),
+          Shape.array_shape(np.int32, batch_dims, _batched_layout(num_bd, 0)),
       )),
       operand_shapes_with_layout=(
           Shape.array_shape(np.int32, (), ()),
           Shape.array_shape(np.int32, (), ()),
-          Shape.array_shape(dtype, (m, n), (0, 1)),
+          Shape.array_shape(np.int32, (), ()),
+          Shape.array_shape(dtype, dims, _batched_layout(num_bd, 2)),
       ))
 
 
 
 # ?potrf: Cholesky decomposition
 
+cdef void _potrf_layout(_BatchChunk* chunk, void** data, size_t elem_size,
+                        size_t real_size) nogil:
+  cdef size_t n = (<int32_t*>(data[2]))[0]
+  chunk.num_operands = 4
+  chunk.num_results = 2
+  chunk.operand_strides[3] = n * n * elem_size
+  chunk.result_strides[0] = n * n * elem_size
+  chunk.result_strides[1] = sizeof(int)
+  chunk.max_dim = n
+  chunk.flops = <double>(n) * n * n / 3
+
 cdef void lapack_spotrf(void* out_tuple, void** data) nogil:
-  cdef int32_t lower = (<int32_t*>(data[0]))[0]
-  cdef int n = (<int32_t*>(data[1]))[0]
-  cdef const float* a_in = <float*>(data[2])
+  cdef int batch = (<int32_t*>(data[0]))[0]
+  if _run_batch_in_parallel(lapack_spotrf, out_tuple, data, _potrf_layout,
+                            sizeof(float), sizeof(float)):
+    return
+  batch = abs(batch)
+  cdef int32_t lower = (<int32_t*>(data[1]))[0]
+  cdef int n = (<int32_t*>(data[2]))[0]
+  cdef const float* a_in = <float*>(data[3])
   cdef char uplo = 'L' if lower else 'U'
 
   cdef void** out = <void**>(out_tuple)
   cdef float* a_out = <float*>(out[0])
   cdef int* info = <int*>(out[1])
   if a_out != a_in:
-    memcpy(a_out, a_in, n * n * sizeof(float))
+    memcpy(a_out, a_in, <size_t>(batch) * n * n * sizeof(float))
 
-  spotrf(&uplo, &n, a_out, &n, info)
+  cdef int i
+  for i in range(batch):
+    spotrf(&uplo, &n, a_out, &n, info)
+    a_out += n * n
+    info += 1
 
 register_cpu_custom_call_target(b"lapack_spotrf", <void*>(lapack_spotrf))
 
 
 cdef void lapack_dpotrf(void* out_tuple, void** data) nogil:
-  cdef int32_t lower = (<int32_t*>(data[0]))[0]
-  cdef int n = (<int32_t*>(data[1]))[0]
-  cdef const double* a_in = <double*>(data[2])
+  cdef int batch = (<int32_t*>(data[0]))[0]
+  if _run_batch_in_parallel(lapack_dpotrf, out_tuple, data, _potrf_layout,
+                            sizeof(double), sizeof(double)):
+    return
+  batch = abs(batch)
+  cdef int32_t lower = (<int32_t*>(data[1]))[0]
+  cdef int n = (<int32_t*>(data[2]))[0]
+  cdef const double* a_in = <double*>(data[3])
   cdef char uplo = 'L' if lower else 'U'
 
   cdef void** out = <void**>(out_tuple)
   cdef double* a_out = <double*>(out[0])
   cdef int* info = <int*>(out[1])
   if a_out != a_in:
-    memcpy(a_out, a_in, n * n * sizeof(double))
+    memcpy(a_out, a_in, <size_t>(batch) * n * n * sizeof(double))
 
-  dpotrf(&uplo, &n, a_out, &n, info)
+  cdef int i
+  for i in range(batch):
+    dpotrf(&uplo, &n, a_out, &n, info)
+    a_out += n * n
+    info += 1
 
 register_cpu_custom_call_target(b"lapack_dpotrf", <void*>(lapack_dpotrf))
 
 
 cdef void lapack_cpotrf(void* out_tuple, void** data) nogil:
-  cdef int32_t lower = (<int32_t*>(data[0]))[0]
-  cdef int n = (<int32_t*>(data[1]))[0]
-  cdef const float complex* a_in = <float complex*>(data[2])
+  cdef int batch = (<int32_t*>(data[0]))[0]
+  if _run_batch_in_parallel(lapack_cpotrf, out_tuple, data, _potrf_layout,
+                            sizeof(float complex), sizeof(float)):
+    return
+  batch = abs(batch)
+  cdef int32_t lower = (<int32_t*>(data[1]))[0]
+  cdef int n = (<int32_t*>(data[2]))[0]
+  cdef const float complex* a_in = <float complex*>(data[3])
   cdef char uplo = 'L' if lower else 'U'
 
   cdef void** out = <void**>(out_tuple)
   cdef float complex* a_out = <float complex*>(out[0])
   cdef int* info = <int*>(out[1])
   if a_out != a_in:
-    memcpy(a_out, a_in, n * n * sizeof(float complex))
+    memcpy(a_out, a_in, <size_t>(batch) * n * n * sizeof(float complex))
 
-  cpotrf(&uplo, &n, a_out, &n, info)
+  cdef int i
+  for i in range(batch):
+    cpotrf(&uplo, &n, a_out, &n, info)
+    a_out += n * n
+    info += 1
 
 register_cpu_custom_call_target(b"lapack_cpotrf", <void*>(lapack_cpotrf))
 
 cdef void lapack_zpotrf(void* out_tuple, void** data) nogil:
-  cdef int32_t lower = (<int32_t*>(data[0]))[0]
-  cdef int n = (<int32_t*>(data[1]))[0]
-  cdef const double complex* a_in = <double complex*>(data[2])
+  cdef int batch = (<int32_t*>(data[0]))[0]
+  if _run_batch_in_parallel(lapack_zpotrf, out_tuple, data, _potrf_layout,
+                            sizeof(double complex), sizeof(double)):
+    return
+  batch = abs(batch)
+  cdef int32_t lower = (<int32_t*>(data[1]))[0]
+  cdef int n = (<int32_t*>(data[2]))[0]
+  cdef const double complex* a_in = <double complex*>(data[3])
   cdef char uplo = 'L' if lower else 'U'
 
   cdef void** out = <void**>(out_tuple)
   cdef double complex* a_out = <double complex*>(out[0])
   cdef int* info = <int*>(out[1])
   if a_out != a_in:
-    memcpy(a_out, a_in, n * n * sizeof(double complex))
+    memcpy(a_out, a_in, <size_t>(batch) * n * n * sizeof(double complex))
 
-  zpotrf(&uplo, &n, a_out, &n, info)
+  cdef int i
+  for i in range(batch):
+    zpotrf(&uplo, &n, a_out, &n, info)
+    a_out += n * n
+    info += 1
 
 register_cpu_custom_call_target(b"lapack_zpotrf", <void*>(lapack_zpotrf))
 
@@ -390,7 +823,10 @@ def jax_potrf(c, a, lower=False):
 
   a_shape = c.GetShape(a)
   dtype = a_shape.element_type()
-  m, n = a_shape.dimensions()
+  dims = a_shape.dimensions()
+  batch_dims = tuple(dims[:-2])
+  num_bd = len(batch_dims)
+  m, n = dims[-2:]
   if m != n:
     raise ValueError("potrf expects a square matrix, got {}".format(a_shape))
   if dtype == np.float32:
@@ -406,15 +842,17 @@ def jax_potrf(c, a, lower=False):
 
   return c.CustomCall(
       fn,
-      operands=(c.ConstantS32Scalar(int(lower)), c.ConstantS32Scalar(n), a),
+      operands=(c.ConstantS32Scalar(_prod(batch_dims)),
+                c.ConstantS32Scalar(int(lower)), c.ConstantS32Scalar(n), a),
       shape_with_layout=Shape.tuple_shape((
-          Shape.array_shape(dtype, (n, n), (0, 1)),
-          Shape.array_shape(np.int32, (), ()),
+          Shape.array_shape(dtype, dims, _batched_layout(num_bd, 2)),
+          Shape.array_shape(np.int32, batch_dims, _batched_layout(num_bd, 0)),
       )),
       operand_shapes_with_layout=(
           Shape.array_shape(np.int32, (), ()),
           Shape.array_shape(np.int32, (), ()),
-          Shape.array_shape(dtype, (n, n), (0, 1)),
+          Shape.array_shape(np.int32, (), ()),
+          Shape.array_shape(dtype, dims, _batched_layout(num_bd, 2)),
       ))
 
 
@@ -430,12 +868,38 @@ cdef int cgesdd_rwork_size(int m, int n, int compute_uv) nogil:
   cdef int mx = max(m, n)
   return max(5 * mn * mn + 5 * mn, 2 * mx * mn + 2 * mn * mn + mn)
 
+cdef void _gesdd_layout(_BatchChunk* chunk, void** data, size_t elem_size,
+                        size_t real_size) nogil:
+  cdef int32_t full_matrices = (<int32_t*>(data[1]))[0]
+  cdef int32_t compute_uv = (<int32_t*>(data[2]))[0]
+  cdef size_t m = (<int32_t*>(data[3]))[0]
+  cdef size_t n = (<int32_t*>(data[4]))[0]
+  cdef size_t mn = min(m, n)
+  chunk.num_operands = 6
+  chunk.num_results = 6 if elem_size == real_size else 7
+  chunk.operand_strides[5] = m * n * elem_size
+  chunk.result_strides[0] = m * n * elem_size
+  chunk.result_strides[1] = mn * real_size
+  chunk.result_strides[2] = m * (m if full_matrices else mn) * elem_size
+  chunk.result_strides[3] = (n if full_matrices else mn) * n * elem_size
+  chunk.result_strides[4] = sizeof(int)
+  chunk.scratch_sizes[5] = gesdd_iwork_size(m, n) * sizeof(int)
+  if elem_size != real_size:
+    chunk.scratch_sizes[6] = cgesdd_rwork_size(m, n, compute_uv) * real_size
+  chunk.max_dim = max(m, n)
+  chunk.flops = 4. * m * n * mn
+
 cdef void lapack_sgesdd(void* out_tuple, void** data) nogil:
-  cdef int32_t job_opt_full_matrices = (<int32_t*>(data[0]))[0]
-  cdef int32_t job_opt_compute_uv = (<int32_t*>(data[1]))[0]
-  cdef int m = (<int32_t*>(data[2]))[0]
-  cdef int n = (<int32_t*>(data[3]))[0]
-  cdef float* a_in = <float*>(data[4])
+  cdef int batch = (<int32_t*>(data[0]))[0]
+  if _run_batch_in_parallel(lapack_sgesdd, out_tuple, data, _gesdd_layout,
+                            sizeof(float), sizeof(float)):
+    return
+  batch = abs(batch)
+  cdef int32_t job_opt_full_matrices = (<int32_t*>(data[1]))[0]
+  cdef int32_t job_opt_compute_uv = (<int32_t*>(data[2]))[0]
+  cdef int m = (<int32_t*>(data[3]))[0]
+  cdef int n = (<int32_t*>(data[4]))[0]
+  cdef float* a_in = <float*>(data[5])
 
   cdef void** out = <void**>(out_tuple)
   cdef float* a_out = <float*>(out[0])
@@ -446,7 +910,7 @@ cdef void lapack_sgesdd(void* out_tuple, void** data) nogil:
   cdef int* iwork = <int*>(out[5])
 
   if a_out != a_in:
-    memcpy(a_out, a_in, m * n * sizeof(float))
+    memcpy(a_out, a_in, <size_t>(batch) * m * n * sizeof(float))
 
   # define appropriate job code
   cdef char jobz = 'A'
@@ -470,20 +934,34 @@ cdef void lapack_sgesdd(void* out_tuple, void** data) nogil:
   sgesdd(&jobz, &m, &n, a_out, &lda, s, u, &ldu, vt, &ldvt, &wkopt, &lwork, iwork, info)
   lwork = <int> wkopt
 
+  cdef int u_cols = m if job_opt_full_matrices else min(m, n)
+
   # Now get the actual SVD
   cdef float* work = <float *> malloc(lwork * sizeof(float))
-  sgesdd(&jobz, &m, &n, a_out, &lda, s, u, &ldu, vt, &ldvt, work, &lwork, iwork, info)
+  cdef int i
+  for i in range(batch):
+    sgesdd(&jobz, &m, &n, a_out, &lda, s, u, &ldu, vt, &ldvt, work, &lwork, iwork, info)
+    a_out += m * n
+    s += min(m, n)
+    u += ldu * u_cols
+    vt += ldvt * n
+    info += 1
   free(work)
 
 register_cpu_custom_call_target(b"lapack_sgesdd", <void*>(lapack_sgesdd))
 
 
 cdef void lapack_dgesdd(void* out_tuple, void** data) nogil:
-  cdef int32_t job_opt_full_matrices = (<int32_t*>(data[0]))[0]
-  cdef int32_t job_opt_compute_uv = (<int32_t*>(data[1]))[0]
-  cdef int m = (<int32_t*>(data[2]))[0]
-  cdef int n = (<int32_t*>(data[3]))[0]
-  cdef double* a_in = <double*>(data[4])
+  cdef int batch = (<int32_t*>(data[0]))[0]
+  if _run_batch_in_parallel(lapack_dgesdd, out_tuple, data, _gesdd_layout,
+                            sizeof(double), sizeof(double)):
+    return
+  batch = abs(batch)
+  cdef int32_t job_opt_full_matrices = (<int32_t*>(data[1]))[0]
+  cdef int32_t job_opt_compute_uv = (<int32_t*>(data[2]))[0]
+  cdef int m = (<int32_t*>(data[3]))[0]
+  cdef int n = (<int32_t*>(data[4]))[0]
+  cdef double* a_in = <double*>(data[5])
 
   cdef void** out = <void**>(out_tuple)
   cdef double* a_out = <double*>(out[0])
@@ -494,7 +972,7 @@ cdef void lapack_dgesdd(void* out_tuple, void** data) nogil:
   cdef int* iwork = <int*>(out[5])
 
   if a_out != a_in:
-    memcpy(a_out, a_in, m * n * sizeof(double))
+    memcpy(a_out, a_in, <size_t>(batch) * m * n * sizeof(double))
 
   # define appropriate job code
   cdef char jobz = 'A'
@@ -518,20 +996,34 @@ cdef void lapack_dgesdd(void* out_tuple, void** data) nogil:
   dgesdd(&jobz, &m, &n, a_out, &lda, s, u, &ldu, vt, &ldvt, &wkopt, &lwork, iwork, info)
   lwork = <int> wkopt
 
+  cdef int u_cols = m if job_opt_full_matrices else min(m, n)
+
   # Now get the actual SVD
   cdef double* work = <double *> malloc(lwork * sizeof(double))
-  dgesdd(&jobz, &m, &n, a_out, &lda, s, u, &ldu, vt, &ldvt, work, &lwork, iwork, info)
+  cdef int i
+  for i in range(batch):
+    dgesdd(&jobz, &m, &n, a_out, &lda, s, u, &ldu, vt, &ldvt, work, &lwork, iwork, info)
+    a_out += m * n
+    s += min(m, n)
+    u += ldu * u_cols
+    vt += ldvt * n
+    info += 1
   free(work)
 
 register_cpu_custom_call_target(b"lapack_dgesdd", <void*>(lapack_dgesdd))
 
 
 cdef void lapack_cgesdd(void* out_tuple, void** data) nogil:
-  cdef int32_t job_opt_full_matrices = (<int32_t*>(data[0]))[0]
-  cdef int32_t job_opt_compute_uv = (<int32_t*>(data[1]))[0]
-  cdef int m = (<int32_t*>(data[2]))[0]
-  cdef int n = (<int32_t*>(data[3]))[0]
-  cdef float complex* a_in = <float complex*>(data[4])
+  cdef int batch = (<int32_t*>(data[0]))[0]
+  if _run_batch_in_parallel(lapack_cgesdd, out_tuple, data, _gesdd_layout,
+                            sizeof(float complex), sizeof(float)):
+    return
+  batch = abs(batch)
+  cdef int32_t job_opt_full_matrices = (<int32_t*>(data[1]))[0]
+  cdef int32_t job_opt_compute_uv = (<int32_t*>(data[2]))[0]
+  cdef int m = (<int32_t*>(data[3]))[0]
+  cdef int n = (<int32_t*>(data[4]))[0]
+  cdef float complex* a_in = <float complex*>(data[5])
 
   cdef void** out = <void**>(out_tuple)
   cdef float complex* a_out = <float complex*>(out[0])
@@ -543,7 +1035,7 @@ cdef void lapack_cgesdd(void* out_tuple, void** data) nogil:
   cdef float* rwork = <float*>(out[6])
 
   if a_out != a_in:
-    memcpy(a_out, a_in, m * n * sizeof(float complex))
+    memcpy(a_out, a_in, <size_t>(batch) * m * n * sizeof(float complex))
 
   # define appropriate job code
   cdef char jobz = 'A'
@@ -567,20 +1059,34 @@ cdef void lapack_cgesdd(void* out_tuple, void** data) nogil:
   cgesdd(&jobz, &m, &n, a_out, &lda, s, u, &ldu, vt, &ldvt, &wkopt, &lwork, rwork, iwork, info)
   lwork = <int>(wkopt.real)
 
+  cdef int u_cols = m if job_opt_full_matrices else min(m, n)
+
   # Now get the actual SVD
   cdef float complex* work = <float complex*> malloc(lwork * sizeof(float complex))
-  cgesdd(&jobz, &m, &n, a_out, &lda, s, u, &ldu, vt, &ldvt, work, &lwork, rwork, iwork, info)
+  cdef int i
+  for i in range(batch):
+    cgesdd(&jobz, &m, &n, a_out, &lda, s, u, &ldu, vt, &ldvt, work, &lwork, rwork, iwork, info)
+    a_out += m * n
+    s += min(m, n)
+    u += ldu * u_cols
+    vt += ldvt * n
+    info += 1
   free(work)
 
 register_cpu_custom_call_target(b"lapack_cgesdd", <void*>(lapack_cgesdd))
 
 
 cdef void lapack_zgesdd(void* out_tuple, void** data) nogil:
-  cdef int32_t job_opt_full_matrices = (<int32_t*>(data[0]))[0]
-  cdef int32_t job_opt_compute_uv = (<int32_t*>(data[1]))[0]
-  cdef int m = (<int32_t*>(data[2]))[0]
-  cdef int n = (<int32_t*>(data[3]))[0]
-  cdef double complex* a_in = <double complex*>(data[4])
+  cdef int batch = (<int32_t*>(data[0]))[0]
+  if _run_batch_in_parallel(lapack_zgesdd, out_tuple, data, _gesdd_layout,
+                            sizeof(double complex), sizeof(double)):
+    return
+  batch = abs(batch)
+  cdef int32_t job_opt_full_matrices = (<int32_t*>(data[1]))[0]
+  cdef int32_t job_opt_compute_uv = (<int32_t*>(data[2]))[0]
+  cdef int m = (<int32_t*>(data[3]))[0]
+  cdef int n = (<int32_t*>(data[4]))[0]
+  cdef double complex* a_in = <double complex*>(data[5])
 
   cdef void** out = <void**>(out_tuple)
   cdef double complex* a_out = <double complex*>(out[0])
@@ -592,7 +1098,7 @@ cdef void lapack_zgesdd(void* out_tuple, void** data) nogil:
   cdef double* rwork = <double*>(out[6])
 
   if a_out != a_in:
-    memcpy(a_out, a_in, m * n * sizeof(double complex))
+    memcpy(a_out, a_in, <size_t>(batch) * m * n * sizeof(double complex))
 
   # define appropriate job code
   cdef char jobz = 'A'
@@ -616,9 +1122,18 @@ cdef void lapack_zgesdd(void* out_tuple, void** data) nogil:
   zgesdd(&jobz, &m, &n, a_out, &lda, s, u, &ldu, vt, &ldvt, &wkopt, &lwork, rwork, iwork, info)
   lwork = <int>(wkopt.real)
 
+  cdef int u_cols = m if job_opt_full_matrices else min(m, n)
+
   # Now get the actual SVD
   cdef double complex* work = <double complex*> malloc(lwork * sizeof(double complex))
-  zgesdd(&jobz, &m, &n, a_out, &lda, s, u, &ldu, vt, &ldvt, work, &lwork, rwork, iwork, info)
+  cdef int i
+  for i in range(batch):
+    zgesdd(&jobz, &m, &n, a_out, &lda, s, u, &ldu, vt, &ldvt, work, &lwork, rwork, iwork, info)
+    a_out += m * n
+    s += min(m, n)
+    u += ldu * u_cols
+    vt += ldvt * n
+    info += 1
   free(work)
 
 register_cpu_custom_call_target(b"lapack_zgesdd", <void*>(lapack_zgesdd))
@@ -628,7 +1143,10 @@ def jax_gesdd(c, a, full_matrices=True, compute_uv=True):
 
   a_shape = c.GetShape(a)
   dtype = a_shape.element_type()
-  m, n = a_shape.dimensions()
+  dims = a_shape.dimensions()
+  batch_dims = tuple(dims[:-2])
+  num_bd = len(batch_dims)
+  m, n = dims[-2:]
   if dtype == np.float32:
     fn = b"lapack_sgesdd"
     singular_vals_dtype = np.float32
@@ -652,21 +1170,26 @@ def jax_gesdd(c, a, full_matrices=True, compute_uv=True):
 
   out = c.CustomCall(
       fn,
-      operands=(c.ConstantS32Scalar(int(full_matrices)), c.ConstantS32Scalar(int(compute_uv)),
+      operands=(c.ConstantS32Scalar(_prod(batch_dims)),
+                c.ConstantS32Scalar(int(full_matrices)), c.ConstantS32Scalar(int(compute_uv)),
                 c.ConstantS32Scalar(m), c.ConstantS32Scalar(n), a),
       shape_with_layout=Shape.tuple_shape((
-          Shape.array_shape(dtype, (m, n), (0, 1)),
-          Shape.array_shape(singular_vals_dtype, (min(m, n),), (0,)),
-          Shape.array_shape(dtype, (m, m if full_matrices else min(m, n)), (0, 1)),
-          Shape.array_shape(dtype, (n if full_matrices else min(m, n), n), (0, 1)),
-          Shape.array_shape(np.int32, (), ())) + workspace
+          Shape.array_shape(dtype, dims, _batched_layout(num_bd, 2)),
+          Shape.array_shape(singular_vals_dtype, batch_dims + (min(m, n),),
+                            _batched_layout(num_bd, 1)),
+          Shape.array_shape(dtype, batch_dims + (m, m if full_matrices else min(m, n)),
+                            _batched_layout(num_bd, 2)),
+          Shape.array_shape(dtype, batch_dims + (n if full_matrices else min(m, n), n),
+                            _batched_layout(num_bd, 2)),
+          Shape.array_shape(np.int32, batch_dims, _batched_layout(num_bd, 0))) + workspace
       ),
       operand_shapes_with_layout=(
           Shape.array_shape(np.int32, (), ()),
           Shape.array_shape(np.int32, (), ()),
           Shape.array_shape(np.int32, (), ()),
           Shape.array_shape(np.int32, (), ()),
-          Shape.array_shape(dtype, (m, n), (0, 1)),
+          Shape.array_shape(np.int32, (), ()),
+          Shape.array_shape(dtype, dims, _batched_layout(num_bd, 2)),
       ))
   return c.Tuple(c.GetTupleElement(out, 1), c.GetTupleElement(out, 2),
                  c.GetTupleElement(out, 3), c.GetTupleElement(out, 4))
@@ -681,10 +1204,41 @@ cdef int syevd_work_size(int n) nogil:
 cdef int syevd_iwork_size(int n) nogil:
   return 3 + 5 * n
 
+cdef int heevd_work_size(int n) nogil:
+  return 1 + 2 * n + n * n
+
+cdef int heevd_rwork_size(int n) nogil:
+  return 1 + 5 * n + 2 * n * n
+
+cdef void _syevd_layout(_BatchChunk* chunk, void** data, size_t elem_size,
+                        size_t real_size) nogil:
+  cdef size_t n = (<int32_t*>(data[2]))[0]
+  chunk.num_operands = 4
+  chunk.operand_strides[3] = n * n * elem_size
+  chunk.result_strides[0] = n * n * elem_size
+  chunk.result_strides[1] = n * real_size
+  chunk.result_strides[2] = sizeof(int)
+  if elem_size == real_size:
+    chunk.num_results = 5
+    chunk.scratch_sizes[3] = syevd_work_size(n) * elem_size
+    chunk.scratch_sizes[4] = syevd_iwork_size(n) * sizeof(int)
+  else:
+    chunk.num_results = 6
+    chunk.scratch_sizes[3] = heevd_work_size(n) * elem_size
+    chunk.scratch_sizes[4] = heevd_rwork_size(n) * real_size
+    chunk.scratch_sizes[5] = syevd_iwork_size(n) * sizeof(int)
+  chunk.max_dim = n
+  chunk.flops = 9. * n * n * n
+
 cdef void lapack_ssyevd(void* out_tuple, void** data) nogil:
-  cdef int32_t lower = (<int32_t*>(data[0]))[0]
-  cdef int n = (<int32_t*>(data[1]))[0]
-  cdef const float* a_in = <float*>(data[2])
+  cdef int batch = (<int32_t*>(data[0]))[0]
+  if _run_batch_in_parallel(lapack_ssyevd, out_tuple, data, _syevd_layout,
+                            sizeof(float), sizeof(float)):
+    return
+  batch = abs(batch)
+  cdef int32_t lower = (<int32_t*>(data[1]))[0]
+  cdef int n = (<int32_t*>(data[2]))[0]
+  cdef const float* a_in = <float*>(data[3])
 
   cdef void** out = <void**>(out_tuple)
   cdef float* a_out = <float*>(out[0])
@@ -693,22 +1247,32 @@ cdef void lapack_ssyevd(void* out_tuple, void** data) nogil:
   cdef float* work = <float*>(out[3])
   cdef int* iwork = <int*>(out[4])
   if a_out != a_in:
-    memcpy(a_out, a_in, n * n * sizeof(float))
+    memcpy(a_out, a_in, <size_t>(batch) * n * n * sizeof(float))
 
   cdef char jobz = 'V'
   cdef char uplo = 'L' if lower else 'U'
 
   cdef int lwork = syevd_work_size(n)
   cdef int liwork = syevd_iwork_size(n)
-  ssyevd(&jobz, &uplo, &n, a_out, &n, w_out, work, &lwork, iwork, &liwork,
-         info_out)
+  cdef int i
+  for i in range(batch):
+    ssyevd(&jobz, &uplo, &n, a_out, &n, w_out, work, &lwork, iwork, &liwork,
+           info_out)
+    a_out += n * n
+    w_out += n
+    info_out += 1
 
 register_cpu_custom_call_target(b"lapack_ssyevd", <void*>(lapack_ssyevd))
 
 cdef void lapack_dsyevd(void* out_tuple, void** data) nogil:
-  cdef int32_t lower = (<int32_t*>(data[0]))[0]
-  cdef int n = (<int32_t*>(data[1]))[0]
-  cdef const double* a_in = <double*>(data[2])
+  cdef int batch = (<int32_t*>(data[0]))[0]
+  if _run_batch_in_parallel(lapack_dsyevd, out_tuple, data, _syevd_layout,
+                            sizeof(double), sizeof(double)):
+    return
+  batch = abs(batch)
+  cdef int32_t lower = (<int32_t*>(data[1]))[0]
+  cdef int n = (<int32_t*>(data[2]))[0]
+  cdef const double* a_in = <double*>(data[3])
 
   cdef void** out = <void**>(out_tuple)
   cdef double* a_out = <double*>(out[0])
@@ -717,30 +1281,33 @@ cdef void lapack_dsyevd(void* out_tuple, void** data) nogil:
   cdef double* work = <double*>(out[3])
   cdef int* iwork = <int*>(out[4])
   if a_out != a_in:
-    memcpy(a_out, a_in, n * n * sizeof(double))
+    memcpy(a_out, a_in, <size_t>(batch) * n * n * sizeof(double))
 
   cdef char jobz = 'V'
   cdef char uplo = 'L' if lower else 'U'
 
   cdef int lwork = syevd_work_size(n)
   cdef int liwork = syevd_iwork_size(n)
-  dsyevd(&jobz, &uplo, &n, a_out, &n, w_out, work, &lwork, iwork, &liwork,
-         info_out)
+  cdef int i
+  for i in range(batch):
+    dsyevd(&jobz, &uplo, &n, a_out, &n, w_out, work, &lwork, iwork, &liwork,
+           info_out)
+    a_out += n * n
+    w_out += n
+    info_out += 1
 
 register_cpu_custom_call_target(b"lapack_dsyevd", <void*>(lapack_dsyevd))
 
-# Workspace sizes, taken from the LAPACK documentation.
-cdef int heevd_work_size(int n) nogil:
-  return 1 + 2 * n + n * n
-
-cdef int heevd_rwork_size(int n) nogil:
-  return 1 + 5 * n + 2 * n * n
-
 
 cdef void lapack_cheevd(void* out_tuple, void** data) nogil:
-  cdef int32_t lower = (<int32_t*>(data[0]))[0]
-  cdef int n = (<int32_t*>(data[1]))[0]
-  cdef const float complex* a_in = <float complex*>(data[2])
+  cdef int batch = (<int32_t*>(data[0]))[0]
+  if _run_batch_in_parallel(lapack_cheevd, out_tuple, data, _syevd_layout,
+                            sizeof(float complex), sizeof(float)):
+    return
+  batch = abs(batch)
+  cdef int32_t lower = (<int32_t*>(data[1]))[0]
+  cdef int n = (<int32_t*>(data[2]))[0]
+  cdef const float complex* a_in = <float complex*>(data[3])
 
   cdef void** out = <void**>(out_tuple)
   cdef float complex* a_out = <float complex*>(out[0])
@@ -750,7 +1317,7 @@ cdef void lapack_cheevd(void* out_tuple, void** data) nogil:
   cdef float* rwork = <float*>(out[4])
   cdef int* iwork = <int*>(out[5])
   if a_out != a_in:
-    memcpy(a_out, a_in, n * n * sizeof(float complex))
+    memcpy(a_out, a_in, <size_t>(batch) * n * n * sizeof(float complex))
 
   cdef char jobz = 'V'
   cdef char uplo = 'L' if lower else 'U'
@@ -758,16 +1325,26 @@ cdef void lapack_cheevd(void* out_tuple, void** data) nogil:
   cdef int lwork = heevd_work_size(n)
   cdef int lrwork = heevd_rwork_size(n)
   cdef int liwork = syevd_iwork_size(n)
-  cheevd(&jobz, &uplo, &n, a_out, &n, w_out, work, &lwork, rwork, &lrwork,
-         iwork, &liwork, info_out)
+  cdef int i
+  for i in range(batch):
+    cheevd(&jobz, &uplo, &n, a_out, &n, w_out, work, &lwork, rwork, &lrwork,
+           iwork, &liwork, info_out)
+    a_out += n * n
+    w_out += n
+    info_out += 1
 
 register_cpu_custom_call_target(b"lapack_cheevd", <void*>(lapack_cheevd))
 
 
 cdef void lapack_zheevd(void* out_tuple, void** data) nogil:
-  cdef int32_t lower = (<int32_t*>(data[0]))[0]
-  cdef int n = (<int32_t*>(data[1]))[0]
-  cdef const double complex* a_in = <double complex*>(data[2])
+  cdef int batch = (<int32_t*>(data[0]))[0]
+  if _run_batch_in_parallel(lapack_zheevd, out_tuple, data, _syevd_layout,
+                            sizeof(double complex), sizeof(double)):
+    return
+  batch = abs(batch)
+  cdef int32_t lower = (<int32_t*>(data[1]))[0]
+  cdef int n = (<int32_t*>(data[2]))[0]
+  cdef const double complex* a_in = <double complex*>(data[3])
 
   cdef void** out = <void**>(out_tuple)
   cdef double complex* a_out = <double complex*>(out[0])
@@ -777,7 +1354,7 @@ cdef void lapack_zheevd(void* out_tuple, void** data) nogil:
   cdef double* rwork = <double*>(out[4])
   cdef int* iwork = <int*>(out[5])
   if a_out != a_in:
-    memcpy(a_out, a_in, n * n * sizeof(double complex))
+    memcpy(a_out, a_in, <size_t>(batch) * n * n * sizeof(double complex))
 
   cdef char jobz = 'V'
   cdef char uplo = 'L' if lower else 'U'
@@ -785,8 +1362,13 @@ cdef void lapack_zheevd(void* out_tuple, void** data) nogil:
   cdef int lwork = heevd_work_size(n)
   cdef int lrwork = heevd_rwork_size(n)
   cdef int liwork = syevd_iwork_size(n)
-  zheevd(&jobz, &uplo, &n, a_out, &n, w_out, work, &lwork, rwork, &lrwork,
-         iwork, &liwork, info_out)
+  cdef int i
+  for i in range(batch):
+    zheevd(&jobz, &uplo, &n, a_out, &n, w_out, work, &lwork, rwork, &lrwork,
+           iwork, &liwork, info_out)
+    a_out += n * n
+    w_out += n
+    info_out += 1
 
 register_cpu_custom_call_target(b"lapack_zheevd", <void*>(lapack_zheevd))
 
@@ -795,7 +1377,10 @@ def jax_syevd(c, a, lower=False):
 
   a_shape = c.GetShape(a)
   dtype = a_shape.element_type()
-  m, n = a_shape.dimensions()
+  dims = a_shape.dimensions()
+  batch_dims = tuple(dims[:-2])
+  num_bd = len(batch_dims)
+  m, n = dims[-2:]
   if dtype == np.float32:
     fn = b"lapack_ssyevd"
     eigvals_type = np.float32
@@ -823,18 +1408,22 @@ def jax_syevd(c, a, lower=False):
 
   out = c.CustomCall(
       fn,
-      operands=(c.ConstantS32Scalar(1 if lower else 0),
+      operands=(c.ConstantS32Scalar(_prod(batch_dims)),
+                c.ConstantS32Scalar(1 if lower else 0),
                 c.ConstantS32Scalar(n),
                 a),
       shape_with_layout=Shape.tuple_shape((
-          Shape.array_shape(dtype, (n, n), (0, 1)),
-          Shape.array_shape(eigvals_type, (n,), (0,)),
-          Shape.array_shape(np.int32, (), ())) + workspace
+          Shape.array_shape(dtype, dims, _batched_layout(num_bd, 2)),
+          Shape.array_shape(eigvals_type, batch_dims + (n,),
+                            _batched_layout(num_bd, 1)),
+          Shape.array_shape(np.int32, batch_dims,
+                            _batched_layout(num_bd, 0))) + workspace
       ),
       operand_shapes_with_layout=(
           Shape.array_shape(np.int32, (), ()),
           Shape.array_shape(np.int32, (), ()),
-          Shape.array_shape(dtype, (n, n), (0, 1)),
+          Shape.array_shape(np.int32, (), ()),
+          Shape.array_shape(dtype, dims, _batched_layout(num_bd, 2)),
       ))
   return c.Tuple(c.GetTupleElement(out, 0), c.GetTupleElement(out, 1),
                  c.GetTupleElement(out, 2))
@@ -17,6 +17,7 @@ from __future__ import division
 from __future__ import print_function
 
 import operator
+import sys
 from collections import namedtuple
 from unittest import skip
 
@@ -30,7 +31,8 @@ from jax import numpy as np
 from jax import test_util as jtu
 from jax.api import jvp, linearize, vjp, jit
 from jax.lax import UnshapedArray, ShapedArray, ConcreteArray
-from jax.tree_util import tree_flatten, tree_unflatten, tree_multimap, tree_reduce
+from jax.tree_util import (tree_flatten, tree_unflatten, tree_multimap,
+                           tree_reduce, build_tree)
 from jax.util import partial
 from jax.interpreters import partial_eval as pe
 from jax.interpreters import xla
@@ -205,6 +207,37 @@ class CoreTest(jtu.JaxTestCase):
     nodes_equal = tree_multimap(operator.eq, tree, tree2)
     assert tree_reduce(operator.and_, nodes_equal)
 
+  def test_treedef_eq_and_hash(self):
+    _, treedef = tree_flatten([(1, 2), {"roy": (3, [4, 5, ()])}, None])
+    _, treedef2 = tree_flatten([(6, 7), {"roy": (8, [9, 10, ()])}, None])
+    _, treedef3 = tree_flatten([(1, 2), {"roy": (3, [4, 5])}, None])
+    assert treedef == treedef2
+    assert hash(treedef) == hash(treedef2)
+    assert treedef != treedef3
+    assert treedef.num_leaves == treedef3.num_leaves == 5
+
+  def test_tree_flatten_deep(self):
+    tree = 0
+    for _ in range(5 * sys.getrecursionlimit()):
+      tree = [tree]
+    flat, treedef = tree_flatten(tree)
+    assert flat == [0]
+    tree2 = tree_unflatten(treedef, [1])
+    for _ in range(5 * sys.getrecursionlimit()):
+      tree2, = tree2
+    assert tree2 == 1
+
+  def test_tree_multimap_prefix(self):
+    xs = (1, [2, 3])
+    ys = ((4, 5), [{'a': 6}, None])
+    out = tree_multimap(lambda x, y: (x, y), xs, ys)
+    assert out == ((1, (4, 5)), [(2, {'a': 6}), (3, None)])
+
+  def test_build_tree(self):
+    _, treedef = tree_flatten(({'a': 1, 'b': 2}, [3]))
+    tree = build_tree(treedef, ((1, 2), (3,)))
+    assert tree == ({'a': 1, 'b': 2}, [3])
+
   @parameterized.parameters(test_specs)
   def test_jit(self, f, args):
     jtu.check_eq(jit(f)(*args), f(*args))
@@ -0,0 +1,179 @@
+# Copyright 2018 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for jax.numpy.fft and the fft primitive in jax.lax_fft."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import itertools
+
+import numpy as onp
+
+from absl.testing import absltest
+from absl.testing import parameterized
+
+from jax import api
+from jax import lax_fft
+from jax import numpy as np
+from jax import test_util as jtu
+
+from jax.config import config
+config.parse_flags_with_absl()
+
+float_dtypes = [onp.float32, onp.float64]
+complex_dtypes = [onp.complex64, onp.complex128]
+int_dtypes = [onp.int32]
+all_dtypes = float_dtypes + complex_dtypes + int_dtypes
+
+
+def _get_fftn_test_axes(shape):
+  axes = [[]]
+  ndims = len(shape)
+  # XLA's FFT op supports up to 3 innermost dimensions.
+  if ndims <= 3:
+    axes.append(None)
+  for naxes in range(1, min(ndims, 3) + 1):
+    for axis in itertools.combinations(range(ndims), naxes):
+      axes.append(axis)
+      axes.append(tuple(-1 - a for a in axis))
+  return axes
+
+
+def _irfft_test_shape(shape, axes):
+  """Shape of a half-spectrum that `irfftn` maps back to `shape`."""
+  if not axes:
+    return shape
+  axis = (axes[-1] if axes is not None else -1) % len(shape)
+  shape = list(shape)
+  shape[axis] = shape[axis] // 2 + 1
+  return tuple(shape)
+
+
+class FftTest(jtu.JaxTestCase):
+
+  @parameterized.named_parameters(jtu.cases_from_list(
+      {"testcase_name": "_{}_shape={}_axes={}_norm={}".format(
+          name, jtu.format_shape_dtype_string(shape, dtype), axes, norm),
+       "name": name, "shape": shape, "dtype": dtype, "axes": axes,
+       "norm": norm, "rng": rng}
+      for name in ["fftn", "ifftn", "rfftn", "irfftn"]
+      for dtype in (float_dtypes if name == "rfftn" else all_dtypes)
+      for shape in [(10,), (10, 10), (2, 3, 4), (2, 3, 4, 5)]
+      for axes in _get_fftn_test_axes(shape)
+      # NumPy's real transforms need at least one axis.
+      if axes != [] or name in ["fftn", "ifftn"]
+      for norm in [None, "ortho"]
+      for rng in [jtu.rand_default()]))
+  def testFftn(self, name, shape, dtype, axes, norm, rng):
+    if name == "irfftn":
+      shape = _irfft_test_shape(shape, axes)
+    args_maker = lambda: [rng(shape, dtype)]
+    np_op = lambda a: getattr(np.fft, name)(a, axes=axes, norm=norm)
+    onp_op = lambda a: getattr(onp.fft, name)(a, axes=axes, norm=norm)
+    self._CheckAgainstNumpy(onp_op, np_op, args_maker, check_dtypes=False,
+                            tol=1e-4)
+    self._CompileAndCheck(np_op, args_maker, check_dtypes=True)
+    # Test gradient for differentiable types.
+    if dtype in float_dtypes + complex_dtypes:
+      jtu.check_grads(np_op, args_maker(), order=1, atol=1e-2, rtol=1e-2)
+
+  @parameterized.named_parameters(jtu.cases_from_list(
+      {"testcase_name": "_{}_shape={}_n={}_axis={}".format(
+          name, jtu.format_shape_dtype_string(shape, dtype), n, axis),
+       "name": name, "shape": shape, "dtype": dtype, "n": n, "axis": axis,
+       "rng": rng}
+      for name in ["fft", "ifft", "rfft", "irfft"]
+      for dtype in (float_dtypes if name == "rfft" else all_dtypes)
+      for shape in [(10,), (7, 8)]
+      for n in [None, 1, 6, 16]
+      for axis in [-1, 0]
+      for rng in [jtu.rand_default()]))
+  def testFft(self, name, shape, dtype, n, axis, rng):
+    args_maker = lambda: [rng(shape, dtype)]
+    np_op = lambda a: getattr(np.fft, name)(a, n=n, axis=axis)
+    onp_op = lambda a: getattr(onp.fft, name)(a, n=n, axis=axis)
+    self._CheckAgainstNumpy(onp_op, np_op, args_maker, check_dtypes=False,
+                            tol=1e-4)
+    self._CompileAndCheck(np_op, args_maker, check_dtypes=True)
+
+  @parameterized.named_parameters(jtu.cases_from_list(
+      {"testcase_name": "_{}_shape={}_s={}".format(
+          name, jtu.format_shape_dtype_string(shape, dtype), s),
+       "name": name, "shape": shape, "dtype": dtype, "s": s, "rng": rng}
+      for name in ["fft2", "ifft2", "rfft2", "irfft2"]
+      for dtype in float_dtypes
+      for shape in [(4, 6), (3, 4, 6)]
+      for s in [None, (4, 4), (8, 3)]
+      for rng in [jtu.rand_default()]))
+  def testFft2(self, name, shape, dtype, s, rng):
+    args_maker = lambda: [rng(shape, dtype)]
+    np_op = lambda a: getattr(np.fft, name)(a, s=s)
+    onp_op = lambda a: getattr(onp.fft, name)(a, s=s)
+    self._CheckAgainstNumpy(onp_op, np_op, args_maker, check_dtypes=False,
+                            tol=1e-4)
+    self._CompileAndCheck(np_op, args_maker, check_dtypes=True)
+
+  def testRealTransformsRoundTrip(self):
+    rng = onp.random.RandomState(0)
+    for shape, axes in [((9,), None), ((8, 7), None), ((4, 5, 6), (0, 2))]:
+      x = rng.randn(*shape).astype(onp.float32)
+      s = [shape[axis] for axis in (axes or range(len(shape)))]
+      y = np.fft.irfftn(np.fft.rfftn(x, axes=axes), s=s, axes=axes)
+      self.assertAllClose(y, x, check_dtypes=True, atol=1e-4, rtol=1e-4)
+
+  @parameterized.named_parameters(
+      {"testcase_name": "_{}".format(fft_type), "fft_type": fft_type}
+      for fft_type in ["FFT", "IFFT", "RFFT", "IRFFT"])
+  def testPrimitiveGradAndBatching(self, fft_type):
+    fft_type = getattr(lax_fft.FftType, fft_type)
+    rng = onp.random.RandomState(0)
+    fft_lengths = (4, 6)
+    if fft_type == lax_fft.FftType.IRFFT:
+      x = (rng.randn(3, 4, 4) + 1j * rng.randn(3, 4, 4)).astype(onp.complex64)
+    elif fft_type == lax_fft.FftType.RFFT:
+      x = rng.randn(3, 4, 6).astype(onp.float32)
+    else:
+      x = (rng.randn(3, 4, 6) + 1j * rng.randn(3, 4, 6)).astype(onp.complex64)
+    f = lambda x: lax_fft.fft(x, fft_type, fft_lengths)
+    jtu.check_grads(f, (x,), order=2, atol=1e-2, rtol=1e-2)
+
+    expected = onp.stack([f(x_i) for x_i in onp.moveaxis(x, 1, 0)])
+    ans = api.vmap(f, in_axes=1)(x)
+    self.assertAllClose(ans, expected, check_dtypes=True, atol=1e-4,
+                        rtol=1e-4)
+
+  def testFftnErrors(self):
+    x = onp.ones((2, 3, 4, 5), onp.float32)
+    # More than three transformed axes.
+    self.assertRaises(ValueError, lambda: np.fft.fftn(x))
+    self.assertRaises(ValueError, lambda: np.fft.fftn(x, axes=(0, 0)))
+    self.assertRaises(ValueError, lambda: np.fft.fftn(x, s=(2, 3), axes=(0,)))
+    self.assertRaises(ValueError, lambda: np.fft.fft(x, norm="backward"))
+
+  @parameterized.named_parameters(jtu.cases_from_list(
+      {"testcase_name": "_{}_n={}_d={}".format(name, n, d),
+       "name": name, "n": n, "d": d}
+      for name in ["fftfreq", "rfftfreq"]
+      for n in [1, 4, 9, 10]
+      for d in [1.0, 0.1]))
+  def testFftfreq(self, name, n, d):
+    self.assertAllClose(getattr(np.fft, name)(n, d),
+                        getattr(onp.fft, name)(n, d), check_dtypes=False,
+                        atol=1e-6, rtol=1e-6)
+
+
+if __name__ == "__main__":
+  absltest.main()
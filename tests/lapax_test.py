@@ -20,12 +20,15 @@ from __future__ import print_function
 import itertools
 
 import numpy as onp
+import scipy.linalg
 from absl.testing import absltest
 from absl.testing import parameterized
 
+from jax import api
 from jax import jit
 from jax import test_util as jtu
 from jax.experimental import lapax
+from jax.util import partial
 
 from jax.config import config
 config.parse_flags_with_absl()
@@ -207,5 +210,54 @@ class LapaxTest(jtu.JaxTestCase):
     # pylint: enable=invalid-name
 
 
+  @parameterized.named_parameters(jtu.cases_from_list(
+      {"testcase_name": "_shape={}_blocksize={}".format(
+          jtu.format_shape_dtype_string(shape, dtype), block_size),
+       "shape": shape, "dtype": dtype, "block_size": block_size, "rng": rng}
+      for shape in [(1, 1), (4, 4), (11, 11), (2, 9, 9)]
+      for block_size in [None, 1, 3]
+      for dtype in float_types
+      for rng in [jtu.rand_default()]))
+  def testLu(self, shape, dtype, block_size, rng):
+    a = rng(shape, dtype)
+    lu, pivots = jit(partial(lapax.lu, block_size=block_size))(a)
+    for index in onp.ndindex(shape[:-2]):
+      expected_lu, expected_pivots = scipy.linalg.lu_factor(a[index])
+      self.assertAllClose(expected_lu, lu[index], check_dtypes=False)
+      self.assertAllClose(expected_pivots, pivots[index], check_dtypes=False)
+
+  def testLuSingular(self):
+    a = onp.eye(5, dtype=onp.float32)
+    a[2, 2] = 0.
+    lu, pivots = lapax.lu(a, block_size=2)
+    expected_lu, expected_pivots = scipy.linalg.lu_factor(a)
+    self.assertAllClose(expected_lu, lu, check_dtypes=False)
+    self.assertAllClose(expected_pivots, pivots, check_dtypes=False)
+
+  def testComputationSizeIndependentOfMatrixSize(self):
+    npr = onp.random.RandomState(0)
+    funs = [
+        lambda x: lapax.cholesky(x, block_size=4),
+        lambda x: lapax.lu(x, block_size=4)[0],
+        lambda x: lapax.solve_triangular(x, x, left_side=True, lower=True,
+                                         trans_a=False, block_size=4),
+    ]
+    for fun in funs:
+      small = api.make_jaxpr(fun)(npr.randn(8, 8).astype(onp.float32))
+      large = api.make_jaxpr(fun)(npr.randn(32, 32).astype(onp.float32))
+      self.assertEqual(len(small.eqns), len(large.eqns))
+
+  def testAutotuneBlockSize(self):
+    npr = onp.random.RandomState(0)
+    self.addCleanup(lapax._tuned_block_sizes.clear)
+    block_size = lapax.autotune_block_size(lapax.cholesky, 12,
+                                           candidates=(2, 4), iters=1)
+    self.assertIn(block_size, (2, 4))
+    arr = npr.randn(12, 12).astype(onp.float32)
+    arr = onp.dot(arr, arr.T) + 12 * onp.eye(12, dtype=onp.float32)
+    self.assertAllClose(onp.linalg.cholesky(arr), lapax.cholesky(arr),
+                        check_dtypes=True)
+
+
 if __name__ == "__main__":
   absltest.main()
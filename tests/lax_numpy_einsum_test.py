@@ -23,6 +23,7 @@ import numpy as onp
 from absl.testing import absltest
 from absl.testing import parameterized
 
+from jax import api
 import jax.numpy as np
 import jax.test_util as jtu
 
@@ -277,6 +278,67 @@ class EinsumTest(jtu.JaxTestCase):
     s = 'ijkl,ijml->ijkm'
     self._check(s, x, y)
 
+  @parameterized.parameters(
+      {'optimize': optimize} for optimize in
+      ['auto', 'greedy', 'optimal', True, False, None,
+       ['einsum_path', (1, 2), (0, 1)], [(0, 1), (0, 1)]])
+  def test_optimize(self, optimize):
+    r = rng()
+    x, y, z = r.randn(3, 4), r.randn(4, 5), r.randn(5, 2)
+    expected = onp.einsum('ij,jk,kl->il', x, y, z)
+    ans = np.einsum('ij,jk,kl->il', x, y, z, optimize=optimize)
+    self.assertAllClose(ans, expected, atol=1e-4, rtol=1e-4, check_dtypes=True)
+
+  def test_invalid_keyword_argument(self):
+    x = rng().randn(3)
+    self.assertRaises(TypeError, lambda: np.einsum('i->', x, out=x))
+
+  def test_interleaved_operands(self):
+    r = rng()
+    x, y = r.randn(3, 4), r.randn(4, 5)
+    expected = onp.einsum(x, [0, 1], y, [1, 2], [0, 2])
+    ans = np.einsum(x, [0, 1], y, [1, 2], [0, 2])
+    self.assertAllClose(ans, expected, atol=1e-4, rtol=1e-4, check_dtypes=True)
+
+  def test_contraction_path_is_cached(self):
+    r = rng()
+    path = np.lax_numpy._einsum_contract_path
+    operand = lambda x: np.lax_numpy._EinsumOperand(x.shape,
+                                                   np.asarray(x).dtype)
+    spec = lambda x, y: ('ij,jk->ik', operand(x), operand(y))
+    x, y = r.randn(3, 4), r.randn(4, 5)
+    np.einsum('ij,jk->ik', x, y)
+    contractions = path(spec(x, y), 'auto')
+    x, y = r.randn(3, 4), r.randn(4, 5)
+    np.einsum('ij,jk->ik', x, y)
+    self.assertIs(path(spec(x, y), 'auto'), contractions)
+    self.assertIsNot(path(spec(x, r.randn(4, 6)), 'auto'), contractions)
+
+  @parameterized.parameters(
+      {'s': s} for s in ['ij,jk->ik', 'ij,jk->ki', 'ij,kj->ik', 'bij,bjk->bik',
+                         'bij,bjk->bki'])
+  def test_two_operands_single_dot_general(self, s):
+    r = rng()
+    input_names = s.split('->')[0].split(',')
+    sizes = dict(zip('ijklb', [2, 3, 4, 5, 6]))
+    x, y = [r.randn(*[sizes[c] for c in names]) for names in input_names]
+    self._check(s, x, y)
+    jaxpr = str(api.make_jaxpr(lambda x, y: np.einsum(s, x, y))(x, y))
+    self.assertEqual(jaxpr.count('dot_general'), 1)
+    self.assertNotIn('transpose', jaxpr)
+    self.assertNotIn('reshape', jaxpr)
+
+  @parameterized.parameters(
+      {'s': s} for s in ['ijk,jkl->il', 'ij,ij->', 'ijk,kl->ijl',
+                         'bijk,bkl->bjil'])
+  def test_two_operands_collapsed_dims(self, s):
+    # more than one contracting or free dimension per operand
+    r = rng()
+    input_names = s.split('->')[0].split(',')
+    sizes = dict(zip('ijklb', [2, 3, 4, 5, 6]))
+    x, y = [r.randn(*[sizes[c] for c in names]) for names in input_names]
+    self._check(s, x, y)
+
 
 if __name__ == '__main__':
   absltest.main()
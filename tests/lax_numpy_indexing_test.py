@@ -669,9 +669,79 @@ def _update_shape(shape, indexer):
   return onp.zeros(shape)[indexer].shape
 
 
+def _has_duplicates(shape, indexer):
+  counts = onp.zeros(shape, dtype=onp.int32)
+  onp.add.at(counts, indexer, 1)
+  return counts.size > 0 and counts.max() > 1
+
+
+ADVANCED_INDEXING_UPDATE_TESTS = [
+    ("One1DIntArrayIndex",
+     [IndexSpec(shape=(3,), indexer=onp.array([0, 1])),
+      IndexSpec(shape=(3, 3), indexer=onp.array([1, 2, 1])),
+      IndexSpec(shape=(3, 4, 5), indexer=onp.array([0, 2, 0, 1])),
+      IndexSpec(shape=(3,), indexer=onp.array([-1, 1])),
+      IndexSpec(shape=(3,), indexer=[0, 2]),
+     ]),
+    ("One2DIntArrayIndex",
+     [IndexSpec(shape=(3,), indexer=onp.array([[0, 0]])),
+      IndexSpec(shape=(3, 4, 5), indexer=onp.array([[0, 2, 0, 1],
+                                                    [-1, -2, 1, 0]])),
+     ]),
+    ("TwoIntArrayIndices",
+     [IndexSpec(shape=(3, 3), indexer=(onp.array([0, 1]), onp.array([1, 2]))),
+      IndexSpec(shape=(3, 4, 5), indexer=(onp.array([0, 2, 0, 1]),
+                                          onp.array([-1, 0, -1, 2]))),
+      IndexSpec(shape=(3, 4, 5), indexer=(onp.array([[0], [2]]),
+                                          onp.array([1, 3, 0]))),
+     ]),
+    ("SlicesAndIntArrayIndices",
+     [IndexSpec(shape=(2, 3), indexer=(onp.array([0, 1]), slice(1, 2))),
+      IndexSpec(shape=(3, 4, 5), indexer=(Ellipsis, onp.array([0, 2]),
+                                          slice(None))),
+      IndexSpec(shape=(3, 4, 5), indexer=(slice(None, None, -1),
+                                          onp.array([[0, 2], [1, 3]]))),
+      IndexSpec(shape=(3, 4, 5), indexer=(onp.array([0, 2]), slice(None),
+                                          onp.array([-1, 2]))),
+      IndexSpec(shape=(3, 4, 5), indexer=(onp.array([0, 1]), None,
+                                          onp.array([1, 1]))),
+     ]),
+    ("IntsAndIntArrayIndices",
+     [IndexSpec(shape=(3, 4, 5), indexer=(1, onp.array([0, 2]))),
+      IndexSpec(shape=(3, 4, 5), indexer=(onp.array([2, 0]), slice(None), 4)),
+     ]),
+    ("BooleanMasks",
+     [IndexSpec(shape=(3,), indexer=onp.array([True, False, True])),
+      IndexSpec(shape=(2, 3), indexer=onp.array([[True, False, True],
+                                                 [False, False, True]])),
+      IndexSpec(shape=(3, 4), indexer=(onp.array([False, True, True]),
+                                       slice(1, 3))),
+      IndexSpec(shape=(3, 4), indexer=onp.array([False, False, False])),
+     ]),
+]
+
+
 class UpdateOps(enum.Enum):
   UPDATE = 0
   ADD = 1
+  MUL = 2
+  MIN = 3
+  MAX = 4
+
+  def onp_fn(op, indexer, x, y):
+    x = x.copy()
+    if op == UpdateOps.UPDATE:
+      x[indexer] = y
+    else:
+      ufunc = {UpdateOps.ADD: onp.add, UpdateOps.MUL: onp.multiply,
+               UpdateOps.MIN: onp.minimum, UpdateOps.MAX: onp.maximum}[op]
+      ufunc.at(x, indexer, y)
+    return x
+
+  def jax_fn(op, indexer, x, y):
+    return {UpdateOps.UPDATE: ops.index_update, UpdateOps.ADD: ops.index_add,
+            UpdateOps.MUL: ops.index_mul, UpdateOps.MIN: ops.index_min,
+            UpdateOps.MAX: ops.index_max}[op](x, indexer, y)
 
 class IndexedUpdateTest(jtu.JaxTestCase):
 
@@ -737,6 +807,199 @@ class IndexedUpdateTest(jtu.JaxTestCase):
     y = rng(update_shape, update_dtype)
     check_grads(jax_fn, (x, y), 2, rtol=1e-3, atol=1e-3, eps=1.)
 
+  @parameterized.named_parameters(jtu.cases_from_list({
+      "testcase_name": "{}_inshape={}_indexer={}_update={}_op={}".format(
+          name, jtu.format_shape_dtype_string(shape, dtype), indexer,
+          jtu.format_shape_dtype_string(update_shape, dtype), op.name),
+       "shape": shape, "dtype": dtype, "rng": rng, "indexer": indexer,
+       "update_shape": update_shape, "op": op
+  } for name, index_specs in ADVANCED_INDEXING_UPDATE_TESTS
+    for shape, indexer in index_specs
+    for op in UpdateOps
+    if op != UpdateOps.UPDATE or not _has_duplicates(shape, indexer)
+    for dtype in default_dtypes
+    for update_shape in _broadcastable_shapes(_update_shape(shape, indexer))
+    for rng in [jtu.rand_default()]))
+  def testAdvancedIndexing(self, shape, dtype, update_shape, rng, indexer, op):
+    args_maker = lambda: [rng(shape, dtype), rng(update_shape, dtype)]
+    onp_fn = lambda x, y: op.onp_fn(indexer, x, y)
+    jax_fn = lambda x, y: op.jax_fn(indexer, x, y)
+    self._CheckAgainstNumpy(onp_fn, jax_fn, args_maker, check_dtypes=True)
+    self._CompileAndCheck(jax_fn, args_maker, check_dtypes=True)
+
+  @parameterized.named_parameters(jtu.cases_from_list({
+      "testcase_name": "{}_inshape={}_indexer={}_op={}".format(
+          name, jtu.format_shape_dtype_string(shape, dtype), indexer, op.name),
+       "shape": shape, "dtype": dtype, "rng": rng, "indexer": indexer,
+       "op": op
+  } for name, index_specs in ADVANCED_INDEXING_UPDATE_TESTS
+    for shape, indexer in index_specs
+    for op in [UpdateOps.UPDATE, UpdateOps.ADD]
+    if op != UpdateOps.UPDATE or not _has_duplicates(shape, indexer)
+    for dtype in float_dtypes
+    for rng in [jtu.rand_default()]))
+  def testAdvancedIndexingGrads(self, shape, dtype, rng, indexer, op):
+    jax_fn = lambda x, y: op.jax_fn(indexer, x, y)
+    x = rng(shape, dtype)
+    y = rng(_update_shape(shape, indexer), dtype)
+    check_grads(jax_fn, (x, y), 2, rtol=1e-3, atol=1e-3, eps=1.)
+
+  def testIndexAddTracedIntArrayIndex(self):
+    x = onp.zeros((4, 3), onp.float32)
+    i = onp.array([3, 0, 3], onp.int32)
+    y = onp.arange(9, dtype=onp.float32).reshape((3, 3))
+    expected = x.copy()
+    onp.add.at(expected, i, y)
+    ans = api.jit(lambda x, i, y: ops.index_add(x, i, y))(x, i, y)
+    self.assertAllClose(ans, expected, check_dtypes=True)
+
+  def testIndexMinMaxGrads(self):
+    x = onp.array([1., 5., 3.], onp.float32)
+    y = onp.array([4., 2., 0.], onp.float32)
+    i = onp.array([0, 1, 1])
+    grad_x, grad_y = api.grad(
+        lambda x, y: lnp.sum(ops.index_min(x, i, y) * onp.arange(3.)),
+        (0, 1))(x, y)
+    self.assertAllClose(grad_x, onp.array([0., 0., 2.], onp.float32),
+                        check_dtypes=True)
+    self.assertAllClose(grad_y, onp.array([0., 0., 1.], onp.float32),
+                        check_dtypes=True)
+    grad_x = api.grad(lambda x: lnp.sum(ops.index_max(x, i, y)))(x)
+    self.assertAllClose(grad_x, onp.array([0., 1., 1.], onp.float32),
+                        check_dtypes=True)
+
+  def testIndexMulGrad(self):
+    x = onp.array([1., 2., 3.], onp.float32)
+    y = onp.array([4., 5.], onp.float32)
+    i = onp.array([0, 0])
+    grad_x = api.grad(lambda x: lnp.sum(ops.index_mul(x, i, y)))(x)
+    self.assertAllClose(grad_x, onp.array([20., 1., 1.], onp.float32),
+                        check_dtypes=True)
+
+  def testIndexMulUpdatesGrad(self):
+    x = onp.array([1., 2., 3.], onp.float32)
+    y = onp.array([4., 5., 0., 6.], onp.float32)
+    i = onp.array([0, 0, 2, 2])
+    grad_x, grad_y = api.grad(
+        lambda x, y: lnp.sum(ops.index_mul(x, i, y)), (0, 1))(x, y)
+    self.assertAllClose(grad_x, onp.array([20., 1., 0.], onp.float32),
+                        check_dtypes=True)
+    self.assertAllClose(grad_y, onp.array([5., 4., 18., 0.], onp.float32),
+                        check_dtypes=True)
+    check_grads(lambda x, y: ops.index_mul(x, i, y), (x, y), 2, rtol=1e-2,
+                atol=1e-2, eps=1e-2)
+
+  def testTracedBooleanMaskUpdateError(self):
+    x = onp.zeros(3)
+    i = onp.array([True, True, False])
+    f = api.jit(lambda x, i: ops.index_update(x, i, 1.))
+    self.assertRaises(IndexError, lambda: f(x, i))
+
+
+def _onp_segment_reduce(ufunc, identity, data, segment_ids, num_segments):
+  out = onp.full((num_segments,) + data.shape[segment_ids.ndim:], identity,
+                 dtype=data.dtype)
+  keep = (segment_ids >= 0) & (segment_ids < num_segments)
+  ufunc.at(out, segment_ids[keep], data[keep])
+  return out
+
+
+SEGMENT_REDUCTIONS = [
+    ("sum", ops.segment_sum, lambda d, i, n: _onp_segment_reduce(
+        onp.add, 0, d, i, n)),
+    ("prod", ops.segment_prod, lambda d, i, n: _onp_segment_reduce(
+        onp.multiply, 1, d, i, n)),
+    ("max", ops.segment_max, lambda d, i, n: _onp_segment_reduce(
+        onp.maximum, -onp.inf, d, i, n)),
+    ("min", ops.segment_min, lambda d, i, n: _onp_segment_reduce(
+        onp.minimum, onp.inf, d, i, n)),
+    ("mean", ops.segment_mean, lambda d, i, n: (
+        _onp_segment_reduce(onp.add, 0, d, i, n) /
+        onp.maximum(1, _onp_segment_reduce(
+            onp.add, 0, onp.ones(i.shape, d.dtype), i, n)).reshape(
+                (n,) + (1,) * (d.ndim - i.ndim)))),
+]
+
+
+class SegmentReductionTest(jtu.JaxTestCase):
+
+  @parameterized.named_parameters(jtu.cases_from_list({
+      "testcase_name": "_{}_{}_ids={}_num_segments={}_sorted={}".format(
+          name, jtu.format_shape_dtype_string(shape, dtype),
+          jtu.format_shape_dtype_string(ids_shape, onp.int32), num_segments,
+          indices_are_sorted),
+       "jax_op": jax_op, "onp_op": onp_op, "shape": shape, "dtype": dtype,
+       "ids_shape": ids_shape, "num_segments": num_segments,
+       "indices_are_sorted": indices_are_sorted, "rng": jtu.rand_default()}
+    for name, jax_op, onp_op in SEGMENT_REDUCTIONS
+    for shape, ids_shape in [((10,), (10,)), ((10, 3), (10,)),
+                             ((4, 5, 2), (4, 5))]
+    for num_segments in [1, 4, 12]
+    for indices_are_sorted in [False, True]
+    for dtype in float_dtypes))
+  def testSegmentReduction(self, jax_op, onp_op, shape, dtype, ids_shape,
+                           num_segments, indices_are_sorted, rng):
+    ids_rng = onp.random.RandomState(0)
+    def args_maker():
+      ids = ids_rng.randint(-1, num_segments + 1, size=ids_shape)
+      if indices_are_sorted:
+        ids = onp.sort(ids, axis=None).reshape(ids_shape)
+      return [rng(shape, dtype), ids.astype(onp.int32)]
+    onp_fn = lambda data, ids: onp_op(data, ids, num_segments)
+    jax_fn = lambda data, ids: jax_op(
+        data, ids, num_segments, indices_are_sorted=indices_are_sorted)
+    self._CheckAgainstNumpy(onp_fn, jax_fn, args_maker, check_dtypes=True)
+    self._CompileAndCheck(jax_fn, args_maker, check_dtypes=True)
+
+  @parameterized.named_parameters(jtu.cases_from_list({
+      "testcase_name": "_{}".format(name), "jax_op": jax_op}
+    for name, jax_op, _ in SEGMENT_REDUCTIONS))
+  def testSegmentReductionGrads(self, jax_op):
+    # Distinct values avoid ties; the empty segment 1 is left out.
+    data = onp.array([[1.5, -2.], [3., 0.5], [-1., 2.5], [4., 1.], [2., -3.]],
+                     onp.float32)
+    ids = onp.array([0, 2, 2, 0, 2])
+    fun = lambda data: jax_op(data, ids, 3)[onp.array([0, 2])]
+    check_grads(fun, (data,), 2, rtol=1e-2, atol=1e-2, eps=1e-2)
+
+  def testSegmentProdGradWithZeros(self):
+    # Segment 0 holds one zero, segment 1 two zeros and segment 2 none.
+    data = onp.array([2., 0., -3., 0., 1.5, 0., 4., 0.5, -1.], onp.float32)
+    ids = onp.array([0, 0, 0, 1, 1, 1, 2, 2, 2])
+    weights = onp.array([1., -2., 3.], onp.float32)
+    fun = lambda data: lnp.sum(weights * ops.segment_prod(data, ids, 3))
+    expected = onp.array([weights[i] * onp.prod(onp.delete(data[ids == i], j))
+                          for i in range(3) for j in range(3)], onp.float32)
+    ans = api.grad(fun)(data)
+    self.assertFalse(onp.any(onp.isnan(ans)))
+    self.assertAllClose(ans, expected, check_dtypes=True)
+    check_grads(fun, (data,), 2, rtol=1e-2, atol=1e-2, eps=1e-2)
+
+  def testSegmentSumVmap(self):
+    rng = onp.random.RandomState(0)
+    data = rng.randn(3, 6, 2).astype(onp.float32)
+    ids = rng.randint(0, 4, size=(3, 6))
+    expected = onp.stack([_onp_segment_reduce(onp.add, 0, d, i, 4)
+                          for d, i in zip(data, ids)])
+    ans = api.vmap(lambda d, i: ops.segment_sum(d, i, 4))(data, ids)
+    self.assertAllClose(ans, expected, check_dtypes=True)
+    ans = api.vmap(lambda i: ops.segment_sum(data[0], i, 4))(ids)
+    expected = onp.stack([_onp_segment_reduce(onp.add, 0, data[0], i, 4)
+                          for i in ids])
+    self.assertAllClose(ans, expected, check_dtypes=True)
+    ans = api.vmap(lambda d: ops.segment_max(d, ids[0], 4))(data)
+    expected = onp.stack([_onp_segment_reduce(onp.maximum, -onp.inf, d,
+                                              ids[0], 4) for d in data])
+    self.assertAllClose(ans, expected, check_dtypes=True)
+
+  def testSegmentSumInferredNumSegments(self):
+    ans = ops.segment_sum(onp.arange(5.), onp.array([0, 0, 3, 1, 1]))
+    self.assertAllClose(ans, onp.array([1., 7., 0., 2.]), check_dtypes=False)
+
+  def testSegmentSumTracedIdsRequireNumSegments(self):
+    f = api.jit(lambda data, ids: ops.segment_sum(data, ids))
+    self.assertRaises(ValueError, lambda: f(onp.ones(3), onp.arange(3)))
+
 
 if __name__ == "__main__":
   absltest.main()
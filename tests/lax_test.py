@@ -31,6 +31,7 @@ import numpy.random as npr
 from jax import api
 from jax import core
 from jax import lax
+from jax import lax_fft
 from jax import test_util as jtu
 from jax import lax_reference
 from jax.test_util import check_grads
@@ -443,6 +444,63 @@ class LaxTest(jtu.JaxTestCase):
 
     self._CompileAndCheck(fun, args_maker, check_dtypes=True)
 
+  @parameterized.named_parameters(jtu.cases_from_list(
+      {"testcase_name": "_lhs_shape={}_rhs_shape={}_strides={}_padding={}"
+       "_lhs_dilation={}_rhs_dilation={}"
+       "_dims={}".format(
+           jtu.format_shape_dtype_string(lhs_shape, dtype),
+           jtu.format_shape_dtype_string(rhs_shape, dtype),
+           strides, padding, lhs_dilation, rhs_dilation,
+           ",".join(dim_nums)),
+       "lhs_shape": lhs_shape, "rhs_shape": rhs_shape, "dtype": dtype,
+       "strides": strides, "padding": padding, "lhs_dilation": lhs_dilation,
+       "rhs_dilation": rhs_dilation, "dimension_numbers": dim_nums,
+       "perms": perms, "rng": rng}
+      for lhs_shape, rhs_shape, all_strides, all_pads, dims_and_perms in [
+          ((b, i, 9, 10), (j, i, 4, 5), [(1, 1), (2, 1)],
+           [((1, 2), (2, 0)), ((0, -1), (0, 0)), "SAME"],
+           [(("NCHW", "OIHW", "NCHW"), ([0, 1, 2, 3], [0, 1, 2, 3])),
+            (("NHWC", "HWIO", "NHWC"), ([0, 2, 3, 1], [2, 3, 1, 0])),
+            (("NCHW", "HWIO", "NHWC"), ([0, 1, 2, 3], [2, 3, 1, 0]))])
+          for b, i, j in itertools.product([1, 3], repeat=3)] + [
+          ((2, 3, 100), (4, 3, 31), [(1,), (3,)], ["VALID", ((5, 30),)],
+           [(("NCH", "OIH", "NCH"), ([0, 1, 2], [0, 1, 2])),
+            (("NHC", "HIO", "NHC"), ([0, 2, 1], [2, 1, 0]))])]
+      for dtype in [onp.float32]
+      for strides in all_strides
+      for padding in all_pads
+      for lhs_dilation, rhs_dilation in itertools.product(
+          [(1,) * len(strides), (2,) * len(strides)], repeat=2)
+      for rng in [jtu.rand_small()]
+      for dim_nums, perms in dims_and_perms))
+  def testConvGeneralDilatedFft(self, lhs_shape, rhs_shape, dtype, strides,
+                                padding, lhs_dilation, rhs_dilation,
+                                dimension_numbers, perms, rng):
+    lhs_perm, rhs_perm = perms  # permute to compatible shapes
+    lhs = onp.transpose(rng(lhs_shape, dtype), lhs_perm)
+    rhs = onp.transpose(rng(rhs_shape, dtype), rhs_perm)
+    conv = partial(lax.conv_general_dilated, window_strides=strides,
+                   padding=padding, lhs_dilation=lhs_dilation,
+                   rhs_dilation=rhs_dilation,
+                   dimension_numbers=dimension_numbers)
+    expected = conv(lhs, rhs, method="direct")
+    self.assertAllClose(conv(lhs, rhs, method="fft"), expected,
+                        check_dtypes=True, atol=1e-3, rtol=1e-3)
+    self.assertAllClose(api.jit(partial(conv, method="auto"))(lhs, rhs),
+                        expected, check_dtypes=True, atol=1e-3, rtol=1e-3)
+
+  def testConvGeneralDilatedAutoMethod(self):
+    dims = lax.conv_dimension_numbers((8, 1, 4096), (1, 1, 512), None)
+    is_faster = lambda lhs_shape, rhs_shape, dtype: lax_fft.fft_conv_is_faster(
+        lhs_shape, rhs_shape, dtype, (1,), ((0, 0),), (1,), (1,), dims)
+    self.assertTrue(is_faster((8, 1, 4096), (1, 1, 512), onp.float32))
+    self.assertFalse(is_faster((8, 1, 4096), (1, 1, 3), onp.float32))
+    # XLA's FFT is single precision, so wider types always convolve directly.
+    self.assertFalse(is_faster((8, 1, 4096), (1, 1, 512), onp.float64))
+    self.assertRaises(ValueError, lambda: lax.conv_general_dilated(
+        onp.ones((1, 1, 8)), onp.ones((1, 1, 3)), (1,), "VALID",
+        method="winograd"))
+
   # TODO(mattjj): test conv_general_dilated against numpy
 
   @parameterized.named_parameters(jtu.cases_from_list(
@@ -546,6 +604,39 @@ class LaxTest(jtu.JaxTestCase):
     numpy_op = lambda x, y: lax_reference.dot_general(x, y, dimension_numbers)
     self._CheckAgainstNumpy(op, numpy_op, args_maker)
 
+  def testDotGeneralPreferredElementType(self):
+    rng = jtu.rand_small()
+    lhs = rng((3, 4, 2), onp.float16)
+    rhs = rng((3, 2, 5), onp.float16)
+    dimension_numbers = (([2], [1]), ([0], [0]))
+    op = lambda x, y: lax.dot_general(x, y, dimension_numbers,
+                                      preferred_element_type=onp.float32)
+    ans = api.jit(op)(lhs, rhs)
+    expected = lax_reference.dot_general(
+        lhs.astype(onp.float32), rhs.astype(onp.float32), dimension_numbers)
+    self.assertEqual(ans.dtype, onp.float32)
+    self.assertAllClose(ans, expected, check_dtypes=True)
+
+    lhs_ct, rhs_ct = api.grad(lambda x, y: op(x, y).sum(), (0, 1))(lhs, rhs)
+    self.assertEqual(lhs_ct.dtype, onp.float16)
+    self.assertEqual(rhs_ct.dtype, onp.float16)
+
+  def testConvPreferredElementType(self):
+    rng = jtu.rand_small()
+    lhs = rng((2, 3, 9, 10), onp.float16)
+    rhs = rng((4, 3, 3, 3), onp.float16)
+    op = lambda x, y, preferred: lax.conv_general_dilated(
+        x, y, (1, 1), 'SAME', preferred_element_type=preferred)
+    ans = api.jit(partial(op, preferred=onp.float32))(lhs, rhs)
+    expected = op(lhs.astype(onp.float32), rhs.astype(onp.float32), None)
+    self.assertEqual(ans.dtype, onp.float32)
+    self.assertAllClose(ans, expected, check_dtypes=True)
+
+    loss = lambda x, y: op(x, y, onp.float32).sum()
+    lhs_ct, rhs_ct = api.grad(loss, (0, 1))(lhs, rhs)
+    self.assertEqual(lhs_ct.dtype, onp.float16)
+    self.assertEqual(rhs_ct.dtype, onp.float16)
+
   @parameterized.named_parameters(jtu.cases_from_list(
       {"testcase_name": "_shape={}_dtype={}_broadcast_sizes={}".format(
           shape, onp.dtype(dtype).name, broadcast_sizes),
@@ -1916,6 +2007,39 @@ class LaxAutodiffTest(jtu.JaxTestCase):
                    dimension_numbers=dimension_numbers)
     check_grads_bilinear(conv, (lhs, rhs), order=2, atol=tol, rtol=tol)
 
+  @parameterized.named_parameters(jtu.cases_from_list(
+      {"testcase_name":
+       "_lhs_shape={}_rhs_shape={}_strides={}_padding={}_rhs_dilation={}"
+       .format(jtu.format_shape_dtype_string(lhs_shape, dtype),
+               jtu.format_shape_dtype_string(rhs_shape, dtype),
+               strides, padding, rhs_dil),
+       "lhs_shape": lhs_shape, "rhs_shape": rhs_shape, "dtype": dtype,
+       "strides": strides, "padding": padding, "rhs_dil": rhs_dil, "rng": rng}
+      for lhs_shape, rhs_shape in [((2, 2, 6, 7), (3, 2, 3, 2)),
+                                   ((1, 2, 12), (2, 2, 5))]
+      for strides in [(1,) * (len(lhs_shape) - 2), (2,) * (len(lhs_shape) - 2)]
+      for padding in ["VALID", "SAME"]
+      for rhs_dil in [(1,) * (len(lhs_shape) - 2), (2,) * (len(lhs_shape) - 2)]
+      for dtype in [onp.float32]
+      for rng in [jtu.rand_default()]))
+  @jtu.skip_on_devices("tpu")
+  def testConvGeneralDilatedFftGrad(self, lhs_shape, rhs_shape, dtype, strides,
+                                    padding, rhs_dil, rng):
+    lhs = rng(lhs_shape, dtype)
+    rhs = rng(rhs_shape, dtype)
+    conv = partial(lax.conv_general_dilated, window_strides=strides,
+                   padding=padding, rhs_dilation=rhs_dil, method="fft")
+    check_grads_bilinear(conv, (lhs, rhs), order=2, atol=1e-1, rtol=1e-1)
+
+    # The FFT path's gradients must agree with those of the direct convolution.
+    direct_conv = partial(conv, method="direct")
+    out, vjp_fft = api.vjp(conv, lhs, rhs)
+    _, vjp_direct = api.vjp(direct_conv, lhs, rhs)
+    cotangent = rng(onp.shape(out), dtype)
+    for ans, expected in zip(vjp_fft(cotangent), vjp_direct(cotangent)):
+      self.assertAllClose(ans, expected, check_dtypes=True, atol=1e-3,
+                          rtol=1e-3)
+
   @parameterized.named_parameters(jtu.cases_from_list(
       {"testcase_name": "_lhs_shape={}_rhs_shape={}".format(
           jtu.format_shape_dtype_string(lhs_shape, dtype),
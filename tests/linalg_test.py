@@ -27,7 +27,9 @@ import scipy as osp
 from absl.testing import absltest
 from absl.testing import parameterized
 
+from jax import api
 from jax import jvp
+from jax import lax_linalg
 from jax import numpy as np
 from jax import scipy as jsp
 from jax import test_util as jtu
@@ -108,6 +110,51 @@ class NumpyLinalgTest(jtu.JaxTestCase):
                             check_dtypes=True, tol=1e-3)
     self._CompileAndCheck(np.linalg.slogdet, args_maker, check_dtypes=True)
 
+  @parameterized.named_parameters(jtu.cases_from_list(
+      {"testcase_name":
+       "_shape={}".format(jtu.format_shape_dtype_string(shape, dtype)),
+       "shape": shape, "dtype": dtype, "rng": rng}
+      for shape in [(1, 1), (4, 4), (3, 5, 5)]
+      for dtype in float_types() | complex_types()
+      for rng in [jtu.rand_default()]))
+  @jtu.skip_on_devices("gpu", "tpu")
+  def testSlogdetGrad(self, shape, dtype, rng):
+    if not hasattr(lapack, "jax_getrf"):
+      self.skipTest("No LU implementation available")
+    a = rng(shape, dtype) + 4 * onp.eye(shape[-1], dtype=dtype)
+    sign, logdet = np.linalg.slogdet(a)
+    expected_sign, expected_logdet = onp.linalg.slogdet(a)
+    self.assertAllClose(sign, expected_sign, check_dtypes=False, atol=1e-3,
+                        rtol=1e-3)
+    self.assertAllClose(logdet, expected_logdet, check_dtypes=False,
+                        atol=1e-3, rtol=1e-3)
+    self.assertAllClose(api.vmap(np.linalg.slogdet)(a[None]),
+                        (sign[None], logdet[None]), check_dtypes=True)
+
+    jtu.check_grads(lambda a: np.linalg.slogdet(a)[1], (a,), 2, rtol=1e-1)
+    if onp.issubdtype(dtype, onp.complexfloating):
+      jtu.check_grads(lambda a: np.linalg.slogdet(a)[0], (a,), 1, rtol=1e-1)
+
+  @parameterized.named_parameters(jtu.cases_from_list(
+      {"testcase_name":
+       "_shape={}".format(jtu.format_shape_dtype_string(shape, dtype)),
+       "shape": shape, "dtype": dtype, "rng": rng}
+      for shape in [(4, 4), (3, 5, 5)]
+      for dtype in float_types() | complex_types()
+      for rng in [jtu.rand_default()]))
+  @jtu.skip_on_devices("gpu", "tpu")
+  def testPositiveDefiniteSlogdet(self, shape, dtype, rng):
+    a = rng(shape, dtype)
+    a = onp.matmul(a, onp.conj(T(a))) + shape[-1] * onp.eye(shape[-1])
+    a = a.astype(dtype)
+    sign, logdet = lax_linalg.slogdet(a, sym_pos=True)
+    self.assertAllClose(sign, onp.ones(shape[:-2]), check_dtypes=False)
+    self.assertAllClose(logdet, onp.linalg.slogdet(a)[1], check_dtypes=False,
+                        atol=1e-3, rtol=1e-3)
+
+    f = lambda a: lax_linalg.slogdet(a, sym_pos=True)[1]
+    jtu.check_grads(f, (a,), 2, rtol=1e-1)
+
   @parameterized.named_parameters(jtu.cases_from_list(
       {"testcase_name": "_n={}_lower={}".format(
            jtu.format_shape_dtype_string((n,n), dtype), lower),
@@ -141,6 +188,29 @@ class NumpyLinalgTest(jtu.JaxTestCase):
     self._CompileAndCheck(partial(np.linalg.eigh, UPLO=uplo), args_maker,
                           check_dtypes=True)
 
+  @parameterized.named_parameters(jtu.cases_from_list(
+      {"testcase_name":
+       "_shape={}".format(jtu.format_shape_dtype_string(shape, dtype)),
+       "shape": shape, "dtype": dtype, "rng": rng}
+      for shape in [(3, 4, 4), (2, 3, 5, 5)]
+      for dtype in float_types() | complex_types()
+      for rng in [jtu.rand_default()]))
+  @jtu.skip_on_devices("gpu", "tpu")
+  def testEighBatching(self, shape, dtype, rng):
+    if not hasattr(lapack, "jax_syevd"):
+      self.skipTest("No symmetric eigendecomposition implementation available")
+    a = rng(shape, dtype)
+    a = (a + onp.conj(T(a))) / 2
+    w, v = np.linalg.eigh(a)
+    self.assertAllClose(w, onp.linalg.eigvalsh(a), check_dtypes=False,
+                        atol=1e-3, rtol=1e-3)
+    self.assertAllClose(onp.matmul(a, v), w[..., None, :] * v,
+                        check_dtypes=False, atol=1e-3, rtol=1e-3)
+
+    ws, vs = api.vmap(np.linalg.eigh)(a)
+    self.assertAllClose(ws, w, check_dtypes=True)
+    self.assertAllClose(vs, v, check_dtypes=True)
+
   @parameterized.named_parameters(jtu.cases_from_list(
       {"testcase_name":
        "_shape={}_lower={}".format(jtu.format_shape_dtype_string(shape, dtype),
@@ -297,6 +367,31 @@ class NumpyLinalgTest(jtu.JaxTestCase):
     self._CompileAndCheck(partial(np.linalg.svd, full_matrices=full_matrices, compute_uv=compute_uv),
                           args_maker, check_dtypes=True)
 
+  @parameterized.named_parameters(jtu.cases_from_list(
+      {"testcase_name": "_shape={}_full_matrices={}".format(
+          jtu.format_shape_dtype_string(shape, dtype), full_matrices),
+       "shape": shape, "dtype": dtype, "full_matrices": full_matrices,
+       "rng": rng}
+      for shape in [(3, 5, 4), (2, 3, 4, 7)]
+      for dtype in float_types() | complex_types()
+      for full_matrices in [False, True]
+      for rng in [jtu.rand_default()]))
+  @jtu.skip_on_devices("gpu", "tpu")
+  def testSVDBatching(self, shape, dtype, full_matrices, rng):
+    if not hasattr(lapack, "jax_gesdd"):
+      self.skipTest("No singular value decomposition implementation available")
+    a = rng(shape, dtype)
+    k = min(shape[-2:])
+    u, s, vt = np.linalg.svd(a, full_matrices=full_matrices)
+    self.assertAllClose(s, onp.linalg.svd(a, compute_uv=False),
+                        check_dtypes=False, atol=1e-3, rtol=1e-3)
+    self.assertAllClose(onp.matmul(u[..., :k] * s[..., None, :], vt[..., :k, :]),
+                        a, check_dtypes=False, atol=1e-3, rtol=1e-3)
+
+    svd = partial(np.linalg.svd, full_matrices=full_matrices)
+    for x, y in zip(api.vmap(svd)(a), (u, s, vt)):
+      self.assertAllClose(x, y, check_dtypes=True)
+
   @parameterized.named_parameters(jtu.cases_from_list(
       {"testcase_name": "_shape={}_fullmatrices={}".format(
           jtu.format_shape_dtype_string(shape, dtype), full_matrices),
@@ -363,6 +458,7 @@ class NumpyLinalgTest(jtu.JaxTestCase):
           ((1, 1), (1, 1)),
           ((4, 4), (4,)),
           ((8, 8), (8, 4)),
+          ((3, 6, 6), (3, 6, 2)),
       ]
       for dtype in float_types() | complex_types()
       for rng in [jtu.rand_default()]))
@@ -377,6 +473,35 @@ class NumpyLinalgTest(jtu.JaxTestCase):
                             check_dtypes=True, tol=1e-3)
     self._CompileAndCheck(np.linalg.solve, args_maker, check_dtypes=True)
 
+  @parameterized.named_parameters(jtu.cases_from_list(
+      {"testcase_name":
+       "_lhs={}_rhs={}".format(
+           jtu.format_shape_dtype_string(lhs_shape, dtype),
+           jtu.format_shape_dtype_string(rhs_shape, dtype)),
+       "lhs_shape": lhs_shape, "rhs_shape": rhs_shape, "dtype": dtype,
+       "rng": rng}
+      for lhs_shape, rhs_shape in [
+          ((4, 4), (4,)),
+          ((5, 5), (5, 3)),
+          ((2, 4, 4), (2, 4, 3)),
+      ]
+      for dtype in float_types() | complex_types()
+      for rng in [jtu.rand_default()]))
+  @jtu.skip_on_devices("gpu", "tpu")
+  def testSolveGradAndBatching(self, lhs_shape, rhs_shape, dtype, rng):
+    if not hasattr(lapack, "jax_getrf"):
+      self.skipTest("No LU implementation available")
+    a = rng(lhs_shape, dtype) + 4 * onp.eye(lhs_shape[-1], dtype=dtype)
+    b = rng(rhs_shape, dtype)
+    jtu.check_grads(np.linalg.solve, (a, b), 2, rtol=1e-1)
+
+    ans = api.vmap(np.linalg.solve)(a[None], b[None])
+    self.assertAllClose(ans[0], onp.linalg.solve(a, b), check_dtypes=False,
+                        atol=1e-3, rtol=1e-3)
+    ans = api.vmap(np.linalg.solve, (None, 0))(a, onp.stack([b, 2 * b]))
+    self.assertAllClose(ans[1], 2 * onp.linalg.solve(a, b),
+                        check_dtypes=False, atol=1e-3, rtol=1e-3)
+
   @parameterized.named_parameters(jtu.cases_from_list(
       {"testcase_name":
        "_shape={}".format(jtu.format_shape_dtype_string(shape, dtype)),
@@ -400,6 +525,65 @@ class NumpyLinalgTest(jtu.JaxTestCase):
                             check_dtypes=True, tol=1e-3)
     self._CompileAndCheck(np.linalg.inv, args_maker, check_dtypes=True)
 
+  @parameterized.named_parameters(jtu.cases_from_list(
+      {"testcase_name":
+       "_shape={}".format(jtu.format_shape_dtype_string(shape, dtype)),
+       "shape": shape, "dtype": dtype, "rng": rng}
+      for shape in [(1, 1), (2, 2), (3, 3), (4, 4), (7, 2, 2), (2, 6, 3, 3),
+                    (100, 4, 4)]
+      for dtype in float_types() | complex_types()
+      for rng in [jtu.rand_default()]))
+  def testSmallMatrixClosedForms(self, shape, dtype, rng):
+    n = shape[-1]
+    a = rng(shape, dtype) + n * onp.eye(n, dtype=dtype)
+    b = rng(shape[:-1], dtype)
+    self.assertAllClose(np.linalg.det(a), onp.linalg.det(a),
+                        check_dtypes=True, atol=1e-3, rtol=1e-3)
+    self.assertAllClose(np.linalg.inv(a), onp.linalg.inv(a),
+                        check_dtypes=True, atol=1e-3, rtol=1e-3)
+    self.assertAllClose(np.linalg.solve(a, b),
+                        onp.linalg.solve(a, b[..., None])[..., 0],
+                        check_dtypes=True, atol=1e-3, rtol=1e-3)
+    self.assertAllClose(api.vmap(np.linalg.inv)(a), onp.linalg.inv(a),
+                        check_dtypes=True, atol=1e-3, rtol=1e-3)
+    jtu.check_grads(np.linalg.det, (a,), 2, rtol=1e-1)
+    jtu.check_grads(np.linalg.inv, (a,), 2, rtol=1e-1)
+    jtu.check_grads(np.linalg.solve, (a, b), 2, rtol=1e-1)
+
+
+  @parameterized.named_parameters(jtu.cases_from_list(
+      {"testcase_name": "_shape={}_n={}".format(
+          jtu.format_shape_dtype_string(shape, dtype), n),
+       "shape": shape, "dtype": dtype, "n": n, "rng": rng}
+      for shape in [(1, 1), (4, 4), (2, 3, 3)]
+      for dtype in float_types() | complex_types()
+      for n in [-3, 0, 1, 2, 7, 12]
+      for rng in [jtu.rand_default()]))
+  @jtu.skip_on_devices("gpu", "tpu")
+  def testMatrixPower(self, shape, dtype, n, rng):
+    def args_maker():
+      a = rng(shape, dtype) / shape[-1] + onp.eye(shape[-1], dtype=dtype)
+      return [a.astype(dtype)]
+    if len(shape) == 2:
+      self._CheckAgainstNumpy(partial(onp.linalg.matrix_power, n=n),
+                              partial(np.linalg.matrix_power, n=n),
+                              args_maker, check_dtypes=True, tol=1e-3)
+    self._CompileAndCheck(partial(np.linalg.matrix_power, n=n), args_maker,
+                          check_dtypes=True)
+    a, = args_maker()
+    if n != 0:
+      jtu.check_grads(partial(np.linalg.matrix_power, n=n), (a,), 2,
+                      rtol=1e-1)
+    ans = api.vmap(partial(np.linalg.matrix_power, n=n))(a[None])
+    self.assertAllClose(ans[0], np.linalg.matrix_power(a, n),
+                        check_dtypes=True, atol=1e-5, rtol=1e-5)
+
+  def testMatrixPowerInteger(self):
+    a = onp.array([[1, 2], [3, 4]], onp.int32)
+    self.assertAllClose(np.linalg.matrix_power(a, 5),
+                        onp.linalg.matrix_power(a, 5), check_dtypes=True)
+    self.assertRaises(TypeError, lambda: np.linalg.matrix_power(a, 1.5))
+
 
 class ScipyLinalgTest(jtu.JaxTestCase):
 
@@ -433,6 +617,55 @@ class ScipyLinalgTest(jtu.JaxTestCase):
 
     jtu.check_grads(jsp.linalg.lu, (a,), 2, rtol=1e-1)
 
+  @parameterized.named_parameters(jtu.cases_from_list(
+      {"testcase_name":
+       "_shape={}".format(jtu.format_shape_dtype_string(shape, dtype)),
+       "shape": shape, "dtype": dtype, "rng": rng}
+      for shape in [(3, 4, 4), (2, 3, 5, 4)]
+      for dtype in float_types() | complex_types()
+      for rng in [jtu.rand_default()]))
+  @jtu.skip_on_devices("gpu", "tpu")
+  def testLuBatching(self, shape, dtype, rng):
+    a = rng(shape, dtype)
+    lu, pivots = lax_linalg.lu(a)
+    for index in itertools.product(*map(range, shape[:-2])):
+      expected_lu, expected_pivots = osp.linalg.lu_factor(a[index])
+      self.assertAllClose(lu[index], expected_lu, check_dtypes=True,
+                          atol=1e-3, rtol=1e-3)
+      self.assertAllClose(pivots[index], expected_pivots, check_dtypes=True)
+
+    lus, pivotss = api.vmap(lax_linalg.lu)(a)
+    self.assertAllClose(lus, lu, check_dtypes=True)
+    self.assertAllClose(pivotss, pivots, check_dtypes=True)
+
+    jtu.check_grads(lambda a: lax_linalg.lu(a)[0], (a,), 2, rtol=1e-1)
+
+  @parameterized.named_parameters(jtu.cases_from_list(
+      {"testcase_name": "_dtype={}".format(onp.dtype(dtype).name),
+       "dtype": dtype, "rng": rng}
+      for dtype in float_types() | complex_types()
+      for rng in [jtu.rand_default()]))
+  @jtu.skip_on_devices("gpu", "tpu")
+  def testBatchedFactorizationsMultithreaded(self, dtype, rng):
+    if not hasattr(lapack, "set_num_threads"):
+      self.skipTest("jaxlib does not split batches across threads")
+    a = rng((301, 16, 16), dtype)
+    spd = onp.matmul(a, onp.conj(T(a))) + 16 * onp.eye(16, dtype=dtype)
+    fs = [lax_linalg.cholesky, lax_linalg.lu,
+          partial(lax_linalg.svd, full_matrices=False), lax_linalg.eigh]
+    operands = [spd, a, a, spd]
+
+    num_threads = lapack.get_num_threads()
+    try:
+      lapack.set_num_threads(1)
+      expected = [f(x) for f, x in zip(fs, operands)]
+      lapack.set_num_threads(4)
+      actual = [f(x) for f, x in zip(fs, operands)]
+    finally:
+      lapack.set_num_threads(num_threads)
+    for ans, ex in zip(actual, expected):
+      self.assertAllClose(ans, ex, check_dtypes=True)
+
 
   # TODO(phawkins): enable when there is an LU implementation for GPU/TPU.
   @parameterized.named_parameters(jtu.cases_from_list(
@@ -489,6 +722,42 @@ class ScipyLinalgTest(jtu.JaxTestCase):
                             check_dtypes=True, tol=1e-3)
     self._CompileAndCheck(jsp_fun, args_maker, check_dtypes=True)
 
+  @parameterized.named_parameters(jtu.cases_from_list(
+      {"testcase_name":
+       "_lhs={}_rhs={}_lower={}".format(
+           jtu.format_shape_dtype_string(lhs_shape, dtype),
+           jtu.format_shape_dtype_string(rhs_shape, dtype), lower),
+       "lhs_shape": lhs_shape, "rhs_shape": rhs_shape, "dtype": dtype,
+       "lower": lower, "rng": rng}
+      for lhs_shape, rhs_shape in [
+          ((4, 4), (4,)),
+          ((5, 5), (5, 3)),
+          ((2, 4, 4), (2, 4, 3)),
+      ]
+      for lower in [False, True]
+      for dtype in float_types() | complex_types()
+      for rng in [jtu.rand_default()]))
+  @jtu.skip_on_devices("gpu", "tpu")
+  def testChoSolveGrad(self, lhs_shape, rhs_shape, dtype, lower, rng):
+    a = rng(lhs_shape, dtype)
+    a = onp.matmul(a, onp.conj(T(a))) + lhs_shape[-1] * onp.eye(lhs_shape[-1])
+    a = a.astype(dtype)
+    b = rng(rhs_shape, dtype)
+    c = onp.linalg.cholesky(a)
+    c = c if lower else onp.conj(T(c))
+
+    f = lambda c, b: jsp.linalg.cho_solve((c, lower), b)
+    self.assertAllClose(f(c, b), onp.linalg.solve(a, b), check_dtypes=True,
+                        atol=1e-3, rtol=1e-3)
+    jtu.check_grads(f, (c, b), 2, rtol=1e-1)
+
+    g = lambda a, b: jsp.linalg.solve(a, b, sym_pos=True, lower=lower)
+    jtu.check_grads(g, (onp.tril(a) if lower else onp.triu(a), b), 2,
+                    rtol=1e-1)
+
+    ans = api.vmap(f)(c[None], b[None])
+    self.assertAllClose(ans[0], f(c, b), check_dtypes=True)
+
   @parameterized.named_parameters(jtu.cases_from_list(
       {"testcase_name":
        "_lhs={}_rhs={}_lower={}_transposea={}".format(
@@ -557,5 +826,72 @@ class ScipyLinalgTest(jtu.JaxTestCase):
     jtu.check_grads(f, (A, B), 2, rtol=1e-3)
 
 
+  @parameterized.named_parameters(jtu.cases_from_list(
+      {"testcase_name": "_fun={}_shape={}".format(
+          name, jtu.format_shape_dtype_string(shape, dtype)),
+       "name": name, "shape": shape, "dtype": dtype, "rng": rng}
+      for name in ["expm", "sqrtm", "logm"]
+      for shape in [(1, 1), (4, 4), (7, 7)]
+      for dtype in float_types() | complex_types()
+      for rng in [jtu.rand_default()]))
+  @jtu.skip_on_devices("gpu", "tpu")
+  def testMatrixFunction(self, name, shape, dtype, rng):
+    osp_fun = getattr(osp.linalg, name)
+    jsp_fun = getattr(jsp.linalg, name)
+
+    def args_maker():
+      a = rng(shape, dtype)
+      if name == "expm":
+        return [(3 * a).astype(dtype)]
+      # Keep the eigenvalues away from the negative real axis, where the
+      # principal square root and logarithm of a real matrix are complex.
+      a = onp.matmul(a, onp.conj(T(a))) / shape[-1] + onp.eye(shape[-1])
+      return [a.astype(dtype)]
+
+    self._CheckAgainstNumpy(lambda a: osp_fun(a).astype(dtype), jsp_fun,
+                            args_maker, check_dtypes=True, tol=1e-3)
+    self._CompileAndCheck(jsp_fun, args_maker, check_dtypes=True)
+
+  @parameterized.named_parameters(jtu.cases_from_list(
+      {"testcase_name": "_fun={}_shape={}".format(
+          name, jtu.format_shape_dtype_string(shape, dtype)),
+       "name": name, "shape": shape, "dtype": dtype, "rng": rng}
+      for name in ["expm", "sqrtm", "logm"]
+      for shape in [(3, 3), (2, 4, 4)]
+      for dtype in float_types() | complex_types()
+      for rng in [jtu.rand_default()]))
+  @jtu.skip_on_devices("gpu", "tpu")
+  def testMatrixFunctionGradAndBatching(self, name, shape, dtype, rng):
+    fun = getattr(jsp.linalg, name)
+    a = rng(shape, dtype) / shape[-1]
+    if name != "expm":
+      a = a + onp.eye(shape[-1], dtype=dtype)
+    a = a.astype(dtype)
+    jtu.check_grads(fun, (a,), 2, rtol=1e-1)
+
+    ans = api.vmap(fun)(a[None])
+    self.assertAllClose(ans[0], fun(a), check_dtypes=True, atol=1e-5,
+                        rtol=1e-5)
+
+  def testExpmFrechet(self):
+    rng = onp.random.RandomState(0)
+    a = rng.randn(5, 5).astype(onp.float32)
+    e = rng.randn(5, 5).astype(onp.float32)
+    expected_expm, expected_frechet = osp.linalg.expm_frechet(a, e)
+    ans_expm, ans_frechet = jvp(jsp.linalg.expm, (a,), (e,))
+    self.assertAllClose(ans_expm, expected_expm, check_dtypes=False,
+                        atol=1e-3, rtol=1e-3)
+    self.assertAllClose(ans_frechet, expected_frechet, check_dtypes=False,
+                        atol=1e-3, rtol=1e-3)
+
+  def testMatrixFunctionsInverse(self):
+    rng = onp.random.RandomState(0)
+    a = rng.randn(6, 6).astype(onp.float32) / 6
+    self.assertAllClose(jsp.linalg.logm(jsp.linalg.expm(a)), a,
+                        check_dtypes=True, atol=1e-4, rtol=1e-4)
+    b = onp.eye(6, dtype=onp.float32) + a
+    self.assertAllClose(np.linalg.matrix_power(jsp.linalg.sqrtm(b), 2), b,
+                        check_dtypes=True, atol=1e-4, rtol=1e-4)
+
 if __name__ == "__main__":
   absltest.main()
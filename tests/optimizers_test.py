@@ -24,6 +24,9 @@ import jax.numpy as np
 import jax.test_util as jtu
 from jax import jit, grad
 from jax.experimental import optimizers
+from jax.experimental import sparse
+from jax.experimental import stax
+from jax.flatten_util import PackedTree
 from jax.lib import xla_bridge as xla
 
 from jax.config import config
@@ -169,6 +172,177 @@ class OptimizerTests(jtu.JaxTestCase):
 
     update(opt_state, 0.9)  # doesn't crash
 
+  def _CheckFusedMatchesUnfused(self, optimizer, *args):
+    def loss(xs, _):
+      x, (y, z) = xs
+      return np.sum(x ** 2) + np.sum(np.sin(y)) + np.sum(z ** 3)
+    x0 = (np.ones((3, 2)), (np.arange(4.), np.array(0.5, np.float32)))
+
+    for update_jit in [lambda f: f, jit]:
+      init_fun, update_fun = optimizer(*args)
+      fused_init_fun, fused_update_fun = optimizer(*args, fused=True)
+      update_fun, fused_update_fun = map(update_jit,
+                                         [update_fun, fused_update_fun])
+      opt_state = init_fun(x0)
+      fused_opt_state = fused_init_fun(x0)
+      for i in range(3):
+        g = grad(loss)(optimizers.get_params(opt_state), None)
+        opt_state = update_fun(i, g, opt_state)
+        fused_opt_state = fused_update_fun(i, g, fused_opt_state)
+      self.assertAllClose(optimizers.get_params(opt_state),
+                          optimizers.get_params(fused_opt_state),
+                          check_dtypes=True)
+
+  def testFusedSgd(self):
+    self._CheckFusedMatchesUnfused(optimizers.sgd, 0.1)
+
+  def testFusedMomentum(self):
+    self._CheckFusedMatchesUnfused(optimizers.momentum, 0.1, 0.9)
+
+  def testFusedRmsprop(self):
+    self._CheckFusedMatchesUnfused(optimizers.rmsprop, 0.1)
+
+  def testFusedAdam(self):
+    self._CheckFusedMatchesUnfused(optimizers.adam, 0.1)
+
+  def testFusedStateIsFlat(self):
+    x0 = {'w': np.ones((3, 2)), 'b': np.zeros(2), 'i': np.arange(3)}
+    init_fun, _ = optimizers.momentum(0.1, 0.9, fused=True)
+    opt_state = init_fun(x0)
+    params, velocity = opt_state.packed_trees
+    self.assertEqual(len(params.buffers), 2)  # one float buffer, one int buffer
+    self.assertEqual(params.buffers[0].shape, (8,))
+    self.assertEqual(velocity.buffers[0].shape, (8,))
+    self.assertAllClose(optimizers.get_params(opt_state), x0, check_dtypes=True)
+
+  def testPackedParams(self):
+    init_params, apply_params = stax.packed(stax.serial(
+        stax.Dense(4), stax.Relu, stax.Dense(2)))
+    _, params = init_params((-1, 3))
+    self.assertIsInstance(params, PackedTree)
+    self.assertEqual(len(params.buffers), 1)
+    self.assertEqual(params.buffers[0].shape, (3 * 4 + 4 + 4 * 2 + 2,))
+
+    inputs = np.ones((5, 3))
+    loss = lambda params: np.sum(apply_params(params, inputs) ** 2)
+    opt_init, opt_update = optimizers.adam(0.1)
+    opt_state = opt_init(params)
+    for i in range(3):
+      g = grad(loss)(optimizers.get_params(opt_state))
+      self.assertIsInstance(g, PackedTree)
+      opt_state = jit(opt_update)(i, g, opt_state)
+
+    packed_params = optimizers.get_params(opt_state)
+    self.assertIsInstance(packed_params, PackedTree)
+    unpacked_params = packed_params.unpack()
+    _, apply_fun = stax.serial(stax.Dense(4), stax.Relu, stax.Dense(2))
+    self.assertAllClose(apply_params(packed_params, inputs),
+                        apply_fun(unpacked_params, inputs), check_dtypes=True)
+
+  def testDynamicLossScaling(self):
+    opt_init, opt_update = optimizers.dynamic_loss_scaling(
+        *optimizers.sgd(0.1), init_scale=8., growth_interval=2)
+    opt_state = opt_init(np.ones(2))
+    self.assertAllClose(optimizers.get_loss_scale(opt_state), 8.,
+                        check_dtypes=False)
+
+    # finite scaled gradients are unscaled before the update
+    opt_state = opt_update(0, 8. * np.ones(2), opt_state)
+    self.assertAllClose(optimizers.get_params(opt_state), 0.9 * np.ones(2),
+                        check_dtypes=False)
+    self.assertAllClose(optimizers.get_loss_scale(opt_state), 8.,
+                        check_dtypes=False)
+
+    # an overflow skips the update and backs off the scale
+    opt_state = jit(opt_update)(1, np.array([np.inf, 1.]), opt_state)
+    self.assertAllClose(optimizers.get_params(opt_state), 0.9 * np.ones(2),
+                        check_dtypes=False)
+    self.assertAllClose(optimizers.get_loss_scale(opt_state), 4.,
+                        check_dtypes=False)
+
+    # growth_interval consecutive finite steps grow the scale
+    for i in range(2):
+      opt_state = opt_update(2 + i, np.zeros(2), opt_state)
+    self.assertAllClose(optimizers.get_loss_scale(opt_state), 8.,
+                        check_dtypes=False)
+
+  def testGlobalNorm(self):
+    tree = ({'a': np.array([3., 0.])}, [np.array([[4.]], np.float16)])
+    self.assertAllClose(optimizers.global_norm(tree), 5., check_dtypes=False)
+
+  def testClipGrads(self):
+    tree = ({'a': np.array([3., 0.])}, [np.array([[4.]])])
+    clipped = optimizers.clip_grads(tree, 1.)
+    self.assertAllClose(optimizers.global_norm(clipped), 1., check_dtypes=False)
+    expected = ({'a': np.array([.6, 0.])}, [np.array([[.8]])])
+    self.assertAllClose(clipped, expected, check_dtypes=True)
+    self.assertAllClose(optimizers.clip_grads(tree, 10.), tree,
+                        check_dtypes=True)
+
+  def testClipUpdate(self):
+    opt_init, opt_update = optimizers.sgd(1.)
+    opt_update = jit(optimizers.clip_update(opt_update, 1.))
+    opt_state = opt_update(0, np.array([3., 4.]), opt_init(np.zeros(2)))
+    self.assertAllClose(optimizers.get_params(opt_state), np.array([-.6, -.8]),
+                        check_dtypes=False)
+
+  def testSparseGradSgdMatchesDense(self):
+    table = np.arange(12.).reshape((6, 2))
+    ids = np.array([4, 1, 4])
+    g_rows = np.array([[1., 2.], [3., 4.], [5., 6.]])
+    g_table = sparse.IndexedSlices(ids, g_rows, table.shape)
+    opt_init, opt_update = optimizers.sgd(0.1)
+    params = {'emb': table, 'w': np.ones(3)}
+    grads = {'emb': g_table, 'w': np.ones(3)}
+    opt_state = jit(opt_update)(0, grads, opt_init(params))
+    dense_grads = {'emb': g_table.todense(), 'w': np.ones(3)}
+    expected = opt_update(0, dense_grads, opt_init(params))
+    self.assertAllClose(optimizers.get_params(opt_state),
+                        optimizers.get_params(expected), check_dtypes=True)
+
+  def testSparseGradAdamIsLazy(self):
+    table = np.ones((5, 3))
+    g_table = sparse.IndexedSlices(np.array([2, 0, 2]), np.ones((3, 3)),
+                                   table.shape)
+    opt_init, opt_update = optimizers.adam(0.1)
+    opt_state = opt_update(0, g_table, opt_init(table))
+    # rows 0 and 2 match a dense step with the summed gradient
+    dense_state = opt_update(0, g_table.todense(), opt_init(table))
+    params = optimizers.get_params(opt_state)
+    dense_params = optimizers.get_params(dense_state)
+    self.assertAllClose(params[np.array([0, 2])],
+                        dense_params[np.array([0, 2])], check_dtypes=True)
+    # untouched rows, and their moment estimates, are left as they were
+    self.assertAllClose(params[np.array([1, 3, 4])], np.ones((3, 3)),
+                        check_dtypes=True)
+    self.assertAllClose(opt_state[1][np.array([1, 3, 4])], np.zeros((3, 3)),
+                        check_dtypes=True)
+
+  def testEmbeddingVjpTraining(self):
+    table = np.ones((10, 2))
+    ids = np.array([[1, 3], [3, 7]])
+    def loss(rows):
+      return np.sum(rows ** 2)
+    opt_init, opt_update = optimizers.sgd(0.1)
+
+    @jit
+    def step(i, opt_state):
+      rows, emb_vjp = sparse.embedding_vjp(optimizers.get_params(opt_state),
+                                           ids)
+      return opt_update(i, emb_vjp(grad(loss)(rows)), opt_state)
+
+    params = optimizers.get_params(step(0, opt_init(table)))
+    dense_grad = grad(lambda t: loss(sparse.embedding_lookup(t, ids)))(table)
+    self.assertAllClose(params, table - 0.1 * dense_grad, check_dtypes=True)
+
+  def testClipGradsSkipsSparseIndices(self):
+    g = sparse.IndexedSlices(np.array([7, 2]), np.array([[3.], [4.]]), (9, 1))
+    self.assertAllClose(optimizers.global_norm(g), 5., check_dtypes=False)
+    clipped = optimizers.clip_grads(g, 1.)
+    self.assertAllClose(clipped.indices, g.indices, check_dtypes=True)
+    self.assertAllClose(clipped.values, np.array([[.6], [.8]]),
+                        check_dtypes=True)
+
 
 if __name__ == '__main__':
   absltest.main()
@@ -51,6 +51,12 @@ class LaxRandomTest(jtu.JaxTestCase):
     statistic = scipy.stats.kstest(samples, cdf).statistic
     self.assertLess(1. - scipy.special.kolmogorov(statistic), fail_prob)
 
+  def _CheckChiSquared(self, counts, probs):
+    fail_prob = 0.01  # conservative bound on statistical fail prob by Chi^2
+    expected = probs * counts.sum()
+    pvalue = scipy.stats.chisquare(counts, expected).pvalue
+    self.assertGreater(pvalue, fail_prob)
+
   @parameterized.named_parameters(jtu.cases_from_list(
       {"testcase_name": "_{}".format(dtype), "dtype": onp.dtype(dtype).name}
       for dtype in [onp.float32, onp.float64]))
@@ -86,6 +92,70 @@ class LaxRandomTest(jtu.JaxTestCase):
         onp.uint32([0x243f6a88, 0x85a308d3]))
     self.assertEqual(expected, result_to_hex(result))
 
+  def testThreefry2x32Reduced(self):
+    # Known-answer values for the 13-round variant, from the kat_vectors file of
+    # the Random123 reference implementation.
+    def result_to_hex(result):
+      return tuple([hex(x.copy()).rstrip("L") for x in result])
+
+    expected = ("0x9d1c5ec6", "0x8bd50731")
+    result = random.threefry_2x32_13(onp.uint32([0, 0]), onp.uint32([0, 0]))
+    self.assertEqual(expected, result_to_hex(result))
+
+    expected = ("0xfd36d048", "0x2d17272c")
+    result = random.threefry_2x32_13(
+        onp.uint32([-1, -1]), onp.uint32([-1, -1]))
+    self.assertEqual(expected, result_to_hex(result))
+
+    expected = ("0xba3e4725", "0xf27d669e")
+    result = random.threefry_2x32_13(
+        onp.uint32([0x13198a2e, 0x03707344]),
+        onp.uint32([0x243f6a88, 0x85a308d3]))
+    self.assertEqual(expected, result_to_hex(result))
+
+  @parameterized.named_parameters(
+      {"testcase_name": "_{}".format(name), "impl": name}
+      for name in sorted(random._prng_impls))
+  def testPRNGImplStatistics(self, impl):
+    hash_fun = random._prng_impls[impl]
+    key = random.PRNGKey(0)
+    counts = onp.arange(10000, dtype=onp.uint32)
+    bits = hash_fun(key, counts)
+    self.assertEqual(len(onp.unique(bits)), 10000)
+
+    samples = onp.asarray(bits, onp.float64) / 2. ** 32
+    self._CheckKolmogorovSmirnovCDF(samples, scipy.stats.uniform().cdf)
+
+    # Neighbouring keys, as produced by PRNGKey on consecutive seeds, should
+    # give unrelated streams.
+    other_bits = hash_fun(random.PRNGKey(1), counts)
+    other_samples = onp.asarray(other_bits, onp.float64) / 2. ** 32
+    self.assertLess(abs(onp.corrcoef(samples, other_samples)[0, 1]), 0.05)
+
+  @parameterized.named_parameters(jtu.cases_from_list(
+      {"testcase_name": "_bits={}_shape={}".format(bit_width, shape),
+       "bit_width": bit_width, "shape": shape}
+      for bit_width in [32, 64]
+      for shape in [(10,), (7, 3), (16,)]))
+  def testRandomBitsInBlocks(self, bit_width, shape):
+    if not FLAGS.jax_enable_x64 and bit_width == 64:
+      raise SkipTest("can't test 64-bit random bits")
+
+    key = random.PRNGKey(0)
+    old_block_count = random._MAX_BLOCK_COUNT
+    random._MAX_BLOCK_COUNT = 4
+    try:
+      bits1 = onp.asarray(random._random_bits(key, bit_width, shape))
+      bits2 = onp.asarray(random._random_bits(key, bit_width, shape))
+    finally:
+      random._MAX_BLOCK_COUNT = old_block_count
+    unblocked = onp.asarray(random._random_bits(key, bit_width, shape))
+
+    self.assertEqual(bits1.shape, shape)
+    self.assertTrue(onp.all(bits1 == bits2))
+    self.assertEqual(len(onp.unique(bits1)), bits1.size)
+    self.assertFalse(onp.all(bits1 == unblocked))
+
   @parameterized.named_parameters(jtu.cases_from_list(
       {"testcase_name": "_{}".format(dtype), "dtype": onp.dtype(dtype).name}
       for dtype in [onp.float32, onp.float64]))
@@ -151,6 +221,80 @@ class LaxRandomTest(jtu.JaxTestCase):
     self.assertFalse(onp.all(perm1 == x))  # seems unlikely!
     self.assertTrue(onp.all(onp.sort(perm1) == x))
 
+  def testPermutationInteger(self):
+    key = random.PRNGKey(0)
+    perm = random.permutation(key, 100)
+    perm2 = api.jit(lambda key: random.permutation(key, 100))(key)
+
+    self.assertTrue(onp.all(perm == perm2))
+    self.assertFalse(onp.all(perm == onp.arange(100)))  # seems unlikely!
+    self.assertTrue(onp.all(onp.sort(perm) == onp.arange(100)))
+
+  def testPermutationArray(self):
+    key = random.PRNGKey(0)
+    x = onp.arange(200).reshape(100, 2)
+    perm = random.permutation(key, x)
+
+    self.assertEqual(perm.shape, x.shape)
+    self.assertTrue(onp.all(perm[:, 1] == perm[:, 0] + 1))  # rows stay intact
+    self.assertTrue(onp.all(onp.sort(perm[:, 0]) == x[:, 0]))
+
+  @parameterized.named_parameters(jtu.cases_from_list(
+      {"testcase_name": "_shape={}_replace={}_weighted={}_array_input={}"
+                        .format(shape, replace, weighted, array_input),
+       "shape": shape, "replace": replace, "weighted": weighted,
+       "array_input": array_input}
+      for shape in [(), (5,), (4, 5)]
+      for replace in [True, False]
+      for weighted in [True, False]
+      for array_input in [True, False]))
+  def testChoice(self, shape, replace, weighted, array_input):
+    N = 100
+    key = random.PRNGKey(0)
+    x = N if not array_input else onp.arange(2 * N, 3 * N)
+    p = None if not weighted else onp.linspace(0, 1, N, dtype=onp.float32)
+    rand = lambda key: random.choice(key, x, shape, replace, p)
+    crand = api.jit(rand)
+
+    sample1 = rand(key)
+    sample2 = crand(key)
+
+    self.assertEqual(onp.shape(sample1), shape)
+    self.assertTrue(onp.all(sample1 == sample2))
+    values = onp.ravel(sample1) - (0 if not array_input else 2 * N)
+    self.assertTrue(onp.all((0 <= values) & (values < N)))
+    if weighted:
+      self.assertFalse(onp.any(values == 0))  # has zero probability
+    if not replace:
+      self.assertEqual(len(onp.unique(values)), values.size)
+
+  def testChoiceDistribution(self):
+    key = random.PRNGKey(0)
+    p = onp.array([0.1, 0.6, 0.3], onp.float32)
+    samples = random.choice(key, 3, (10000,), p=p)
+    counts = onp.bincount(samples, minlength=3)
+    self._CheckChiSquared(counts, p)
+
+  @parameterized.named_parameters(jtu.cases_from_list(
+      {"testcase_name": "_axis={}".format(axis), "axis": axis}
+      for axis in [0, 1, -1]))
+  def testCategorical(self, axis):
+    key = random.PRNGKey(0)
+    p = onp.array([0.1, 0.6, 0.3], onp.float32)
+    logits = onp.log(onp.stack([p, p]))
+    if axis == 0:
+      logits = logits.T
+    rand = lambda key: random.categorical(key, logits, axis, (10000, 2))
+    crand = api.jit(rand)
+
+    uncompiled_samples = rand(key)
+    compiled_samples = crand(key)
+
+    for samples in [uncompiled_samples, compiled_samples]:
+      self.assertEqual(samples.shape, (10000, 2))
+      for column in onp.asarray(samples).T:
+        self._CheckChiSquared(onp.bincount(column, minlength=3), p)
+
   # TODO: add Chi-squared test for Bernoulli
   def testBernoulliShape(self):
     key = random.PRNGKey(0)
@@ -220,6 +364,158 @@ class LaxRandomTest(jtu.JaxTestCase):
     x = random.pareto(key, onp.array([0.2, 0.3]), shape=(3, 2))
     assert x.shape == (3, 2)
 
+  @parameterized.named_parameters(jtu.cases_from_list(
+      {"testcase_name": "_a={}_{}".format(a, dtype),
+       "a": a, "dtype": onp.dtype(dtype).name}
+      for a in [0.1, 1., 10.]
+      for dtype in [onp.float32, onp.float64]))
+  def testGamma(self, a, dtype):
+    key = random.PRNGKey(0)
+    rand = lambda key, a: random.gamma(key, a, (10000,), dtype)
+    crand = api.jit(rand)
+
+    uncompiled_samples = rand(key, a)
+    compiled_samples = crand(key, a)
+
+    for samples in [uncompiled_samples, compiled_samples]:
+      self._CheckKolmogorovSmirnovCDF(samples, scipy.stats.gamma(a).cdf)
+
+  def testGammaShape(self):
+    key = random.PRNGKey(0)
+    x = random.gamma(key, onp.array([0.2, 0.3]), shape=(3, 2))
+    assert x.shape == (3, 2)
+
+  @parameterized.named_parameters(jtu.cases_from_list(
+      {"testcase_name": "_a={}".format(a), "a": a}
+      for a in [0.5, 1., 5.]))
+  def testGammaGrad(self, a):
+    key = random.PRNGKey(0)
+    rand = lambda a: random.gamma(key, a * onp.ones(100, onp.float32))
+    samples = onp.asarray(rand(a), onp.float64)
+    grads = api.grad(lambda a: rand(a).sum())(onp.float32(a))
+
+    # implicit differentiation of the CDF, by finite differences in a
+    eps = 1e-4
+    cdf_dot = (scipy.special.gammainc(a + eps, samples) -
+               scipy.special.gammainc(a - eps, samples)) / (2 * eps)
+    pdf = scipy.stats.gamma(a).pdf(samples)
+    expected = onp.sum(-cdf_dot / pdf)
+    self.assertAllClose(grads, expected, check_dtypes=False, rtol=1e-2)
+
+  def testGammaGradBatchedKeys(self):
+    keys = random.split(random.PRNGKey(0), 4)
+    a = onp.array([0.5, 1., 5.], onp.float32)
+    grads = api.grad(lambda a: random.gamma(keys, a).sum())(a)
+    expected = sum(api.grad(lambda a: random.gamma(key, a).sum())(a)
+                   for key in keys)
+    self.assertAllClose(grads, expected, check_dtypes=True, rtol=1e-5)
+    grads = api.grad(
+        lambda a: random.gamma(keys, a, shape=(2, 3)).sum())(a)
+    expected = sum(api.grad(
+        lambda a: random.gamma(key, a, shape=(2, 3)).sum())(a)
+                   for key in keys)
+    self.assertAllClose(grads, expected, check_dtypes=True, rtol=1e-5)
+
+  @parameterized.named_parameters(jtu.cases_from_list(
+      {"testcase_name": "_a={}_b={}_{}".format(a, b, dtype),
+       "a": a, "b": b, "dtype": onp.dtype(dtype).name}
+      for a in [0.2, 5.]
+      for b in [0.2, 5.]
+      for dtype in [onp.float32, onp.float64]))
+  def testBeta(self, a, b, dtype):
+    key = random.PRNGKey(0)
+    rand = lambda key, a, b: random.beta(key, a, b, (10000,), dtype)
+    crand = api.jit(rand)
+
+    uncompiled_samples = rand(key, a, b)
+    compiled_samples = crand(key, a, b)
+
+    for samples in [uncompiled_samples, compiled_samples]:
+      self._CheckKolmogorovSmirnovCDF(samples, scipy.stats.beta(a, b).cdf)
+
+  @parameterized.named_parameters(jtu.cases_from_list(
+      {"testcase_name": "_alpha={}_{}".format(alpha, dtype),
+       "alpha": alpha, "dtype": onp.dtype(dtype).name}
+      for alpha in [[0.2, 1., 5.]]
+      for dtype in [onp.float32, onp.float64]))
+  def testDirichlet(self, alpha, dtype):
+    key = random.PRNGKey(0)
+    rand = lambda key, alpha: random.dirichlet(key, alpha, (10000,), dtype)
+    crand = api.jit(rand)
+
+    uncompiled_samples = rand(key, alpha)
+    compiled_samples = crand(key, alpha)
+
+    for samples in [uncompiled_samples, compiled_samples]:
+      self.assertEqual(samples.shape, (10000, 3))
+      self.assertAllClose(samples.sum(-1), onp.ones(10000, dtype),
+                          check_dtypes=True)
+      alpha_sum = sum(alpha)
+      for i, a in enumerate(alpha):
+        self._CheckKolmogorovSmirnovCDF(
+            samples[:, i], scipy.stats.beta(a, alpha_sum - a).cdf)
+
+  @parameterized.named_parameters(jtu.cases_from_list(
+      {"testcase_name": "_{}".format(dtype), "dtype": onp.dtype(dtype).name}
+      for dtype in [onp.float32, onp.float64]))
+  def testMultivariateNormal(self, dtype):
+    key = random.PRNGKey(0)
+    mean = onp.array([1., -2., 3.], dtype)
+    factor = onp.array([[1., 0., 0.], [0.5, 2., 0.], [-1., 0.3, 0.5]], dtype)
+    cov = onp.dot(factor, factor.T)
+    rand = lambda key: random.multivariate_normal(key, mean, cov, (10000,),
+                                                  dtype)
+    crand = api.jit(rand)
+
+    uncompiled_samples = rand(key)
+    compiled_samples = crand(key)
+
+    for samples in [uncompiled_samples, compiled_samples]:
+      self.assertEqual(samples.shape, (10000, 3))
+      samples = onp.asarray(samples, onp.float64)
+      self.assertAllClose(samples.mean(0), mean, check_dtypes=False, atol=0.1)
+      self.assertAllClose(onp.cov(samples.T), cov, check_dtypes=False,
+                          atol=0.2)
+      # whitened samples are independent standard normals
+      whitened = onp.linalg.solve(factor, (samples - mean).T)
+      for row in whitened:
+        self._CheckKolmogorovSmirnovCDF(row, scipy.stats.norm().cdf)
+
+  @parameterized.named_parameters(jtu.cases_from_list(
+      {"testcase_name": "_lower={}_upper={}_{}".format(lower, upper, dtype),
+       "lower": lower, "upper": upper, "dtype": onp.dtype(dtype).name}
+      for lower, upper in [(-1., 1.), (-3., 0.5), (0.5, 2.)]
+      for dtype in [onp.float32, onp.float64]))
+  def testTruncatedNormal(self, lower, upper, dtype):
+    key = random.PRNGKey(0)
+    rand = lambda key: random.truncated_normal(key, lower, upper, (10000,),
+                                               dtype)
+    crand = api.jit(rand)
+
+    uncompiled_samples = rand(key)
+    compiled_samples = crand(key)
+
+    for samples in [uncompiled_samples, compiled_samples]:
+      self.assertTrue(onp.all(lower <= samples))
+      self.assertTrue(onp.all(samples <= upper))
+      self._CheckKolmogorovSmirnovCDF(
+          samples, scipy.stats.truncnorm(lower, upper).cdf)
+
+  def testTruncatedNormalArrayBounds(self):
+    key = random.PRNGKey(0)
+    lower = onp.array([-1., 0., 0.5], onp.float32)
+    upper = onp.array([1., 2., 0.75], onp.float32)
+    samples = api.jit(random.truncated_normal)(key, lower, upper)
+    self.assertEqual(samples.shape, (3,))
+    self.assertTrue(onp.all(lower <= samples))
+    self.assertTrue(onp.all(samples <= upper))
+
+    keys = random.split(key, 3)
+    samples = api.vmap(random.truncated_normal)(keys, lower, upper)
+    self.assertEqual(samples.shape, (3,))
+    self.assertTrue(onp.all(lower <= samples))
+    self.assertTrue(onp.all(samples <= upper))
+
   def testIssue222(self):
     x = random.randint(random.PRNGKey(10003), (), 0, 0)
     assert x == 0
@@ -229,6 +525,44 @@ class LaxRandomTest(jtu.JaxTestCase):
     keys = [random.fold_in(key, i) for i in range(10)]
     assert onp.unique(onp.ravel(keys)).shape == (20,)
 
+  def testSplitBatched(self):
+    keys = random.split(random.PRNGKey(0), 3)
+    batched = random.split(keys, 4)
+    self.assertEqual(batched.shape, (3, 4, 2))
+    for key, subkeys in zip(keys, batched):
+      self.assertAllClose(random.split(key, 4), subkeys, check_dtypes=True)
+
+  def testFoldInBatched(self):
+    key = random.PRNGKey(0)
+    keys = random.split(key, 5)
+    data = onp.arange(5, dtype=onp.int32)
+
+    expected = onp.stack([random.fold_in(key, i) for i in range(5)])
+    self.assertAllClose(random.fold_in(key, data), expected, check_dtypes=True)
+
+    expected = onp.stack([random.fold_in(k, 7) for k in keys])
+    self.assertAllClose(random.fold_in(keys, 7), expected, check_dtypes=True)
+
+    expected = onp.stack([random.fold_in(k, i) for i, k in enumerate(keys)])
+    self.assertAllClose(random.fold_in(keys, data), expected, check_dtypes=True)
+
+  @parameterized.named_parameters(
+      {"testcase_name": "_{}".format(name), "sampler": sampler}
+      for name, sampler in [
+          ("uniform", lambda key: random.uniform(key, (3, 2))),
+          ("normal", lambda key: random.normal(key, (3, 2))),
+          ("randint", lambda key: random.randint(key, (3, 2), 0, 5)),
+          ("bernoulli", lambda key: random.bernoulli(key, 0.5, (3, 2))),
+          ("shuffle", lambda key: random.shuffle(key, onp.arange(6))),
+      ])
+  def testSamplersWithBatchedKeys(self, sampler):
+    as_float = lambda x: onp.asarray(x, onp.float32)
+    keys = random.split(random.PRNGKey(0), 4)
+    expected = onp.stack([as_float(sampler(key)) for key in keys])
+    for samples in [sampler(keys), api.jit(sampler)(keys),
+                    api.vmap(sampler)(keys)]:
+      self.assertAllClose(as_float(samples), expected, check_dtypes=True)
+
   @parameterized.named_parameters(jtu.cases_from_list(
       {"testcase_name": "_{}".format(dtype), "dtype": onp.dtype(dtype).name}
       for dtype in [onp.float32, onp.float64]))
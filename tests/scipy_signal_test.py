@@ -0,0 +1,107 @@
+# Copyright 2018 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+from absl.testing import absltest, parameterized
+
+import numpy as onp
+import scipy.signal as osp_signal
+
+from jax import api
+from jax import test_util as jtu
+from jax.scipy import signal as lsp_signal
+
+from jax.config import config
+config.parse_flags_with_absl()
+
+float_dtypes = [onp.float32, onp.float64]
+complex_dtypes = [onp.complex64]
+
+
+class LaxBackedScipySignalTests(jtu.JaxTestCase):
+  """Tests for LAX-backed scipy.signal implementations"""
+
+  @parameterized.named_parameters(jtu.cases_from_list(
+      {"testcase_name": "_{}_xshape={}_yshape={}_mode={}".format(
+          op, jtu.format_shape_dtype_string(xshape, dtype),
+          jtu.format_shape_dtype_string(yshape, dtype), mode),
+       "op": op, "xshape": xshape, "yshape": yshape, "dtype": dtype,
+       "mode": mode, "rng": jtu.rand_default()}
+      for op in ["fftconvolve", "convolve_fft", "convolve_direct",
+                 "convolve_auto"]
+      for xshape, yshape in [((10,), (3,)), ((3,), (10,)), ((64,), (17,)),
+                             ((9, 10), (3, 4)), ((4, 5, 6), (2, 3, 2))]
+      for dtype in (float_dtypes + complex_dtypes if op == "fftconvolve"
+                    else float_dtypes)
+      for mode in ["full", "same", "valid"]))
+  def testConvolve(self, op, xshape, yshape, dtype, mode, rng):
+    if op == "fftconvolve":
+      lax_fun = lambda x, y: lsp_signal.fftconvolve(x, y, mode=mode)
+    else:
+      method = op.split("_")[1]
+      lax_fun = lambda x, y: lsp_signal.convolve(x, y, mode=mode,
+                                                 method=method)
+    scipy_fun = lambda x, y: osp_signal.convolve(x, y, mode=mode,
+                                                 method="direct")
+    args_maker = lambda: [rng(xshape, dtype), rng(yshape, dtype)]
+    self._CheckAgainstNumpy(scipy_fun, lax_fun, args_maker, check_dtypes=False,
+                            tol=1e-3)
+    self._CompileAndCheck(lax_fun, args_maker, check_dtypes=True)
+
+  @parameterized.named_parameters(jtu.cases_from_list(
+      {"testcase_name": "_xshape={}_yshape={}_axes={}_mode={}".format(
+          jtu.format_shape_dtype_string(xshape, dtype),
+          jtu.format_shape_dtype_string(yshape, dtype), axes, mode),
+       "xshape": xshape, "yshape": yshape, "dtype": dtype, "axes": axes,
+       "mode": mode, "rng": jtu.rand_default()}
+      for xshape, yshape, axes in [((3, 20), (3, 5), 1), ((3, 20), (1, 5), -1),
+                                   ((6, 4, 8), (6, 3, 1), (0, 1))]
+      for dtype in [onp.float32]
+      for mode in ["full", "same", "valid"]))
+  def testFftconvolveAxes(self, xshape, yshape, dtype, axes, mode, rng):
+    lax_fun = lambda x, y: lsp_signal.fftconvolve(x, y, mode=mode, axes=axes)
+    scipy_fun = lambda x, y: osp_signal.fftconvolve(x, y, mode=mode, axes=axes)
+    args_maker = lambda: [rng(xshape, dtype), rng(yshape, dtype)]
+    self._CheckAgainstNumpy(scipy_fun, lax_fun, args_maker, check_dtypes=False,
+                            tol=1e-3)
+
+  def testFftconvolveGrad(self):
+    rng = onp.random.RandomState(0)
+    x = rng.randn(20).astype(onp.float32)
+    y = rng.randn(7).astype(onp.float32)
+    for mode in ["full", "same", "valid"]:
+      f = lambda x, y: lsp_signal.fftconvolve(x, y, mode=mode)
+      jtu.check_grads(f, (x, y), 2, atol=1e-2, rtol=1e-2)
+
+  def testFftconvolveGradMatchesDirect(self):
+    rng = onp.random.RandomState(0)
+    x = rng.randn(30).astype(onp.float32)
+    y = rng.randn(9).astype(onp.float32)
+    for mode in ["full", "same", "valid"]:
+      fft_fun = lambda x, y: lsp_signal.fftconvolve(x, y, mode=mode)
+      direct_fun = lambda x, y: lsp_signal.convolve(x, y, mode=mode,
+                                                    method="direct")
+      out, vjp_fft = api.vjp(fft_fun, x, y)
+      _, vjp_direct = api.vjp(direct_fun, x, y)
+      cotangent = rng.randn(*onp.shape(out)).astype(onp.float32)
+      for ans, expected in zip(vjp_fft(cotangent), vjp_direct(cotangent)):
+        self.assertAllClose(ans, expected, check_dtypes=True, atol=1e-3,
+                            rtol=1e-3)
+
+
+if __name__ == "__main__":
+  absltest.main()
@@ -0,0 +1,275 @@
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for the iterative solvers in jax.scipy.sparse.linalg."""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+from functools import partial
+
+import numpy as onp
+
+from absl.testing import absltest
+from absl.testing import parameterized
+
+from jax import api
+from jax import numpy as np
+from jax import random
+from jax import test_util as jtu
+from jax.scipy.sparse import linalg as sp_linalg
+
+from jax.config import config
+config.parse_flags_with_absl()
+
+
+def posdef(rng, n, dtype):
+  a = rng.randn(n, n).astype(dtype)
+  return onp.dot(a, a.T) / n + onp.eye(n, dtype=dtype)
+
+def nonsymmetric(rng, n, dtype):
+  return (rng.randn(n, n) / onp.sqrt(n) + 3 * onp.eye(n)).astype(dtype)
+
+SOLVERS = [
+    ("cg", sp_linalg.cg, posdef),
+    ("gmres", sp_linalg.gmres, nonsymmetric),
+    ("gmres_restart=3", partial(sp_linalg.gmres, restart=3), nonsymmetric),
+    ("bicgstab", sp_linalg.bicgstab, nonsymmetric),
+]
+
+
+class IterativeSolversTest(jtu.JaxTestCase):
+
+  @parameterized.named_parameters(jtu.cases_from_list(
+      {"testcase_name": "_{}_n={}_preconditioned={}".format(
+          name, n, preconditioned),
+       "solver": solver, "make_matrix": make_matrix, "n": n,
+       "preconditioned": preconditioned}
+      for name, solver, make_matrix in SOLVERS
+      for n in [1, 5, 30]
+      for preconditioned in [False, True]))
+  def testSolve(self, solver, make_matrix, n, preconditioned):
+    rng = onp.random.RandomState(0)
+    a = make_matrix(rng, n, onp.float32)
+    b = rng.randn(n).astype(onp.float32)
+    # A Jacobi preconditioner, given as a function.
+    M = (lambda x: x / np.diag(a)) if preconditioned else None
+    matvec = lambda x: np.dot(a, x)
+
+    x, info = api.jit(lambda b: solver(matvec, b, tol=1e-6, M=M))(b)
+    self.assertIsNone(info)
+    self.assertAllClose(x, onp.linalg.solve(a, b), check_dtypes=True,
+                        atol=1e-4, rtol=1e-4)
+
+    x, _ = solver(a, b, tol=1e-6, x0=onp.ones_like(b))
+    self.assertAllClose(x, onp.linalg.solve(a, b), check_dtypes=True,
+                        atol=1e-4, rtol=1e-4)
+
+  @parameterized.named_parameters(jtu.cases_from_list(
+      {"testcase_name": "_{}".format(name), "solver": solver,
+       "make_matrix": make_matrix}
+      for name, solver, make_matrix in SOLVERS))
+  def testSolveMatrixShapedOperand(self, solver, make_matrix):
+    rng = onp.random.RandomState(0)
+    a = make_matrix(rng, 12, onp.float32)
+    b = rng.randn(3, 4).astype(onp.float32)
+    matvec = lambda x: np.reshape(np.dot(a, np.ravel(x)), (3, 4))
+    x, _ = solver(matvec, b, tol=1e-6)
+    expected = onp.linalg.solve(a, b.ravel()).reshape(3, 4)
+    self.assertAllClose(x, expected, check_dtypes=True, atol=1e-4, rtol=1e-4)
+
+  def testMaxiter(self):
+    rng = onp.random.RandomState(0)
+    a = posdef(rng, 20, onp.float32)
+    b = rng.randn(20).astype(onp.float32)
+    x, _ = sp_linalg.cg(a, b, maxiter=0)
+    self.assertAllClose(x, onp.zeros_like(b), check_dtypes=True)
+
+  @parameterized.named_parameters(jtu.cases_from_list(
+      {"testcase_name": "_{}".format(name), "solver": solver,
+       "make_matrix": make_matrix}
+      for name, solver, make_matrix in SOLVERS))
+  def testImplicitGrad(self, solver, make_matrix):
+    rng = onp.random.RandomState(0)
+    a = make_matrix(rng, 6, onp.float32)
+    b = rng.randn(6).astype(onp.float32)
+    if make_matrix is posdef:
+      symmetrize = lambda a: (a + a.T) / 2
+    else:
+      symmetrize = lambda a: a
+
+    def iterative(a, b):
+      a = symmetrize(a)
+      x, _ = solver(lambda x: np.dot(a, x), b, tol=1e-7)
+      return np.sum(np.sin(x))
+
+    def direct(a, b):
+      return np.sum(np.sin(np.linalg.solve(symmetrize(a), b)))
+
+    for argnums in [0, 1]:
+      self.assertAllClose(api.grad(iterative, argnums)(a, b),
+                          api.grad(direct, argnums)(a, b),
+                          check_dtypes=True, atol=1e-3, rtol=1e-3)
+    t = rng.randn(6).astype(onp.float32)
+    _, ans = api.jvp(partial(iterative, a), (b,), (t,))
+    _, expected = api.jvp(partial(direct, a), (b,), (t,))
+    self.assertAllClose(ans, expected, check_dtypes=True, atol=1e-3,
+                        rtol=1e-3)
+
+  def testMatrixFreeHessianSolve(self):
+    # Newton step for a convex function, with the Hessian applied by
+    # forward-over-reverse differentiation.
+    rng = onp.random.RandomState(0)
+    c = posdef(rng, 8, onp.float32)
+    f = lambda x: 0.5 * np.dot(x, np.dot(c, x)) + np.sum(np.exp(x / 4))
+    x = rng.randn(8).astype(onp.float32)
+    hvp = lambda v: api.jvp(api.grad(f), (x,), (v,))[1]
+    g = api.grad(f)(x)
+    step, _ = sp_linalg.cg(hvp, g, tol=1e-6)
+    expected = onp.linalg.solve(api.hessian(f)(x), g)
+    self.assertAllClose(step, expected, check_dtypes=True, atol=1e-4,
+                        rtol=1e-4)
+
+  @parameterized.named_parameters(jtu.cases_from_list(
+      {"testcase_name": "_{}".format(name), "solver": solver,
+       "make_matrix": make_matrix}
+      for name, solver, make_matrix in SOLVERS))
+  def testBatching(self, solver, make_matrix):
+    rng = onp.random.RandomState(0)
+    a = onp.stack([make_matrix(rng, 5, onp.float32) for _ in range(3)])
+    b = rng.randn(3, 5).astype(onp.float32)
+
+    def f(a, b):
+      return solver(lambda x: np.dot(a, x), b, tol=1e-7)[0]
+
+    expected = onp.stack([onp.linalg.solve(a_, b_) for a_, b_ in zip(a, b)])
+    self.assertAllClose(api.vmap(f)(a, b), expected, check_dtypes=True,
+                        atol=1e-4, rtol=1e-4)
+    expected = onp.stack([onp.linalg.solve(a[0], b_) for b_ in b])
+    self.assertAllClose(api.vmap(f, (None, 0))(a[0], b), expected,
+                        check_dtypes=True, atol=1e-4, rtol=1e-4)
+
+    loss = lambda a, b: np.sum(api.vmap(f)(a, b) ** 2)
+    direct = lambda a, b: np.sum(np.linalg.solve(a, b[..., None]) ** 2)
+    self.assertAllClose(api.grad(loss, 1)(a, b), api.grad(direct, 1)(a, b),
+                        check_dtypes=True, atol=1e-3, rtol=1e-3)
+
+  def testComplexCG(self):
+    rng = onp.random.RandomState(0)
+    a = rng.randn(6, 6) + 1j * rng.randn(6, 6)
+    a = (onp.dot(a, a.conj().T) / 6 + onp.eye(6)).astype(onp.complex64)
+    b = (rng.randn(6) + 1j * rng.randn(6)).astype(onp.complex64)
+    x, _ = sp_linalg.cg(a, b, tol=1e-6)
+    self.assertAllClose(x, onp.linalg.solve(a, b), check_dtypes=True,
+                        atol=1e-4, rtol=1e-4)
+
+  def testBadOperatorShape(self):
+    a = onp.ones((3, 4), onp.float32)
+    b = onp.ones((3,), onp.float32)
+    self.assertRaises(TypeError, lambda: sp_linalg.cg(a, b))
+
+
+class EigensolversTest(jtu.JaxTestCase):
+
+  @parameterized.named_parameters(jtu.cases_from_list(
+      {"testcase_name": "_n={}_k={}_which={}".format(n, k, which),
+       "n": n, "k": k, "which": which}
+      for n, k in [(10, 1), (40, 3), (100, 6)]
+      for which in ["LM", "LA", "SA"]))
+  def testEigsh(self, n, k, which):
+    rng = onp.random.RandomState(0)
+    a = rng.randn(n, n).astype(onp.float32)
+    a = (a + a.T) / 2
+    w_ref = onp.linalg.eigvalsh(a)
+    if which == "LA":
+      expected = w_ref[-k:]
+    elif which == "SA":
+      expected = w_ref[:k]
+    else:
+      expected = onp.sort(w_ref[onp.argsort(-onp.abs(w_ref))[:k]])
+
+    w, v = api.jit(partial(sp_linalg.eigsh, k=k, which=which))(a)
+    self.assertAllClose(w, expected, check_dtypes=True, atol=1e-4,
+                        rtol=1e-4)
+    self.assertAllClose(onp.dot(a, v), v * w, check_dtypes=True, atol=1e-3,
+                        rtol=1e-3)
+    self.assertAllClose(onp.dot(v.T, v), onp.eye(k), check_dtypes=False,
+                        atol=1e-4, rtol=1e-4)
+
+  def testEigshMatrixFree(self):
+    # The Hessian of a function, applied by forward-over-reverse
+    # differentiation without forming it.
+    rng = onp.random.RandomState(0)
+    c = rng.randn(30, 30).astype(onp.float32)
+    f = lambda x: np.sum(np.tanh(np.dot(c, x)) ** 2)
+    x = rng.randn(30).astype(onp.float32)
+    hvp = lambda v: api.jvp(api.grad(f), (x,), (v,))[1]
+    v0 = rng.randn(30).astype(onp.float32)
+    w, _ = sp_linalg.eigsh(hvp, k=2, which="LA", v0=v0)
+    expected = onp.linalg.eigvalsh(api.hessian(f)(x))[-2:]
+    self.assertAllClose(w, expected, check_dtypes=True, atol=1e-3, rtol=1e-3)
+    self.assertRaises(ValueError, lambda: sp_linalg.eigsh(hvp, k=2))
+
+  @parameterized.named_parameters(jtu.cases_from_list(
+      {"testcase_name": "_shape={}_k={}_which={}".format(shape, k, which),
+       "shape": shape, "k": k, "which": which}
+      for shape, k in [((20, 12), 2), ((15, 40), 4)]
+      for which in ["LM", "SM"]))
+  def testSvds(self, shape, k, which):
+    rng = onp.random.RandomState(0)
+    a = rng.randn(*shape).astype(onp.float32)
+    s_ref = onp.linalg.svd(a, compute_uv=False)
+    if shape[0] < shape[1] and which == "SM":
+      s_ref = onp.concatenate([s_ref, onp.zeros(shape[1] - shape[0])])
+    s_ref = onp.sort(s_ref)
+    expected = s_ref[-k:] if which == "LM" else s_ref[:k]
+    u, s, vh = sp_linalg.svds(a, k=k, which=which)
+    self.assertAllClose(s, expected, check_dtypes=False, atol=1e-3,
+                        rtol=1e-3)
+    if which == "LM":
+      self.assertAllClose(onp.dot(u * s, vh), onp.dot(onp.dot(u, u.T), a),
+                          check_dtypes=False, atol=1e-3, rtol=1e-3)
+
+    matvec = lambda x: np.dot(a, x)
+    v0 = onp.ones(shape[1], onp.float32)
+    s = sp_linalg.svds(matvec, k=k, which=which, v0=v0,
+                       return_singular_vectors=False)
+    self.assertAllClose(s, expected, check_dtypes=False, atol=1e-3,
+                        rtol=1e-3)
+
+  @parameterized.named_parameters(jtu.cases_from_list(
+      {"testcase_name": "_matrix_free={}".format(matrix_free),
+       "matrix_free": matrix_free}
+      for matrix_free in [False, True]))
+  def testRandomizedSvd(self, matrix_free):
+    rng = onp.random.RandomState(0)
+    # A matrix of rank 5 plus a little noise.
+    a = onp.dot(rng.randn(60, 5), rng.randn(5, 40)).astype(onp.float32)
+    a = a + 1e-4 * rng.randn(60, 40).astype(onp.float32)
+    key = random.PRNGKey(0)
+    if matrix_free:
+      u, s, vh = sp_linalg.randomized_svd(key, lambda x: np.dot(a, x), 5,
+                                          shape=(60, 40))
+    else:
+      u, s, vh = sp_linalg.randomized_svd(key, a, 5)
+    self.assertEqual(u.shape, (60, 5))
+    self.assertEqual(vh.shape, (5, 40))
+    self.assertAllClose(s, onp.linalg.svd(a, compute_uv=False)[:5],
+                        check_dtypes=False, atol=1e-3, rtol=1e-3)
+    self.assertAllClose(onp.dot(u * s, vh), a, check_dtypes=False, atol=1e-2,
+                        rtol=1e-2)
+
+
+if __name__ == "__main__":
+  absltest.main()
@@ -0,0 +1,175 @@
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for the sparse matrix library."""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import operator
+
+from absl.testing import absltest
+from absl.testing import parameterized
+
+import numpy as onp
+import six
+
+from jax import api
+from jax import test_util as jtu
+from jax import tree_util
+from jax.experimental import sparse
+
+from jax.config import config
+config.parse_flags_with_absl()
+
+
+def rand_sparse(rng, shape, density, dtype=onp.float32):
+  x = rng.randn(*shape).astype(dtype)
+  return onp.where(rng.rand(*shape) < density, x, 0).astype(dtype)
+
+
+class SparseTest(jtu.JaxTestCase):
+
+  @parameterized.named_parameters(jtu.cases_from_list(
+      {"testcase_name": "_{}_shape={}".format(fmt.__name__, shape),
+       "fmt": fmt, "shape": shape}
+      for fmt in [sparse.COO, sparse.CSR]
+      for shape in [(5, 3), (1, 7), (4, 4)]))
+  def testFromDenseToDense(self, fmt, shape):
+    x = rand_sparse(onp.random.RandomState(0), shape, 0.4)
+    m = fmt.fromdense(x)
+    self.assertEqual(m.nnz, onp.count_nonzero(x))
+    self.assertAllClose(m.todense(), x, check_dtypes=True)
+    self.assertAllClose(m.T.todense(), x.T, check_dtypes=True)
+
+  def testCOODuplicatesAreSummed(self):
+    m = sparse.COO(onp.array([1., 2., 3.]), onp.array([0, 1, 0]),
+                   onp.array([2, 0, 2]), (2, 3))
+    expected = onp.array([[0., 0., 4.], [2., 0., 0.]])
+    self.assertAllClose(m.todense(), expected, check_dtypes=False)
+
+  @parameterized.named_parameters(jtu.cases_from_list(
+      {"testcase_name": "_{}_shape={}_other={}_sparse_lhs={}".format(
+          fmt.__name__, shape, other_shape, sparse_lhs),
+       "fmt": fmt, "shape": shape, "other_shape": other_shape,
+       "sparse_lhs": sparse_lhs}
+      for fmt in [sparse.COO, sparse.CSR]
+      for shape, other_shape, sparse_lhs in [
+          ((5, 3), (3,), True), ((5, 3), (3, 4), True),
+          ((5, 3), (5,), False), ((5, 3), (2, 5), False),
+          ((1, 6), (6, 2), True)]))
+  def testMatmul(self, fmt, shape, other_shape, sparse_lhs):
+    rng = onp.random.RandomState(0)
+    x = rand_sparse(rng, shape, 0.3)
+    y = rng.randn(*other_shape).astype(onp.float32)
+    m = fmt.fromdense(x)
+    if sparse_lhs:
+      expected = onp.matmul(x, y)
+      f = lambda m, y: sparse.matmul(m, y)
+      args = (m, y)
+    else:
+      expected = onp.matmul(y, x)
+      f = lambda y, m: sparse.matmul(y, m)
+      args = (y, m)
+    self.assertAllClose(f(*args), expected, check_dtypes=True)
+    self.assertAllClose(api.jit(f)(*args), expected, check_dtypes=True)
+
+  @parameterized.named_parameters(jtu.cases_from_list(
+      {"testcase_name": "_{}".format(fmt.__name__), "fmt": fmt}
+      for fmt in [sparse.COO, sparse.CSR]))
+  def testMatmulOperator(self, fmt):
+    if six.PY2:
+      self.skipTest("the @ operator requires Python 3")
+    rng = onp.random.RandomState(0)
+    x = rand_sparse(rng, (4, 3), 0.5)
+    m = fmt.fromdense(x)
+    y = rng.randn(3, 2).astype(onp.float32)
+    z = rng.randn(2, 4).astype(onp.float32)
+    self.assertAllClose(operator.matmul(m, y), onp.matmul(x, y),
+                        check_dtypes=True)
+    # A numpy left operand must defer to the sparse matrix's __rmatmul__.
+    self.assertAllClose(operator.matmul(z, m), onp.matmul(z, x),
+                        check_dtypes=True)
+
+  def testDot(self):
+    rng = onp.random.RandomState(0)
+    x = rand_sparse(rng, (4, 6), 0.3)
+    y = rng.randn(6, 2).astype(onp.float32)
+    self.assertAllClose(sparse.dot(sparse.CSR.fromdense(x), y), onp.dot(x, y),
+                        check_dtypes=True)
+    self.assertAllClose(sparse.dot(x, y), onp.dot(x, y), check_dtypes=True)
+
+  def testPytree(self):
+    m = sparse.COO.fromdense(onp.eye(3, dtype=onp.float32))
+    leaves, treedef = tree_util.tree_flatten(m)
+    self.assertEqual(len(leaves), 3)
+    m2 = tree_util.tree_unflatten(treedef, leaves)
+    self.assertEqual(m2.shape, (3, 3))
+    self.assertAllClose(m2.todense(), onp.eye(3), check_dtypes=False)
+
+  @parameterized.named_parameters(jtu.cases_from_list(
+      {"testcase_name": "_{}".format(fmt.__name__), "fmt": fmt}
+      for fmt in [sparse.COO, sparse.CSR]))
+  def testMatmulGrads(self, fmt):
+    rng = onp.random.RandomState(0)
+    m = fmt.fromdense(rand_sparse(rng, (5, 4), 0.5))
+    y = rng.randn(4, 3).astype(onp.float32)
+    leaves, treedef = tree_util.tree_flatten(m)
+    f = lambda data, y: sparse.matmul(
+        tree_util.tree_unflatten(treedef, [data] + leaves[1:]), y)
+    jtu.check_grads(f, (m.data, y), 2, rtol=1e-2, atol=1e-2, eps=1e-2)
+
+  def testMatmulVmap(self):
+    rng = onp.random.RandomState(0)
+    x = rand_sparse(rng, (5, 4), 0.5)
+    m = sparse.COO.fromdense(x)
+    ys = rng.randn(3, 4).astype(onp.float32)
+    ans = api.vmap(lambda y: m @ y)(ys)
+    self.assertAllClose(ans, onp.matmul(ys, x.T), check_dtypes=True)
+
+    datas = onp.stack([m.data, 2 * m.data, -m.data])
+    ans = api.vmap(lambda data: sparse.COO(data, m.row, m.col, m.shape)
+                   @ ys[0])(datas)
+    expected = onp.stack([onp.dot(x, ys[0]), onp.dot(2 * x, ys[0]),
+                          onp.dot(-x, ys[0])])
+    self.assertAllClose(ans, expected, check_dtypes=True)
+
+  def testEmbeddingVjp(self):
+    rng = onp.random.RandomState(0)
+    table = rng.randn(8, 3).astype(onp.float32)
+    ids = onp.array([[5, 1], [5, 0]])
+    ct = rng.randn(2, 2, 3).astype(onp.float32)
+    rows, emb_vjp = sparse.embedding_vjp(table, ids)
+    self.assertAllClose(rows, table[ids], check_dtypes=True)
+    g = emb_vjp(ct)
+    self.assertIsInstance(g, sparse.IndexedSlices)
+    self.assertEqual(g.shape, table.shape)
+    _, dense_vjp = api.vjp(lambda t: sparse.embedding_lookup(t, ids), table)
+    expected, = dense_vjp(ct)
+    self.assertAllClose(g.todense(), expected, check_dtypes=True)
+
+  def testSumDuplicates(self):
+    g = sparse.IndexedSlices(onp.array([3, 1, 3, 0, 1, 3]),
+                             onp.arange(6, dtype=onp.float32)[:, None],
+                             (5, 1))
+    summed = sparse._sum_duplicates(g)
+    self.assertAllClose(summed.indices, onp.array([0, 1, 1, 3, 3, 3]),
+                        check_dtypes=False)
+    self.assertAllClose(summed.values[:, 0],
+                        onp.array([3., 5., 5., 7., 7., 7.], onp.float32),
+                        check_dtypes=True)
+
+
+if __name__ == "__main__":
+  absltest.main()
@@ -204,5 +204,29 @@ class StaxTest(jtu.JaxTestCase):
     self.assertEqual(gamma.shape, (5,))
     self.assertEqual(out_shape, out.shape)
 
+  @parameterized.named_parameters(jtu.cases_from_list(
+      {"testcase_name": "_{}".format(name), "layer": layer,
+       "mixed_layer": mixed_layer, "input_shape": input_shape}
+      for name, layer, mixed_layer, input_shape in [
+          ("dense", stax.Dense(4), stax.Dense(4, compute_dtype=onp.float16),
+           (3, 5)),
+          ("conv", stax.Conv(3, (2, 2)),
+           stax.Conv(3, (2, 2), compute_dtype=onp.float16), (2, 5, 6, 1)),
+          ("batchnorm", stax.BatchNorm(),
+           stax.BatchNorm(compute_dtype=onp.float16), (4, 5, 6, 7)),
+      ]))
+  def testMixedPrecision(self, layer, mixed_layer, input_shape):
+    init_fun, apply_fun = layer
+    _, mixed_apply_fun = mixed_layer
+    out_shape, params = init_fun(input_shape)
+    inputs = random_inputs(onp.random.RandomState(0), input_shape)
+
+    out = apply_fun(params, inputs)
+    mixed_out = mixed_apply_fun(params, inputs)
+    self.assertEqual(mixed_out.shape, out_shape)
+    self.assertEqual(mixed_out.dtype, onp.float16)
+    self.assertAllClose(mixed_out.astype(onp.float32), out, check_dtypes=True,
+                        atol=1e-2, rtol=1e-2)
+
 if __name__ == "__main__":
   absltest.main()